@@ -1,24 +1,24 @@
-import requests
+import asyncio
 import os
 import json
 from dotenv import load_dotenv, find_dotenv
-import uuid
+
+from External_API.tmdb_client import TMDbClient
 
 load_dotenv(find_dotenv())
 API_TOKEN = os.getenv("TMDB_API_TOKEN")
 
 
 def getTrending():
-    url = "https://api.themoviedb.org/3/movie/popular?language=en-US&page=1"
-
-    headers = {
-        "accept": "application/json",
-        "Authorization": f"Bearer {API_TOKEN}"
-    }
-    response = requests.get(url, headers=headers)
-    data = response.json()
+    """
+    First page of TMDb's popular movies. Blocking, for scripts; the backend uses
+    External_API.tmdb_client directly.
+    """
+    async def fetch():
+        async with TMDbClient(API_TOKEN) as tmdb:
+            return await tmdb.get("/movie/popular", {"language": "en-US", "page": 1})
 
-    return data
+    return asyncio.run(fetch())
 
 def save_tmdb_json(response_json, filename="backend/data/tmdb_data.json"):
     """
@@ -28,86 +28,19 @@ def save_tmdb_json(response_json, filename="backend/data/tmdb_data.json"):
         json.dump(response_json, f, indent=4, ensure_ascii=False)
     print(f"Data saved to {filename}")
 
-def transform_tmdb_to_files():
-    # Load original TMDb JSON
-    with open("backend/data/tmdb_data.json", "r", encoding="utf-8") as f:
-        tmdb_data = json.load(f)
-
-    print(f"Found {len(tmdb_data.get('results', []))} movies in TMDb data.")
-
-    # Output folder
-    output_dir = "backend/data/movies"
-    os.makedirs(output_dir, exist_ok=True)
-    print(f"Using output folder: {os.path.abspath(output_dir)}")
-
-    # Mapping file path
-    mapping_file = os.path.join(output_dir, "tmdb_uuid_map.json")
-    if os.path.exists(mapping_file):
-        with open(mapping_file, "r", encoding="utf-8") as f:
-            tmdb_uuid_map = json.load(f)
-        print("Loaded existing UUID map.")
-    else:
-        tmdb_uuid_map = {}
-        print("No existing UUID map found; starting fresh.")
-
-    for movie in tmdb_data.get("results", []):
-        tmdb_id = str(movie.get("id"))
-
-        # Reuse UUID if already mapped
-        if tmdb_id in tmdb_uuid_map:
-            movie_id = tmdb_uuid_map[tmdb_id]
-        else:
-            movie_id = str(uuid.uuid4())
-            tmdb_uuid_map[tmdb_id] = movie_id
-
-        filename = os.path.join(output_dir, f"{movie_id}.json")
-
-        # Skip creating file if it already exists
-        if os.path.exists(filename):
-            continue
-
-        transformed = {
-            "movie_id": movie_id,
-            "title": movie.get("title"),
-            "imdb_rating": movie.get("vote_average"),
-            "meta_score": None,
-            "genres": movie.get("genre_ids", []),
-            "directors": [],
-            "release_date": movie.get("release_date"),
-            "duration": None,
-            "description": movie.get("overview"),
-            "main_stars": [],
-            "total_user_reviews": None,
-            "total_critic_reviews": None,
-            "total_rating_count": movie.get("vote_count"),
-            "source_folder": movie.get("title")
-        }
-
-        with open(filename, "w", encoding="utf-8") as f:
-            json.dump(transformed, f, indent=4, ensure_ascii=False)
-        print(f"Created file: {filename}")
-
-    # Save mapping file after processing all movies
-    with open(mapping_file, "w", encoding="utf-8") as f:
-        json.dump(tmdb_uuid_map, f, indent=4)
-    print(f"Processed {len(tmdb_data.get('results', []))} movies.")
-
-#transform_tmdb_to_files()
-
-
-
-
-
-
-
-
-
-
-
-
+def transform_tmdb_to_files(filename="backend/data/tmdb_data.json"):
+    """
+    Writes the movies of a saved TMDb response into backend/data/movies. To fetch and
+    ingest many pages at once use `python -m External_API.ingest --pages N`.
+    """
+    from External_API.ingest import ingest_payloads
 
-# Example usage:
-#save_tmdb_json(data)  call from outside of this file in the actual implementation
+    with open(filename, "r", encoding="utf-8") as f:
+        tmdb_data = json.load(f)
+    report = ingest_payloads([tmdb_data])
+    print(f"{report.movies} movies: {report.created} created, {report.updated} updated, "
+          f"{report.unchanged} unchanged")
+    return report
 
 """
 To use the api set the url to the correct end point which can be found in the documentation
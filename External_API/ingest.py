@@ -0,0 +1,225 @@
+"""Ingest TMDb's popular movies into the movies collection.
+
+    python -m External_API.ingest --pages 500
+
+Pipeline:
+    fetch      every page is requested at once through one TMDbClient, which bounds the
+               requests in flight and retries failures; pages enter a queue as they arrive
+    transform  each movie becomes a movie record (genre ids resolved to names); a movie seen
+               on two pages is taken once
+    write      records are written in batches of `batch_size`, each batch in one transaction
+               over the movies directory, so its files and the ids it adds to the
+               tmdb_id -> movie_id map are committed together: new ids are appended to
+               tmdb_uuid_map.log, which is folded into tmdb_uuid_map.json once, after the last
+               batch (or by the next writer, if a run stops before that). A movie whose record
+               hashes the same as the stored one is skipped. Batches are written in a worker
+               thread while fetching goes on.
+
+Returns (and with the command prints) an IngestReport with counts and movies per second.
+"""
+import argparse, asyncio, hashlib, json, os, time, uuid
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, Iterable, List, Optional
+
+from backend.core import jsonio, storage
+from backend.core.transactions import transaction
+from External_API.tmdb_client import TMDbClient
+
+MAP_FILE = "tmdb_uuid_map.json"
+MAP_LOG = "tmdb_uuid_map.log"  # [tmdb_id, movie_id] lines added since the map was last saved
+BATCH_SIZE = 200
+MAX_PAGES = 500
+
+
+@dataclass
+class IngestReport:
+    pages: int = 0
+    movies: int = 0
+    created: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    batches: int = 0
+    seconds: float = 0.0
+    client: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def movies_per_sec(self) -> float:
+        return round(self.movies / self.seconds, 1) if self.seconds else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {**asdict(self), "movies_per_sec": self.movies_per_sec}
+
+
+def digest(record: Dict[str, Any]) -> str:
+    return hashlib.sha1(json.dumps(record, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def transform(movie: Dict[str, Any], movie_id: str, genres: Dict[int, str]) -> Dict[str, Any]:
+    """A TMDb list entry as a movie record (genre ids without a name are kept as ids)."""
+    return {
+        "movie_id": movie_id,
+        "title": movie.get("title"),
+        "imdb_rating": movie.get("vote_average"),
+        "meta_score": None,
+        "genres": [genres.get(g, g) for g in movie.get("genre_ids", [])],
+        "directors": [],
+        "release_date": movie.get("release_date"),
+        "duration": None,
+        "description": movie.get("overview"),
+        "main_stars": [],
+        "total_user_reviews": None,
+        "total_critic_reviews": None,
+        "total_rating_count": movie.get("vote_count"),
+        "source_folder": movie.get("title"),
+    }
+
+
+class MovieWriter:
+    """Batched, transactional writes of movie records plus the tmdb_id -> movie_id map."""
+
+    def __init__(self, collection: Optional[storage.Collection] = None):
+        self.movies = collection or storage.collection("movies")
+        self.directory = self.movies.spec.directory
+        self.map_path = os.path.join(self.directory, MAP_FILE)
+        self.log_path = os.path.join(self.directory, MAP_LOG)
+        self.ids: Dict[str, str] = jsonio.load_json(self.map_path, default={})
+        self.logged = self._read_log()
+        self.ids.update(self.logged)
+
+    def _read_log(self) -> Dict[str, str]:
+        logged: Dict[str, str] = {}
+        try:
+            with open(self.log_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        tmdb_id, movie_id = json.loads(line)
+                    except ValueError:
+                        continue  # a line torn by a crash; its batch was not committed
+                    logged[str(tmdb_id)] = movie_id
+        except FileNotFoundError:
+            pass
+        return logged
+
+    def movie_id(self, tmdb_id: str) -> str:
+        """The movie_id for a TMDb id; new ids are only recorded by the batch that writes them."""
+        return self.ids.get(tmdb_id) or str(uuid.uuid5(uuid.NAMESPACE_URL, f"tmdb:{tmdb_id}"))
+
+    def write(self, batch: List[Dict[str, Any]], report: IngestReport) -> None:
+        """batch: {"tmdb_id", "record"} items."""
+        with transaction(self.directory) as tx:
+            for item in batch:
+                record = item["record"]
+                known = item["tmdb_id"] in self.ids
+                if known:
+                    current = self.movies.get(record["movie_id"])
+                    if current is not None and digest(current) == digest(record):
+                        report.unchanged += 1
+                        continue
+                self.movies.put(record)
+                if known:
+                    report.updated += 1
+                else:
+                    self.ids[item["tmdb_id"]] = self.logged[item["tmdb_id"]] = record["movie_id"]
+                    tx.stage_append(self.log_path, json.dumps([item["tmdb_id"], record["movie_id"]]))
+                    report.created += 1
+        report.batches += 1
+
+    def finish(self) -> None:
+        """Fold the ids logged by the batches into the map file and drop the log."""
+        if not self.logged:
+            return
+        with transaction(self.directory) as tx:
+            jsonio.save_json(self.map_path, self.ids)
+            tx.stage_delete(self.log_path)
+        self.logged = {}
+
+
+async def ingest(pages: int, *, client: Optional[TMDbClient] = None, writer: Optional[MovieWriter] = None,
+                 batch_size: int = BATCH_SIZE) -> IngestReport:
+    """Fetch pages 1..pages of TMDb's popular list and write the movies (see module docstring)."""
+    pages = max(min(pages, MAX_PAGES), 1)
+    tmdb = client or TMDbClient()
+    writer = writer or MovieWriter()
+    report = IngestReport()
+    started = time.perf_counter()
+    queue: "asyncio.Queue[Optional[Dict[str, Any]]]" = asyncio.Queue()
+
+    async def fetch(page: int) -> None:
+        try:
+            await queue.put(await tmdb.get("/movie/popular", {"language": "en-US", "page": page}, cache=False))
+        finally:
+            await queue.put(None)
+
+    try:
+        genre_list = await tmdb.get("/genre/movie/list", {"language": "en-US"})
+        genres = {g["id"]: g["name"] for g in genre_list.get("genres", [])}
+        fetchers = [asyncio.ensure_future(fetch(page)) for page in range(1, pages + 1)]
+        seen = set()
+        batch: List[Dict[str, Any]] = []
+        pending: List[asyncio.Future] = []
+        remaining = pages
+        while remaining:
+            payload = await queue.get()
+            if payload is None:
+                remaining -= 1
+                continue
+            report.pages += 1
+            for movie in payload.get("results", []):
+                tmdb_id = str(movie.get("id"))
+                if tmdb_id in seen:
+                    continue
+                seen.add(tmdb_id)
+                batch.append({"tmdb_id": tmdb_id, "record": transform(movie, writer.movie_id(tmdb_id), genres)})
+                if len(batch) >= batch_size:
+                    await asyncio.gather(*pending)  # one batch in flight keeps map updates ordered
+                    pending = [asyncio.ensure_future(asyncio.to_thread(writer.write, batch, report))]
+                    batch = []
+        await asyncio.gather(*pending)
+        if batch:
+            await asyncio.to_thread(writer.write, batch, report)
+        await asyncio.to_thread(writer.finish)
+        report.movies = len(seen)
+        await asyncio.gather(*fetchers)  # re-raises a page that failed for good, once the rest is written
+    finally:
+        if client is None:
+            await tmdb.aclose()
+    report.seconds = round(time.perf_counter() - started, 3)
+    report.client = tmdb.stats()
+    return report
+
+
+def ingest_payloads(payloads: Iterable[Dict[str, Any]], writer: Optional[MovieWriter] = None,
+                    genres: Optional[Dict[int, str]] = None) -> IngestReport:
+    """Write already-fetched list payloads (e.g. a saved tmdb_data.json) through the same stages.
+
+    Blocking; without `genres` the records keep TMDb's genre ids.
+    """
+    writer = writer or MovieWriter()
+    report = IngestReport()
+    started = time.perf_counter()
+    batch: Dict[str, Dict[str, Any]] = {}
+    for payload in payloads:
+        report.pages += 1
+        for movie in payload.get("results", []):
+            tmdb_id = str(movie.get("id"))
+            batch.setdefault(tmdb_id, {"tmdb_id": tmdb_id, "record": transform(movie, writer.movie_id(tmdb_id), genres or {})})
+    items = list(batch.values())
+    for start in range(0, len(items), BATCH_SIZE):
+        writer.write(items[start:start + BATCH_SIZE], report)
+    writer.finish()
+    report.movies = len(items)
+    report.seconds = round(time.perf_counter() - started, 3)
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Ingest TMDb's popular movies into backend/data/movies")
+    parser.add_argument("--pages", type=int, default=50, help=f"pages of 20 movies to fetch (max {MAX_PAGES})")
+    parser.add_argument("--batch", type=int, default=BATCH_SIZE, help="movies per write transaction")
+    args = parser.parse_args(argv)
+    report = asyncio.run(ingest(args.pages, batch_size=args.batch))
+    print(json.dumps(report.as_dict(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""Async TMDb client shared by the backend (trending list, popular pool, ingestion).
+
+One httpx.AsyncClient per TMDbClient keeps a pool of keep-alive connections (HTTP/2 when the
+optional h2 package is installed) and at most `concurrency` requests in flight. Responses are
+cached per endpoint and parameters: within the endpoint's TTL (CACHE_TTLS) the cached body is
+returned without a request, after it the request carries If-None-Match and a 304 reuses the
+body. 429 and 5xx answers and transport errors are retried with exponential backoff and full
+jitter, waiting Retry-After when TMDb sends one.
+
+Pass `transport` (e.g. httpx.MockTransport, or a transport pointed at a local fake server) to
+drive the client without the network.
+
+Usage:
+    async with TMDbClient() as tmdb:
+        page = await tmdb.get("/movie/popular", {"page": 1})
+"""
+import asyncio, email.utils, importlib.util, os, random, time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+import httpx
+from dotenv import load_dotenv, find_dotenv
+
+load_dotenv(find_dotenv())
+
+BASE_URL = "https://api.themoviedb.org/3"
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Endpoint path prefix -> seconds a cached response is used without asking TMDb again
+CACHE_TTLS = {"/movie/popular": 300.0, "/trending": 300.0, "/genre": 86400.0, "/configuration": 86400.0}
+DEFAULT_CACHE_TTL = 60.0
+CACHE_ENTRIES = 512
+HTTP2 = importlib.util.find_spec("h2") is not None
+
+
+class TMDbError(Exception):
+    """TMDb answered with an error status (after retries) or could not be reached."""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def _retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or an HTTP date)."""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(email.utils.parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class TMDbClient:
+    def __init__(self, token: Optional[str] = None, *, base_url: str = BASE_URL, concurrency: int = 8,
+                 max_retries: int = 3, backoff: float = 0.5, max_backoff: float = 30.0,
+                 timeout: float = 10.0, transport: Optional[httpx.AsyncBaseTransport] = None,
+                 sleep: Callable[[float], Awaitable[Any]] = asyncio.sleep):
+        token = token if token is not None else os.getenv("TMDB_API_TOKEN", "")
+        self.http = httpx.AsyncClient(
+            base_url=base_url,
+            headers={"accept": "application/json", "Authorization": f"Bearer {token}"},
+            timeout=httpx.Timeout(timeout, connect=3.05),
+            limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency),
+            http2=HTTP2 and transport is None,  # h2 is optional; HTTP/1.1 keep-alive otherwise
+            transport=transport,
+        )
+        self.http2 = HTTP2 and transport is None
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._sleep = sleep
+        self._slots = asyncio.Semaphore(concurrency)
+        # (path, params) -> (fetched at, etag, body)
+        self._cache: "OrderedDict[Tuple[str, Tuple], Tuple[float, Optional[str], Any]]" = OrderedDict()
+        self.requests = self.cache_hits = self.not_modified = self.retries = 0
+
+    async def __aenter__(self) -> "TMDbClient":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        await self.http.aclose()
+
+    @staticmethod
+    def _ttl(path: str) -> float:
+        return next((ttl for prefix, ttl in CACHE_TTLS.items() if path.startswith(prefix)), DEFAULT_CACHE_TTL)
+
+    async def get(self, path: str, params: Optional[Dict[str, Any]] = None, *, cache: bool = True) -> Any:
+        """The decoded JSON body of GET path. Raises TMDbError when TMDb keeps failing."""
+        key = (path, tuple(sorted((params or {}).items())))
+        cached = self._cache.get(key) if cache else None
+        if cached is not None:
+            self._cache.move_to_end(key)
+            if time.monotonic() - cached[0] < self._ttl(path):
+                self.cache_hits += 1
+                return cached[2]
+        headers = {"If-None-Match": cached[1]} if cached is not None and cached[1] else None
+        response = await self._send(path, params, headers)
+        if response.status_code == 304 and cached is not None:
+            self.not_modified += 1
+            body = cached[2]
+        else:
+            body = response.json()
+        if cache:
+            self._cache[key] = (time.monotonic(), response.headers.get("etag") or (cached[1] if cached else None), body)
+            while len(self._cache) > CACHE_ENTRIES:
+                self._cache.popitem(last=False)
+        return body
+
+    async def _send(self, path: str, params: Optional[Dict[str, Any]], headers: Optional[Dict[str, str]]) -> httpx.Response:
+        attempt = 0
+        while True:
+            wait: Optional[float] = None
+            try:
+                async with self._slots:
+                    self.requests += 1
+                    response = await self.http.get(path, params=params, headers=headers)
+            except httpx.TransportError as exc:
+                if attempt >= self.max_retries:
+                    raise TMDbError(f"TMDb unreachable: {exc}") from exc
+            else:
+                if response.status_code < 400:
+                    return response
+                if response.status_code not in RETRY_STATUSES or attempt >= self.max_retries:
+                    raise TMDbError(f"TMDb answered {response.status_code} for {path}", response.status_code)
+                wait = _retry_after(response.headers.get("retry-after"))
+            if wait is None:
+                wait = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+            attempt += 1
+            self.retries += 1
+            await self._sleep(min(wait, self.max_backoff))
+
+    def stats(self) -> Dict[str, Any]:
+        return {"requests": self.requests, "cache_hits": self.cache_hits, "not_modified": self.not_modified,
+                "retries": self.retries, "cached": len(self._cache), "http2": self.http2}
+
+
+_shared: Optional[Tuple[asyncio.AbstractEventLoop, TMDbClient]] = None
+
+
+def get_client() -> TMDbClient:
+    """The shared client for the running event loop (a new one if the loop changed)."""
+    global _shared
+    loop = asyncio.get_running_loop()
+    if _shared is None or _shared[0] is not loop:
+        _shared = (loop, TMDbClient())
+    return _shared[1]
+
+
+async def close_client() -> None:
+    global _shared
+    if _shared is not None:
+        (loop, client), _shared = _shared, None
+        if loop is asyncio.get_running_loop():
+            await client.aclose()
@@ -2,6 +2,7 @@ from fastapi import APIRouter, Depends, status
 from fastapi.security import OAuth2PasswordRequestForm, HTTPAuthorizationCredentials, HTTPBearer
 from backend.authentication import schemas, utils, security
 from backend.core import tokens, exceptions, validators
+from backend.core.transactions import transaction
 import uuid
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
@@ -67,8 +68,7 @@ def refresh_token(current_user: schemas.TokenData = Depends(security.get_current
 
 @router.post("/password/request")
 def request_password_reset(email: str):
-    users = utils.load_all_users()
-    user = next((u for u in users if u["email"] == email), None)
+    user = utils.find_user(email=email)
     if not user:
         raise exceptions.NotFoundError("Email")
 
@@ -86,19 +86,14 @@ def reset_password(token: str, new_password: str):
     # Validate new password requirements
     validators.validate_password(new_password)
 
-    users = utils.load_all_users()
-    for user in users:
-        if user["user_id"] == user_id:
-            user["hashed_password"] = security.hash_password(new_password)
-            break
-    else:
-        raise exceptions.NotFoundError("User")
-
-    active = [u for u in users if u["status"] == "active"]
-    inactive = [u for u in users if u["status"] == "inactive"]
-    utils.save_active_users(active)
-    utils.save_inactive_users(inactive)
-    return {"message": "Password successfully reset"}
+    held, shared = utils.user_locks(user_id)
+    with transaction(*held, shared=shared):
+        user = utils.find_user(user_id=user_id)
+        if not user:
+            raise exceptions.NotFoundError("User")
+        user["hashed_password"] = security.hash_password(new_password)
+        utils.save_user(user, active=user.get("status") == "active")
+        return {"message": "Password successfully reset"}
 
 
 @router.get("/me")
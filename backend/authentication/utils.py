@@ -3,7 +3,9 @@ from typing import Any, Dict, List, Optional, Tuple
 from backend.core.paths import (
     USERS_ACTIVE_FILE, USERS_INACTIVE_FILE, REVOKED_TOKENS_FILE
 )
-from backend.core.jsonio import load_json, save_json
+from backend.core import exceptions, storage
+from backend.core.jsonio import load_json, load_json_view, save_json, thaw
+from backend.core.transactions import transaction
 from backend.authentication import schemas
 
 
@@ -29,12 +31,67 @@ def load_all_users() -> List[Dict[str, Any]]:
     return load_active_users() + load_inactive_users()
 
 
+# ----- Single user records -----
+
+def users_collection(active: bool = True) -> storage.Collection:
+    return storage.collection("users_active" if active else "users_inactive")
+
+
+def user_locks(*user_ids: str, changes: Optional[Dict[str, Any]] = None,
+               active: Optional[bool] = None) -> Tuple[List[str], List[str]]:
+    """
+    (held, shared) paths for a read-modify-write of users through get_active_user and save_user:
+    each user's record and index entries, plus those of the indexed fields set in changes (all
+    of a new user's fields). active names the list the users are saved to when that moves them
+    (default: where they are). Hold them with transaction(*held, shared=shared).
+    """
+    held: List[str] = []
+    for user_id in user_ids:
+        found = {a: users_collection(a).get(user_id) for a in (True, False)}
+        old = found[True] or found[False]
+        target = users_collection(active if active is not None else found[False] is None)
+        held += target.write_paths(user_id, old, dict(old or {}, **(changes or {})))
+    return held, [users_collection().spec.store]
+
+
+def get_active_user(user_id: str) -> Optional[Dict[str, Any]]:
+    """Return a mutable copy of an active user's record, or None."""
+    user = users_collection().get(user_id)
+    return thaw(user) if user is not None else None
+
+
+def save_user(user: Dict[str, Any], *, active: bool = True) -> None:
+    """
+    Write one user record to the active or inactive list, removing it from the other.
+    Raises ConflictError if its username or email belongs to another user.
+    """
+    held, shared = user_locks(user["user_id"], changes=user, active=active)
+    with transaction(*held, shared=shared):
+        for field in ("username", "email"):
+            owner = find_user(**{field: user[field]}) if user.get(field) is not None else None
+            if owner is not None and owner["user_id"] != user["user_id"]:
+                raise exceptions.ConflictError(f"{field.capitalize()} already taken")
+        users_collection(active).put(user)
+        users_collection(not active).delete(user["user_id"])
+
+
 # ----- Helpers -----
 
+def find_user(**filters: Any) -> Optional[Dict[str, Any]]:
+    """
+    Look a user up by user_id, username or email (case-insensitive) through the
+    storage indexes, active users first. Returns a mutable copy or None.
+    """
+    for name in ("users_active", "users_inactive"):
+        found = storage.collection(name).query(**filters)
+        if found:
+            return thaw(found[0])
+    return None
+
+
 def user_exists(username: str, email: str) -> Tuple[bool, Optional[str]]:
-    users = load_all_users()
-    username_taken = any(u.get("username") == username for u in users)
-    email_taken = any(u.get("email") == email for u in users)
+    username_taken = find_user(username=username) is not None
+    email_taken = find_user(email=email) is not None
     if username_taken and email_taken:
         return True, "Username and Email already taken"
     if username_taken:
@@ -45,52 +102,37 @@ def user_exists(username: str, email: str) -> Tuple[bool, Optional[str]]:
 
 
 def add_user(user: Dict[str, Any], *, active: bool = True) -> None:
-    """Add user to the active or inactive list."""
+    """Add user to the active or inactive list. Raises ConflictError if the username or email is taken."""
     user.setdefault("penalties", [])
-    if active:
-        users = load_active_users()
-        users.append(user)
-        save_active_users(users)
-    else:
-        users = load_inactive_users()
-        users.append(user)
-        save_inactive_users(users)
+    held, shared = user_locks(user["user_id"], changes=user, active=active)
+    with transaction(*held, shared=shared):
+        exists, message = user_exists(user.get("username"), user.get("email"))
+        if exists:
+            raise exceptions.ConflictError(message)
+        save_user(user, active=active)
 
 
 def get_user_by_id(user_id: str) -> Optional[Dict[str, Any]]:
-    return next((u for u in load_all_users() if u.get("user_id") == user_id), None)
+    return find_user(user_id=user_id)
 
 def get_user_by_username(username: str) -> Optional[Dict[str, Any]]:
-    return next((u for u in load_all_users() if u.get("username") == username), None)
+    return find_user(username=username)
 
 def get_user_by_username_or_email(identifier: str) -> Optional[Dict[str, Any]]:
     """Return a user by either username or email (case-insensitive for email)."""
-    users = load_all_users()
-    for u in users:
-        if u.get("username") == identifier or u.get("email").lower() == identifier.lower():
-            return u
-    return None
+    return find_user(username=identifier) or find_user(email=identifier)
 
 def update_user_status(user_id: str, status: schemas.UserStatus) -> bool:
     """Move user between active/inactive and update status."""
-    active_users = load_active_users()
-    inactive_users = load_inactive_users()
-    user = None
-
-    active_users = [u for u in active_users if not (u.get("user_id") == user_id and (user := u))]
-    inactive_users = [u for u in inactive_users if not (u.get("user_id") == user_id and (user := u))]
-    if not user:
-        return False
-
-    user["status"] = status.value
-    if status == schemas.UserStatus.ACTIVE:
-        active_users.append(user)
-    else:
-        inactive_users.append(user)
-
-    save_active_users(active_users)
-    save_inactive_users(inactive_users)
-    return True
+    active = status == schemas.UserStatus.ACTIVE
+    held, shared = user_locks(user_id, active=active)
+    with transaction(*held, shared=shared):
+        user = find_user(user_id=user_id)
+        if not user:
+            return False
+        user["status"] = status.value
+        save_user(user, active=active)
+        return True
 
 
 # ----- Revoked tokens -----
@@ -99,5 +141,10 @@ def load_revoked_tokens() -> List[str]:
     return load_json(REVOKED_TOKENS_FILE, default=[])
 
 
+def view_revoked_tokens() -> List[str]:
+    """Read-only view of the revoked tokens list (served from the document cache)."""
+    return load_json_view(REVOKED_TOKENS_FILE, default=[])
+
+
 def save_revoked_tokens(tokens: List[str]) -> None:
     save_json(REVOKED_TOKENS_FILE, tokens)
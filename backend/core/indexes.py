@@ -0,0 +1,190 @@
+"""Persistent secondary indexes for collections stored as one JSON file per record.
+
+Layout under the index directory:
+    meta.json                 {"next_seq": n}, written when a record is added or moves group
+    <key>/<shard>.json        key -> [group, seq]   (which group directory holds the record)
+    <field>/<shard>.json      normalized field value -> key
+
+Each map is split into 256 shards by the first byte of an md5 of the value, so a lookup loads
+one small (cached) shard and an update rewrites a few of them; a writer holds just those
+(update_paths), so writes to different records do not wait for each other. Values of normalized
+fields (e.g. email) are indexed lower-cased. seq preserves insertion order when a group is listed.
+"""
+import hashlib, json, os
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from backend.core import jsonio
+
+SHARD_HEX_DIGITS = 2
+
+
+class DuplicateValueError(ValueError):
+    """Raised when an update would index a field value already owned by another record."""
+
+
+class RecordIndex:
+    """Key and unique secondary-field indexes shared by the groups of one record store."""
+
+    def __init__(self, directory: str, key: str, fields: Iterable[str] = (), normalized: Iterable[str] = ()):
+        self.directory = directory
+        self.key = key
+        self.fields = tuple(fields)
+        self.normalized = set(normalized)
+        self.lock_path = os.path.join(directory, "meta.json")
+
+    # --- lookups ---
+
+    def normalize(self, field: str, value: Any) -> Any:
+        if field in self.normalized and isinstance(value, str):
+            return value.lower()
+        return value
+
+    def shard_path(self, field: str, value: Any) -> str:
+        digest = hashlib.md5(str(value).encode("utf-8")).hexdigest()[:SHARD_HEX_DIGITS]
+        return os.path.join(self.directory, field, f"{digest}.json")
+
+    def _shard(self, field: str, value: Any) -> Dict[str, Any]:
+        return jsonio.load_json_view(self.shard_path(field, value), default={})
+
+    def locate(self, key: Any) -> Optional[Tuple[str, int]]:
+        """Return (group, seq) for a key, or None if it is not indexed."""
+        entry = self._shard(self.key, key).get(key)
+        return (entry[0], entry[1]) if entry else None
+
+    def lookup(self, field: str, value: Any) -> Optional[Any]:
+        """Return the key of the record whose field equals value, or None."""
+        if field == self.key:
+            return value if self.locate(value) else None
+        value = self.normalize(field, value)
+        return self._shard(field, value).get(value)
+
+    # --- updates (call inside a transaction holding update_paths()) ---
+
+    def update_paths(self, key: Any, old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]],
+                     seq: bool) -> List[str]:
+        """Shards update() writes for key going from old to new, plus meta.json if it takes a new seq."""
+        paths = [self.shard_path(self.key, key)]
+        for field in self.fields:
+            before = self.normalize(field, old.get(field)) if old else None
+            after = self.normalize(field, new.get(field)) if new else None
+            if before != after:
+                paths.extend(self.shard_path(field, v) for v in (before, after) if v is not None)
+        if seq:
+            paths.append(self.lock_path)
+        return paths
+
+    def _next_seq(self) -> int:
+        meta = jsonio.load_json(self.lock_path, default={})
+        seq = meta.get("next_seq", 0)
+        meta["next_seq"] = seq + 1
+        jsonio.save_json(self.lock_path, meta)
+        return seq
+
+    def update(self, key: Any, old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]], group: str) -> None:
+        """
+        Stage the index changes for a record moving from old to new (None = absent) in group.
+        Raises DuplicateValueError (staging nothing) if a new field value belongs to another record.
+        """
+        changes: List[Tuple[str, Any, Any]] = []
+        for field in self.fields:
+            before = self.normalize(field, old.get(field)) if old else None
+            after = self.normalize(field, new.get(field)) if new else None
+            if before != after:
+                changes.append((field, before, after))
+
+        shards: Dict[str, Dict[str, Any]] = {}
+
+        def shard(field: str, value: Any) -> Dict[str, Any]:
+            path = self.shard_path(field, value)
+            if path not in shards:
+                shards[path] = jsonio.load_json(path, default={})
+            return shards[path]
+
+        for field, before, after in changes:
+            owner = shard(field, after).get(after) if after is not None else None
+            if owner is not None and owner != key:
+                raise DuplicateValueError(f"{field} {after!r} is already used by {owner!r}")
+        for field, before, after in changes:
+            if before is not None and shard(field, before).get(before) == key:
+                del shard(field, before)[before]
+            if after is not None:
+                shard(field, after)[after] = key
+
+        entries = shard(self.key, key)
+        if new is None:
+            entries.pop(key, None)
+        elif key not in entries or entries[key][0] != group:
+            entries[key] = [group, self._next_seq()]
+        for path, data in shards.items():
+            jsonio.save_json(path, data)
+
+    # --- rebuild / verify ---
+
+    def build(self, groups: Dict[str, List[Dict[str, Any]]]) -> Tuple[Dict[str, Dict[str, Any]], List[str]]:
+        """
+        Compute every shard from the records of each group (in order).
+        Returns ({shard path: map}, problems) where problems lists duplicate values and keys.
+        """
+        shards: Dict[str, Dict[str, Any]] = {}
+        problems: List[str] = []
+        owners: Dict[Tuple[str, Any], Any] = {}
+        seq = 0
+        for group, records in groups.items():
+            for record in records:
+                key = record.get(self.key)
+                entries = shards.setdefault(self.shard_path(self.key, key), {})
+                if key in entries:
+                    problems.append(f"{self.key} {key!r} is stored in both {entries[key][0]} and {group}")
+                    continue
+                entries[key] = [group, seq]
+                seq += 1
+                for field in self.fields:
+                    value = self.normalize(field, record.get(field))
+                    if value is None:
+                        continue
+                    owner = owners.setdefault((field, value), key)
+                    if owner != key:
+                        problems.append(f"{field} {value!r} is used by both {owner!r} and {key!r}")
+                        continue
+                    shards.setdefault(self.shard_path(field, value), {})[value] = key
+        shards[self.lock_path] = {"next_seq": seq}
+        return shards, problems
+
+    def _existing_shards(self) -> List[str]:
+        paths = []
+        for field in (self.key, *self.fields):
+            folder = os.path.join(self.directory, field)
+            if os.path.isdir(folder):
+                paths.extend(os.path.join(folder, n) for n in os.listdir(folder) if n.endswith(".json"))
+        return paths
+
+    def write(self, shards: Dict[str, Dict[str, Any]]) -> None:
+        """Replace the on-disk index with freshly built shards."""
+        for path in self._existing_shards():
+            if path not in shards:
+                os.remove(path)
+        for path, data in shards.items():
+            jsonio.save_json(path, data)
+
+    def verify(self, groups: Dict[str, List[Dict[str, Any]]]) -> List[str]:
+        """Compare the on-disk index with the records. Returns a list of problems (empty if consistent)."""
+        expected, problems = self.build(groups)
+        for path in sorted(set(expected) | set(self._existing_shards())):
+            if path == self.lock_path:
+                continue
+            want = expected.get(path, {})
+            have = jsonio.load_json_view(path, default={})
+            if path.startswith(os.path.join(self.directory, self.key) + os.sep):
+                # seq values may legitimately differ from a fresh build; compare groups only
+                want = {k: v[0] for k, v in want.items()}
+                have = {k: v[0] for k, v in have.items()}
+            for value in sorted(set(want) | set(have), key=str):
+                if want.get(value) != have.get(value):
+                    problems.append(f"{os.path.relpath(path, self.directory)}: {value!r} indexed as "
+                                    f"{json.dumps(have.get(value))}, expected {json.dumps(want.get(value))}")
+        key_dir = os.path.join(self.directory, self.key) + os.sep
+        seqs = [v[1] for path in self._existing_shards() if path.startswith(key_dir)
+                for v in jsonio.load_json_view(path, default={}).values()]
+        if seqs and max(seqs) >= jsonio.load_json_view(self.lock_path, default={}).get("next_seq", 0):
+            problems.append("meta.json next_seq is behind the indexed records")
+        return problems
@@ -0,0 +1,249 @@
+"""Append-only journals for keyed JSON list documents.
+
+A journaled document is a snapshot (the ordinary JSON list file, e.g. {movie_id}_reviews.json)
+plus a log next to it ({movie_id}_reviews.log) holding one JSON line per mutation:
+    {"op": "put", "record": {...}}
+    {"op": "del", "key": "..."}
+
+Reads replay snapshot + log. The replayed list is cached per document and extended with just
+the new log tail when the log grows (also when another process appended to it). A put replaces
+the record in place or appends it, and a delete removes it, so the replayed list is identical to
+what rewriting the whole file would have produced.
+
+Mutations are staged on the open transaction (see backend.core.transactions) and appended on
+commit. Once a log grows past COMPACT_BYTES it is queued for the background compactor, which
+writes a new snapshot and empties the log in one atomic commit.
+"""
+import json, logging, os, queue, threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from backend.core import jsonio, transactions
+
+logger = logging.getLogger(__name__)
+
+COMPACT_BYTES = int(os.getenv("STORAGE_JOURNAL_COMPACT_BYTES", str(1024 * 1024)))
+CACHE_MAX_ENTRIES = int(os.getenv("STORAGE_JOURNAL_CACHE_ENTRIES", "1024"))
+
+_FileSig = Optional[Tuple[int, int, int]]  # (inode, mtime_ns, size); None if missing
+
+
+def log_path(path: str) -> str:
+    """Log file kept next to a snapshot: foo_reviews.json -> foo_reviews.log."""
+    return os.path.splitext(path)[0] + ".log"
+
+
+def _stat(path: str) -> _FileSig:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+def _parse_snapshot(text: str) -> List[Dict[str, Any]]:
+    text = text.strip()
+    if not text:
+        return []
+    try:
+        doc = json.loads(text)
+    except json.JSONDecodeError:
+        return []
+    return doc if isinstance(doc, list) else []
+
+
+class _Replay:
+    """Replayed state of one document and how far into its log it has read."""
+    __slots__ = ("snap_sig", "log_ino", "offset", "records", "view")
+
+    def __init__(self, snap_sig: _FileSig, log_ino: Optional[int]):
+        self.snap_sig = snap_sig
+        self.log_ino = log_ino
+        self.offset = 0
+        self.records: "OrderedDict[Any, Any]" = OrderedDict()
+        self.view: Optional[jsonio.FrozenList] = None
+
+
+class Journal:
+    """Snapshot + log storage for JSON lists of records keyed by `key`."""
+
+    def __init__(self, key: str, compact_bytes: int = COMPACT_BYTES, max_entries: int = CACHE_MAX_ENTRIES):
+        self.key = key
+        self.compact_bytes = compact_bytes
+        self.max_entries = max_entries
+        self._states: "OrderedDict[str, _Replay]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._queue: "queue.Queue[str]" = queue.Queue()
+        self._queued: set = set()
+        self._worker: Optional[threading.Thread] = None
+        self.compactions = 0
+
+    # --- replay ---
+
+    def _apply(self, records: "OrderedDict[Any, Any]", op: Dict[str, Any]) -> None:
+        if op.get("op") == "put":
+            record = op["record"]
+            records[record.get(self.key)] = jsonio.freeze(record)
+        elif op.get("op") == "del":
+            records.pop(op.get("key"), None)
+
+    def _apply_lines(self, records: "OrderedDict[Any, Any]", lines: List[str], path: str) -> None:
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                self._apply(records, json.loads(line))
+            except (json.JSONDecodeError, KeyError, TypeError, AttributeError):
+                logger.warning("Skipping unreadable journal entry in %s", path)
+
+    def _load(self, path: str) -> _Replay:
+        """Bring the cached replay of path up to date with the files on disk."""
+        log = log_path(path)
+        with self._lock:
+            for _ in range(5):
+                snap_sig = _stat(path)
+                log_sig = _stat(log)
+                log_ino = log_sig[0] if log_sig else None
+                log_size = log_sig[2] if log_sig else 0
+                state = self._states.get(path)
+                if state is None or state.snap_sig != snap_sig or state.log_ino != log_ino or log_size < state.offset:
+                    state = _Replay(snap_sig, log_ino)
+                    if snap_sig is not None:
+                        try:
+                            with open(path, "r", encoding="utf-8") as f:
+                                snapshot = _parse_snapshot(f.read())
+                        except OSError:
+                            continue
+                        for record in snapshot:
+                            state.records.setdefault(record.get(self.key), jsonio.freeze(record))
+                if log_size > state.offset:
+                    try:
+                        with open(log, "rb") as f:
+                            f.seek(state.offset)
+                            tail = f.read(log_size - state.offset)
+                    except OSError:
+                        continue
+                    end = tail.rfind(b"\n") + 1  # ignore a torn final line
+                    if end:
+                        self._apply_lines(state.records, tail[:end].decode("utf-8").splitlines(), path)
+                        state.offset += end
+                        state.view = None
+                # A compaction that replaced the snapshot mid-read means the log may be stale too
+                if _stat(path) == snap_sig:
+                    self._states[path] = state
+                    self._states.move_to_end(path)
+                    while len(self._states) > self.max_entries:
+                        self._states.popitem(last=False)
+                    return state
+                self._states.pop(path, None)
+            raise OSError(f"Journal for {path} kept changing while it was read")
+
+    def read(self, path: str) -> List[Dict[str, Any]]:
+        """Return the document's records as a shared read-only list."""
+        path = os.path.abspath(path)
+        tx = transactions.current()
+        if tx is not None and tx.holds(path):
+            staged = self._read_staged(path, tx)
+            if staged is not None:
+                return staged
+        state = self._load(path)
+        with self._lock:
+            if state.view is None:
+                state.view = jsonio.FrozenList(state.records.values())
+            return state.view
+
+    def _read_staged(self, path: str, tx) -> Optional[List[Dict[str, Any]]]:
+        """Replay including the transaction's uncommitted changes; None if it has none."""
+        log = log_path(path)
+        snapshot_text = tx.staged_payload(path)
+        log_text = tx.staged_payload(log)
+        appends = tx.staged_appends(log)
+        if snapshot_text is None and log_text is None and not appends:
+            return None
+        records: "OrderedDict[Any, Any]"
+        if snapshot_text is None and log_text is None:
+            records = OrderedDict(self._load(path).records)
+        else:
+            records = OrderedDict()
+            if snapshot_text is None and os.path.exists(path):
+                with open(path, "r", encoding="utf-8") as f:
+                    snapshot_text = f.read()
+            for record in _parse_snapshot(snapshot_text or ""):
+                records.setdefault(record.get(self.key), jsonio.freeze(record))
+            if log_text is None and os.path.exists(log):
+                with open(log, "r", encoding="utf-8") as f:
+                    log_text = f.read()
+            self._apply_lines(records, (log_text or "").splitlines(), path)
+        self._apply_lines(records, appends, path)
+        return jsonio.FrozenList(records.values())
+
+    # --- mutations (call inside transaction(path)) ---
+
+    def _transaction(self, path: str):
+        tx = transactions.current()
+        if tx is None or not tx.holds(path):
+            raise transactions.TransactionError(f"Journal writes need an open transaction on {path}")
+        return tx
+
+    def put(self, path: str, record: Dict[str, Any]) -> None:
+        op = {"op": "put", "record": jsonio._to_jsonable(record)}
+        self._transaction(path).stage_append(log_path(path), json.dumps(op, separators=(",", ":")))
+
+    def delete(self, path: str, key: Any) -> None:
+        op = {"op": "del", "key": key}
+        self._transaction(path).stage_append(log_path(path), json.dumps(op, separators=(",", ":")))
+
+    def rewrite(self, path: str, records: List[Dict[str, Any]]) -> None:
+        """Replace the document with a new snapshot and an empty log."""
+        tx = self._transaction(path)
+        jsonio.save_json(path, list(records))
+        tx.stage_text(log_path(path), "")
+
+    # --- compaction ---
+
+    def signature(self, path: str) -> Tuple[_FileSig, _FileSig]:
+        """Stat signatures of the snapshot and its log: changes whenever the document may have."""
+        return _stat(path), _stat(log_path(path))
+
+    def log_size(self, path: str) -> int:
+        sig = _stat(log_path(path))
+        return sig[2] if sig else 0
+
+    def compact(self, path: str) -> bool:
+        """Fold the log into a new snapshot. Returns False if there was nothing to fold."""
+        with transactions.transaction(path):
+            if not self.log_size(path):
+                return False
+            self.rewrite(path, jsonio.thaw(self.read(path)))
+        self.compactions += 1
+        return True
+
+    def maybe_compact(self, path: str) -> None:
+        """Queue path for background compaction once its log passes compact_bytes."""
+        if self.compact_bytes <= 0 or self.log_size(path) < self.compact_bytes:
+            return
+        path = os.path.abspath(path)
+        with self._lock:
+            if path in self._queued:
+                return
+            self._queued.add(path)
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="journal-compactor", daemon=True)
+                self._worker.start()
+        self._queue.put(path)
+
+    def wait_for_compactions(self) -> None:
+        """Block until every queued compaction has run (used by tests and scripts)."""
+        self._queue.join()
+
+    def _run(self) -> None:
+        while True:
+            path = self._queue.get()
+            with self._lock:
+                self._queued.discard(path)
+            try:
+                self.compact(path)
+            except Exception:
+                logger.exception("Journal compaction failed for %s", path)
+            finally:
+                self._queue.task_done()
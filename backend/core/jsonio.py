@@ -1,10 +1,24 @@
-"""JSON I/O helpers with atomic writes and datetime-safe serialization."""
-import json, os, tempfile, shutil
+"""JSON I/O helpers with atomic writes, datetime-safe serialization, a document cache and optional write-behind."""
+import atexit, json, os, tempfile, threading, time, logging
+from collections import OrderedDict
+from contextvars import ContextVar
 from datetime import datetime, date
-from typing import Any, TypeVar
+from typing import Any, Dict, List, Optional, Tuple, TypeVar
 
 T = TypeVar("T")
 
+logger = logging.getLogger(__name__)
+
+# Cache limits (overridable through the environment)
+CACHE_ENABLED = os.getenv("JSONIO_CACHE", "1") != "0"
+CACHE_MAX_BYTES = int(os.getenv("JSONIO_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+CACHE_MAX_ENTRIES = int(os.getenv("JSONIO_CACHE_MAX_ENTRIES", "4096"))
+
+# Write-behind window (0 disables it) and durability mode: "wait", "group" or "none"
+WRITE_BEHIND_MS = float(os.getenv("JSONIO_WRITE_BEHIND_MS", "0"))
+DURABILITY = os.getenv("JSONIO_DURABILITY", "none")
+DURABILITY_MODES = ("wait", "group", "none")
+
 
 def _to_jsonable(obj: Any) -> Any:
     """Recursively convert datetimes to ISO strings."""
@@ -21,34 +35,520 @@ def ensure_parent(path: str) -> None:
     os.makedirs(os.path.dirname(path), exist_ok=True)
 
 
-def load_json(path: str, default: T) -> T:
-    """Load JSON or return default if missing/invalid."""
+# ----- Read-only views -----
+
+def _readonly(self, *args, **kwargs):
+    raise TypeError("Cached JSON documents are read-only; use load_json() for a mutable copy.")
+
+
+class FrozenDict(dict):
+    """dict that rejects mutation; copy() returns a plain (shallow) dict."""
+    __setitem__ = __delitem__ = __ior__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+
+    def copy(self) -> dict:
+        return dict(self)
+
+    def __reduce__(self):
+        return (FrozenDict, (dict(self),))
+
+
+class FrozenList(list):
+    """list that rejects mutation; copy() returns a plain (shallow) list."""
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _readonly
+    append = clear = extend = insert = pop = remove = reverse = sort = _readonly
+
+    def copy(self) -> list:
+        return list(self)
+
+    def __reduce__(self):
+        return (FrozenList, (list(self),))
+
+
+def freeze(obj: Any) -> Any:
+    """Recursively convert a parsed JSON document into read-only containers."""
+    if isinstance(obj, dict):
+        return FrozenDict((k, freeze(v)) for k, v in obj.items())
+    if isinstance(obj, list):
+        return FrozenList(freeze(v) for v in obj)
+    return obj
+
+
+def thaw(obj: Any) -> Any:
+    """Return a deep mutable copy of a (possibly frozen) JSON document."""
+    if isinstance(obj, dict):
+        return {k: thaw(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [thaw(v) for v in obj]
+    return obj
+
+
+# ----- Document cache -----
+
+_Signature = Tuple[int, int, int]  # (inode, mtime_ns, size)
+
+
+class _CacheEntry:
+    __slots__ = ("sig", "text", "doc")
+
+    def __init__(self, sig: _Signature, text: str):
+        self.sig = sig
+        self.text = text
+        self.doc: Any = None  # frozen document, built on first view
+
+
+class DocumentCache:
+    """
+    Process-wide LRU cache of JSON documents keyed by absolute path.
+    Entries are validated against (inode, mtime_ns, size) on every lookup,
+    so writes made by other processes are picked up on the next read.
+    """
+
+    def __init__(self, max_bytes: int = CACHE_MAX_BYTES, max_entries: int = CACHE_MAX_ENTRIES, enabled: bool = CACHE_ENABLED):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self._entries: "OrderedDict[str, _CacheEntry]" = OrderedDict()
+        self._overrides: Dict[str, bool] = {}
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    # --- configuration ---
+
+    def set_enabled(self, path: str, enabled: bool) -> None:
+        """Enable or disable caching for one path (overrides the global switch)."""
+        key = os.path.abspath(path)
+        with self._lock:
+            self._overrides[key] = enabled
+            if not enabled:
+                self._drop(key)
+
+    def is_enabled(self, path: str) -> bool:
+        return self._overrides.get(os.path.abspath(path), self.enabled)
+
+    # --- lookups ---
+
+    def read(self, path: str) -> Optional[_CacheEntry]:
+        """Return a validated entry for path, reading the file on a miss. None if missing/empty."""
+        key = os.path.abspath(path)
+        try:
+            st = os.stat(key)
+        except OSError:
+            self.invalidate(key)
+            return None
+        sig = (st.st_ino, st.st_mtime_ns, st.st_size)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.sig == sig:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+        try:
+            with open(key, "r", encoding="utf-8") as f:
+                st = os.fstat(f.fileno())
+                text = f.read().strip()
+        except OSError:
+            return None
+        entry = _CacheEntry((st.st_ino, st.st_mtime_ns, st.st_size), text)
+        with self._lock:
+            self._store(key, entry)
+        return entry
+
+    def invalidate(self, path: str) -> None:
+        key = os.path.abspath(path)
+        with self._lock:
+            if self._drop(key):
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+            }
+
+    # --- internals (lock held) ---
+
+    def _store(self, key: str, entry: _CacheEntry) -> None:
+        size = len(entry.text)
+        self._drop(key)
+        if size > self.max_bytes:
+            return
+        self._entries[key] = entry
+        self._bytes += size
+        while self._entries and (self._bytes > self.max_bytes or len(self._entries) > self.max_entries):
+            old_key, old = self._entries.popitem(last=False)
+            self._bytes -= len(old.text)
+            self.evictions += 1
+
+    def _drop(self, key: str) -> bool:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        self._bytes -= len(entry.text)
+        return True
+
+
+_cache = DocumentCache()
+
+
+def set_cache_enabled(path: str, enabled: bool) -> None:
+    """Turn the document cache on or off for a single file."""
+    _cache.set_enabled(path, enabled)
+
+
+def cache_stats() -> Dict[str, int]:
+    """Return hit/miss/eviction counters for the document cache."""
+    return _cache.stats()
+
+
+def clear_cache() -> None:
+    _cache.clear()
+
+
+# ----- Storage backend hook -----
+
+_backend = None
+
+
+def set_backend(backend) -> None:
+    """
+    Route document paths through a storage engine (see backend.core.storage).
+    The backend must provide handles(path), load(path, default) and save(path, data).
+    """
+    global _backend
+    _backend = backend
+
+
+def _backend_for(path: str):
+    return _backend if _backend is not None and _backend.handles(path) else None
+
+
+# ----- Transaction staging (see backend.core.transactions) -----
+
+# The open transaction for the current thread/task, if any. Writes to paths it holds
+# locks for are staged in memory and committed together when the transaction exits.
+active_transaction: ContextVar[Any] = ContextVar("jsonio_transaction", default=None)
+
+
+def _staged_payload(path: str) -> Optional[str]:
+    tx = active_transaction.get()
+    return tx.staged_payload(path) if tx is not None else None
+
+
+# ----- File writes and write-behind -----
+
+def fsync_dir(directory: str) -> None:
+    """fsync a directory so renames inside it survive a crash (no-op where unsupported)."""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _write_file(path: str, payload: str, *, fsync: bool) -> None:
+    """Write payload to a temp file next to path and rename it into place."""
+    ensure_parent(path)
+    tmp_fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+    try:
+        with os.fdopen(tmp_fd, "w", encoding="utf-8") as f:
+            f.write(payload)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    finally:
+        _cache.invalidate(path)
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+class WriteBehind:
+    """
+    Coalesces save_json writes per path and flushes them in groups from a background thread.
+    A group is flushed window_ms after its first write; later writes to the same path inside
+    the window replace the pending payload, so a burst costs one rewrite per file.
+
+    Durability:
+      "wait"   - save_json blocks until its group is written and fsynced (group commit)
+      "group"  - save_json returns immediately; each file is fsynced once per flush
+      "none"   - save_json returns immediately; no fsync
+
+    Pending writes are visible to load_json/load_json_view in this process only, so other
+    worker processes see them after the flush. Use with a single worker, or with "wait".
+    Transactions always flush their group before releasing their locks (see enqueue).
+    """
+
+    def __init__(self, window_ms: float, durability: str = "group"):
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"Unknown durability mode: {durability!r}")
+        self.window = window_ms / 1000.0
+        self.durability = durability
+        self._pending: Dict[str, str] = {}
+        self._inflight: Dict[str, str] = {}
+        self._opened = 0.0  # monotonic time of the first write in the pending group
+        self._next_group = 1
+        self._done_group = 0
+        self._failed: Dict[int, BaseException] = {}
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+        self.writes = self.files_written = self.groups = 0
+        self._flush_last = self._flush_total = self._flush_max = 0.0
+
+    def pending_payload(self, path: str) -> Optional[str]:
+        # Lock-free: flush() publishes a group as in-flight before emptying pending
+        key = os.path.abspath(path)
+        payload = self._pending.get(key)
+        return payload if payload is not None else self._inflight.get(key)
+
+    def enqueue(self, writes: List[Tuple[str, str]], flush: bool = False) -> bool:
+        """
+        Queue (path, payload) pairs as part of one group. Returns False once closed.
+        With flush (or durability "wait") it returns once the group is on disk, raising its
+        error if the flush failed.
+        """
+        with self._cond:
+            if self._closed:
+                return False
+            if not self._pending:
+                self._opened = time.monotonic()
+            for path, payload in writes:
+                self._pending[os.path.abspath(path)] = payload
+            self.writes += len(writes)
+            group = self._next_group
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="jsonio-write-behind", daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+            if not flush and self.durability != "wait":
+                return True
+        if flush:
+            self.flush()
+        with self._cond:
+            while self._done_group < group:
+                self._cond.wait()
+            if group in self._failed:
+                raise self._failed[group]
+        return True
+
+    def flush(self) -> int:
+        """Write the pending group now. Returns the number of files written."""
+        with self._flush_lock:
+            with self._cond:
+                if not self._pending:
+                    return 0
+                self._inflight = batch = self._pending
+                self._pending = {}
+                group = self._next_group
+                self._next_group += 1
+            start = time.perf_counter()
+            error = None
+            try:
+                fsync = self.durability != "none"
+                for path, payload in batch.items():
+                    _write_file(path, payload, fsync=fsync)
+                if fsync:
+                    for directory in {os.path.dirname(p) for p in batch}:
+                        fsync_dir(directory)
+            except Exception as exc:
+                error = exc
+                logger.exception("Write-behind flush failed; %d file(s) requeued", len(batch))
+            elapsed = time.perf_counter() - start
+            with self._cond:
+                self._inflight = {}
+                if error is not None:
+                    # Keep newer writes that arrived during the flush
+                    if not self._pending:
+                        self._opened = time.monotonic()
+                    for path, payload in batch.items():
+                        self._pending.setdefault(path, payload)
+                    self._failed[group] = error
+                else:
+                    self.groups += 1
+                    self.files_written += len(batch)
+                    self._flush_last = elapsed
+                    self._flush_total += elapsed
+                    self._flush_max = max(self._flush_max, elapsed)
+                for old in [g for g in self._failed if g <= group - 64]:
+                    del self._failed[old]
+                self._done_group = group
+                self._cond.notify_all()
+            return 0 if error is not None else len(batch)
+
+    def close(self) -> None:
+        """Flush everything pending and stop the background thread."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "enabled": True,
+                "window_ms": self.window * 1000.0,
+                "durability": self.durability,
+                "writes": self.writes,
+                "files_written": self.files_written,
+                "groups": self.groups,
+                "pending": len(self._pending),
+                "coalescing_ratio": self.writes / self.files_written if self.files_written else 0.0,
+                "flush_ms_last": self._flush_last * 1000.0,
+                "flush_ms_avg": self._flush_total * 1000.0 / self.groups if self.groups else 0.0,
+                "flush_ms_max": self._flush_max * 1000.0,
+            }
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+                delay = self._opened + self.window - time.monotonic()
+                if delay > 0 and not self._closed:
+                    self._cond.wait(delay)
+                    continue
+            self.flush()
+
+
+_durability = DURABILITY
+_write_behind: Optional[WriteBehind] = WriteBehind(WRITE_BEHIND_MS, DURABILITY) if WRITE_BEHIND_MS > 0 else None
+
+
+def configure_writes(window_ms: float = 0, durability: str = "none") -> None:
+    """
+    Set the write-behind window (0 writes synchronously) and durability mode.
+    Writes pending under the previous configuration are flushed first.
+    """
+    global _write_behind, _durability
+    if durability not in DURABILITY_MODES:
+        raise ValueError(f"Unknown durability mode: {durability!r}")
+    if _write_behind is not None:
+        _write_behind.close()
+    _durability = durability
+    _write_behind = WriteBehind(window_ms, durability) if window_ms > 0 else None
+
+
+def flush_writes() -> int:
+    """Flush pending write-behind writes now. Returns the number of files written."""
+    return _write_behind.flush() if _write_behind is not None else 0
+
+
+def shutdown_writes() -> None:
+    """Flush pending writes and stop the write-behind thread (called on app shutdown)."""
+    if _write_behind is not None:
+        _write_behind.close()
+
+
+atexit.register(shutdown_writes)
+
+
+def write_stats() -> Dict[str, Any]:
+    """Return flush latency and coalescing counters for the write-behind queue."""
+    if _write_behind is None:
+        return {"enabled": False, "durability": _durability}
+    return _write_behind.stats()
+
+
+def _pending_payload(path: str) -> Optional[str]:
+    """Latest unwritten payload for path: the transaction's staged write, then write-behind."""
+    staged = _staged_payload(path)
+    if staged is None and _write_behind is not None:
+        staged = _write_behind.pending_payload(path)
+    return staged
+
+
+def _read_text(path: str) -> Optional[str]:
+    """Return the stripped file contents, or None if the file is missing."""
     if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read().strip()
+
+
+def load_json(path: str, default: T) -> T:
+    """Load JSON or return default if missing/invalid. The result is a private, mutable copy."""
+    staged = _pending_payload(path)
+    if staged is not None:
+        return json.loads(staged) if staged else default
+    backend = _backend_for(path)
+    if backend is not None:
+        return backend.load(path, default)
+    if _cache.is_enabled(path):
+        entry = _cache.read(path)
+        content = entry.text if entry is not None else None
+    else:
+        content = _read_text(path)
+    if not content:
         return default
     try:
-        with open(path, "r", encoding="utf-8") as f:
-            content = f.read().strip()
-            if not content:
-                return default
-            return json.loads(content)
+        return json.loads(content)
     except json.JSONDecodeError:
         return default
 
 
+def load_json_view(path: str, default: T) -> T:
+    """
+    Load JSON as a shared read-only view (FrozenDict/FrozenList).
+    Use for read paths; call load_json() or thaw() when the document must be modified.
+    """
+    if _pending_payload(path) is not None or _backend_for(path) is not None or not _cache.is_enabled(path):
+        return freeze(load_json(path, default))
+    entry = _cache.read(path)
+    if entry is None or not entry.text:
+        return default
+    if entry.doc is None:
+        try:
+            entry.doc = freeze(json.loads(entry.text))
+        except json.JSONDecodeError:
+            return default
+    return entry.doc
+
+
 def save_json(path: str, data: Any, *, atomic: bool = True) -> None:
-    """Write JSON to disk atomically."""
+    """
+    Write JSON to disk atomically, stage it if a transaction holds the path,
+    or queue it when write-behind is enabled (see configure_writes).
+    """
+    tx = active_transaction.get()
+    if tx is not None and tx.holds(path):
+        tx.stage(path, _to_jsonable(data))
+        return
+    backend = _backend_for(path)
+    if backend is not None:
+        backend.save(path, data)
+        return
     ensure_parent(path)
     payload = json.dumps(_to_jsonable(data), indent=4)
+    if _write_behind is not None and _write_behind.enqueue([(path, payload)]):
+        return
     if not atomic:
-        with open(path, "w", encoding="utf-8") as f:
-            f.write(payload)
+        try:
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(payload)
+        finally:
+            _cache.invalidate(path)
         return
-    tmp_fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
-    os.close(tmp_fd)
-    try:
-        with open(tmp_path, "w", encoding="utf-8") as f:
-            f.write(payload)
-        shutil.move(tmp_path, path)
-    finally:
-        if os.path.exists(tmp_path):
-            os.remove(tmp_path)
+    _write_file(path, payload, fsync=_durability != "none")
@@ -12,6 +12,9 @@ REVIEWS_DIR = os.path.join(DATA_DIR, "reviews")
 REPORTS_DIR = os.path.join(DATA_DIR, "reports")
 PENALTIES_DIR = os.path.join(DATA_DIR, "penalties")
 FRIENDSHIPS_DIR=os.path.join(DATA_DIR, "frienship")
+USERS_ACTIVE_DIR = os.path.join(USERS_DIR, "active")
+USERS_INACTIVE_DIR = os.path.join(USERS_DIR, "inactive")
+USERS_INDEX_DIR = os.path.join(USERS_DIR, "index")
 
 # Files
 USERS_ACTIVE_FILE = os.path.join(USERS_DIR, "users_active.json")
@@ -0,0 +1,941 @@
+"""Pluggable storage engines for keyed JSON collections.
+
+Two engines are provided:
+- JsonFileEngine: the original layout under backend/data (list files, one file per movie,
+  one review file per movie).
+- SqliteEngine: a single embedded SQLite database (WAL mode) with one table per collection,
+  indexed by key, partition and the collection's lookup fields.
+
+The engine is selected with STORAGE_ENGINE=json|sqlite (STORAGE_SQLITE_PATH for the db file).
+Under the JSON engine, collections marked journaled (reviews) keep each document as a snapshot
+plus an append-only log (see core.journal); STORAGE_JOURNAL=0 turns this off. Users are kept as
+one file per user with persistent username/email/user_id indexes (see core.indexes); the
+legacy users_active.json/users_inactive.json paths are routed to them through jsonio.
+When the SQLite engine is active it is also installed behind jsonio.load_json/save_json, so
+code that still reads or writes whole documents by path keeps working and whole-list saves
+become row-level upserts/deletes.
+"""
+import glob, json, os, sqlite3, threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from backend.core import journal, jsonio
+from backend.core.indexes import RecordIndex
+from backend.core.transactions import current, transaction
+from backend.core.paths import (
+    DATA_DIR, MOVIES_DIR, REVIEWS_DIR, USERS_DIR, USERS_ACTIVE_FILE, USERS_INACTIVE_FILE,
+    USERS_ACTIVE_DIR, USERS_INACTIVE_DIR, REPORTS_FILE, PENALTIES_FILE,
+)
+
+SQLITE_PATH = os.getenv("STORAGE_SQLITE_PATH", os.path.join(DATA_DIR, "store.sqlite3"))
+JOURNAL_ENABLED = os.getenv("STORAGE_JOURNAL", "1") != "0"
+
+
+@dataclass(frozen=True)
+class CollectionSpec:
+    """Describes a collection and where the JSON engine keeps it."""
+    name: str
+    key: str
+    indexes: Tuple[str, ...] = ()
+    file: Optional[str] = None           # single JSON list file
+    directory: Optional[str] = None      # one file per record or per partition
+    partition: Optional[str] = None      # field used to split records across files
+    suffix: str = ".json"
+    journaled: bool = False              # JSON engine: snapshot + append-only log per document
+    store: Optional[str] = None          # JSON engine: record store root (one file per record in
+                                         # `directory`, indexes in store/index, locked as a unit)
+    normalized: Tuple[str, ...] = ()     # indexed fields matched case-insensitively
+
+
+def _rebase(path: str, data_dir: str) -> str:
+    return os.path.join(data_dir, os.path.relpath(path, DATA_DIR))
+
+
+def collection_specs(data_dir: str = DATA_DIR) -> Dict[str, CollectionSpec]:
+    """Collection layout for a data tree (defaults to backend/data, see core.paths)."""
+    specs = (
+        CollectionSpec("users_active", key="user_id", indexes=("username", "email"), normalized=("email",),
+                       file=_rebase(USERS_ACTIVE_FILE, data_dir), directory=_rebase(USERS_ACTIVE_DIR, data_dir),
+                       store=_rebase(USERS_DIR, data_dir)),
+        CollectionSpec("users_inactive", key="user_id", indexes=("username", "email"), normalized=("email",),
+                       file=_rebase(USERS_INACTIVE_FILE, data_dir), directory=_rebase(USERS_INACTIVE_DIR, data_dir),
+                       store=_rebase(USERS_DIR, data_dir)),
+        CollectionSpec("reports", key="report_id", indexes=("reporter_id", "reported_id", "status"),
+                       file=_rebase(REPORTS_FILE, data_dir)),
+        CollectionSpec("penalties", key="penalty_id", indexes=("user_id",),
+                       file=_rebase(PENALTIES_FILE, data_dir)),
+        CollectionSpec("movies", key="movie_id", directory=_rebase(MOVIES_DIR, data_dir)),
+        CollectionSpec("reviews", key="review_id", indexes=("user_id",), directory=_rebase(REVIEWS_DIR, data_dir),
+                       partition="movie_id", suffix="_reviews.json", journaled=True),
+    )
+    return {spec.name: spec for spec in specs}
+
+
+COLLECTIONS = collection_specs()
+
+# Files in the movies directory that are not movie records
+_NON_RECORD_FILES = {"tmdb_uuid_map.json"}
+
+
+def _fold(value: Any) -> Any:
+    return value.lower() if isinstance(value, str) else value
+
+
+def _matches(record: Dict[str, Any], filters: Dict[str, Any], normalized: Iterable[str] = ()) -> bool:
+    return all(_fold(record.get(k)) == _fold(v) if k in normalized else record.get(k) == v
+               for k, v in filters.items())
+
+
+# -----------------------------------------------------------------------------
+# COLLECTION INTERFACE
+# -----------------------------------------------------------------------------
+class Collection:
+    """
+    Keyed set of JSON records. Subclasses implement the engine-specific parts.
+    Records returned by get/query/all may be shared read-only views; copy before modifying.
+    """
+
+    def __init__(self, spec: CollectionSpec):
+        self.spec = spec
+        self.name = spec.name
+        self.key = spec.key
+
+    def document_path(self, partition: Optional[str] = None) -> str:
+        """Path of the JSON document holding a partition (also used as its lock name)."""
+        if self.spec.file:
+            return self.spec.file
+        return os.path.join(self.spec.directory, f"{partition}{self.spec.suffix}")
+
+    def get(self, key: str, partition: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def put(self, record: Dict[str, Any]) -> None:
+        """Insert or replace a record by key."""
+        raise NotImplementedError
+
+    def delete(self, key: str, partition: Optional[str] = None) -> bool:
+        raise NotImplementedError
+
+    def write_paths(self, key: str, old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]]) -> List[str]:
+        """
+        Lock names to hold for a write of one record from old to new (None = absent), sharing
+        spec.store or the directory. Engines that serialize writes themselves name the record only.
+        """
+        if self.spec.directory:
+            return [os.path.join(self.spec.directory, f"{key}.json")]
+        return [self.document_path()]
+
+    def query(self, **filters: Any) -> List[Dict[str, Any]]:
+        """Return records whose fields equal all the given values."""
+        return [r for r in self.all() if _matches(r, filters, self.spec.normalized)]
+
+    def all(self) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def load_document(self, partition: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Return the records of one document (the whole list, or one partition)."""
+        raise NotImplementedError
+
+    def view_document(self, partition: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Read-only records of one document; engines that cache return the same object until it changes."""
+        return jsonio.freeze(self.load_document(partition))
+
+    def save_document(self, records: List[Dict[str, Any]], partition: Optional[str] = None) -> None:
+        """Replace the records of one document."""
+        raise NotImplementedError
+
+    def replace_all(self, records: Iterable[Dict[str, Any]]) -> int:
+        """Replace the whole collection (used by migrations). Returns the record count."""
+        raise NotImplementedError
+
+    def version(self) -> Any:
+        """Cheap token that changes whenever the collection may have changed (None if unknown)."""
+        return None
+
+    def document_version(self, partition: Optional[str] = None) -> Any:
+        """Cheap token that changes whenever one document may have changed (None if unknown)."""
+        return None
+
+    def record_signatures(self) -> Optional[Dict[str, Any]]:
+        """{key: signature} to find changed records without loading them (None if unsupported)."""
+        return None
+
+
+# -----------------------------------------------------------------------------
+# JSON FILE ENGINE
+# -----------------------------------------------------------------------------
+class JsonListCollection(Collection):
+    """All records in a single JSON list file."""
+
+    def get(self, key, partition=None):
+        return next((r for r in jsonio.load_json_view(self.spec.file, default=[]) if r.get(self.key) == key), None)
+
+    def put(self, record):
+        with transaction(self.spec.file):
+            records = jsonio.load_json(self.spec.file, default=[])
+            for i, r in enumerate(records):
+                if r.get(self.key) == record[self.key]:
+                    records[i] = record
+                    break
+            else:
+                records.append(record)
+            jsonio.save_json(self.spec.file, records)
+
+    def delete(self, key, partition=None):
+        with transaction(self.spec.file):
+            records = jsonio.load_json(self.spec.file, default=[])
+            kept = [r for r in records if r.get(self.key) != key]
+            if len(kept) == len(records):
+                return False
+            jsonio.save_json(self.spec.file, kept)
+            return True
+
+    def all(self):
+        return list(jsonio.load_json_view(self.spec.file, default=[]))
+
+    def load_document(self, partition=None):
+        return jsonio.load_json(self.spec.file, default=[])
+
+    def save_document(self, records, partition=None):
+        jsonio.save_json(self.spec.file, records)
+
+    def replace_all(self, records):
+        records = list(records)
+        jsonio.save_json(self.spec.file, records)
+        return len(records)
+
+
+class JsonRecordDirCollection(Collection):
+    """One JSON file per record, named {key}.json."""
+
+    _path = Collection.document_path
+
+    def __init__(self, spec: CollectionSpec):
+        super().__init__(spec)
+        self._writes = 0  # local writes; the directory mtime only catches other processes' ones
+
+    def _paths(self) -> List[str]:
+        return [p for p in glob.glob(os.path.join(self.spec.directory, f"*{self.spec.suffix}"))
+                if os.path.basename(p) not in _NON_RECORD_FILES]
+
+    def get(self, key, partition=None):
+        doc = jsonio.load_json_view(self._path(key), default=None)
+        return doc if isinstance(doc, dict) else None
+
+    def put(self, record):
+        jsonio.save_json(self._path(record[self.key]), record)
+        self._writes += 1
+
+    def delete(self, key, partition=None):
+        path = self._path(key)
+        if not os.path.exists(path):
+            return False
+        os.remove(path)
+        self._writes += 1
+        return True
+
+    def all(self):
+        docs = (jsonio.load_json_view(p, default=None) for p in self._paths())
+        return [d for d in docs if isinstance(d, dict)]
+
+    def load_document(self, partition=None):
+        doc = self.get(partition)
+        return [doc] if doc else []
+
+    def save_document(self, records, partition=None):
+        for r in records:
+            self.put(r)
+
+    def replace_all(self, records):
+        for path in self._paths():
+            os.remove(path)
+        self._writes += 1
+        count = 0
+        for r in records:
+            self.put(r)
+            count += 1
+        return count
+
+    def version(self):
+        # Records are replaced by rename, so every write touches the directory mtime
+        try:
+            st = os.stat(self.spec.directory)
+        except OSError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, self._writes)
+
+    def record_signatures(self):
+        sigs: Dict[str, Any] = {}
+        if not os.path.isdir(self.spec.directory):
+            return sigs
+        suffix = self.spec.suffix
+        with os.scandir(self.spec.directory) as entries:
+            for entry in entries:
+                if entry.name.endswith(suffix) and entry.name not in _NON_RECORD_FILES:
+                    st = entry.stat()
+                    sigs[entry.name[: -len(suffix)]] = (st.st_ino, st.st_mtime_ns, st.st_size)
+        return sigs
+
+
+class JsonPartitionedCollection(Collection):
+    """One JSON list file per partition value, e.g. {movie_id}_reviews.json."""
+
+    _path = Collection.document_path
+
+    def _partitions(self) -> List[str]:
+        pattern = os.path.join(self.spec.directory, f"*{self.spec.suffix}")
+        return [os.path.basename(p)[: -len(self.spec.suffix)] for p in glob.glob(pattern)]
+
+    def _view(self, part: str) -> List[Dict[str, Any]]:
+        return jsonio.load_json_view(self._path(part), default=[])
+
+    def _find(self, key: str, partition: Optional[str]) -> Optional[Tuple[str, List[Dict[str, Any]], int]]:
+        parts = [partition] if partition is not None else self._partitions()
+        for part in parts:
+            records = self._view(part)
+            for i, r in enumerate(records):
+                if r.get(self.key) == key:
+                    return part, records, i
+        return None
+
+    def get(self, key, partition=None):
+        found = self._find(key, partition)
+        return found[1][found[2]] if found else None
+
+    def put(self, record):
+        part = record[self.spec.partition]
+        with transaction(self._path(part)):
+            records = self.load_document(part)
+            for i, r in enumerate(records):
+                if r.get(self.key) == record[self.key]:
+                    records[i] = record
+                    break
+            else:
+                records.append(record)
+            self.save_document(records, part)
+
+    def delete(self, key, partition=None):
+        found = self._find(key, partition)
+        if not found:
+            return False
+        part = found[0]
+        with transaction(self._path(part)):
+            records = self.load_document(part)
+            kept = [r for r in records if r.get(self.key) != key]
+            if len(kept) == len(records):
+                return False
+            self.save_document(kept, part)
+            return True
+
+    def query(self, **filters):
+        part = filters.get(self.spec.partition)
+        if part is not None:
+            return [r for r in self._view(part) if _matches(r, filters)]
+        return super().query(**filters)
+
+    def all(self):
+        out: List[Dict[str, Any]] = []
+        for part in self._partitions():
+            out.extend(self._view(part))
+        return out
+
+    def load_document(self, partition=None):
+        return jsonio.load_json(self._path(partition), default=[])
+
+    def view_document(self, partition=None):
+        return self._view(partition)
+
+    def save_document(self, records, partition=None):
+        jsonio.save_json(self._path(partition), records, atomic=True)
+
+    def replace_all(self, records):
+        for part in self._partitions():
+            os.remove(self._path(part))
+        grouped: Dict[str, List[Dict[str, Any]]] = {}
+        for r in records:
+            grouped.setdefault(r[self.spec.partition], []).append(r)
+        for part, recs in grouped.items():
+            self.save_document(recs, part)
+        return sum(len(v) for v in grouped.values())
+
+
+class JsonJournaledCollection(JsonPartitionedCollection):
+    """
+    Partitioned collection whose documents are a snapshot plus an append-only log.
+    Adds, edits and deletes append one line instead of rewriting the partition file.
+    """
+
+    def __init__(self, spec: CollectionSpec):
+        super().__init__(spec)
+        self.journal = journal.Journal(spec.key)
+
+    def _partitions(self) -> List[str]:
+        parts = set(super()._partitions())
+        stem = self.spec.suffix[: -len(".json")] if self.spec.suffix.endswith(".json") else self.spec.suffix
+        for p in glob.glob(os.path.join(self.spec.directory, f"*{stem}.log")):
+            parts.add(os.path.basename(p)[: -len(stem) - len(".log")])
+        return sorted(parts)
+
+    def _view(self, part):
+        return self.journal.read(self._path(part))
+
+    def document_version(self, partition=None):
+        return self.journal.signature(self._path(partition))
+
+    def put(self, record):
+        path = self._path(record[self.spec.partition])
+        with transaction(path):
+            self.journal.put(path, record)
+        self.journal.maybe_compact(path)
+
+    def delete(self, key, partition=None):
+        found = self._find(key, partition)
+        if not found:
+            return False
+        path = self._path(found[0])
+        with transaction(path):
+            if not any(r.get(self.key) == key for r in self._view(found[0])):
+                return False
+            self.journal.delete(path, key)
+        self.journal.maybe_compact(path)
+        return True
+
+    def load_document(self, partition=None):
+        return jsonio.thaw(self._view(partition))
+
+    def save_document(self, records, partition=None):
+        path = self._path(partition)
+        with transaction(path):
+            self.journal.rewrite(path, records)
+
+    def replace_all(self, records):
+        for part in self._partitions():
+            for path in (self._path(part), journal.log_path(self._path(part))):
+                if os.path.exists(path):
+                    os.remove(path)
+        return super().replace_all(records)
+
+
+class JsonIndexedRecordCollection(Collection):
+    """
+    One JSON file per record ({directory}/{key}.json) with persistent key and secondary indexes
+    (see core.indexes) shared by every collection in the same store, e.g. active and inactive
+    users. Putting a record moves it out of a sibling collection. A write holds the record's file
+    in every collection of the store and the index shards it changes (write_paths), sharing the
+    store directory, so a record move and its index updates commit together while writes to
+    other records go ahead; bulk writes (save_document, replace_all) hold the whole store.
+
+    The legacy list file (spec.file) still names the whole collection: jsonio loads and saves
+    of that path are routed here, and a save only rewrites the records that changed.
+    """
+
+    def __init__(self, spec: CollectionSpec, engine: "JsonFileEngine"):
+        super().__init__(spec)
+        self.engine = engine
+        self.index = engine.index_for(spec)
+
+    def record_path(self, key: str) -> str:
+        return os.path.join(self.spec.directory, f"{key}.json")
+
+    def load_record(self, key: str) -> Optional[Dict[str, Any]]:
+        doc = jsonio.load_json_view(self.record_path(key), default=None)
+        return doc if isinstance(doc, dict) else None
+
+    def scan(self) -> List[str]:
+        """Keys of the record files on disk, indexed ones first in insertion order."""
+        if not os.path.isdir(self.spec.directory):
+            return []
+        keys = [n[: -len(".json")] for n in os.listdir(self.spec.directory) if n.endswith(".json")]
+        order = {}
+        for key in keys:
+            loc = self.index.locate(key)
+            order[key] = (0, loc[1], key) if loc and loc[0] == self.name else (1, 0, key)
+        return sorted(keys, key=order.__getitem__)
+
+    def _keys(self) -> List[str]:
+        """Keys the index assigns to this collection, in insertion order."""
+        return [k for k in self.scan() if (self.index.locate(k) or ("",))[0] == self.name]
+
+    def get(self, key, partition=None):
+        loc = self.index.locate(key)
+        if loc is None or loc[0] != self.name:
+            return None
+        return self.load_record(key)
+
+    def query(self, **filters):
+        for field in (self.key, *self.index.fields):
+            if field in filters:
+                key = self.index.lookup(field, filters[field])
+                record = self.get(key) if key is not None else None
+                return [record] if record is not None and _matches(record, filters, self.spec.normalized) else []
+        return super().query(**filters)
+
+    def all(self):
+        return [r for r in (self.load_record(k) for k in self._keys()) if r is not None]
+
+    def stored(self, key: str) -> Optional[Dict[str, Any]]:
+        """The record of key in whichever collection of the store holds it, or None."""
+        loc = self.index.locate(key)
+        return self.engine.collection(loc[0]).load_record(key) if loc else None
+
+    def write_paths(self, key, old, new):
+        loc = self.index.locate(key)
+        seq = new is not None and (loc is None or loc[0] != self.name)
+        if new is None and (loc is None or loc[0] != self.name):
+            old = None  # nothing of this collection's to delete
+        return ([col.record_path(key) for col in self.engine._store_members(self.spec.store)]
+                + self.index.update_paths(key, old, new, seq))
+
+    @contextmanager
+    def _locked(self, key: str, new: Optional[Dict[str, Any]]) -> Iterator[None]:
+        """Hold write_paths for key (re-taken if the stored record changed before they were)."""
+        while True:
+            with transaction(*self.write_paths(key, self.stored(key), new), shared=[self.spec.store]) as tx:
+                if all(tx.holds(p) for p in self.write_paths(key, self.stored(key), new)):
+                    yield
+                    return
+
+    def _write(self, record: Dict[str, Any]) -> None:
+        """Stage one record and its index changes (inside a transaction holding its write_paths)."""
+        record = jsonio._to_jsonable(record)
+        key = record[self.key]
+        loc = self.index.locate(key)
+        old = self.engine.collection(loc[0]).load_record(key) if loc else None
+        if loc and loc[0] == self.name and old == record:
+            return
+        jsonio.save_json(self.record_path(key), record)
+        if loc and loc[0] != self.name:
+            current().stage_delete(self.engine.collection(loc[0]).record_path(key))
+        self.index.update(key, old, record, self.name)
+
+    def put(self, record):
+        with self._locked(record[self.key], jsonio._to_jsonable(record)):
+            self._write(record)
+
+    def delete(self, key, partition=None):
+        with self._locked(key, None):
+            loc = self.index.locate(key)
+            if loc is None or loc[0] != self.name:
+                return False
+            old = self.load_record(key)
+            current().stage_delete(self.record_path(key))
+            self.index.update(key, old, None, self.name)
+            return True
+
+    def load_document(self, partition=None):
+        return jsonio.thaw(self.all())
+
+    def save_document(self, records, partition=None):
+        with transaction(self.spec.store):
+            keep = set()
+            for r in records:
+                keep.add(r[self.key])
+                self._write(r)
+            for key in self._keys():
+                if key not in keep:
+                    self.delete(key)
+
+    def replace_all(self, records):
+        with transaction(self.spec.store):
+            for key in self.scan():
+                os.remove(self.record_path(key))
+            os.makedirs(self.spec.directory, exist_ok=True)
+            # Bulk path: records are written directly, then the store's index is rebuilt
+            written = []
+            for r in records:
+                r = jsonio._to_jsonable(r)
+                jsonio._write_file(self.record_path(r[self.key]), json.dumps(r, indent=4), fsync=False)
+                written.append(r)
+            groups = self.engine.record_groups(self.spec.store)
+            groups[self.name] = written
+            self.engine.rebuild_index(self.spec.store, groups)
+        return len(written)
+
+
+class JsonFileEngine:
+    """Original flat-file layout under backend/data (users as one file per user)."""
+    name = "json"
+
+    def __init__(self, data_dir: str = DATA_DIR):
+        self.specs = collection_specs(data_dir)
+        self._collections: Dict[str, Collection] = {}
+        self._indexes: Dict[str, RecordIndex] = {}
+        self._routes = {os.path.abspath(spec.file): name for name, spec in self.specs.items() if spec.store}
+        self._imported: set = set()
+
+    def collection(self, name: str) -> Collection:
+        if name not in self._collections:
+            spec = self.specs[name]
+            if spec.store:
+                col: Collection = JsonIndexedRecordCollection(spec, self)
+            elif spec.file:
+                col = JsonListCollection(spec)
+            elif spec.partition and spec.journaled and JOURNAL_ENABLED:
+                col = JsonJournaledCollection(spec)
+            elif spec.partition:
+                col = JsonPartitionedCollection(spec)
+            else:
+                col = JsonRecordDirCollection(spec)
+            self._collections[name] = col
+            if spec.store:
+                self._import_legacy_lists(spec.store)
+        return self._collections[name]
+
+    def close(self) -> None:
+        pass
+
+    # --- per-record stores ---
+
+    def index_for(self, spec: CollectionSpec) -> RecordIndex:
+        if spec.store not in self._indexes:
+            self._indexes[spec.store] = RecordIndex(os.path.join(spec.store, "index"), spec.key,
+                                                    spec.indexes, spec.normalized)
+        return self._indexes[spec.store]
+
+    def _store_members(self, store: str) -> List[JsonIndexedRecordCollection]:
+        return [self.collection(n) for n, spec in self.specs.items() if spec.store == store]
+
+    def _import_legacy_lists(self, store: str) -> None:
+        """Convert list files (users_active.json, ...) into per-record files on first use."""
+        if store in self._imported:
+            return
+        self._imported.add(store)
+        specs = [s for s in self.specs.values() if s.store == store]
+        if not any(os.path.exists(s.file) and not os.path.isdir(s.directory) for s in specs):
+            return
+        # May be reached from a load inside another transaction; the import is its own unit
+        token = jsonio.active_transaction.set(None)
+        try:
+            with transaction(store):
+                for spec in specs:
+                    if not os.path.exists(spec.file) or os.path.isdir(spec.directory):
+                        continue
+                    with open(spec.file, "r", encoding="utf-8") as f:
+                        text = f.read().strip()
+                    self.collection(spec.name).replace_all(json.loads(text) if text else [])
+                    os.replace(spec.file, spec.file + ".imported")
+        finally:
+            jsonio.active_transaction.reset(token)
+
+    def record_groups(self, store: str) -> Dict[str, List[Dict[str, Any]]]:
+        """Every record file in a store, by collection, as found on disk."""
+        return {col.name: [r for r in (col.load_record(k) for k in col.scan()) if r is not None]
+                for col in self._store_members(store)}
+
+    def rebuild_index(self, store: str, groups: Optional[Dict[str, List[Dict[str, Any]]]] = None) -> List[str]:
+        """Rebuild a store's indexes from its record files. Returns the problems found."""
+        index = self._store_members(store)[0].index
+        with transaction(store):
+            shards, problems = index.build(groups if groups is not None else self.record_groups(store))
+            index.write(shards)
+        return problems
+
+    def verify_index(self, store: str) -> List[str]:
+        index = self._store_members(store)[0].index
+        return index.verify(self.record_groups(store))
+
+    # --- jsonio backend hooks: legacy list paths of per-record stores ---
+
+    def handles(self, path: str) -> bool:
+        return os.path.abspath(path) in self._routes
+
+    def load(self, path: str, default: Any) -> Any:
+        return self.collection(self._routes[os.path.abspath(path)]).load_document() or default
+
+    def save(self, path: str, data: Any) -> None:
+        self.collection(self._routes[os.path.abspath(path)]).save_document(list(data))
+
+
+# -----------------------------------------------------------------------------
+# SQLITE ENGINE
+# -----------------------------------------------------------------------------
+def _dumps(record: Dict[str, Any]) -> str:
+    return json.dumps(jsonio._to_jsonable(record), sort_keys=True)
+
+
+class SqliteCollection(Collection):
+    """
+    One table per collection: key, partition, indexed fields, the JSON document and its rev.
+    Every write bumps the table's change counter in _versions (and, for partitioned tables, the
+    counter of each partition it wrote, named "<table>:<partition>") and stamps the rows it wrote
+    with the table's new value, so version(), document_version() and record_signatures() see only
+    the changes of this table or partition.
+    """
+
+    def __init__(self, spec: CollectionSpec, engine: "SqliteEngine"):
+        super().__init__(spec)
+        self.engine = engine
+        self.columns = tuple(spec.indexes)
+
+    def create_schema(self, conn: sqlite3.Connection) -> None:
+        cols = "".join(f", {c} TEXT" for c in self.columns)
+        conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.name} ("
+            f"id INTEGER PRIMARY KEY, key TEXT NOT NULL UNIQUE, part TEXT{cols}, doc TEXT NOT NULL, "
+            f"rev INTEGER NOT NULL DEFAULT 0)"
+        )
+        if "rev" not in {row[1] for row in conn.execute(f"PRAGMA table_info({self.name})")}:
+            conn.execute(f"ALTER TABLE {self.name} ADD COLUMN rev INTEGER NOT NULL DEFAULT 0")  # older databases
+        conn.execute(f"CREATE INDEX IF NOT EXISTS ix_{self.name}_part ON {self.name}(part)")
+        for c in self.columns:
+            conn.execute(f"CREATE INDEX IF NOT EXISTS ix_{self.name}_{c} ON {self.name}({c})")
+
+    def _column(self, field: str, value: Any) -> Any:
+        return _fold(value) if field in self.spec.normalized else value
+
+    def _row(self, record: Dict[str, Any]) -> Tuple[Any, ...]:
+        part = record.get(self.spec.partition) if self.spec.partition else None
+        return (record[self.key], part, *[self._column(c, record.get(c)) for c in self.columns], _dumps(record))
+
+    def _upsert_sql(self) -> str:
+        cols = ("key", "part", *self.columns, "doc", "rev")
+        updates = ", ".join(f"{c}=excluded.{c}" for c in cols[1:])
+        return (f"INSERT INTO {self.name} ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))}) "
+                f"ON CONFLICT(key) DO UPDATE SET {updates}")
+
+    def get(self, key, partition=None):
+        row = self.engine.conn().execute(f"SELECT doc FROM {self.name} WHERE key = ?", (key,)).fetchone()
+        if not row:
+            return None
+        doc = json.loads(row[0])
+        if partition is not None and doc.get(self.spec.partition) != partition:
+            return None
+        return doc
+
+    def _touch(self, conn: sqlite3.Connection, parts: Iterable[Any] = ()) -> int:
+        """Bump the table's change counter and those of parts; returns the table's (the rev of the rows written)."""
+        names = [self.name]
+        if self.spec.partition:
+            names += [f"{self.name}:{p}" for p in set(parts) if p is not None]
+        conn.executemany("INSERT INTO _versions (name, version) VALUES (?, 1) "
+                         "ON CONFLICT(name) DO UPDATE SET version = version + 1", [(n,) for n in names])
+        return conn.execute("SELECT version FROM _versions WHERE name = ?", (self.name,)).fetchone()[0]
+
+    def _counter(self, name: str) -> int:
+        row = self.engine.conn().execute("SELECT version FROM _versions WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else 0
+
+    def put(self, record):
+        row = self._row(record)
+        with self.engine.atomic() as conn:
+            conn.execute(self._upsert_sql(), row + (self._touch(conn, [row[1]]),))
+
+    def delete(self, key, partition=None):
+        sql, args = f"DELETE FROM {self.name} WHERE key = ?", [key]
+        if partition is not None:
+            sql, args = sql + " AND part = ?", args + [partition]
+        with self.engine.atomic() as conn:
+            found = conn.execute(f"SELECT part FROM {self.name} WHERE key = ?", (key,)).fetchone()
+            if found is None or conn.execute(sql, args).rowcount == 0:
+                return False
+            self._touch(conn, [found[0]])
+            return True
+
+    def query(self, **filters):
+        where, args, rest = [], [], {}
+        for field, value in filters.items():
+            if field == self.key:
+                where.append("key = ?")
+            elif field == self.spec.partition:
+                where.append("part = ?")
+            elif field in self.columns:
+                where.append(f"{field} = ?")
+                value = self._column(field, value)
+            else:
+                rest[field] = value
+                continue
+            args.append(value)
+        sql = f"SELECT doc FROM {self.name}"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        docs = [json.loads(d) for (d,) in self.engine.conn().execute(sql + " ORDER BY id", args)]
+        return [d for d in docs if _matches(d, rest, self.spec.normalized)] if rest else docs
+
+    def all(self):
+        return self.query()
+
+    def load_document(self, partition=None):
+        if self.spec.partition:
+            return self.query(**{self.spec.partition: partition})
+        if self.spec.directory and not self.spec.file:
+            doc = self.get(partition)
+            return [doc] if doc else []
+        return self.all()
+
+    def save_document(self, records, partition=None):
+        """Diff against stored rows: only changed records are written, missing ones deleted."""
+        if self.spec.directory and not self.spec.partition and not self.spec.file:
+            for r in records:
+                self.put(r)
+            return
+        rows = [self._row(r) for r in records]
+        with self.engine.atomic() as conn:
+            if self.spec.partition:
+                existing = dict(conn.execute(f"SELECT key, doc FROM {self.name} WHERE part = ?", (partition,)))
+            else:
+                existing = dict(conn.execute(f"SELECT key, doc FROM {self.name}"))
+            keep = {row[0] for row in rows}
+            stale = [(k,) for k in existing if k not in keep]
+            if stale:
+                conn.executemany(f"DELETE FROM {self.name} WHERE key = ?", stale)
+            changed = [row for row in rows if existing.get(row[0]) != row[-1]]
+            if changed or stale:
+                rev = self._touch(conn, [partition])
+                conn.executemany(self._upsert_sql(), [row + (rev,) for row in changed])
+
+    def replace_all(self, records):
+        rows = [self._row(r) for r in records]
+        with self.engine.atomic() as conn:
+            parts = [p for (p,) in conn.execute(f"SELECT DISTINCT part FROM {self.name}")]
+            rev = self._touch(conn, parts + [row[1] for row in rows])
+            conn.execute(f"DELETE FROM {self.name}")
+            conn.executemany(self._upsert_sql(), [row + (rev,) for row in rows])
+        return len(rows)
+
+    def version(self):
+        return self._counter(self.name)
+
+    def record_signatures(self):
+        return dict(self.engine.conn().execute(f"SELECT key, rev FROM {self.name}"))
+
+    def document_version(self, partition=None):
+        if self.spec.partition and partition is not None:
+            return self._counter(f"{self.name}:{partition}")
+        return self.version()
+
+
+class SqliteEngine:
+    """Embedded SQLite store (WAL mode). One connection per thread."""
+    name = "sqlite"
+
+    def __init__(self, path: str = SQLITE_PATH, data_dir: str = DATA_DIR):
+        self.path = path
+        self.specs = collection_specs(data_dir)
+        self._local = threading.local()
+        self._collections = {name: SqliteCollection(spec, self) for name, spec in self.specs.items()}
+        self._schema_ready = False
+        self._schema_lock = threading.Lock()
+
+    def conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            jsonio.ensure_parent(self.path)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.depth = 0
+            self._ensure_schema(conn)
+        return conn
+
+    def _ensure_schema(self, conn: sqlite3.Connection) -> None:
+        with self._schema_lock:
+            if self._schema_ready:
+                return
+            for col in self._collections.values():
+                col.create_schema(conn)
+            conn.execute("CREATE TABLE IF NOT EXISTS _meta (version INTEGER NOT NULL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS _versions (name TEXT PRIMARY KEY, version INTEGER NOT NULL)")
+            conn.execute("INSERT INTO _meta (version) SELECT 0 WHERE NOT EXISTS (SELECT 1 FROM _meta)")
+            self._schema_ready = True
+
+    @contextmanager
+    def atomic(self) -> Iterator[sqlite3.Connection]:
+        """Run statements in one write transaction; nested calls join the outer one."""
+        conn = self.conn()
+        if self._local.depth:
+            self._local.depth += 1
+            try:
+                yield conn
+            finally:
+                self._local.depth -= 1
+            return
+        conn.execute("BEGIN IMMEDIATE")
+        self._local.depth = 1
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        else:
+            conn.execute("UPDATE _meta SET version = version + 1")
+            conn.execute("COMMIT")
+        finally:
+            self._local.depth = 0
+
+    def version(self) -> int:
+        """Database-wide write counter, bumped by every committed write transaction."""
+        return self.conn().execute("SELECT version FROM _meta").fetchone()[0]
+
+    def collection(self, name: str) -> Collection:
+        return self._collections[name]
+
+    def close(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    # --- jsonio backend hooks: map legacy document paths onto collections ---
+
+    def resolve(self, path: str) -> Optional[Tuple[Collection, Optional[str]]]:
+        path = os.path.abspath(path)
+        for spec in self.specs.values():
+            if spec.file and path == os.path.abspath(spec.file):
+                return self._collections[spec.name], None
+            if spec.directory and not spec.file and os.path.dirname(path) == os.path.abspath(spec.directory):
+                base = os.path.basename(path)
+                if base in _NON_RECORD_FILES or not base.endswith(spec.suffix):
+                    continue
+                return self._collections[spec.name], base[: -len(spec.suffix)]
+        return None
+
+    def handles(self, path: str) -> bool:
+        return self.resolve(path) is not None
+
+    def load(self, path: str, default: Any) -> Any:
+        col, part = self.resolve(path)
+        records = col.load_document(part)
+        if col.spec.directory and not col.spec.partition and not col.spec.file:
+            return records[0] if records else default
+        return records or default
+
+    def save(self, path: str, data: Any) -> None:
+        col, part = self.resolve(path)
+        if isinstance(data, dict):
+            data = [data]
+        col.save_document(list(data), part)
+
+
+# -----------------------------------------------------------------------------
+# ENGINE SELECTION
+# -----------------------------------------------------------------------------
+def create_engine(name: str, **kwargs: Any):
+    if name == "sqlite":
+        return SqliteEngine(**kwargs)
+    if name == "json":
+        return JsonFileEngine(**kwargs)
+    raise ValueError(f"Unknown storage engine: {name}")
+
+
+_engine = None
+
+
+def set_engine(engine) -> None:
+    """Install the active engine and route the legacy document paths it serves through jsonio."""
+    global _engine
+    _engine = engine
+    jsonio.set_backend(engine)
+
+
+def get_engine():
+    return _engine
+
+
+def collection(name: str) -> Collection:
+    """Return the named collection from the active engine."""
+    return _engine.collection(name)
+
+
+set_engine(create_engine(os.getenv("STORAGE_ENGINE", "json")))
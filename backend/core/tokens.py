@@ -4,6 +4,8 @@ import jwt
 from datetime import datetime, timezone
 from typing import List
 from backend.authentication import utils
+from backend.core.paths import REVOKED_TOKENS_FILE
+from backend.core.transactions import transaction
 from backend.authentication.security_config import SECRET_KEY, ALGORITHM
 
 
@@ -38,14 +40,15 @@ def cleanup_revoked_tokens() -> None:
 
 def revoke_token(token: str) -> None:
     """Add a token to the revocation list."""
-    cleanup_revoked_tokens()
-    tokens = load_revoked_tokens()
-    if token not in tokens:
-        tokens.append(token)
-        save_revoked_tokens(tokens)
+    with transaction(REVOKED_TOKENS_FILE):
+        cleanup_revoked_tokens()
+        tokens = load_revoked_tokens()
+        if token not in tokens:
+            tokens.append(token)
+            save_revoked_tokens(tokens)
 
 
 def is_token_revoked(token: str) -> bool:
     """Return True if a token has been revoked."""
-    tokens = load_revoked_tokens()
+    tokens = utils.view_revoked_tokens()
     return token in tokens
@@ -0,0 +1,343 @@
+"""Cross-process read-modify-write transactions over JSON documents.
+
+Usage:
+    with transaction(REVIEWS_FILE, USERS_ACTIVE_FILE):
+        reviews = load_json(REVIEWS_FILE, default=[])
+        ...
+        save_json(REVIEWS_FILE, reviews)
+        save_json(USERS_ACTIVE_FILE, users)
+
+A path may also be a directory, which locks every document under it as one unit. Paths passed
+as `shared` are locked in shared mode and are not writable: writers that each lock their own
+file under a shared directory run side by side, and exclude a transaction that locks the whole
+directory (e.g. a rebuild).
+Advisory locks (fcntl.flock on "<path>.lock") are taken in sorted path order, so concurrent
+workers cannot deadlock. Reads inside the block see the latest committed data plus the
+transaction's own staged writes. save_json calls on held paths are staged and written together
+on exit: every file is written to a temp file and fsynced, an intent record is written (naming the
+renames, deletes and the lines to append to logs with the offset they go at), then the temp files
+are renamed into place and the lines appended. If the block raises, staged writes are discarded.
+An interrupted commit is rolled forward by recover() at startup (commits hold a shared lock on
+TRANSACTIONS_DIR while their intent record exists; recover() takes it exclusively). When jsonio
+write-behind is enabled, committed files join its pending group, which is flushed before the
+locks are released so other workers never read older data under them.
+"""
+import json, os, tempfile, threading, uuid
+from contextlib import contextmanager, nullcontext
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+from backend.core import jsonio
+from backend.core.paths import DATA_DIR
+
+TRANSACTIONS_DIR = os.path.join(DATA_DIR, ".transactions")
+
+# Fallback for platforms without fcntl: serializes transactions within this process only.
+_local_locks: Dict[str, threading.Lock] = {}
+_local_locks_guard = threading.Lock()
+
+
+class TransactionError(RuntimeError):
+    """Raised when a transaction is used incorrectly (e.g. nested with new paths)."""
+
+
+class _PathLock:
+    """Advisory lock on "<path>.lock", exclusive unless shared is set."""
+
+    def __init__(self, path: str, shared: bool = False):
+        self.path = path
+        self.shared = shared
+        self._fd: Optional[int] = None
+        self._thread_lock: Optional[threading.Lock] = None
+
+    def acquire(self) -> None:
+        if fcntl is None:
+            with _local_locks_guard:
+                self._thread_lock = _local_locks.setdefault(self.path, threading.Lock())
+            self._thread_lock.acquire()
+            return
+        jsonio.ensure_parent(self.path)
+        self._fd = os.open(self.path + ".lock", os.O_RDWR | os.O_CREAT, 0o644)
+        fcntl.flock(self._fd, fcntl.LOCK_SH if self.shared else fcntl.LOCK_EX)
+
+    def release(self) -> None:
+        if self._thread_lock is not None:
+            self._thread_lock.release()
+            self._thread_lock = None
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+
+
+# Markers for stage_text() (written verbatim, never routed to a storage backend) and stage_delete()
+_RAW = object()
+_DELETED = object()
+
+
+class Transaction:
+    """Staged writes for a fixed set of locked paths."""
+
+    def __init__(self, paths: List[str], shared: Iterable[str] = ()):
+        self.paths = sorted({os.path.abspath(p) for p in paths})
+        self.shared = sorted({os.path.abspath(p) for p in shared} - set(self.paths))
+        self._writes: Dict[str, Tuple[Any, str]] = {}
+        self._appends: Dict[str, List[str]] = {}
+
+    def holds(self, path: str) -> bool:
+        """True for locked paths and, when a directory is locked, for every file under it."""
+        path = os.path.abspath(path)
+        return path in self.paths or any(path.startswith(p + os.sep) for p in self.paths)
+
+    def shares(self, path: str) -> bool:
+        """True for paths locked in shared mode (or held)."""
+        return os.path.abspath(path) in self.shared or self.holds(path)
+
+    def stage(self, path: str, data: Any) -> None:
+        self._writes[os.path.abspath(path)] = (data, json.dumps(data, indent=4))
+
+    def stage_text(self, path: str, text: str) -> None:
+        """Replace a file's contents on commit; drops appends staged for it so far."""
+        key = os.path.abspath(path)
+        self._writes[key] = (_RAW, text)
+        self._appends.pop(key, None)
+
+    def stage_delete(self, path: str) -> None:
+        """Remove a file on commit. Reads inside the transaction see it as missing."""
+        key = os.path.abspath(path)
+        self._writes[key] = (_DELETED, "")
+        self._appends.pop(key, None)
+
+    def stage_append(self, path: str, line: str) -> None:
+        """Append one line to a file on commit (after all whole-file writes)."""
+        self._appends.setdefault(os.path.abspath(path), []).append(line)
+
+    def staged_payload(self, path: str) -> Optional[str]:
+        staged = self._writes.get(os.path.abspath(path))
+        return staged[1] if staged else None
+
+    def staged_appends(self, path: str) -> List[str]:
+        return self._appends.get(os.path.abspath(path), [])
+
+    def commit(self) -> None:
+        backend_writes, file_writes, deletes = [], [], []
+        for path, (data, payload) in self._writes.items():
+            if data is _DELETED:
+                deletes.append(path)
+                continue
+            backend = jsonio._backend_for(path) if data is not _RAW else None
+            (backend_writes if backend else file_writes).append((path, data, payload, backend))
+        for path, data, _, backend in backend_writes:
+            backend.save(path, data)
+        files = [(path, payload) for path, _, payload, _ in file_writes]
+        # With write-behind enabled the files join its pending group, flushed before the locks are
+        # released (see jsonio.WriteBehind). Journaled writes (raw text/appends) and deletes must
+        # reach disk in order, so they go direct.
+        direct = self._appends or deletes or any(data is _RAW for _, data, _, _ in file_writes)
+        wb = jsonio._write_behind
+        if (files or deletes or self._appends) and (direct or wb is None or not wb.enqueue(files, flush=True)):
+            _commit_files(files, deletes, self._appends)
+        self._writes.clear()
+        self._appends.clear()
+
+
+def _commit_files(writes: List[Tuple[str, str]], deletes: Optional[List[str]] = None,
+                  appends: Optional[Dict[str, List[str]]] = None) -> None:
+    """
+    Write all payloads to temp files, record intent, then rename them into place, delete files
+    and append lines to logs (after the whole-file writes).
+    """
+    deletes = deletes or []
+    appends = appends or {}
+    if not writes and not deletes and not appends:
+        return
+    renames: List[Tuple[str, str]] = []
+    try:
+        for path, payload in writes:
+            jsonio.ensure_parent(path)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".txn")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(payload)
+                f.flush()
+                os.fsync(f.fileno())
+            renames.append((tmp_path, path))
+    except BaseException:
+        for tmp_path, _ in renames:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        raise
+
+    planned = [_plan_append(path, lines) for path, lines in appends.items()]
+    intent, intents_lock = None, None
+    if len(renames) + len(deletes) + len(planned) > 1:
+        # Held (shared) while the intent exists, so recover() in another worker waits for it
+        intents_lock = _PathLock(TRANSACTIONS_DIR, shared=True)
+        intents_lock.acquire()
+        os.makedirs(TRANSACTIONS_DIR, exist_ok=True)
+        intent = os.path.join(TRANSACTIONS_DIR, f"{uuid.uuid4()}.json")
+    try:
+        if intent:
+            with open(intent, "w", encoding="utf-8") as f:
+                json.dump({"renames": renames, "deletes": deletes, "appends": planned}, f)
+                f.flush()
+                os.fsync(f.fileno())
+        for tmp_path, path in renames:
+            os.replace(tmp_path, path)
+            jsonio._cache.invalidate(path)
+        _remove_files(deletes)
+        for directory in {os.path.dirname(p) for _, p in renames} | {os.path.dirname(p) for p in deletes}:
+            jsonio.fsync_dir(directory)
+        for path, _, text in planned:
+            _write_append(path, text)
+        if intent:
+            os.remove(intent)
+    finally:
+        if intents_lock is not None:
+            intents_lock.release()
+
+
+def _plan_append(path: str, lines: List[str]) -> Tuple[str, int, str]:
+    """(path, offset, text) appending lines to a log, starting a new line if a torn write left one open."""
+    jsonio.ensure_parent(path)
+    offset, prefix = 0, ""
+    try:
+        with open(path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            offset = f.tell()
+            if offset:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    prefix = "\n"
+    except FileNotFoundError:
+        pass
+    return path, offset, prefix + "".join(line + "\n" for line in lines)
+
+
+def _write_append(path: str, text: str) -> None:
+    with open(path, "ab") as f:
+        f.write(text.encode("utf-8"))
+        f.flush()
+        if jsonio._durability != "none":
+            os.fsync(f.fileno())
+
+
+def _roll_forward_append(path: str, offset: int, text: str) -> None:
+    """
+    Finish an append recorded in an intent: nothing if it is in place at offset, rewritten there
+    if it is missing or torn, appended at the end if other lines have followed since.
+    """
+    data = text.encode("utf-8")
+    jsonio.ensure_parent(path)
+    with open(path, "ab+") as f:
+        size = f.seek(0, os.SEEK_END)
+        f.seek(min(offset, size))
+        present = f.read(len(data))
+        if present == data:
+            return
+        if offset <= size <= offset + len(data) and data.startswith(present):
+            f.truncate(offset)
+            f.write(data)
+        else:
+            data = data.lstrip(b"\n")
+            if size:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    data = b"\n" + data
+            f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _remove_files(paths: List[str]) -> None:
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
+        jsonio._cache.invalidate(path)
+
+
+def recover() -> int:
+    """
+    Roll forward commits interrupted after their intent record was written. Returns the count.
+    Takes the intents lock exclusively, so commits still running in other workers finish first.
+    """
+    if not os.path.isdir(TRANSACTIONS_DIR):
+        return 0
+    lock = _PathLock(TRANSACTIONS_DIR)
+    lock.acquire()
+    try:
+        return _recover_intents()
+    finally:
+        lock.release()
+
+
+def _recover_intents() -> int:
+    recovered = 0
+    for name in os.listdir(TRANSACTIONS_DIR):
+        intent = os.path.join(TRANSACTIONS_DIR, name)
+        try:
+            with open(intent, "r", encoding="utf-8") as f:
+                record = json.load(f)
+        except FileNotFoundError:
+            continue
+        except (OSError, json.JSONDecodeError):
+            os.remove(intent)
+            continue
+        if isinstance(record, list):  # intents written before deletes were supported
+            record = {"renames": record, "deletes": []}
+        for tmp_path, path in record["renames"]:
+            if os.path.exists(tmp_path):
+                os.replace(tmp_path, path)
+                jsonio._cache.invalidate(path)
+        _remove_files(record["deletes"])
+        for path, offset, text in record.get("appends", []):
+            _roll_forward_append(path, offset, text)
+        os.remove(intent)
+        recovered += 1
+    return recovered
+
+
+def current() -> Optional[Transaction]:
+    return jsonio.active_transaction.get()
+
+
+@contextmanager
+def transaction(*paths: str, shared: Iterable[str] = ()) -> Iterator[Transaction]:
+    """
+    Lock the given document paths (and the `shared` ones in shared mode) and commit all writes
+    to them atomically. Nested transactions join the outer one and may only use paths it
+    already holds (shared paths: holds or shares).
+    """
+    shared = list(shared)
+    outer = current()
+    if outer is not None:
+        missing = [p for p in paths if not outer.holds(p)] + [p for p in shared if not outer.shares(p)]
+        if missing:
+            raise TransactionError(f"Nested transaction needs paths not held by the outer one: {missing}")
+        yield outer
+        return
+
+    tx = Transaction(list(paths), shared)
+    locks = sorted([_PathLock(p) for p in tx.paths] + [_PathLock(p, shared=True) for p in tx.shared],
+                   key=lambda lock: lock.path)
+    acquired: List[_PathLock] = []
+    # Engines installed behind jsonio (SQLite) run the whole block in one database transaction
+    atomic = jsonio._backend.atomic() if hasattr(jsonio._backend, "atomic") else nullcontext()
+    token = None
+    try:
+        for lock in locks:
+            lock.acquire()
+            acquired.append(lock)
+        with atomic:
+            token = jsonio.active_transaction.set(tx)
+            try:
+                yield tx
+            finally:
+                jsonio.active_transaction.reset(token)
+            tx.commit()
+    finally:
+        for lock in reversed(acquired):
+            lock.release()
@@ -1,5 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException
-from backend.movies.utils import get_movie
+from backend.movies.utils import get_movies
 from backend.authentication.security import get_current_user
 from backend.authentication.schemas import UserToken
 from backend.friendship.utils import (
@@ -154,11 +154,7 @@ def friend_watchlist(friend_username: str, current_user: UserToken = Depends(get
     movie_ids = friend.get("watch_later", [])
 
     # Convert IDs → movie objects
-    watchlist = []
-    for m_id in movie_ids:
-        movie = get_movie(m_id)
-        if movie:
-            watchlist.append(movie)
+    watchlist = list(get_movies(movie_ids).values())
 
     return {
         "friend_username": friend_username,
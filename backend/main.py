@@ -1,5 +1,6 @@
 from dotenv import load_dotenv, find_dotenv
 load_dotenv(find_dotenv())
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
@@ -15,10 +16,15 @@ from backend.users import router as users_router
 from backend.dashboards import router as dashboard_router
 from backend.friendship import router as friendship_router
 from backend.recommendations import router as recommendations_router
-from backend.core import exceptions
-from pathlib import Path
-import json
-from External_API.TMDb_api import getTrending, save_tmdb_json
+from backend.core import exceptions, jsonio, transactions
+from backend.movies.index import get_index as get_movie_index
+from backend.movies.catalog import get_catalog as get_movie_catalog
+from backend.movies.fulltext import get_text_index as get_movie_text_index
+from backend.movies.suggest import get_suggest_index as get_movie_suggest_index
+from backend.movies.popular import get_pool as get_popular_pool, close_pool as close_popular_pool
+from backend.movies.trending import get_trending_cache
+from backend.reviews.utils import recover_votes, shutdown_votes
+from External_API.tmdb_client import close_client as close_tmdb_client
 
 logger = logging.getLogger(__name__)
 
@@ -30,7 +36,35 @@ tags_metadata = [
     },
 ]
 
-app = FastAPI(openapi_tags=tags_metadata)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Finish any multi-file commit interrupted by a crash before serving requests
+    recovered = transactions.recover()
+    if recovered:
+        logger.warning(f"Recovered {recovered} interrupted transaction(s)")
+    # Fold in review votes a previous run logged but did not flush
+    recovered = recover_votes()
+    if recovered:
+        logger.warning(f"Applied unflushed votes to {recovered} review(s)")
+    # Build the movie search index now rather than on the first GET /movies
+    logger.info(f"Indexed {len(get_movie_index())} movies")
+    get_movie_catalog()
+    get_movie_text_index()
+    get_movie_suggest_index()
+    # Fill the GET /movies/random pool in the background and keep it fresh
+    get_popular_pool().start()
+    yield
+    close_popular_pool()
+    await close_tmdb_client()
+    shutdown_votes()
+    # Write out anything still queued by write-behind before the process exits
+    jsonio.shutdown_writes()
+    stats = jsonio.write_stats()
+    if stats["enabled"]:
+        logger.info(f"Write-behind flushed: {stats}")
+
+
+app = FastAPI(openapi_tags=tags_metadata, lifespan=lifespan)
 
 # Include routers
 app.include_router(authentication_router.router)
@@ -102,27 +136,14 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 @app.get('/')
 async def read_root():
     return {"message": "Backend is up"}
 
-DATA_FILE = Path(__file__).parent / "data/tmdb_data.json"
-
 @app.get("/trending")
 async def get_trending_movies():
-    save_tmdb_json(getTrending())
-    try:
-        with open(DATA_FILE, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        movies = data.get("results", [])
-        if not isinstance(movies, list):
-            movies = []
-    except Exception as e:
-        print("Failed to read JSON:", e)
-        movies = []
-
-    # Sort by vote_average descending
-    movies_sorted = sorted(movies, key=lambda x: x.get("vote_average", 0), reverse=True)
-    return movies_sorted
+    """TMDb's popular movies by vote_average, from a cache refreshed in the background."""
+    return await get_trending_cache().get()
@@ -0,0 +1,260 @@
+"""Columnar (NumPy) view of the movie catalog for vectorized filters, sorts and scoring.
+
+One row per movie, rows ordered by movie_id:
+    movie_ids                      str array
+    imdb_rating, meta_score, duration, total_rating_count, total_user_reviews
+                                   float64 arrays, NaN where the movie has no value
+    year                           int32 array of release years, 0 where unknown
+    genres / genre_matrix          lower-cased genre names and a rows x genres bool matrix
+    genre_labels                   each genre as first written in the movies
+    directors / director_rows / director_codes
+                                   director names (as first written) and one (row, code) pair
+                                   per movie and director
+
+The arrays are saved to an .npz sidecar next to the movies directory together with a
+fingerprint of the movie files, so a process whose catalog has not changed since the last
+save loads the sidecar instead of reading every movie.
+"""
+import hashlib, logging, os, tempfile, threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from backend.core import storage
+from backend.movies.index import get_index, parse_year
+
+logger = logging.getLogger(__name__)
+
+NUMERIC_FIELDS = ("imdb_rating", "meta_score", "duration", "total_rating_count", "total_user_reviews")
+FACET_TOP = 20  # entries kept in the genre and director facets
+SIDECAR_NAME = "movies_catalog.npz"
+# sort_by names accepted by argsort, as in MovieSearchParams, plus the other numeric columns
+SORT_FIELDS = {"rating": "imdb_rating", "imdb_rating": "imdb_rating", "meta_score": "meta_score",
+               "total_rating_count": "total_rating_count", "duration": "duration",
+               "total_user_reviews": "total_user_reviews", "year": "year"}
+
+
+def _float(value: Any) -> float:
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    return np.nan
+
+
+def _str_array(values: List[str]) -> np.ndarray:
+    return np.array(values, dtype=str) if values else np.array([], dtype="<U1")
+
+
+def _codes(records: List[Dict[str, Any]], field: str) -> Tuple[List[str], np.ndarray, np.ndarray]:
+    """Distinct values of a list field (case-insensitive, first spelling kept) and the (row, code) pairs."""
+    codes: Dict[str, int] = {}
+    labels: List[str] = []
+    rows: List[int] = []
+    cols: List[int] = []
+    for row, r in enumerate(records):
+        seen = set()
+        for value in r.get(field) or ():
+            if isinstance(value, str) and value.lower() not in seen:
+                seen.add(value.lower())
+                code = codes.get(value.lower())
+                if code is None:
+                    code = codes[value.lower()] = len(labels)
+                    labels.append(value)
+                rows.append(row)
+                cols.append(code)
+    return labels, np.array(rows, dtype=np.int32), np.array(cols, dtype=np.int32)
+
+
+def _ranked(labels: np.ndarray, counts: np.ndarray, top: Optional[int] = None) -> List[Dict[str, Any]]:
+    """[{"value", "count"}] for the non-zero counts, largest first (ties by value)."""
+    nonzero = np.flatnonzero(counts)
+    order = nonzero[np.lexsort((labels[nonzero], -counts[nonzero]))] if len(nonzero) else nonzero
+    return [{"value": str(labels[i]), "count": int(counts[i])} for i in order[:top]]
+
+
+class MovieCatalog:
+    """Column arrays for every movie (see module docstring)."""
+
+    def __init__(self, movie_ids: np.ndarray, columns: Dict[str, np.ndarray], year: np.ndarray,
+                 genres: np.ndarray, genre_matrix: np.ndarray, fingerprint: str = "",
+                 genre_labels: Optional[np.ndarray] = None, directors: Optional[np.ndarray] = None,
+                 director_rows: Optional[np.ndarray] = None, director_codes: Optional[np.ndarray] = None):
+        self.movie_ids = movie_ids
+        self.columns = columns
+        self.year = year
+        self.genres = genres
+        self.genre_matrix = genre_matrix
+        self.fingerprint = fingerprint
+        self.genre_labels = genres if genre_labels is None else genre_labels
+        self.directors = _str_array([]) if directors is None else directors
+        self.director_rows = np.array([], dtype=np.int32) if director_rows is None else director_rows
+        self.director_codes = np.array([], dtype=np.int32) if director_codes is None else director_codes
+        self._genre_codes = {g: i for i, g in enumerate(genres.tolist())}
+        self._rows: Optional[Dict[str, int]] = None
+        self._genre_pairs: Optional[Tuple[np.ndarray, np.ndarray]] = None  # (rows, codes) of genre_matrix
+
+    def __len__(self) -> int:
+        return len(self.movie_ids)
+
+    def __getitem__(self, field: str) -> np.ndarray:
+        return self.year if field == "year" else self.columns[field]
+
+    @classmethod
+    def from_records(cls, records: Iterable[Dict[str, Any]], fingerprint: str = "") -> "MovieCatalog":
+        records = sorted((r for r in records if isinstance(r.get("movie_id"), str)), key=lambda r: r["movie_id"])
+        columns = {f: np.array([_float(r.get(f)) for r in records], dtype=np.float64) for f in NUMERIC_FIELDS}
+        year = np.array([(parse_year(d) if isinstance(d, str) else None) or 0
+                         for d in (r.get("release_date") for r in records)], dtype=np.int32)
+
+        genre_labels, rows, cols = _codes(records, "genres")
+        genre_matrix = np.zeros((len(records), len(genre_labels)), dtype=bool)
+        genre_matrix[rows, cols] = True
+        genres = _str_array([g.lower() for g in genre_labels])
+        directors, director_rows, director_codes = _codes(records, "directors")
+        movie_ids = _str_array([r["movie_id"] for r in records])
+        return cls(movie_ids, columns, year, genres, genre_matrix, fingerprint,
+                   _str_array(genre_labels), _str_array(directors), director_rows, director_codes)
+
+    # --- sidecar ---
+
+    def save(self, path: str) -> None:
+        """Write the arrays to an .npz file (atomically replacing any previous one)."""
+        directory = os.path.dirname(path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix=".npz.tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, movie_ids=self.movie_ids, year=self.year, genres=self.genres,
+                         genre_matrix=self.genre_matrix, fingerprint=np.array(self.fingerprint),
+                         genre_labels=self.genre_labels, directors=self.directors,
+                         director_rows=self.director_rows, director_codes=self.director_codes,
+                         **{f"col_{name}": values for name, values in self.columns.items()})
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+    @classmethod
+    def load(cls, path: str) -> Optional["MovieCatalog"]:
+        """Read a sidecar written by save(); None if it is missing, unreadable or outdated in shape."""
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                columns = {f: data[f"col_{f}"] for f in NUMERIC_FIELDS}
+                return cls(data["movie_ids"], columns, data["year"], data["genres"], data["genre_matrix"],
+                           str(data["fingerprint"]), data["genre_labels"], data["directors"],
+                           data["director_rows"], data["director_codes"])
+        except (OSError, KeyError, ValueError):
+            return None
+
+    # --- queries ---
+
+    def row(self, movie_id: str) -> Optional[int]:
+        if self._rows is None:
+            self._rows = {m: i for i, m in enumerate(self.movie_ids.tolist())}
+        return self._rows.get(movie_id)
+
+    def rows_mask(self, movie_ids: Iterable[str]) -> np.ndarray:
+        """Bool mask of the rows of the given movies (unknown ids are ignored)."""
+        mask = np.zeros(len(self), dtype=bool)
+        rows = [r for r in map(self.row, movie_ids) if r is not None]
+        mask[rows] = True
+        return mask
+
+    def genre_mask(self, genre: str) -> np.ndarray:
+        code = self._genre_codes.get(genre.lower())
+        if code is None:
+            return np.zeros(len(self), dtype=bool)
+        return self.genre_matrix[:, code]
+
+    def filter_mask(self, params) -> np.ndarray:
+        """Rows passing the genre and numeric filters of MovieSearchParams, as filter_movies applies them."""
+        mask = np.ones(len(self), dtype=bool)
+        if getattr(params, "genre", None):
+            mask &= self.genre_mask(params.genre)
+        rating = np.nan_to_num(self.columns["imdb_rating"], nan=0.0)
+        if getattr(params, "min_rating", None):
+            mask &= rating >= params.min_rating
+        if getattr(params, "max_rating", None):
+            mask &= rating <= params.max_rating
+        if getattr(params, "min_year", None):
+            mask &= self.year >= params.min_year
+        if getattr(params, "max_year", None):
+            mask &= np.where(self.year == 0, 9999, self.year) <= params.max_year
+        return mask
+
+    def facet_counts(self, mask: np.ndarray, top: int = FACET_TOP) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Counts over mask's rows: the top genres and directors (most movies first), and every
+        decade and whole-star rating bucket present (in order; a rating of 10 counts as 9-10).
+        """
+        if self._genre_pairs is None:
+            self._genre_pairs = np.nonzero(self.genre_matrix)
+        genre_rows, genre_codes = self._genre_pairs
+        genres = np.bincount(genre_codes[mask[genre_rows]], minlength=len(self.genre_labels))
+        directors = np.bincount(self.director_codes[mask[self.director_rows]], minlength=len(self.directors))
+        years = self.year[mask]
+        decades = np.bincount(years[years > 0] // 10)
+        ratings = self.columns["imdb_rating"][mask]
+        buckets = np.bincount(np.clip(ratings[~np.isnan(ratings)], 0, 9.999).astype(np.int64), minlength=10)
+        return {
+            "genres": _ranked(self.genre_labels, genres, top),
+            "directors": _ranked(self.directors, directors, top),
+            "decades": [{"value": f"{d * 10}s", "count": int(decades[d])} for d in np.flatnonzero(decades)],
+            "ratings": [{"value": f"{b}-{b + 1}", "count": int(buckets[b])} for b in np.flatnonzero(buckets)],
+        }
+
+    def argsort(self, sort_by: str, order: str = "asc", mask: Optional[np.ndarray] = None) -> np.ndarray:
+        """Row numbers (of mask's rows, if given) ordered by a numeric column; missing values sort as 0."""
+        field = SORT_FIELDS[sort_by.lower()]
+        values = np.nan_to_num(self[field].astype(np.float64), nan=0.0)
+        rows = np.arange(len(self)) if mask is None else np.flatnonzero(mask)
+        values = values[rows]
+        ranks = np.argsort(-values if order.lower() == "desc" else values, kind="stable")
+        return rows[ranks]
+
+
+# -----------------------------------------------------------------------------
+# Shared instance
+# -----------------------------------------------------------------------------
+
+def sidecar_path(col: storage.Collection) -> str:
+    return os.path.join(os.path.dirname(os.path.abspath(col.spec.directory)), SIDECAR_NAME)
+
+
+def _fingerprint(col: storage.Collection) -> str:
+    """Digest of the movie records' signatures (file stats, SQLite row revs), else of the collection's version."""
+    signatures = col.record_signatures()
+    if signatures is not None:
+        source: Any = sorted(signatures.items())
+    else:
+        source = [type(col).__name__, getattr(getattr(col, "engine", None), "path", None), col.version()]
+    return hashlib.md5(repr(source).encode("utf-8")).hexdigest()
+
+
+_catalog: Optional[MovieCatalog] = None
+_catalog_source: Any = None  # (collection, version) the shared catalog was made from
+_catalog_lock = threading.Lock()
+
+
+def get_catalog() -> MovieCatalog:
+    """The catalog of the current movies collection, rebuilt (and re-saved) when movies change."""
+    global _catalog, _catalog_source
+    col = storage.collection("movies")
+    with _catalog_lock:
+        version = col.version()
+        if _catalog is not None and version is not None and _catalog_source == (col, version):
+            return _catalog
+        fingerprint = _fingerprint(col)
+        if _catalog is not None and _catalog_source[0] is col and _catalog.fingerprint == fingerprint:
+            _catalog_source = (col, version)
+            return _catalog
+        path = sidecar_path(col)
+        catalog = MovieCatalog.load(path)
+        if catalog is None or catalog.fingerprint != fingerprint:
+            catalog = MovieCatalog.from_records(get_index().all_docs(), fingerprint)
+            try:
+                catalog.save(path)
+            except OSError:
+                logger.warning("Could not write movie catalog sidecar %s", path, exc_info=True)
+        _catalog, _catalog_source = catalog, (col, version)
+        return catalog
@@ -0,0 +1,199 @@
+"""Streaming export of the movie catalog (GET /movies/download).
+
+The export is generated chunk by chunk from a snapshot of the movie index (references to the
+indexed records, in movie_id order), so memory stays bounded by CHUNK_BYTES instead of the
+size of the catalog. Formats:
+    json      a JSON array, one movie per line
+    ndjson    one JSON object per line
+Either can be gzip-compressed.
+
+Uncompressed exports support single byte ranges (Range / If-Range) so an interrupted
+download can resume. The ETag names the content of the catalog (MovieIndex.content_version),
+so it matches in every worker and after a restart; answering a range needs the byte offset of
+every movie, measured once per content version and format and kept in a small cache.
+Compressed exports are always sent whole.
+"""
+import json, logging, threading, time, zlib
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict
+from itertools import accumulate
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from backend.core import jsonio
+from backend.movies.index import get_index
+
+logger = logging.getLogger(__name__)
+CHUNK_BYTES = 64 * 1024
+LAYOUT_CACHE_ENTRIES = 4
+FORMATS = {
+    # format: (head, separator between movies, tail, media type, file extension)
+    "json": (b"[\n", b",\n", b"\n]\n", "application/json", "json"),
+    "ndjson": (b"", b"\n", b"\n", "application/x-ndjson", "ndjson"),
+}
+
+
+class RangeNotSatisfiable(Exception):
+    """The requested byte range lies outside the export; `length` is the export size."""
+
+    def __init__(self, length: int):
+        super().__init__(f"Range not satisfiable (export is {length} bytes)")
+        self.length = length
+
+
+def _encode(record: Dict[str, Any]) -> bytes:
+    return json.dumps(jsonio._to_jsonable(record), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class MovieExport:
+    """One download: a snapshot of the movies in a format, optionally gzip-compressed."""
+
+    def __init__(self, fmt: str = "json", gzip: bool = False):
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown export format {fmt!r}")
+        self.fmt = fmt
+        self.gzip = gzip
+        self.token, self.records = get_index().snapshot()
+        self.head, self.separator, self.tail, self.media_type, extension = FORMATS[fmt]
+        self.filename = f"movies.{extension}" + (".gz" if gzip else "")
+        self.etag = f'"{self.token}-{fmt}{"-gz" if gzip else ""}"'
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    # --- pieces: head, then each movie with its trailing separator, then the tail ---
+
+    def _piece(self, i: int) -> bytes:
+        """Piece i of the export: 0 is the head, 1..n the movies, n+1 the tail."""
+        n = len(self.records)
+        if i == 0:
+            return self.head
+        if i == n + 1:
+            return self.tail
+        return _encode(self.records[i - 1]) + (self.separator if i < n else b"")
+
+    def _pieces(self, start: int = 0) -> Iterator[bytes]:
+        for i in range(start, len(self.records) + 2):
+            yield self._piece(i)
+
+    def _offsets(self) -> "array[int]":
+        """Start offset of every piece plus the total length (cached per content version and format)."""
+        key = (self.token, self.fmt)
+        with _layout_lock:
+            offsets = _layouts.get(key)
+            if offsets is not None:
+                _layouts.move_to_end(key)
+                return offsets
+        offsets = array("q", accumulate((len(p) for p in self._pieces()), initial=0))
+        with _layout_lock:
+            _layouts[key] = offsets
+            while len(_layouts) > LAYOUT_CACHE_ENTRIES:
+                _layouts.popitem(last=False)
+        return offsets
+
+    # --- byte ranges ---
+
+    def resolve_range(self, header: Optional[str], if_range: Optional[str] = None) -> Optional[Tuple[int, int, int]]:
+        """
+        (first, last, length) for a satisfiable single-range Range header, or None to send the
+        whole export (no/unsupported header, compressed export, or If-Range naming other content).
+        Raises RangeNotSatisfiable when the range starts past the end.
+        """
+        if not header or self.gzip or (if_range and if_range != self.etag):
+            return None
+        unit, _, spec = header.partition("=")
+        if unit.strip().lower() != "bytes" or "," in spec:
+            return None
+        first_s, dash, last_s = spec.strip().partition("-")
+        if not dash or not (first_s.isdigit() or (not first_s and last_s.isdigit())) or (last_s and not last_s.isdigit()):
+            return None
+        length = self._offsets()[-1]
+        if not first_s:  # suffix range: the last N bytes
+            suffix = int(last_s)
+            if suffix == 0:
+                raise RangeNotSatisfiable(length)
+            return max(length - suffix, 0), length - 1, length
+        first = int(first_s)
+        last = min(int(last_s), length - 1) if last_s else length - 1
+        if first >= length or last < first:
+            raise RangeNotSatisfiable(length)
+        return first, last, length
+
+    # --- streaming ---
+
+    def _raw(self, first: int = 0, last: Optional[int] = None) -> Iterator[bytes]:
+        """Uncompressed bytes first..last (inclusive), in chunks of about CHUNK_BYTES."""
+        start_piece, skip = 0, 0
+        if first:
+            offsets = self._offsets()
+            start_piece = bisect_right(offsets, first) - 1
+            skip = first - offsets[start_piece]
+        remaining = None if last is None else last - first + 1
+        buffer: List[bytes] = []
+        size = 0
+        for piece in self._pieces(start_piece):
+            if skip:
+                piece, skip = piece[skip:], 0
+            if remaining is not None:
+                piece = piece[:remaining]
+                remaining -= len(piece)
+            buffer.append(piece)
+            size += len(piece)
+            if size >= CHUNK_BYTES:
+                yield b"".join(buffer)
+                buffer, size = [], 0
+            if remaining == 0:
+                break
+        if buffer:
+            yield b"".join(buffer)
+
+    def stream(self, first: int = 0, last: Optional[int] = None) -> Iterator[bytes]:
+        """The export body (or the given byte range of it), recording throughput in export_stats()."""
+        started = time.perf_counter()
+        sent = 0
+        try:
+            if self.gzip:
+                compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31: gzip container
+                for chunk in self._raw():
+                    out = compressor.compress(chunk)
+                    if out:
+                        sent += len(out)
+                        yield out
+                out = compressor.flush()
+                sent += len(out)
+                yield out
+            else:
+                for chunk in self._raw(first, last):
+                    sent += len(chunk)
+                    yield chunk
+        finally:
+            _record(sent, time.perf_counter() - started)
+
+
+# -----------------------------------------------------------------------------
+# Layout cache and throughput stats
+# -----------------------------------------------------------------------------
+
+_layouts: "OrderedDict[Tuple[str, str], array]" = OrderedDict()
+_layout_lock = threading.Lock()
+
+_stats_lock = threading.Lock()
+_stats = {"exports": 0, "bytes": 0, "seconds": 0.0, "last_bytes": 0, "last_seconds": 0.0}
+
+
+def _record(sent: int, seconds: float) -> None:
+    with _stats_lock:
+        _stats["exports"] += 1
+        _stats["bytes"] += sent
+        _stats["seconds"] += seconds
+        _stats["last_bytes"], _stats["last_seconds"] = sent, seconds
+    logger.info("Movie export sent %d bytes in %.2fs (%d bytes/sec)", sent, seconds, sent / seconds if seconds else 0)
+
+
+def export_stats() -> Dict[str, Any]:
+    """Totals over finished (or aborted) downloads, with bytes/sec overall and for the last one."""
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["bytes_per_sec"] = round(stats["bytes"] / stats["seconds"]) if stats["seconds"] else 0
+    stats["last_bytes_per_sec"] = round(stats["last_bytes"] / stats["last_seconds"]) if stats["last_seconds"] else 0
+    return stats
@@ -0,0 +1,218 @@
+"""Ranked full-text search (BM25) over movie titles, descriptions, directors and stars.
+
+Text is split into lower-cased words, common English words are dropped and the rest reduced
+to a stem (stem()), so "Knights" finds "knight" and "loved" finds "love". Each field counts
+with a weight (FIELD_WEIGHTS): a term's frequency in a movie is the weighted sum over fields,
+and so is the movie's length, which is how BM25 combines fields here.
+
+Postings are append-only arrays per term (docids and weighted term frequencies). Changing a
+movie marks its old docid dead and appends it under a new one; once the dead docids outnumber
+the live ones the arrays are rebuilt. A query scores every posting of its terms with NumPy,
+sums the scores per movie and orders only the candidates for the top k.
+
+The shared index (get_text_index) follows the movie index, so it sees the same incremental
+updates when backend/data/movies changes.
+"""
+import math, re, threading
+from array import array
+from collections import Counter
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from backend.movies.index import MovieIndex, get_index
+
+_WORD = re.compile(r"\w+")
+K1 = 1.2
+B = 0.75
+FIELD_WEIGHTS = {"title": 3.0, "directors": 2.0, "main_stars": 2.0, "description": 1.0}
+STOPWORDS = frozenset("""
+    a an and are as at be but by for from has he her his in into is it its of on or she so
+    that the their them they this to was were who will with
+""".split())
+_VOWELS = set("aeiouy")
+
+
+@lru_cache(maxsize=65536)
+def stem(word: str) -> str:
+    """A light suffix-stripping stemmer (plurals, -ed, -ing, -ly and a final e)."""
+    if len(word) <= 3 or not word.isalpha():
+        return word
+    if word.endswith("ies") and len(word) > 4:
+        word = word[:-3] + "y"
+    elif word.endswith("sses"):
+        word = word[:-2]
+    elif word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        word = word[:-1]
+    for suffix in ("ingly", "edly", "ing", "ed", "ly"):
+        base = word[:-len(suffix)]
+        if word.endswith(suffix) and len(base) >= 3 and _VOWELS.intersection(base):
+            word = base
+            if len(word) > 3 and word[-1] == word[-2] and word[-1] not in "lsz":
+                word = word[:-1]  # running -> run
+            break
+    if len(word) > 3 and word.endswith("e"):
+        word = word[:-1]  # hope / hoped / hoping -> hop
+    return word
+
+
+def terms(text: str) -> List[str]:
+    """Stemmed search terms of text, stopwords and single characters left out."""
+    return [stem(w) for w in _WORD.findall(text.lower()) if len(w) > 1 and w not in STOPWORDS]
+
+
+def _field_text(record: Dict[str, Any], field: str) -> str:
+    value = record.get(field)
+    if isinstance(value, str):
+        return value
+    if isinstance(value, list):
+        return " ".join(v for v in value if isinstance(v, str))
+    return ""
+
+
+class TextIndex:
+    """BM25 index over movie records keyed by movie_id (see module docstring)."""
+
+    def __init__(self, key: str = "movie_id"):
+        self.key = key
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self.docs: List[Optional[Dict[str, Any]]] = []
+        self.ids: Dict[str, int] = {}
+        self.alive = bytearray()
+        self.lengths = array("f")
+        self.total_length = 0.0
+        self.postings: Dict[str, Tuple["array[int]", "array[float]"]] = {}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    # --- maintenance ---
+
+    def _add(self, record: Dict[str, Any]) -> None:
+        key = record.get(self.key)
+        frequencies: Counter = Counter()
+        for field, weight in FIELD_WEIGHTS.items():
+            for term in terms(_field_text(record, field)):
+                frequencies[term] += weight
+        docid = len(self.docs)
+        self.docs.append(record)
+        self.ids[key] = docid
+        self.alive.append(1)
+        length = sum(frequencies.values())
+        self.lengths.append(length)
+        self.total_length += length
+        postings = self.postings
+        for term, tf in frequencies.items():
+            entry = postings.get(term)
+            if entry is None:
+                entry = postings[term] = (array("i"), array("f"))
+            entry[0].append(docid)
+            entry[1].append(tf)
+
+    def _kill(self, docid: int) -> None:
+        self.alive[docid] = 0
+        self.docs[docid] = None
+        self.total_length -= self.lengths[docid]
+
+    def build(self, records: Iterable[Dict[str, Any]]) -> None:
+        with self._lock:
+            self._reset()
+            for record in records:
+                docid = self.ids.get(record.get(self.key))
+                if docid is not None:
+                    self._kill(docid)
+                self._add(record)
+
+    def upsert(self, record: Dict[str, Any]) -> None:
+        with self._lock:
+            docid = self.ids.pop(record.get(self.key), None)
+            if docid is not None:
+                self._kill(docid)
+            self._add(record)
+            self._compact_if_needed()
+
+    def remove(self, key: str) -> bool:
+        with self._lock:
+            docid = self.ids.pop(key, None)
+            if docid is None:
+                return False
+            self._kill(docid)
+            self._compact_if_needed()
+            return True
+
+    def _compact_if_needed(self) -> None:
+        if len(self.docs) - len(self.ids) > max(len(self.ids), 64):
+            self.build([d for d in self.docs if d is not None])
+
+    # --- queries ---
+
+    def _term_scores(self, term: str, n: int, avg_length: float) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """(live docids, BM25 scores) for one term; the buffers are only viewed within this call."""
+        entry = self.postings.get(term)
+        if entry is None:
+            return None
+        ids = np.frombuffer(entry[0], dtype=np.int32)
+        tf = np.frombuffer(entry[1], dtype=np.float32)
+        live = np.frombuffer(self.alive, dtype=bool)[ids]
+        ids, tf = ids[live], tf[live]
+        if not len(ids):
+            return None
+        idf = math.log(1 + (n - len(ids) + 0.5) / (len(ids) + 0.5))
+        norm = K1 * (1 - B + B * np.frombuffer(self.lengths, dtype=np.float32)[ids] / avg_length)
+        return ids, idf * tf.astype(np.float64) * (K1 + 1) / (tf + norm)
+
+    def search(self, query: str, limit: int = 20, offset: int = 0) -> List[Tuple[Dict[str, Any], float]]:
+        """
+        (movie, score) for the best-scoring movies, highest first, ties in the order the movies
+        were indexed; [] when the query has no searchable terms.
+        """
+        wanted = offset + limit
+        with self._lock:
+            n = len(self.ids)
+            if not n or wanted <= 0:
+                return []
+            avg_length = self.total_length / n or 1.0
+            hits = [h for h in (self._term_scores(t, n, avg_length) for t in set(terms(query))) if h is not None]
+            if not hits:
+                return []
+            if len(hits) == 1:
+                docids, scores = hits[0]
+            else:
+                ids = np.concatenate([h[0] for h in hits])
+                weights = np.concatenate([h[1] for h in hits])
+                if len(ids) * 8 > len(self.docs):  # many hits: sum over every docid at once
+                    totals = np.bincount(ids, weights=weights, minlength=len(self.docs))
+                    docids = np.flatnonzero(totals)
+                    scores = totals[docids]
+                else:
+                    docids, inverse = np.unique(ids, return_inverse=True)
+                    scores = np.bincount(inverse, weights=weights)
+            if len(docids) > wanted:
+                # Keep what scores at least the wanted-th best score, then order only those
+                threshold = np.partition(scores, len(scores) - wanted)[len(scores) - wanted]
+                keep = scores >= threshold
+                docids, scores = docids[keep], scores[keep]
+            ranked = np.lexsort((docids, -scores))[offset:wanted]
+            docs = self.docs
+            return [(docs[d], round(s, 4)) for d, s in zip(docids[ranked].tolist(), scores[ranked].tolist())]
+
+
+_text_index: Optional[TextIndex] = None
+_text_source: Optional[MovieIndex] = None
+_text_lock = threading.Lock()
+
+
+def get_text_index() -> TextIndex:
+    """The shared full-text index, following the shared movie index (and so kept up to date)."""
+    global _text_index, _text_source
+    movies = get_index()
+    with _text_lock:
+        if _text_index is None or _text_source is not movies:
+            index = TextIndex(movies.key)
+            movies.follow(index)
+            _text_index, _text_source = index, movies
+        return _text_index
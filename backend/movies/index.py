@@ -0,0 +1,560 @@
+"""In-memory search index over the movie catalog, answering MovieSearchParams filters.
+
+Structures (docids are positions in `docs`; a removed movie leaves a None tombstone):
+    words      title word -> docids whose lower-cased title contains that word
+    grams      1-3 character substrings -> title words containing them (finds words by substring)
+    genres / directors / stars    lower-cased value -> docids
+    columns    per-docid values (rating, years, and every sort key) kept in (value, movie_id) order
+
+A query starts from its most selective source (a posting set or a sorted range) and checks the
+remaining predicates per candidate, so matching the current filter_movies semantics costs time
+proportional to the smallest source rather than the catalog size. Sorting reuses the column
+orders: a page is read off the pre-sorted order, or the matches alone are sorted when few.
+Descending order is the exact reverse of ascending (ties by movie_id descending), so a cursor
+holding the last (value, movie_id) pair resumes with a bisect instead of skipping an offset.
+Sort keys kept outside the movie records (review aggregates) are registered as derived columns,
+whose order is rebuilt on use after their source or the movies changed.
+
+The index is built once (get_index, warmed at startup) and kept current by comparing the
+collection's version token on each use and re-reading only the records whose signature changed.
+Indexes over the same movies (e.g. the full-text index) follow it to receive those changes.
+"""
+import base64, hashlib, json, re, threading, uuid
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from datetime import datetime
+from functools import lru_cache
+from itertools import islice
+from typing import Any, Callable, Collection, Dict, FrozenSet, Iterable, Iterator, List, Optional, Set, Tuple
+
+from backend.core import storage
+
+_WORD = re.compile(r"\w+")
+_GRAM_MAX = 3
+_EMPTY: FrozenSet[int] = frozenset()
+TOKEN_CACHE_ENTRIES = 1024
+
+
+@lru_cache(maxsize=65536)
+def parse_year(date_str: Optional[str]) -> Optional[int]:
+    if not date_str:
+        return None
+    try:
+        return datetime.strptime(date_str, "%Y-%m-%d").year
+    except Exception:
+        return None
+
+
+def _words(text: str) -> Set[str]:
+    return set(_WORD.findall(text))
+
+
+def _grams(word: str) -> Set[str]:
+    return {word[i:i + n] for n in range(1, _GRAM_MAX + 1) for i in range(len(word) - n + 1)}
+
+
+def _values(record: Dict[str, Any], field: str) -> Set[str]:
+    return {v.lower() for v in record.get(field) or () if isinstance(v, str)}
+
+
+def _number(value: Any) -> float:
+    return value if isinstance(value, (int, float)) and not isinstance(value, bool) else 0
+
+
+def _text(value: Any) -> str:
+    return value if isinstance(value, str) else ""
+
+
+# Column name -> value for (record, release year). rating and the years follow filter_movies,
+# the sort keys follow sort_movies.
+COLUMNS: Dict[str, Callable[[Dict[str, Any], Optional[int]], Any]] = {
+    "rating": lambda r, year: _number(r.get("imdb_rating") or 0),
+    "year_lo": lambda r, year: year or 0,
+    "year_hi": lambda r, year: year or 9999,
+    "title": lambda r, year: _text(r.get("title")),
+    "release_date": lambda r, year: _text(r.get("release_date")),
+    "meta_score": lambda r, year: _number(r.get("meta_score") or 0),
+    "total_rating_count": lambda r, year: _number(r.get("total_rating_count") or 0),
+    "movie_id": lambda r, year: _text(r.get("movie_id")),
+}
+_TEXT_COLUMNS = {"title", "release_date", "movie_id"}
+# sort_by -> column; any other sort_by lists movies by movie_id
+SORT_COLUMNS = {"title": "title", "release_date": "release_date", "rating": "rating", "imdb_rating": "rating",
+                "meta_score": "meta_score", "total_rating_count": "total_rating_count"}
+# Numeric sort columns whose values live outside the movie records (e.g. review aggregates):
+# name -> source() returning (version token, {movie_id: value}); see register_sort_column
+DERIVED_COLUMNS: Dict[str, Callable[[], Tuple[Any, Dict[str, Any]]]] = {}
+# Sort the matches directly when they are under 1/SORT_DIRECT_RATIO of the catalog,
+# otherwise walk the pre-sorted order and keep the matches
+SORT_DIRECT_RATIO = 32
+
+
+def register_sort_column(name: str, source: Callable[[], Tuple[Any, Dict[str, Any]]],
+                         sort_by: Iterable[str] = ()) -> None:
+    """
+    Make name (and the sort_by aliases) a sort key backed by source. Movies missing from the
+    source's map sort as 0. The column's order is rebuilt when the token or the movies change.
+    """
+    DERIVED_COLUMNS[name] = source
+    for key in (name, *sort_by):
+        SORT_COLUMNS[key] = name
+
+
+def encode_cursor(column: str, order: str, value: Any, movie_id: str) -> str:
+    raw = json.dumps([column, order, value, movie_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str, Any, str]:
+    """Inverse of encode_cursor. Raises ValueError for anything it did not produce."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        column, order, value, movie_id = json.loads(raw)
+    except Exception:
+        raise ValueError("Invalid cursor")
+    text = column in _TEXT_COLUMNS
+    if ((column not in COLUMNS and column not in DERIVED_COLUMNS) or order not in ("asc", "desc") or not isinstance(movie_id, str)
+            or isinstance(value, bool) or not isinstance(value, str if text else (int, float))):
+        raise ValueError("Invalid cursor")
+    return column, order, value, movie_id
+
+
+class _SortedColumn:
+    """Per-docid values plus the docids in (value, movie_id) order, for range scans and sorting."""
+
+    def __init__(self, names: List[str]):
+        self.names = names  # docid -> movie_id, shared with the index
+        self.values: List[Any] = []
+        self.keys: List[Any] = []
+        self.ids: List[int] = []
+
+    def build(self, values: List[Any], live: Iterable[int]) -> None:
+        names = self.names
+        self.values = values
+        self.ids = sorted(live, key=lambda d: (values[d], names[d]))
+        self.keys = [values[d] for d in self.ids]
+
+    def position(self, value: Any, name: str, after: bool = False) -> int:
+        """Position of (value, name) in the order: first entry >= it, or > it with after=True."""
+        lo, hi = bisect_left(self.keys, value), bisect_right(self.keys, value)
+        if after:
+            return bisect_right(self.ids, name, lo, hi, key=self.names.__getitem__)
+        return bisect_left(self.ids, name, lo, hi, key=self.names.__getitem__)
+
+    def add(self, docid: int, value: Any) -> None:
+        if docid == len(self.values):
+            self.values.append(value)
+        else:
+            self.values[docid] = value
+        pos = self.position(value, self.names[docid])
+        self.keys.insert(pos, value)
+        self.ids.insert(pos, docid)
+
+    def remove(self, docid: int) -> None:
+        pos = self.position(self.values[docid], self.names[docid])
+        if pos < len(self.ids) and self.ids[pos] == docid:
+            del self.keys[pos]
+            del self.ids[pos]
+
+    def span(self, low: Optional[float] = None, high: Optional[float] = None) -> Tuple[int, int]:
+        """Positions in ids of the docids whose value is within [low, high]."""
+        lo = bisect_left(self.keys, low) if low is not None else 0
+        hi = bisect_right(self.keys, high) if high is not None else len(self.keys)
+        return lo, max(lo, hi)
+
+    def order(self, reverse: bool = False, start: Optional[int] = None) -> Iterator[int]:
+        """Docids from position start (default: the first, or the last when reverse) onwards."""
+        if reverse:
+            positions = range((len(self.ids) if start is None else start) - 1, -1, -1)
+        else:
+            positions = range(start or 0, len(self.ids))
+        return map(self.ids.__getitem__, positions)
+
+
+class MovieIndex:
+    """Inverted index over movie records keyed by movie_id."""
+
+    def __init__(self, key: str = "movie_id"):
+        self.key = key
+        self._lock = threading.RLock()
+        # (instance, generation) changes whenever the indexed records do
+        self.instance = uuid.uuid4().hex[:12]
+        self.generation = 0
+        self._reset()
+        # Change detection against the source collection (see refresh)
+        self.collection: Optional[storage.Collection] = None
+        self.version: Any = None
+        self.signatures: Optional[Dict[str, Any]] = None
+        self._content: Tuple[Any, str] = (None, "")  # ((generation, version), content_version())
+        # Other indexes kept in step with this one (see follow)
+        self.followers: List[Any] = []
+
+    def _reset(self) -> None:
+        self.docs: List[Optional[Dict[str, Any]]] = []
+        self.ids: Dict[str, int] = {}
+        self.titles: List[str] = []
+        self.names: List[str] = []  # docid -> movie_id, the tie-breaker of every column order
+        self.words: Dict[str, Set[int]] = {}
+        self.grams: Dict[str, Set[str]] = {}
+        self.genres: Dict[str, Set[int]] = {}
+        self.directors: Dict[str, Set[int]] = {}
+        self.stars: Dict[str, Set[int]] = {}
+        self.columns: Dict[str, _SortedColumn] = {name: _SortedColumn(self.names) for name in COLUMNS}
+        self._derived: Dict[str, Tuple[Any, _SortedColumn]] = {}  # name -> ((token, generation), column)
+        self._live: Optional[List[Dict[str, Any]]] = None
+        self._token_cache: "OrderedDict[str, FrozenSet[int]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    # --- maintenance ---
+
+    def _postings(self, record: Dict[str, Any], title: str):
+        yield from ((self.words, w) for w in _words(title))
+        yield from ((self.genres, v) for v in _values(record, "genres"))
+        yield from ((self.directors, v) for v in _values(record, "directors"))
+        yield from ((self.stars, v) for v in _values(record, "main_stars"))
+
+    def _add(self, docid: int, record: Dict[str, Any]) -> Dict[str, Any]:
+        title = (record.get("title") or "").lower()
+        if docid == len(self.docs):
+            self.docs.append(record)
+            self.titles.append(title)
+            self.names.append(_text(record.get(self.key)))
+        else:
+            self.docs[docid] = record
+            self.titles[docid] = title
+        for postings, value in self._postings(record, title):
+            ids = postings.get(value)
+            if ids is None:
+                ids = postings[value] = set()
+                if postings is self.words:
+                    for gram in _grams(value):
+                        self.grams.setdefault(gram, set()).add(value)
+            ids.add(docid)
+        date = record.get("release_date")
+        year = parse_year(date) if isinstance(date, str) else None
+        return {name: value(record, year) for name, value in COLUMNS.items()}
+
+    def _discard(self, docid: int) -> None:
+        record = self.docs[docid]
+        for postings, value in self._postings(record, self.titles[docid]):
+            ids = postings.get(value)
+            if ids is not None:
+                ids.discard(docid)
+                if not ids:
+                    del postings[value]
+                    if postings is self.words:
+                        for gram in _grams(value):
+                            words = self.grams.get(gram)
+                            if words is not None:
+                                words.discard(value)
+                                if not words:
+                                    del self.grams[gram]
+        for column in self.columns.values():
+            column.remove(docid)
+
+    def _changed(self) -> None:
+        self._live = None
+        self._token_cache.clear()
+        self.generation += 1
+
+    def build(self, records: Iterable[Dict[str, Any]]) -> None:
+        """Index records from scratch (later duplicates of a key replace earlier ones)."""
+        latest: Dict[Any, Dict[str, Any]] = {}
+        for record in records:
+            latest[record.get(self.key)] = record
+        with self._lock:
+            self._reset()
+            values: List[Dict[str, Any]] = []
+            for docid, (key, record) in enumerate(latest.items()):
+                self.ids[key] = docid
+                values.append(self._add(docid, record))
+            live = range(len(values))
+            for name, column in self.columns.items():
+                column.build([v[name] for v in values], live)
+            self._changed()
+            for follower in self.followers:
+                follower.build(self.all_docs())
+
+    def upsert(self, record: Dict[str, Any]) -> None:
+        """Add a movie or replace the indexed version of it (keeping its position)."""
+        with self._lock:
+            key = record.get(self.key)
+            docid = self.ids.get(key)
+            if docid is None:
+                docid = self.ids[key] = len(self.docs)
+            else:
+                self._discard(docid)
+            for name, value in self._add(docid, record).items():
+                self.columns[name].add(docid, value)
+            self._changed()
+            for follower in self.followers:
+                follower.upsert(record)
+
+    def remove(self, key: str) -> bool:
+        with self._lock:
+            docid = self.ids.pop(key, None)
+            if docid is None:
+                return False
+            self._discard(docid)
+            self.docs[docid] = None
+            self.titles[docid] = ""
+            self._changed()
+            for follower in self.followers:
+                follower.remove(key)
+            return True
+
+    def follow(self, follower: Any) -> None:
+        """
+        Keep another index (anything with build(records), upsert(record) and remove(key)) in
+        step with this one: it is built from the current movies now and sees every later change.
+        """
+        with self._lock:
+            follower.build(self.all_docs())
+            self.followers.append(follower)
+
+    # --- keeping up with the collection ---
+
+    def load(self, collection: storage.Collection) -> None:
+        """Build from a collection and remember its version for refresh()."""
+        with self._lock:
+            version = collection.version()
+            signatures = collection.record_signatures()
+            if signatures is None:
+                records = collection.all()
+            else:
+                records = (r for r in map(collection.get, signatures) if r is not None)
+            self.build(records)
+            self.collection, self.version, self.signatures = collection, version, signatures
+
+    def refresh(self) -> None:
+        """Re-read what changed in the collection since the last load/refresh."""
+        with self._lock:
+            collection = self.collection
+            version = collection.version()
+            if version is not None and version == self.version:
+                return
+            signatures = collection.record_signatures()
+            if signatures is None or self.signatures is None:
+                self.load(collection)
+                return
+            for key, sig in signatures.items():
+                if self.signatures.get(key) != sig:
+                    record = collection.get(key)
+                    if record is not None:
+                        self.upsert(record)
+            for key in self.signatures.keys() - signatures.keys():
+                self.remove(key)
+            self.version, self.signatures = version, signatures
+
+    # --- queries ---
+
+    def _token_docs(self, token: str) -> FrozenSet[int]:
+        """Docids whose title has a word containing token (cached per token)."""
+        cached = self._token_cache.get(token)
+        if cached is not None:
+            self._token_cache.move_to_end(token)
+            return cached
+        if len(token) <= _GRAM_MAX:
+            words: Iterable[str] = self.grams.get(token, ())
+        else:
+            grams = sorted((self.grams.get(token[i:i + _GRAM_MAX], set()) for i in range(len(token) - _GRAM_MAX + 1)),
+                           key=len)
+            words = [w for w in grams[0].intersection(*grams[1:]) if token in w]
+        docs: Set[int] = set()
+        for word in words:
+            docs |= self.words[word]
+        result = frozenset(docs)
+        self._token_cache[token] = result
+        while len(self._token_cache) > TOKEN_CACHE_ENTRIES:
+            self._token_cache.popitem(last=False)
+        return result
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """{movie_id: record} for the keys that are indexed, in the order given."""
+        with self._lock:
+            ids, docs = self.ids, self.docs
+            return {k: docs[ids[k]] for k in keys if k in ids}
+
+    def content_version(self) -> str:
+        """
+        Token naming the indexed movies, the same in every process that indexed the same
+        collection state (and after a restart): a digest of the movies' record signatures (file
+        stats, SQLite row revs), which change with the movies written and nothing else. An index
+        not loaded from a collection falls back to instance and generation.
+        """
+        with self._lock:
+            seen = (self.generation, self.version)
+            if self._content[0] != seen:
+                if self.signatures is None:
+                    token = f"{self.instance}-{self.generation}"
+                else:
+                    token = hashlib.sha1(repr(sorted(self.signatures.items())).encode("utf-8")).hexdigest()[:20]
+                self._content = (seen, token)
+            return self._content[1]
+
+    def snapshot(self) -> Tuple[str, List[Dict[str, Any]]]:
+        """(content_version(), every movie in movie_id order)."""
+        with self._lock:
+            docs = self.docs
+            return self.content_version(), [docs[d] for d in self.columns["movie_id"].ids]
+
+    def all_docs(self) -> List[Dict[str, Any]]:
+        if self._live is None:
+            self._live = [d for d in self.docs if d is not None]
+        return self._live
+
+    def _match(self, params) -> Optional[Collection[int]]:
+        """Docids matching the filters in params (unordered), or None when nothing filters."""
+        with self._lock:
+            sets: List[FrozenSet[int]] = []
+            query = getattr(params, "query", None)
+            title: Optional[str] = None
+            if query:
+                title = query.lower()
+                tokens = _words(title)
+                if tokens:
+                    sets.extend(self._token_docs(t) for t in tokens)
+                    if _WORD.fullmatch(title):
+                        title = None  # a single word: its postings are exactly the matches
+            for field, postings in (("genre", self.genres), ("director", self.directors), ("star", self.stars)):
+                value = getattr(params, field, None)
+                if value:
+                    sets.append(postings.get(value.lower(), _EMPTY))
+
+            # Falsy bounds are ignored, as in filter_movies
+            min_rating, max_rating = getattr(params, "min_rating", None), getattr(params, "max_rating", None)
+            min_year, max_year = getattr(params, "min_year", None), getattr(params, "max_year", None)
+            columns = self.columns
+            ranges: List[Tuple[_SortedColumn, Optional[float], Optional[float]]] = []
+            if min_rating or max_rating:
+                ranges.append((columns["rating"], min_rating or None, max_rating or None))
+            if min_year:
+                ranges.append((columns["year_lo"], min_year, None))
+            if max_year:
+                ranges.append((columns["year_hi"], None, max_year))
+
+            if not sets and not ranges and title is None:
+                return None
+
+            # Start from the smallest source; everything else becomes a per-candidate check
+            sets.sort(key=len)
+            spans = [(column.span(low, high), (column, low, high)) for column, low, high in ranges]
+            narrowest = min(spans, key=lambda s: s[0][1] - s[0][0], default=None)
+            if narrowest is not None and (not sets or narrowest[0][1] - narrowest[0][0] < len(sets[0])):
+                (lo, hi), picked = narrowest
+                candidates: List[int] = narrowest[1][0].ids[lo:hi]
+                ranges.remove(picked)
+                for s in sets:
+                    candidates = [d for d in candidates if d in s]
+            elif sets:
+                matched = sets[0].intersection(*sets[1:]) if len(sets) > 1 else sets[0]
+                if not ranges and title is None:
+                    return matched
+                candidates = list(matched)
+            else:
+                candidates = [d for d, doc in enumerate(self.docs) if doc is not None]
+
+            for column, low, high in ranges:
+                values = column.values
+                if low is not None:
+                    candidates = [d for d in candidates if values[d] >= low]
+                if high is not None:
+                    candidates = [d for d in candidates if values[d] <= high]
+            if title is not None:
+                titles = self.titles
+                candidates = [d for d in candidates if title in titles[d]]
+            return candidates
+
+    def search(self, params) -> List[Dict[str, Any]]:
+        """Movies matching params, in catalog order (same results as filter_movies)."""
+        with self._lock:
+            matches = self._match(params)
+            if matches is None:
+                return list(self.all_docs())
+            docs = self.docs
+            return [docs[d] for d in sorted(matches)]
+
+    def column(self, name: str) -> _SortedColumn:
+        """The sorted column for a COLUMNS or DERIVED_COLUMNS name."""
+        col = self.columns.get(name)
+        if col is not None:
+            return col
+        token, values = DERIVED_COLUMNS[name]()
+        cached = self._derived.get(name)
+        if cached is not None and cached[0] == (token, self.generation):
+            return cached[1]
+        col = _SortedColumn(self.names)
+        col.build([_number(values.get(n, 0)) for n in self.names], self.ids.values())
+        self._derived[name] = ((token, self.generation), col)
+        return col
+
+    def sorted_docids(self, matches: Optional[Collection[int]], column: str, reverse: bool = False,
+                      after: Optional[Tuple[Any, str]] = None, offset: int = 0) -> Iterator[int]:
+        """
+        matches (None = every movie) in column order, produced lazily where possible.
+        after=(value, movie_id) starts just past that entry; offset then skips further matches.
+        """
+        col = self.column(column)
+        start = None
+        if after is not None:
+            start = col.position(*after, after=not reverse)
+        if matches is None:
+            if offset:
+                base = (len(col.ids) if reverse else 0) if start is None else start
+                start = max(base - offset, 0) if reverse else base + offset
+            return col.order(reverse, start)
+        if len(matches) * SORT_DIRECT_RATIO < len(self.ids):
+            values, names = col.values, self.names
+            ordered = sorted(matches, key=lambda d: (values[d], names[d]), reverse=reverse)
+            if after is not None:
+                ordered = [d for d in ordered if ((values[d], names[d]) < after if reverse else (values[d], names[d]) > after)]
+            return iter(ordered[offset:])
+        wanted = matches if isinstance(matches, (set, frozenset)) else set(matches)
+        return islice((d for d in col.order(reverse, start) if d in wanted), offset, None)
+
+    def search_page(self, params) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        One page of movies matching params in sort_by order, and the cursor for the next page
+        (None on the last). params.cursor, when set, takes the place of page.
+        Raises ValueError for a malformed cursor or one issued for another sort_by/order.
+        """
+        limit = max(params.limit, 1)
+        order = "desc" if params.order.lower() == "desc" else "asc"
+        column = SORT_COLUMNS.get(params.sort_by.lower(), "movie_id")
+        after, offset = None, max(params.page - 1, 0) * limit
+        cursor = getattr(params, "cursor", None)
+        if cursor:
+            cursor_column, cursor_order, value, movie_id = decode_cursor(cursor)
+            if (cursor_column, cursor_order) != (column, order):
+                raise ValueError("Cursor was issued for a different sort_by/order")
+            after, offset = (value, movie_id), 0
+        with self._lock:
+            ordered = self.sorted_docids(self._match(params), column, order == "desc", after, offset)
+            page = list(islice(ordered, limit + 1))  # one extra tells whether there is a next page
+            next_cursor = None
+            if len(page) > limit:
+                del page[limit:]
+                last = page[-1]
+                next_cursor = encode_cursor(column, order, self.column(column).values[last], self.names[last])
+            docs = self.docs
+            return [docs[d] for d in page], next_cursor
+
+
+_index: Optional[MovieIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_index() -> MovieIndex:
+    """The shared index for the current movies collection, brought up to date."""
+    global _index
+    col = storage.collection("movies")
+    with _index_lock:
+        if _index is None or _index.collection is not col:
+            index = MovieIndex(col.key)
+            index.load(col)
+            _index = index
+        else:
+            _index.refresh()
+        return _index
@@ -0,0 +1,175 @@
+"""Pool of popular movies behind GET /movies/random.
+
+The pool is filled from a provider and served from memory; a background thread refreshes it
+every TMDB_POOL_TTL seconds (a pick from a pool older than that starts the thread). When
+a refresh fails or returns nothing the previous pool is kept, and an empty pool is filled
+from the fallback provider instead.
+
+Providers:
+    TMDbPopularProvider    TMDB_POOL_PAGES random pages of TMDb's popular list, fetched
+                           concurrently through a TMDbClient (timeouts, retry/backoff)
+    LocalPopularProvider   the most-rated movies of the local catalog; used when no
+                           TMDB_API_TOKEN is set and as the fallback, so the pool works offline
+"""
+import asyncio, logging, os, random, threading, time
+from typing import Any, Callable, Dict, List, Optional
+
+from backend.movies.index import get_index
+from External_API.tmdb_client import TMDbClient
+
+logger = logging.getLogger(__name__)
+
+POOL_TTL = float(os.getenv("TMDB_POOL_TTL", "3600"))
+POOL_PAGES = int(os.getenv("TMDB_POOL_PAGES", "5"))
+LOCAL_POOL_SIZE = 200
+TMDB_MAX_PAGE = 500  # TMDb serves at most 500 pages of a list
+TMDB_IMAGE_BASE = "https://image.tmdb.org/t/p/w500"
+
+
+class TMDbPopularProvider:
+    name = "tmdb"
+
+    def __init__(self, token: str, pages: int = POOL_PAGES, client: Optional[Callable[[], TMDbClient]] = None):
+        self.pages = max(min(pages, TMDB_MAX_PAGE), 1)
+        # Called in the refresher's own event loop, which owns the client's connections
+        self.client = client or (lambda: TMDbClient(token))
+
+    def fetch(self) -> List[Dict[str, Any]]:
+        return asyncio.run(self._fetch())
+
+    async def _fetch(self) -> List[Dict[str, Any]]:
+        async with self.client() as tmdb:
+            pages = await asyncio.gather(*(
+                tmdb.get("/movie/popular", {"language": "en-US", "page": page}, cache=False)
+                for page in random.sample(range(1, TMDB_MAX_PAGE + 1), self.pages)))
+        return [self.summary(m) for page in pages for m in page.get("results", [])]
+
+    @staticmethod
+    def summary(movie: Dict[str, Any]) -> Dict[str, Any]:
+        poster = movie.get("poster_path")
+        return {
+            "id": movie.get("id"),
+            "title": movie.get("title"),
+            "overview": movie.get("overview"),
+            "poster_path": f"{TMDB_IMAGE_BASE}{poster}" if poster else None,
+            "rating": movie.get("vote_average"),
+            "release_date": movie.get("release_date"),
+        }
+
+
+class LocalPopularProvider:
+    name = "local"
+
+    def __init__(self, size: int = LOCAL_POOL_SIZE):
+        self.size = size
+
+    def fetch(self) -> List[Dict[str, Any]]:
+        movies = sorted(get_index().all_docs(), key=lambda m: m.get("total_rating_count") or 0, reverse=True)
+        return [{
+            "id": m.get("movie_id"),
+            "title": m.get("title"),
+            "overview": m.get("description"),
+            "poster_path": None,
+            "rating": m.get("imdb_rating"),
+            "release_date": m.get("release_date"),
+        } for m in movies[:self.size]]
+
+
+class PopularPool:
+    """Movies from provider (or fallback), refreshed in the background every ttl seconds."""
+
+    def __init__(self, provider, ttl: float = POOL_TTL, fallback=None):
+        self.provider = provider
+        self.fallback = fallback
+        self.ttl = ttl
+        self.movies: List[Dict[str, Any]] = []
+        self.source: Optional[str] = None
+        self.refreshed = 0.0  # monotonic time of the last successful refresh
+        self.failures = 0
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread: Optional[threading.Thread] = None
+
+    def refresh(self) -> bool:
+        """Fetch a new pool now. Returns False (keeping the old pool) when the provider fails."""
+        for provider in (self.provider, self.fallback):
+            if provider is None or (provider is self.fallback and self.movies):
+                continue
+            try:
+                movies = provider.fetch()
+            except Exception:
+                logger.warning("Popular movie refresh from %s failed", provider.name, exc_info=True)
+                movies = []
+            if movies:
+                with self._cond:
+                    self.movies, self.source, self.refreshed = movies, provider.name, time.monotonic()
+                return provider is self.provider
+            self.failures += 1
+        return False
+
+    def pick(self) -> Optional[Dict[str, Any]]:
+        """A random movie from the pool (filled first if empty); None if nothing could be fetched."""
+        if not self.movies:
+            self.refresh()
+        elif time.monotonic() - self.refreshed > self.ttl:
+            self.start()  # serve the stale pool; the thread refreshes it
+        movies = self.movies
+        return random.choice(movies) if movies else None
+
+    def start(self) -> None:
+        with self._cond:
+            if self._closed or (self._thread is not None and self._thread.is_alive()):
+                return
+            self._thread = threading.Thread(target=self._run, name="popular-pool-refresh", daemon=True)
+            self._thread.start()
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"size": len(self.movies), "source": self.source, "failures": self.failures,
+                "age_seconds": round(time.monotonic() - self.refreshed, 1) if self.refreshed else None}
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                if self._closed:
+                    return
+                if self.movies:
+                    self._cond.wait(timeout=max(self.refreshed + self.ttl - time.monotonic(), 0))
+                    if self._closed:
+                        return
+                    if time.monotonic() - self.refreshed < self.ttl:
+                        continue
+            if not self.refresh():
+                # Failed: try again after a tenth of the ttl rather than hammering the provider
+                with self._cond:
+                    if not self._closed:
+                        self._cond.wait(timeout=self.ttl / 10)
+
+
+_pool: Optional[PopularPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> PopularPool:
+    """The shared pool: TMDb when TMDB_API_TOKEN is set, else the local catalog."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            token = os.getenv("TMDB_API_TOKEN")
+            local = LocalPopularProvider()
+            _pool = PopularPool(TMDbPopularProvider(token) if token else local, fallback=local if token else None)
+        return _pool
+
+
+def close_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
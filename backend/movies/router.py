@@ -1,79 +1,106 @@
 """Movie browsing and watch-later list routes."""
-from fastapi import APIRouter, Depends, HTTPException, Query, BackgroundTasks
-from fastapi.responses import FileResponse
-from typing import List, Optional
-import tempfile, os, random, requests
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from typing import List, Optional, Union
 from backend.authentication.security import get_current_user
 from backend.authentication.schemas import UserToken
 from backend.movies import utils, schemas
+from backend.movies.export import MovieExport, RangeNotSatisfiable, export_stats
+from backend.movies.popular import get_pool
 from backend.core.authz import require_role, block_if_penalized
-from backend.core.jsonio import save_json
-from dotenv import load_dotenv, find_dotenv
 
 router = APIRouter(prefix="/movies", tags=["Movies"])
 
-load_dotenv(find_dotenv())
-API_TOKEN = os.getenv("TMDB_API_TOKEN")
-TMDB_BASE_URL = "https://api.themoviedb.org/3/movie/popular"
 
-headers = {
-    "accept": "application/json",
-    "Authorization": f"Bearer {API_TOKEN}"
-}
-
-
-@router.get("/", response_model=List[schemas.Movie])
-def list_movies(params: schemas.MovieSearchParams = Depends()):
-    """List, search, sort, and paginate movies."""
-    movies = utils.load_movies()
-    movies = utils.filter_movies(movies, params)
-    movies = utils.sort_movies(movies, params.sort_by, params.order)
-    return utils.paginate_movies(movies, params.page, params.limit)
+@router.get("/", response_model=Union[List[schemas.Movie], schemas.MoviePageWithFacets])
+def list_movies(response: Response, params: schemas.MovieSearchParams = Depends()):
+    """
+    List, search, sort, and paginate movies.
+    Ties are ordered by movie_id. When more results follow, the X-Next-Cursor header holds a
+    cursor to pass back as `cursor` (with the same filters and sort) for the next page.
+    With `facets=true` the page comes back as {"movies", "facets"}, the facets counting every
+    matching movie (not just this page).
+    """
+    try:
+        movies, next_cursor = utils.list_movies(params)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    if params.facets:
+        return {"movies": movies, "facets": utils.movie_facets(params)}
+    return movies
+
+@router.get("/search", response_model=List[schemas.MovieSearchHit])
+def search_movies(q: str = Query(..., min_length=1, description="Words to look for in title, description, directors and stars"),
+                  page: int = Query(1, ge=1), limit: int = Query(20, ge=1, le=100)):
+    """Full-text search ranked by relevance (best match first)."""
+    return utils.rank_movies(q, page, limit)
+
+@router.get("/suggest", response_model=List[schemas.Suggestion])
+def suggest_movies(prefix: str = Query(..., min_length=1), limit: int = Query(10, ge=1, le=20)):
+    """Typeahead suggestions (titles, directors, stars, genres), most popular first."""
+    return utils.suggest(prefix, limit)
 
 @router.get("/random", summary="Get a random popular movie")
 def get_random_popular_movie():
     """
-    Fetches a random popular movie from TMDB.
+    A random popular movie, picked from a pool of TMDB's popular movies that is refreshed in
+    the background (or of the local catalog's most-rated movies when TMDB is unavailable).
     """
-    # TMDB popular movies can have up to ~500 pages
-    page = random.randint(1, 500)
-    params = {"language": "en-US", "page": page}
-
-    response = requests.get(TMDB_BASE_URL, headers=headers, params=params)
-
-    if response.status_code != 200:
-        raise HTTPException(status_code=502, detail="Failed to fetch data from TMDB")
-
-    data = response.json()
-    results = data.get("results", [])
-
-    if not results:
+    movie = get_pool().pick()
+    if movie is None:
         raise HTTPException(status_code=404, detail="No popular movies found")
-
-    movie = random.choice(results)
-
-    return {
-        "id": movie.get("id"),
-        "title": movie.get("title"),
-        "overview": movie.get("overview"),
-        "poster_path": f"https://image.tmdb.org/t/p/w500{movie.get('poster_path')}" 
-                        if movie.get("poster_path") else None,
-        "rating": movie.get("vote_average"),
-        "release_date": movie.get("release_date")
-    }
+    return movie
 
 @router.get("/download")
-def download_movies(background_tasks: BackgroundTasks, current_user: UserToken = Depends(get_current_user)):
-    """Download all movies as a single JSON file (admin only)."""
+def download_movies(
+    request: Request,
+    format: str = Query("json", pattern="^(json|ndjson)$", description="json (array) or ndjson"),
+    compress: Optional[str] = Query(None, pattern="^gzip$", description="gzip to compress the file"),
+    current_user: UserToken = Depends(get_current_user),
+):
+    """
+    Download all movies as one file, streamed (admin only).
+    Uncompressed downloads accept a single `Range` (with `If-Range: <ETag>`) to resume.
+    """
     require_role(current_user, ["administrator"])
-    movies = utils.load_movies()
-    if not movies:
+    export = MovieExport(format, gzip=compress == "gzip")
+    if not len(export):
         raise HTTPException(status_code=404, detail="No movies found.")
 
-    tmp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".json")
-    save_json(tmp_file.name, movies)
-    background_tasks.add_task(os.remove, tmp_file.name)
-    return FileResponse(tmp_file.name, filename="movies.json", media_type="application/json")
+    headers = {
+        "Content-Disposition": f'attachment; filename="{export.filename}"',
+        "ETag": export.etag,
+        "Accept-Ranges": "none" if export.gzip else "bytes",
+    }
+    try:
+        byte_range = export.resolve_range(request.headers.get("range"), request.headers.get("if-range"))
+    except RangeNotSatisfiable as e:
+        return Response(status_code=416, headers={"Content-Range": f"bytes */{e.length}"})
+    media_type = "application/gzip" if export.gzip else export.media_type
+    if byte_range is None:
+        return StreamingResponse(export.stream(), media_type=media_type, headers=headers)
+
+    first, last, length = byte_range
+    headers["Content-Range"] = f"bytes {first}-{last}/{length}"
+    headers["Content-Length"] = str(last - first + 1)
+    return StreamingResponse(export.stream(first, last), status_code=206, media_type=media_type, headers=headers)
+
+
+@router.get("/download/stats")
+def download_stats(current_user: UserToken = Depends(get_current_user)):
+    """Export throughput (bytes and bytes/sec) since startup (admin only)."""
+    require_role(current_user, ["administrator"])
+    return export_stats()
+
+
+@router.post("/batch", response_model=schemas.MovieBatchResponse)
+def get_movies_batch(request: schemas.MovieBatchRequest, current_user: UserToken = Depends(get_current_user)):
+    """Fetch up to 1000 movies by ID in one call (in the order given; unknown IDs are listed as missing)."""
+    found = utils.get_movies(request.movie_ids)
+    missing = [m for m in dict.fromkeys(request.movie_ids) if m not in found]
+    return {"movies": list(found.values()), "missing": missing}
 
 
 @router.get("/watch-later", response_model=schemas.WatchLaterResponse)
@@ -120,9 +147,9 @@ def get_movie_book_time(movie_id: str, current_user: UserToken = Depends(get_cur
     return {"message": message}
 
 
-@router.get("/{movie_id}", response_model=schemas.Movie)
+@router.get("/{movie_id}", response_model=schemas.MovieDetail)
 def get_movie(movie_id: str, current_user: UserToken = Depends(get_current_user)):
-    movie = utils.get_movie(movie_id)
+    movie = utils.get_movie_detail(movie_id)
     if not movie:
         raise HTTPException(status_code=404, detail="Movie not found.")
     return movie
@@ -17,6 +17,19 @@ class Movie(BaseModel):
     total_rating_count: Optional[int] = None
 
 
+class RatingStats(BaseModel):
+    count: int = 0
+    average: Optional[float] = None
+    stddev: Optional[float] = None
+    histogram: List[int] = [0] * 10  # number of ratings 1..10
+    helpful_votes: int = 0
+    total_votes: int = 0
+
+
+class MovieDetail(Movie):
+    rating_stats: RatingStats  # aggregated from user reviews
+
+
 class MovieSearchParams(BaseModel):
     query: Optional[str] = Field(None, description="Free text search against title")
     genre: Optional[str] = None
@@ -26,10 +39,49 @@ class MovieSearchParams(BaseModel):
     max_rating: Optional[float] = None
     min_year: Optional[int] = None
     max_year: Optional[int] = None
-    sort_by: str = "title"           # title|release_date|rating|meta_score|total_rating_count
+    sort_by: str = "title"           # title|release_date|rating|meta_score|total_rating_count|user_rating|review_count
     order: str = "asc"               # asc|desc
     page: int = 1
     limit: int = 20
+    cursor: Optional[str] = Field(None, description="X-Next-Cursor from the previous page; replaces page")
+    facets: bool = Field(False, description="Also return facet counts over all matching movies")
+
+
+class FacetValue(BaseModel):
+    value: str
+    count: int
+
+
+class MovieFacets(BaseModel):
+    genres: List[FacetValue] = []
+    directors: List[FacetValue] = []
+    decades: List[FacetValue] = []  # e.g. "1990s"
+    ratings: List[FacetValue] = []  # whole-star buckets, e.g. "7-8"
+
+
+class MoviePageWithFacets(BaseModel):
+    movies: List[Movie]
+    facets: MovieFacets
+
+
+class MovieSearchHit(Movie):
+    score: float  # BM25 relevance to the query
+
+
+class Suggestion(BaseModel):
+    type: str  # title|director|star|genre
+    text: str
+    movie_id: Optional[str] = None  # set for titles
+    popularity: int  # total_rating_count (summed over the movies of a person or genre)
+
+
+class MovieBatchRequest(BaseModel):
+    movie_ids: List[str] = Field(..., max_length=1000)
+
+
+class MovieBatchResponse(BaseModel):
+    movies: List[Movie]
+    missing: List[str] = []
 
 
 class WatchLaterUpdate(BaseModel):
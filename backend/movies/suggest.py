@@ -0,0 +1,279 @@
+"""Typeahead suggestions (GET /movies/suggest) over titles, directors, stars and genres.
+
+Every name is normalized (accents and punctuation dropped, lower-cased) and stored under each
+of its word starts, so "kni" finds "The Dark Knight". The keys live in one sorted list of
+(key, kind, ident) tuples; a prefix is a contiguous slice of it, found with two bisects.
+Suggestions are ranked by popularity: total_rating_count for a title, the sum over their
+movies for a person or genre.
+
+Short prefixes (up to HEAD_PREFIX_LEN characters) match a large slice, so each keeps a ranked
+head: its best HEAD_SIZE suggestions, built with the index and updated in place when a change
+moves a suggestion under it. The head is the exact top of its prefix; a suggestion that drops
+below its last entry leaves it (something outside may now rank higher) and the prefix is only
+re-ranked once fewer than MAX_SUGGESTIONS remain. Longer prefixes match few keys; the ranked
+result of recent ones (TOP_CACHE_ENTRIES of them) is kept until a change touches a key under
+that prefix. The index follows the movie index (see MovieIndex.follow) and applies each movie
+change in place.
+"""
+import heapq, re, threading, unicodedata
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from backend.movies.index import MovieIndex, get_index
+
+MAX_SUGGESTIONS = 20
+HEAD_PREFIX_LEN = 3
+HEAD_SIZE = 2 * MAX_SUGGESTIONS  # the slack absorbs demotions before a prefix is re-ranked
+TOP_CACHE_ENTRIES = 4096
+MAX_WORD_STARTS = 8  # a name is findable from its first eight words
+_NON_WORD = re.compile(r"[\W_]+")
+# kind -> record field, for the names that come from lists
+GROUP_FIELDS = {"director": "directors", "star": "main_stars", "genre": "genres"}
+
+Entry = Tuple[str, str]  # (kind, ident): ident is the movie_id of a title, else the normalized name
+Ranked = Tuple[int, str, str, str]  # (-popularity, display text, kind, ident): best first when sorted
+
+
+def normalize(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return _NON_WORD.sub(" ", text.lower()).strip()
+
+
+def _word_starts(name: str) -> List[str]:
+    """name and each of its suffixes that starts at a word, e.g. "dark knight" -> + "knight"."""
+    starts = [0] + [i + 1 for i, c in enumerate(name) if c == " "]
+    return [name[i:] for i in starts[:MAX_WORD_STARTS]]
+
+
+def _popularity(record: Dict[str, Any]) -> int:
+    count = record.get("total_rating_count")
+    return count if isinstance(count, int) and not isinstance(count, bool) else 0
+
+
+class SuggestIndex:
+    """Sorted prefix keys over the movie catalog (see module docstring)."""
+
+    def __init__(self, key: str = "movie_id"):
+        self.key = key
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self.keys: List[Tuple[str, str, str]] = []
+        self.docs: Dict[str, Dict[str, Any]] = {}
+        self.titles: Dict[str, Tuple[str, str, int]] = {}  # movie_id -> (normalized, title, popularity)
+        # (kind, normalized name) -> [popularity, movie count, display name]
+        self.groups: Dict[Entry, List[Any]] = {}
+        self._heads: Dict[str, List[Ranked]] = {}  # short prefix -> its best HEAD_SIZE, sorted
+        self._complete: Set[str] = set()  # short prefixes whose head holds every match
+        self._top: "OrderedDict[str, List[Ranked]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.titles)
+
+    # --- maintenance ---
+
+    def _groups_of(self, record: Dict[str, Any]) -> Dict[Entry, str]:
+        found: Dict[Entry, str] = {}
+        for kind, field in GROUP_FIELDS.items():
+            for name in record.get(field) or ():
+                if isinstance(name, str) and normalize(name):
+                    found.setdefault((kind, normalize(name)), name)
+        return found
+
+    def _apply(self, record: Dict[str, Any], sign: int, keys: List[Tuple[str, str, str]],
+               touched: Dict[Entry, Set[str]]) -> None:
+        """
+        Add (sign=1) or take away (sign=-1) a movie's title and its share of each group.
+        touched collects the entries whose ranking may change, with their keys.
+        """
+        movie_id = record.get(self.key)
+        popularity = _popularity(record)
+        title = record.get("title")
+        name = normalize(title) if isinstance(title, str) else ""
+        if name:
+            if sign > 0:
+                self.titles[movie_id] = (name, title, popularity)
+            else:
+                self.titles.pop(movie_id, None)
+            keys.extend((k, "title", movie_id) for k in _word_starts(name))
+        for (kind, norm), label in self._groups_of(record).items():
+            group = self.groups.get((kind, norm))
+            if group is None:
+                group = self.groups[(kind, norm)] = [0, 0, label]
+            group[0] += sign * popularity
+            group[1] += sign
+            if sign > 0:
+                group[2] = label
+            if group[1] == 0 or (sign > 0 and group[1] == 1):
+                keys.extend((k, kind, norm) for k in _word_starts(norm))  # group appears or goes
+            if group[1] == 0:
+                del self.groups[(kind, norm)]
+            touched.setdefault((kind, norm), set()).update(_word_starts(norm))
+        if name:
+            touched.setdefault(("title", movie_id), set()).update(_word_starts(name))
+
+    def _changed(self, touched: Dict[Entry, Set[str]]) -> None:
+        """Move the touched entries in the heads and drop the cached results they may change."""
+        for entry, keys in touched.items():
+            current = self._keys_of(entry)
+            ranking = self._ranking(entry) if current else None
+            for prefix in {k[:n] for k in keys for n in range(1, min(len(k), HEAD_PREFIX_LEN) + 1)}:
+                matches = ranking is not None and any(k.startswith(prefix) for k in current)
+                self._place(prefix, entry, ranking if matches else None)
+            for key in keys:
+                for n in range(HEAD_PREFIX_LEN + 1, len(key) + 1):
+                    self._top.pop(key[:n], None)
+
+    def _place(self, prefix: str, entry: Entry, ranking: Optional[Ranked]) -> None:
+        """Put entry at its ranking in the head of prefix (None: it no longer matches)."""
+        head = self._heads.get(prefix)
+        if head is None:
+            if ranking is not None:
+                self._heads[prefix] = [ranking]
+                self._complete.add(prefix)
+            return
+        for i, ranked in enumerate(head):
+            if ranked[2:] == entry:
+                del head[i]
+                break
+        complete = prefix in self._complete
+        if ranking is not None and (complete or (head and ranking < head[-1])):
+            insort(head, ranking)
+            if len(head) > HEAD_SIZE:
+                del head[HEAD_SIZE:]
+                self._complete.discard(prefix)
+                complete = False
+        if not complete and len(head) < MAX_SUGGESTIONS:
+            head[:] = self._ranked(prefix, HEAD_SIZE + 1)
+            if len(head) > HEAD_SIZE:
+                del head[HEAD_SIZE:]
+            else:
+                self._complete.add(prefix)
+        if not head:
+            del self._heads[prefix]
+            self._complete.discard(prefix)
+
+    def _build_heads(self) -> None:
+        rankings: Dict[Entry, Ranked] = {}
+        matches: Dict[str, Set[Ranked]] = {}
+        for key, kind, ident in self.keys:
+            ranking = rankings.get((kind, ident))
+            if ranking is None:
+                ranking = rankings[(kind, ident)] = self._ranking((kind, ident))
+            for n in range(1, min(len(key), HEAD_PREFIX_LEN) + 1):
+                matches.setdefault(key[:n], set()).add(ranking)
+        self._heads = {prefix: heapq.nsmallest(HEAD_SIZE, found) for prefix, found in matches.items()}
+        self._complete = {prefix for prefix, found in matches.items() if len(found) <= HEAD_SIZE}
+
+    def build(self, records: Iterable[Dict[str, Any]]) -> None:
+        with self._lock:
+            self._reset()
+            keys: List[Tuple[str, str, str]] = []
+            for record in records:
+                self.docs[record.get(self.key)] = record
+                self._apply(record, 1, keys, {})
+            self.keys = sorted(keys)
+            self._build_heads()
+
+    def upsert(self, record: Dict[str, Any]) -> None:
+        with self._lock:
+            touched: Dict[Entry, Set[str]] = {}
+            old = self.docs.get(record.get(self.key))
+            if old is not None:
+                removed: List[Tuple[str, str, str]] = []
+                self._apply(old, -1, removed, touched)
+                self._delete_keys(removed)
+            self.docs[record.get(self.key)] = record
+            added: List[Tuple[str, str, str]] = []
+            self._apply(record, 1, added, touched)
+            for entry in added:
+                insort(self.keys, entry)
+            self._changed(touched)
+
+    def remove(self, key: str) -> bool:
+        with self._lock:
+            old = self.docs.pop(key, None)
+            if old is None:
+                return False
+            touched: Dict[Entry, Set[str]] = {}
+            removed: List[Tuple[str, str, str]] = []
+            self._apply(old, -1, removed, touched)
+            self._delete_keys(removed)
+            self._changed(touched)
+            return True
+
+    def _delete_keys(self, entries: List[Tuple[str, str, str]]) -> None:
+        for entry in entries:
+            pos = bisect_left(self.keys, entry)
+            if pos < len(self.keys) and self.keys[pos] == entry:
+                del self.keys[pos]
+
+    # --- queries ---
+
+    def _describe(self, entry: Entry) -> Tuple[str, int]:
+        """(display text, popularity) of an entry."""
+        kind, ident = entry
+        if kind == "title":
+            _, title, popularity = self.titles[ident]
+            return title, popularity
+        popularity, _, label = self.groups[entry]
+        return label, popularity
+
+    def _ranking(self, entry: Entry) -> Ranked:
+        text, popularity = self._describe(entry)
+        return (-popularity, text) + entry
+
+    def _keys_of(self, entry: Entry) -> List[str]:
+        """The current keys of an entry ([] once it is gone)."""
+        kind, ident = entry
+        if kind == "title":
+            title = self.titles.get(ident)
+            return _word_starts(title[0]) if title else []
+        return _word_starts(ident) if entry in self.groups else []
+
+    def _ranked(self, prefix: str, limit: int) -> List[Ranked]:
+        keys = self.keys
+        lo = bisect_left(keys, (prefix,))
+        hi = bisect_left(keys, (prefix + "\U0010ffff",), lo)
+        entries = {(kind, ident) for _, kind, ident in keys[lo:hi]}
+        return heapq.nsmallest(limit, map(self._ranking, entries))
+
+    def suggest(self, prefix: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """The most popular titles, people and genres with a word starting with prefix."""
+        prefix = normalize(prefix)
+        limit = max(min(limit, MAX_SUGGESTIONS), 0)
+        if not prefix or not limit:
+            return []
+        with self._lock:
+            if len(prefix) <= HEAD_PREFIX_LEN:
+                top = self._heads.get(prefix, [])
+            else:
+                top = self._top.get(prefix)
+                if top is None:
+                    top = self._top[prefix] = self._ranked(prefix, MAX_SUGGESTIONS)
+                    while len(self._top) > TOP_CACHE_ENTRIES:
+                        self._top.popitem(last=False)
+                else:
+                    self._top.move_to_end(prefix)
+            return [{"type": kind, "text": text, "movie_id": ident if kind == "title" else None,
+                     "popularity": -negated} for negated, text, kind, ident in top[:limit]]
+
+
+_suggest_index: Optional[SuggestIndex] = None
+_suggest_source: Optional[MovieIndex] = None
+_suggest_lock = threading.Lock()
+
+
+def get_suggest_index() -> SuggestIndex:
+    """The shared suggestion index, following the shared movie index (and so kept up to date)."""
+    global _suggest_index, _suggest_source
+    movies = get_index()
+    with _suggest_lock:
+        if _suggest_index is None or _suggest_source is not movies:
+            index = SuggestIndex(movies.key)
+            movies.follow(index)
+            _suggest_index, _suggest_source = index, movies
+        return _suggest_index
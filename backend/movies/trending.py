@@ -0,0 +1,110 @@
+"""In-memory cache of TMDb's trending (popular) list behind GET /trending.
+
+The list is fetched at most once per TMDB_TRENDING_TTL seconds and sorted by vote_average
+once per fetch. Callers never wait on a refresh while any list is cached: a stale list is
+served as is and a single background task refreshes it; every caller arriving meanwhile
+shares that task. When TMDb fails (or answers without results) the last good list stays in
+place and TMDb is not asked again for a tenth of the TTL. The payload is written to
+tmdb_data.json only when it differs from what was last saved, and that file seeds the cache
+after a restart.
+"""
+import asyncio, logging, os, time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from backend.core import jsonio
+from backend.core.paths import DATA_DIR
+from External_API.tmdb_client import get_client
+
+logger = logging.getLogger(__name__)
+
+TRENDING_TTL = float(os.getenv("TMDB_TRENDING_TTL", "600"))
+TRENDING_FILE = os.path.join(DATA_DIR, "tmdb_data.json")
+
+Fetcher = Callable[[], Awaitable[Dict[str, Any]]]
+
+
+def _results(payload: Any) -> Optional[List[Dict[str, Any]]]:
+    results = payload.get("results") if isinstance(payload, dict) else None
+    return results if isinstance(results, list) else None
+
+
+def _by_vote(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return sorted(results, key=lambda m: m.get("vote_average") or 0, reverse=True)
+
+
+class TrendingCache:
+    """Trending movies sorted by vote_average, refreshed single-flight with stale-while-revalidate."""
+
+    def __init__(self, fetch: Fetcher, ttl: float = TRENDING_TTL, path: Optional[str] = TRENDING_FILE):
+        self.fetch = fetch
+        self.ttl = ttl
+        self.path = path
+        self.movies: List[Dict[str, Any]] = []
+        self.refreshed: Optional[float] = None  # monotonic time of the last good fetch
+        self.fetches = self.failures = self.saves = 0
+        self._retry_at = 0.0  # after a failure, no new fetch before this monotonic time
+        self._saved: Any = None
+        self._task: Optional[asyncio.Task] = None
+        if path:
+            saved = jsonio.load_json(path, default=None)
+            if _results(saved):
+                self._saved = saved
+                self.movies = _by_vote(_results(saved))
+
+    def fresh(self) -> bool:
+        return self.refreshed is not None and time.monotonic() - self.refreshed < self.ttl
+
+    async def get(self) -> List[Dict[str, Any]]:
+        if not self.fresh() and time.monotonic() >= self._retry_at:
+            task = self.refresh()
+            if not self.movies:
+                await asyncio.shield(task)
+        return self.movies
+
+    def refresh(self) -> "asyncio.Task[bool]":
+        """The in-flight refresh task, started if there is none (call from the event loop)."""
+        task = self._task
+        if task is None or task.done() or task.get_loop() is not asyncio.get_running_loop():
+            task = self._task = asyncio.ensure_future(self._refresh())
+        return task
+
+    async def _refresh(self) -> bool:
+        self.fetches += 1
+        try:
+            payload = await self.fetch()
+        except Exception:
+            logger.warning("Trending refresh failed; serving the cached list", exc_info=True)
+            payload = None
+        results = _results(payload)
+        if results is None:
+            self.failures += 1
+            self._retry_at = time.monotonic() + self.ttl / 10
+            return False
+        self.movies = _by_vote(results)
+        self.refreshed = time.monotonic()
+        if self.path and payload != self._saved:
+            try:
+                await asyncio.to_thread(jsonio.save_json, self.path, payload)
+                self._saved = payload
+                self.saves += 1
+            except OSError:
+                logger.warning("Could not save trending list to %s", self.path, exc_info=True)
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        return {"size": len(self.movies), "fresh": self.fresh(), "fetches": self.fetches,
+                "failures": self.failures, "saves": self.saves}
+
+
+async def _fetch_trending() -> Dict[str, Any]:
+    return await get_client().get("/movie/popular", {"language": "en-US", "page": 1})
+
+
+_cache: Optional[TrendingCache] = None
+
+
+def get_trending_cache() -> TrendingCache:
+    global _cache
+    if _cache is None:
+        _cache = TrendingCache(_fetch_trending)
+    return _cache
@@ -1,25 +1,57 @@
 """Movie catalog + watch-later list management."""
-import os, glob
-from typing import List, Dict, Optional
+from typing import Iterable, List, Dict, Optional, Tuple
 from datetime import datetime
-from backend.core.paths import MOVIES_DIR, USERS_ACTIVE_FILE
-from backend.core.jsonio import load_json, save_json
+from backend.core import storage
+from backend.core.transactions import transaction
+from backend.authentication import utils as user_utils
+from backend.movies.index import get_index, register_sort_column
+from backend.movies.fulltext import get_text_index
+from backend.movies.suggest import get_suggest_index
+from backend.movies.catalog import get_catalog
+from backend.reviews import utils as review_utils
+
+
+def _movies() -> storage.Collection:
+    return storage.collection("movies")
 
 
 def load_movies() -> List[Dict]:
-    """Load all movie JSON files."""
-    movies = []
-    for path in glob.glob(os.path.join(MOVIES_DIR, "*.json")):
-        m = load_json(path, default=None)
-        if isinstance(m, dict):
-            movies.append(m)
-    return movies
+    """Load all movies (read-only records)."""
+    return _movies().all()
 
 
 def get_movie(movie_id: str) -> Optional[Dict]:
-    path = os.path.join(MOVIES_DIR, f"{movie_id}.json")
-    doc = load_json(path, default=None)
-    return doc if isinstance(doc, dict) else None
+    return _movies().get(movie_id)
+
+
+def get_movie_detail(movie_id: str) -> Optional[Dict]:
+    """A movie plus its rating_stats (see reviews.stats)."""
+    movie = get_movie(movie_id)
+    if movie is None:
+        return None
+    return {**movie, "rating_stats": review_utils.get_rating_stats(movie_id)}
+
+
+def _stats_column(value):
+    """Sort column source over the review aggregates, recomputed only when they change."""
+    cached: Dict[str, Tuple] = {}
+
+    def source():
+        token, table = review_utils.rating_stats_table()
+        if cached.get("values", (None,))[0] != token:
+            cached["values"] = (token, {movie_id: value(agg) for movie_id, agg in table.items()})
+        return cached["values"]
+    return source
+
+
+# sort_by=user_rating (average review rating, 0 without reviews) and sort_by=review_count
+register_sort_column("user_rating", _stats_column(lambda a: a["sum"] / a["count"] if a["count"] else 0))
+register_sort_column("review_count", _stats_column(lambda a: a["count"]))
+
+
+def get_movies(movie_ids: Iterable[str]) -> Dict[str, Dict]:
+    """Movies for the given ids as {movie_id: movie}, in the order asked; unknown ids are left out."""
+    return get_index().get_many(movie_ids)
 
 
 def _parse_year(date_str: Optional[str]) -> Optional[int]:
@@ -42,6 +74,8 @@ def filter_movies(movies: List[Dict], params) -> List[Dict]:
             continue
         if getattr(params, "director", None) and getattr(params, "director").lower() not in [d.lower() for d in m.get("directors", [])]:
             continue
+        if getattr(params, "star", None) and getattr(params, "star").lower() not in [s.lower() for s in m.get("main_stars", [])]:
+            continue
         rating = m.get("imdb_rating") or 0
         if getattr(params, "min_rating", None) and rating < params.min_rating:
             continue
@@ -55,19 +89,56 @@ def filter_movies(movies: List[Dict], params) -> List[Dict]:
     return out
 
 
+def search_movies(params) -> List[Dict]:
+    """Same results as filter_movies(load_movies(), params), answered from the movie index."""
+    return get_index().search(params)
+
+
+def list_movies(params) -> Tuple[List[Dict], Optional[str]]:
+    """
+    One page of search_movies results in params.sort_by order, read off the index's pre-sorted
+    orders, plus the cursor for the next page (None on the last page).
+    Raises ValueError for an invalid params.cursor.
+    """
+    return get_index().search_page(params)
+
+
+def movie_facets(params) -> Dict[str, List[Dict]]:
+    """Genre, director, decade and rating counts over every movie matching params' filters."""
+    catalog = get_catalog()
+    if any(getattr(params, f, None) for f in ("query", "director", "star")):
+        mask = catalog.rows_mask(m["movie_id"] for m in search_movies(params))
+    else:
+        mask = catalog.filter_mask(params)
+    return catalog.facet_counts(mask)
+
+
+def rank_movies(query: str, page: int = 1, limit: int = 20) -> List[Dict]:
+    """Movies ranked by BM25 relevance to query (title, description, directors, stars), with a score each."""
+    offset = max(page - 1, 0) * limit
+    return [{**movie, "score": score} for movie, score in get_text_index().search(query, limit, offset)]
+
+
+def suggest(prefix: str, limit: int = 10) -> List[Dict]:
+    """Typeahead: the most popular titles, directors, stars and genres with a word starting with prefix."""
+    return get_suggest_index().suggest(prefix, limit)
+
+
 def sort_movies(movies: List[Dict], sort_by: str, order: str) -> List[Dict]:
     reverse = order.lower() == "desc"
     key = sort_by.lower()
 
     def _k(m: Dict):
         if key == "title":
-            return m.get("title", "")
+            return m.get("title") or ""
         if key == "release_date":
-            return m.get("release_date", "")
+            return m.get("release_date") or ""
         if key in ("rating", "imdb_rating"):
             return m.get("imdb_rating") or 0
         if key == "meta_score":
             return m.get("meta_score") or 0
+        if key == "total_rating_count":
+            return m.get("total_rating_count") or 0
         return 0
 
     return sorted(movies, key=_k, reverse=reverse)
@@ -81,33 +152,23 @@ def paginate_movies(movies: List[Dict], page: int, limit: int) -> List[Dict]:
 
 # ---- Watch later ----
 
-def _load_users() -> List[Dict]:
-    return load_json(USERS_ACTIVE_FILE, default=[])
-
-
-def _save_users(data: List[Dict]) -> None:
-    save_json(USERS_ACTIVE_FILE, data)
-
-
 def get_watch_later(user_id: str) -> List[Dict]:
-    users = _load_users()
-    user = next((u for u in users if u.get("user_id") == user_id), None)
+    user = storage.collection("users_active").get(user_id)
     if not user:
         return []
-    movie_ids = user.get("watch_later", [])
-    all_movies = load_movies()
-    return [m for m in all_movies if m.get("movie_id") in movie_ids]
+    return list(get_movies(user.get("watch_later", [])).values())
 
 
 def update_watch_later(user_id: str, movie_id: str, action: str) -> None:
-    users = _load_users()
-    user = next((u for u in users if u.get("user_id") == user_id), None)
-    if not user:
-        return
-    wl = list(user.get("watch_later", []))
-    if action == "add" and movie_id not in wl:
-        wl.append(movie_id)
-    elif action == "remove" and movie_id in wl:
-        wl.remove(movie_id)
-    user["watch_later"] = wl
-    _save_users(users)
+    held, shared = user_utils.user_locks(user_id)
+    with transaction(*held, shared=shared):
+        user = user_utils.get_active_user(user_id)
+        if not user:
+            return
+        wl = list(user.get("watch_later", []))
+        if action == "add" and movie_id not in wl:
+            wl.append(movie_id)
+        elif action == "remove" and movie_id in wl:
+            wl.remove(movie_id)
+        user["watch_later"] = wl
+        user_utils.save_user(user)
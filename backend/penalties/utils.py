@@ -3,6 +3,7 @@ from datetime import datetime
 from typing import List, Optional
 from backend.core.paths import PENALTIES_FILE
 from backend.core.jsonio import load_json, save_json
+from backend.core.transactions import transaction
 from backend.penalties import schemas
 from backend.authentication import utils as user_utils
 
@@ -15,77 +16,89 @@ def _save(data: List[dict]) -> None:
     save_json(PENALTIES_FILE, data)
 
 
+def _penalty_user(penalty_id: str) -> Optional[str]:
+    return next((p.get("user_id") for p in _load() if p.get("penalty_id") == penalty_id), None)
+
+
 def add_penalty(penalty: schemas.Penalty) -> schemas.Penalty:
-    data = _load()
-    data.append(penalty.dict())
-    _save(data)
-
-    users = user_utils.load_active_users()
-    for u in users:
-        if u.get("user_id") == penalty.user_id:
-            u.setdefault("penalties", []).append(penalty.penalty_id)
-            user_utils.save_active_users(users)
-            break
+    held, shared = user_utils.user_locks(penalty.user_id)
+    with transaction(PENALTIES_FILE, *held, shared=shared):
+        data = _load()
+        data.append(penalty.dict())
+        _save(data)
+
+        user = user_utils.get_active_user(penalty.user_id)
+        if user is not None:
+            user.setdefault("penalties", []).append(penalty.penalty_id)
+            user_utils.save_user(user)
     return penalty
 
 
 def _unlink_penalty_from_user(user_id: str, penalty_id: str) -> None:
-    users = user_utils.load_active_users()
-    for u in users:
-        if u.get("user_id") == user_id and "penalties" in u:
-            if penalty_id in u["penalties"]:
-                u["penalties"].remove(penalty_id)
-                user_utils.save_active_users(users)
-            break
+    held, shared = user_utils.user_locks(user_id)
+    with transaction(*held, shared=shared):
+        user = user_utils.get_active_user(user_id)
+        if user is not None and penalty_id in user.get("penalties", []):
+            user["penalties"].remove(penalty_id)
+            user_utils.save_user(user)
 
 
 def get_penalties_for_user(user_id: str) -> List[schemas.Penalty]:
     penalties = [schemas.Penalty(**p) for p in _load() if p.get("user_id") == user_id]
-    changed = False
-    all_pen = _load()
-
-    for p in penalties:
-        if p.status == "active" and p.has_expired():
+    if not any(p.status == "active" and p.has_expired() for p in penalties):
+        return penalties
+
+    # Expire lapsed penalties under the same locks as the other writers, re-reading inside
+    held, shared = user_utils.user_locks(user_id)
+    with transaction(PENALTIES_FILE, *held, shared=shared):
+        all_pen = _load()
+        penalties = [schemas.Penalty(**p) for p in all_pen if p.get("user_id") == user_id]
+        expired = [p for p in penalties if p.status == "active" and p.has_expired()]
+        for p in expired:
             p.status = "expired"
-            changed = True
             for stored in all_pen:
                 if stored.get("penalty_id") == p.penalty_id:
                     stored["status"] = "expired"
             _unlink_penalty_from_user(p.user_id, p.penalty_id)
-
-    if changed:
-        _save(all_pen)
+        if expired:
+            _save(all_pen)
     return penalties
 
 get_penalties_by_user = get_penalties_for_user
 
 def resolve_penalty(penalty_id: str, moderator_id: str, notes: Optional[str] = None) -> None:
-    data = _load()
-    tgt_user = None
-    for p in data:
-        if p.get("penalty_id") == penalty_id:
-            p["status"] = "resolved"
-            p["notes"] = notes
-            p["resolved_by"] = moderator_id
-            p["resolved_at"] = datetime.utcnow().isoformat()
-            tgt_user = p.get("user_id")
-            break
-    _save(data)
-    if tgt_user:
-        _unlink_penalty_from_user(tgt_user, penalty_id)
+    user_id = _penalty_user(penalty_id)  # for its lock; a penalty keeps its user
+    held, shared = user_utils.user_locks(*([user_id] if user_id else []))
+    with transaction(PENALTIES_FILE, *held, shared=shared):
+        data = _load()
+        tgt_user = None
+        for p in data:
+            if p.get("penalty_id") == penalty_id:
+                p["status"] = "resolved"
+                p["notes"] = notes
+                p["resolved_by"] = moderator_id
+                p["resolved_at"] = datetime.utcnow().isoformat()
+                tgt_user = p.get("user_id")
+                break
+        _save(data)
+        if tgt_user:
+            _unlink_penalty_from_user(tgt_user, penalty_id)
 
 
 def delete_penalty(penalty_id: str) -> None:
-    data = _load()
-    tgt_user = None
-    for p in data:
-        if p.get("penalty_id") == penalty_id:
-            tgt_user = p.get("user_id")
-            break
-    updated = [p for p in data if p.get("penalty_id") != penalty_id]
-    _save(updated)
-    if tgt_user:
-        _unlink_penalty_from_user(tgt_user, penalty_id)
+    user_id = _penalty_user(penalty_id)  # for its lock; a penalty keeps its user
+    held, shared = user_utils.user_locks(*([user_id] if user_id else []))
+    with transaction(PENALTIES_FILE, *held, shared=shared):
+        data = _load()
+        tgt_user = None
+        for p in data:
+            if p.get("penalty_id") == penalty_id:
+                tgt_user = p.get("user_id")
+                break
+        updated = [p for p in data if p.get("penalty_id") != penalty_id]
+        _save(updated)
+        if tgt_user:
+            _unlink_penalty_from_user(tgt_user, penalty_id)
 
 
 def check_active_penalty(user_id: str, blocked_types: List[str]) -> Optional[str]:
@@ -1,7 +1,9 @@
 """Recommendation algorithms and utilities."""
 from typing import List, Dict, Optional, Tuple
 from collections import Counter, defaultdict
+import numpy as np
 from backend.movies import utils as movie_utils
+from backend.movies import catalog as movie_catalog
 from backend.reviews import utils as review_utils
 from backend.friendship import utils as friendship_utils
 from backend.authentication import utils as user_utils
@@ -10,14 +12,14 @@ from backend.recommendations.schemas import RecommendedMovie
 
 def get_user_reviewed_movies(user_id: str) -> List[str]:
     """Get list of movie IDs the user has reviewed."""
-    reviews = review_utils.get_reviews_by_user(user_id)
-    return list(set([r.get("movie_id") for r in reviews if r.get("movie_id")]))
+    refs = review_utils.get_user_review_refs(user_id)
+    return list(set([movie_id for movie_id, _, _ in refs if movie_id]))
 
 
 def get_user_ratings(user_id: str) -> Dict[str, int]:
     """Get user's ratings for movies as {movie_id: rating}."""
-    reviews = review_utils.get_reviews_by_user(user_id)
-    return {r.get("movie_id"): r.get("rating", 0) for r in reviews if r.get("movie_id") and r.get("rating")}
+    refs = review_utils.get_user_review_refs(user_id)
+    return {movie_id: rating for movie_id, _, rating in refs if movie_id and rating}
 
 
 def get_user_watchlist(user_id: str) -> List[str]:
@@ -35,8 +37,7 @@ def get_user_preferences(user_id: str) -> Dict[str, float]:
     watchlist = get_user_watchlist(user_id)
     
     all_movie_ids = list(set(reviewed_movies + watchlist))
-    all_movies = [movie_utils.get_movie(mid) for mid in all_movie_ids]
-    all_movies = [m for m in all_movies if m]
+    all_movies = list(movie_utils.get_movies(all_movie_ids).values())
     
     genre_scores = defaultdict(float)
     director_scores = defaultdict(float)
@@ -183,8 +184,9 @@ def collaborative_recommendations(user_id: str, limit: int = 20) -> List[Recomme
     scored_items.sort(key=lambda x: x[0], reverse=True)
     
     recommendations = []
+    movies = movie_utils.get_movies(mid for _, mid in scored_items[:limit])
     for score, movie_id in scored_items[:limit]:
-        movie = movie_utils.get_movie(movie_id)
+        movie = movies.get(movie_id)
         if movie:
             reason = ", ".join(set(movie_reasons[movie_id])) or "Liked by users with similar taste"
             rec_movie = RecommendedMovie(
@@ -226,8 +228,9 @@ def friend_based_recommendations(user_id: str, limit: int = 20) -> List[Recommen
     scored_items.sort(key=lambda x: x[0], reverse=True)
     
     recommendations = []
+    movies = movie_utils.get_movies(mid for _, mid in scored_items[:limit])
     for score, movie_id in scored_items[:limit]:
-        movie = movie_utils.get_movie(movie_id)
+        movie = movies.get(movie_id)
         if movie:
             friend_names = list(set(movie_reasons[movie_id]))[:3]
             if len(friend_names) == 1:
@@ -247,59 +250,72 @@ def friend_based_recommendations(user_id: str, limit: int = 20) -> List[Recommen
     return recommendations
 
 
+def _popularity(movie: Dict) -> Tuple[float, List[str]]:
+    """Popularity score of one movie and the reasons behind it."""
+    score = 0.0
+    reasons = []
+
+    # High IMDB rating
+    imdb_rating = movie.get("imdb_rating", 0) or 0
+    if imdb_rating >= 8.0:
+        score += 0.5
+        reasons.append("Highly rated")
+    elif imdb_rating >= 7.0:
+        score += 0.3
+        reasons.append("Well-rated")
+
+    # High meta score
+    meta_score = movie.get("meta_score", 0) or 0
+    if meta_score >= 80:
+        score += 0.3
+        reasons.append("Critic favorite")
+
+    # High amount of reviews
+    total_reviews = movie.get("total_user_reviews", 0) or 0
+    if total_reviews > 100:
+        score += 0.2
+        reasons.append("Popular")
+
+    return score, reasons
+
+
 def popular_recommendations(user_id: str, limit: int = 20) -> List[RecommendedMovie]:
     """Recommend popular/highly-rated movies."""
     reviewed_movies = set(get_user_reviewed_movies(user_id))
     watchlist = set(get_user_watchlist(user_id))
     excluded = reviewed_movies | watchlist
-    
-    all_movies = movie_utils.load_movies()
-    scored_movies = []
-    
-    for movie in all_movies:
-        movie_id = movie.get("movie_id")
-        if movie_id in excluded:
-            continue
-        
-        score = 0.0
-        reasons = []
-        
-        # High IMDB rating
-        imdb_rating = movie.get("imdb_rating", 0) or 0
-        if imdb_rating >= 8.0:
-            score += 0.5
-            reasons.append("Highly rated")
-        elif imdb_rating >= 7.0:
-            score += 0.3
-            reasons.append("Well-rated")
-        
-        # High meta score
-        meta_score = movie.get("meta_score", 0) or 0
-        if meta_score >= 80:
-            score += 0.3
-            reasons.append("Critic favorite")
-        
-        # High amount of reviews
-        total_reviews = movie.get("total_user_reviews", 0) or 0
-        if total_reviews > 100:
-            score += 0.2
-            reasons.append("Popular")
-        
-        if score > 0:
-            reason = ", ".join(reasons) if reasons else "Popular choice"
-            scored_movies.append((score, movie, reason))
-    
-    scored_movies.sort(key=lambda x: x[0], reverse=True)
+
+    # Score every movie at once from the columnar catalog (same rules as _popularity)
+    catalog = movie_catalog.get_catalog()
+    imdb_rating = np.nan_to_num(catalog["imdb_rating"], nan=0.0)
+    meta_score = np.nan_to_num(catalog["meta_score"], nan=0.0)
+    total_reviews = np.nan_to_num(catalog["total_user_reviews"], nan=0.0)
+    scores = (np.where(imdb_rating >= 8.0, 0.5, np.where(imdb_rating >= 7.0, 0.3, 0.0))
+              + np.where(meta_score >= 80, 0.3, 0.0)
+              + np.where(total_reviews > 100, 0.2, 0.0))
+    candidates = scores > 0
+    if excluded:
+        candidates &= ~np.isin(catalog.movie_ids, list(excluded))
+    rows = np.flatnonzero(candidates)
+    rows = rows[np.argsort(-scores[rows], kind="stable")]
+
     recommendations = []
-    
-    for score, movie, reason in scored_movies[:limit]:
-        rec_movie = RecommendedMovie(
-            **movie,
-            recommendation_reason=reason,
-            recommendation_score=min(score, 1.0)
-        )
-        recommendations.append(rec_movie)
-    
+    # Fetch the top rows a page at a time; a movie changed since the catalog was built may drop out
+    for start in range(0, len(rows), limit):
+        movies = movie_utils.get_movies(catalog.movie_ids[rows[start:start + limit]].tolist())
+        for movie in movies.values():
+            score, reasons = _popularity(movie)
+            if score <= 0:
+                continue
+            rec_movie = RecommendedMovie(
+                **movie,
+                recommendation_reason=", ".join(reasons) if reasons else "Popular choice",
+                recommendation_score=min(score, 1.0)
+            )
+            recommendations.append(rec_movie)
+            if len(recommendations) >= limit:
+                return recommendations
+
     return recommendations
 
 
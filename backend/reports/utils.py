@@ -1,17 +1,22 @@
 import uuid
 from datetime import datetime
 from typing import List, Optional
-from backend.core.paths import REPORTS_FILE
-from backend.core.jsonio import load_json, save_json
+from backend.core import storage
+from backend.core.jsonio import thaw
+from backend.core.transactions import transaction
 from backend.reports import schemas
 
 
+def _reports() -> storage.Collection:
+    return storage.collection("reports")
+
+
 def _load() -> List[dict]:
-    return load_json(REPORTS_FILE, default=[])
+    return _reports().load_document()
 
 
 def _save(data: List[dict]) -> None:
-    save_json(REPORTS_FILE, data)
+    _reports().save_document(data)
 
 
 def load_reports() -> List[schemas.Report]:
@@ -19,14 +24,11 @@ def load_reports() -> List[schemas.Report]:
 
 
 def get_report(report_id: str) -> Optional[schemas.Report]:
-    for r in _load():
-        if r.get("report_id") == report_id:
-            return schemas.Report(**r)
-    return None
+    r = _reports().get(report_id)
+    return schemas.Report(**r) if r else None
 
 
 def create_report(reporter_id: str, reported_id: str, type: schemas.ReportType, reason: str) -> schemas.Report:
-    data = _load()
     new = schemas.Report(
         report_id=str(uuid.uuid4()),
         reporter_id=reporter_id,
@@ -39,36 +41,33 @@ def create_report(reporter_id: str, reported_id: str, type: schemas.ReportType,
         moderator_id=None,
         moderator_notes=None,
     )
-    data.append(new.dict())
-    _save(data)
+    _reports().put(new.dict())
     return new
 
 
 def update_report_status(report_id: str, update: schemas.ReportUpdate, moderator_id: str) -> Optional[schemas.Report]:
-    data = _load()
-    for r in data:
-        if r.get("report_id") == report_id:
-            r["status"] = update.status
-            r["moderator_id"] = moderator_id
-            r["moderator_notes"] = update.moderator_notes
-            if update.status in [schemas.ReportStatus.resolved, schemas.ReportStatus.dismissed]:
-                r["resolved_at"] = datetime.utcnow().isoformat()
-            _save(data)
-            return schemas.Report(**r)
-    return None
+    reports = _reports()
+    with transaction(reports.document_path()):
+        r = reports.get(report_id)
+        if r is None:
+            return None
+        r = thaw(r)
+        r["status"] = update.status
+        r["moderator_id"] = moderator_id
+        r["moderator_notes"] = update.moderator_notes
+        if update.status in [schemas.ReportStatus.resolved, schemas.ReportStatus.dismissed]:
+            r["resolved_at"] = datetime.utcnow().isoformat()
+        reports.put(r)
+    return schemas.Report(**r)
 
 
 def delete_report(report_id: str) -> bool:
-    data = _load()
-    updated = [r for r in data if r.get("report_id") != report_id]
-    if len(updated) == len(data):
-        return False
-    _save(updated)
-    return True
+    return _reports().delete(report_id)
 
 
 def filter_reports_by_status(status: schemas.ReportStatus) -> List[schemas.Report]:
-    return [schemas.Report(**r) for r in _load() if r.get("status") == status]
+    status = getattr(status, "value", status)
+    return [schemas.Report(**r) for r in _reports().query(status=status)]
 
 
 def get_summary() -> schemas.ReportSummary:
@@ -0,0 +1,251 @@
+"""Pre-sorted orderings of each movie's reviews, for paging GET /reviews/{movie_id} without sorting.
+
+For a movie, every (sort key, rating bucket) pair that has been asked for keeps a list of
+(value, review_id) entries in ascending order; bucket None holds every review. The "top" key
+ranks by the Wilson lower bound of helpful/total_votes, so a review needs both a high share
+of helpful votes and enough votes to be sure of it; few votes count for little. Descending order
+is the exact reverse (ties by review_id descending), so a page is a slice at an offset, or,
+with a cursor holding the last (value, review_id) pair, a slice after a bisect.
+
+Orderings are cached per movie (least recently used first out) together with the content
+version of the document they reflect (Collection.document_version), so a page of an unchanged
+document neither reloads nor re-sorts it. The journal keeps unchanged records as the same
+objects in the same places, so a read after a write finds the few reviews that were added,
+edited, voted on or removed by comparing the two views object by object (at C speed, no key is
+computed) and moves only their entries, a bisect and a list insert each. Engines that build
+new records on every read (SQLite) are compared by review_id and content instead; only a
+document that changed wholesale is re-sorted.
+
+An unknown sort_by keeps the stored (insertion) order and any order other than "desc" is
+ascending, as GET /reviews/{movie_id} always did.
+"""
+import base64, json, math, threading
+from bisect import bisect_left, bisect_right, insort
+from collections import OrderedDict
+from itertools import compress, count
+from operator import is_not
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+CACHE_MAX_MOVIES = 256
+WILSON_Z = 1.96  # 95% confidence
+RESORT_FRACTION = 8  # re-sort instead of patching when more than 1/8 of the reviews changed
+
+
+def _number(value: Any) -> Any:
+    return value if isinstance(value, (int, float)) and not isinstance(value, bool) else 0
+
+
+def _votes(field: str) -> Callable[[Dict[str, Any]], Any]:
+    return lambda r: _number((r.get("usefulness") or {}).get(field))
+
+
+def wilson_score(helpful: Any, total: Any, z: float = WILSON_Z) -> float:
+    """Lower bound of the Wilson score interval for helpful/total (0.0 without votes)."""
+    helpful, total = _number(helpful), _number(total)
+    if total <= 0:
+        return 0.0
+    p = min(max(helpful / total, 0.0), 1.0)
+    z2 = z * z
+    return (p + z2 / (2 * total) - z * math.sqrt((p * (1 - p) + z2 / (4 * total)) / total)) / (1 + z2 / total)
+
+
+def _top(r: Dict[str, Any]) -> float:
+    usefulness = r.get("usefulness") or {}
+    return wilson_score(usefulness.get("helpful"), usefulness.get("total_votes"))
+
+
+SORT_KEYS: Dict[str, Callable[[Dict[str, Any]], Any]] = {
+    "date": lambda r: r.get("date") if isinstance(r.get("date"), str) else "",
+    "rating": lambda r: _number(r.get("rating")),
+    "helpful": _votes("helpful"),
+    "total_votes": _votes("total_votes"),
+    "top": _top,
+}
+
+Entry = Tuple[Any, str]  # (sort value, review_id)
+View = Union[List[Dict[str, Any]], Callable[[], List[Dict[str, Any]]]]
+
+
+def encode_cursor(sort_by: str, order: str, rating: Optional[int], value: Any, review_id: str) -> str:
+    raw = json.dumps([sort_by, order, rating, value, review_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str, Optional[int], Any, str]:
+    """Inverse of encode_cursor. Raises ValueError for anything it did not produce."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        sort_by, order, rating, value, review_id = json.loads(raw)
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if (sort_by not in SORT_KEYS or order not in ("asc", "desc") or not isinstance(review_id, str)
+            or not (rating is None or (isinstance(rating, int) and not isinstance(rating, bool)))
+            or isinstance(value, bool) or not isinstance(value, str if sort_by == "date" else (int, float))):
+        raise ValueError("Invalid cursor")
+    return sort_by, order, rating, value, review_id
+
+
+class _MovieOrderings:
+    """One movie's reviews by id and the (sort key, rating bucket) orders built so far."""
+
+    def __init__(self, key: str):
+        self.key = key
+        self.source: Optional[List[Dict[str, Any]]] = None
+        self.version: Any = None
+        self.records: Dict[str, Dict[str, Any]] = {}
+        self.orders: Dict[Tuple[str, Optional[Any]], List[Entry]] = {}
+
+    def _sorted(self, sort_by: str, bucket: Optional[Any]) -> List[Entry]:
+        value = SORT_KEYS[sort_by]
+        return sorted((value(r), rid) for rid, r in self.records.items()
+                      if bucket is None or r.get("rating") == bucket)
+
+    def order(self, sort_by: str, bucket: Optional[Any]) -> List[Entry]:
+        entries = self.orders.get((sort_by, bucket))
+        if entries is None:
+            entries = self.orders[(sort_by, bucket)] = self._sorted(sort_by, bucket)
+        return entries
+
+    def _move(self, old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]], rid: str) -> None:
+        for (sort_by, bucket), entries in self.orders.items():
+            value = SORT_KEYS[sort_by]
+            if old is not None and (bucket is None or old.get("rating") == bucket):
+                entry = (value(old), rid)
+                pos = bisect_left(entries, entry)
+                if pos < len(entries) and entries[pos] == entry:
+                    del entries[pos]
+            if new is not None and (bucket is None or new.get("rating") == bucket):
+                insort(entries, (value(new), rid))
+
+    def _compare(self, view: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """(removed, added) records between the cached records and view, by key and content."""
+        key, records = self.key, self.records
+        removed, added, seen = [], [], set()
+        for new in view:
+            rid = str(new.get(key))
+            seen.add(rid)
+            old = records.get(rid)
+            if old is None:
+                added.append(new)
+            elif old is not new and old != new:
+                removed.append(old)
+                added.append(new)
+        removed.extend(r for rid, r in records.items() if rid not in seen)
+        return removed, added
+
+    def refresh(self, view: View, version: Any = None) -> None:
+        """
+        Bring the orders up to date with view (a no-op when version, if known, is the one seen
+        last; view may be a function returning it, called only when it is needed).
+        """
+        if version is not None and version == self.version:
+            return
+        if callable(view):
+            view = view()
+        if view is not self.source:
+            self._update(view)
+            self.source = view
+        self.version = version
+
+    def _update(self, view: List[Dict[str, Any]]) -> None:
+        previous = self.source or []
+        if len(view) >= len(previous):
+            # Edits keep their position and additions are appended: compare position by position
+            changed = list(compress(count(), map(is_not, previous, view)))
+            removed = [previous[i] for i in changed]
+            added = [view[i] for i in changed] + view[len(previous):]
+        else:
+            # Records are compared by identity; holding previous keeps its ids from being reused
+            before, after = dict(zip(map(id, previous), previous)), dict(zip(map(id, view), view))
+            removed = [before[i] for i in before.keys() - after.keys()]
+            added = [after[i] for i in after.keys() - before.keys()]
+        limit = max(len(view), 1)
+        if (len(added) + len(removed)) * RESORT_FRACTION > limit and self.records:
+            removed, added = self._compare(view)  # new objects for the same records
+        key = self.key
+        if (len(added) + len(removed)) * RESORT_FRACTION > limit:
+            self.records = {str(r.get(key)): r for r in view}
+            for sort_by, bucket in list(self.orders):
+                self.orders[(sort_by, bucket)] = self._sorted(sort_by, bucket)
+        else:
+            for old in removed:
+                rid = str(old.get(key))
+                self._move(old, None, rid)
+                if self.records.get(rid) is old:
+                    del self.records[rid]
+            for new in added:
+                rid = str(new.get(key))
+                self._move(None, new, rid)
+                self.records[rid] = new
+
+
+class ReviewOrderings:
+    def __init__(self, key: str = "review_id", max_movies: int = CACHE_MAX_MOVIES):
+        self.key = key
+        self.max_movies = max_movies
+        self._movies: "OrderedDict[str, _MovieOrderings]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def page(self, movie_id: str, view: View, rating: Optional[int] = None,
+             sort_by: str = "date", order: str = "desc", skip: int = 0, limit: int = 20,
+             cursor: Optional[str] = None, version: Any = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        One page of view (the movie's current reviews, or a function returning them) and the
+        cursor for the next page (None on the last); cursor, when set, takes the place of skip.
+        version is the document's content version (None if unknown): while it is unchanged the
+        cached orders are used without loading view. An unknown sort_by keeps view's order and
+        has no cursor; any order other than "desc" is ascending.
+        Raises ValueError for a malformed cursor or one issued for another sort_by/order/rating.
+        """
+        order = "desc" if order.lower() == "desc" else "asc"
+        limit, skip = max(limit, 1), max(skip, 0)
+        if sort_by not in SORT_KEYS:
+            if cursor:
+                raise ValueError("Cursors are only issued for sort_by " + ", ".join(SORT_KEYS))
+            records = view() if callable(view) else view
+            kept = [r for r in records if rating is None or r.get("rating") == rating]
+            return kept[skip: skip + limit], None
+        after = None
+        if cursor:
+            cursor_sort, cursor_order, cursor_rating, value, review_id = decode_cursor(cursor)
+            if (cursor_sort, cursor_order, cursor_rating) != (sort_by, order, rating):
+                raise ValueError("Cursor was issued for a different sort_by/order/rating")
+            after, skip = (value, review_id), 0
+        with self._lock:
+            movie = self._movies.get(movie_id)
+            if movie is None:
+                movie = self._movies[movie_id] = _MovieOrderings(self.key)
+            self._movies.move_to_end(movie_id)
+            while len(self._movies) > self.max_movies:
+                self._movies.popitem(last=False)
+            movie.refresh(view, version)
+            entries = movie.order(sort_by, rating)
+            if order == "asc":
+                start = bisect_right(entries, after) if after is not None else 0
+                chosen = entries[start + skip: start + skip + limit + 1]
+            else:
+                end = bisect_left(entries, after) if after is not None else len(entries)
+                end = max(end - skip, 0)
+                chosen = entries[max(end - limit - 1, 0): end][::-1]
+            records = movie.records
+            next_cursor = None
+            if len(chosen) > limit:  # one extra tells whether there is a next page
+                del chosen[limit:]
+                next_cursor = encode_cursor(sort_by, order, rating, *chosen[-1])
+            return [records[rid] for _, rid in chosen], next_cursor
+
+    def clear(self) -> None:
+        with self._lock:
+            self._movies.clear()
+
+
+_orderings: Dict[str, ReviewOrderings] = {}
+_orderings_lock = threading.Lock()
+
+
+def orderings_for(reviews) -> ReviewOrderings:
+    """The (shared) review orderings of a reviews collection."""
+    with _orderings_lock:
+        if reviews.spec.directory not in _orderings:
+            _orderings[reviews.spec.directory] = ReviewOrderings(reviews.key)
+        return _orderings[reviews.spec.directory]
@@ -1,5 +1,5 @@
 """Movie review creation, editing, deletion, and voting routes."""
-from fastapi import APIRouter, Depends, Query, status
+from fastapi import APIRouter, Depends, Query, Response, status
 from typing import List, Optional
 from backend.reviews import utils, schemas
 from backend.authentication.security import get_current_user, get_current_user_optional
@@ -12,16 +12,29 @@ router = APIRouter(prefix="/reviews", tags=["Reviews"])
 
 @router.get("/{movie_id}", response_model=List[schemas.Review])
 def list_reviews(
+    response: Response,
     movie_id: str,
     rating: Optional[int] = Query(None, description="Filter by rating (1-10)"),
-    sort_by: str = Query("date", description="Sort by date, rating, helpful, total_votes"),
+    sort_by: str = Query("date", description="Sort by date, rating, helpful, total_votes, top (most reliably helpful)"),
     order: str = Query("desc", description="Order: asc or desc"),
     skip: int = Query(0, ge=0),
     limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor from the previous page; replaces skip"),
     current_user: TokenData = Depends(get_current_user_optional)
 ):
-    """List reviews for a movie with optional filtering, sorting, and pagination. Accessible to guests."""
-    return utils.filter_sort_reviews(movie_id, rating, sort_by, order, skip, limit)
+    """
+    List reviews for a movie with optional filtering, sorting, and pagination. Accessible to guests.
+    Ties are ordered by review_id; any other sort_by keeps the stored order, and any order other
+    than desc is ascending. When more reviews follow, the X-Next-Cursor header holds a cursor to
+    pass back as `cursor` (with the same rating, sort_by and order) for the next page.
+    """
+    try:
+        reviews, next_cursor = utils.review_page(movie_id, rating, sort_by, order, skip, limit, cursor)
+    except ValueError as e:
+        raise exceptions.ValidationError(str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return reviews
 
 
 @router.get("/{movie_id}/{review_id}", response_model=schemas.Review)
@@ -79,10 +92,10 @@ def delete_review(movie_id: str, review_id: str, current_user: TokenData = Depen
 @router.post("/{movie_id}/{review_id}/vote", response_model=schemas.Review)
 @block_if_penalized(["suspension"])
 def vote_review(movie_id: str, review_id: str, vote: schemas.Vote, current_user: TokenData = Depends(get_current_user)):
-    """Vote whether a review was helpful or not. Requires authentication."""
+    """Vote whether a review was helpful or not; voting again changes your vote. Requires authentication."""
     if current_user.role == "guest":
         raise exceptions.AuthenticationError("Authentication required to vote on reviews.")
-    updated = utils.add_vote(movie_id, review_id, vote)
+    updated = utils.add_vote(movie_id, review_id, vote, current_user.user_id)
     if not updated:
         raise exceptions.NotFoundError("Review")
     return updated
@@ -0,0 +1,197 @@
+"""Per-movie rating aggregates, kept next to the movie records in <movies directory>/stats.
+
+    stats/<movie_id>.json   {"movie_id", "count", "sum", "sum_sq", "histogram", "helpful_votes", "total_votes"}
+    stats/_meta.json        {"movies": n} as of the last build; marks the stats as built
+
+histogram counts ratings 1..10 (a rating outside that range counts in the nearest bucket).
+The review utilities apply each add, edit, delete and vote as a delta to one movie's file,
+inside the transaction that writes the review, holding that file and sharing the stats
+directory, so an update costs one small file whatever the number of reviews and writes to
+different movies do not wait for each other; a build holds the whole directory. Until _meta.json exists
+nothing is updated; the first read builds every file from the reviews collection. The
+subdirectory is not a movie record, so writing it leaves the movie index and catalog alone.
+
+table() keeps {movie_id: aggregate} in memory for sorting, re-reading only the files whose
+signature changed since the directory was last seen.
+"""
+import math, os, threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from backend.core import jsonio
+from backend.core.transactions import TransactionError, current, transaction
+
+META_NAME = "_meta.json"
+
+Loader = Callable[[], Iterable[Dict[str, Any]]]  # every review; called with the stats locked
+
+
+def empty(movie_id: str) -> Dict[str, Any]:
+    return {"movie_id": movie_id, "count": 0, "sum": 0, "sum_sq": 0, "histogram": [0] * 10,
+            "helpful_votes": 0, "total_votes": 0}
+
+
+def _apply(agg: Dict[str, Any], review: Dict[str, Any], sign: int) -> None:
+    rating = review.get("rating")
+    if isinstance(rating, (int, float)) and not isinstance(rating, bool):
+        agg["count"] += sign
+        agg["sum"] += sign * rating
+        agg["sum_sq"] += sign * rating * rating
+        agg["histogram"][min(max(int(rating), 1), 10) - 1] += sign
+    usefulness = review.get("usefulness") or {}
+    agg["helpful_votes"] += sign * (usefulness.get("helpful") or 0)
+    agg["total_votes"] += sign * (usefulness.get("total_votes") or 0)
+
+
+def summary(agg: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """The public view of an aggregate: count, average, stddev, histogram and vote totals."""
+    agg = agg or empty("")
+    count = agg["count"]
+    average = agg["sum"] / count if count else None
+    stddev = math.sqrt(max(agg["sum_sq"] / count - average * average, 0.0)) if count else None
+    return {
+        "count": count,
+        "average": round(average, 2) if average is not None else None,
+        "stddev": round(stddev, 2) if stddev is not None else None,
+        "histogram": list(agg["histogram"]),
+        "helpful_votes": agg["helpful_votes"],
+        "total_votes": agg["total_votes"],
+    }
+
+
+class RatingStats:
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.meta_path = os.path.join(directory, META_NAME)
+        self._lock = threading.Lock()
+        self._version: Any = None
+        self._signatures: Dict[str, Any] = {}
+        self._table: Dict[str, Dict[str, Any]] = {}
+
+    def path(self, movie_id: str) -> str:
+        return os.path.join(self.directory, f"{movie_id}.json")
+
+    def built(self) -> bool:
+        return os.path.exists(self.meta_path)
+
+    # --- reads ---
+
+    def get(self, movie_id: str, load: Optional[Loader] = None) -> Dict[str, Any]:
+        """A movie's aggregate (all zeros without reviews). With `load`, missing stats are built first."""
+        if not self.built() and load is not None:
+            self.ensure_built(load)
+        return jsonio.load_json_view(self.path(movie_id), default=None) or empty(movie_id)
+
+    def table(self, load: Optional[Loader] = None) -> Tuple[Any, Dict[str, Dict[str, Any]]]:
+        """(version token, {movie_id: aggregate}) for every movie with stats."""
+        if not self.built() and load is not None:
+            self.ensure_built(load)
+        with self._lock:
+            try:
+                st = os.stat(self.directory)
+                version = (st.st_ino, st.st_mtime_ns)
+            except OSError:
+                version = None
+            if version is None or version != self._version:
+                signatures = self._scan()
+                for movie_id, sig in signatures.items():
+                    if self._signatures.get(movie_id) != sig:
+                        agg = jsonio.load_json_view(self.path(movie_id), default=None)
+                        if agg is not None:
+                            self._table[movie_id] = agg
+                for movie_id in self._signatures.keys() - signatures.keys():
+                    self._table.pop(movie_id, None)
+                self._version, self._signatures = version, signatures
+            return (self.directory, self._version), self._table
+
+    def _scan(self) -> Dict[str, Any]:
+        sigs: Dict[str, Any] = {}
+        if not os.path.isdir(self.directory):
+            return sigs
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if entry.name.endswith(".json") and entry.name != META_NAME:
+                    st = entry.stat()
+                    sigs[entry.name[: -len(".json")]] = (st.st_ino, st.st_mtime_ns, st.st_size)
+        return sigs
+
+    def ensure_built(self, load: Loader) -> None:
+        # May be reached from a read inside another transaction; the build is its own unit
+        token = jsonio.active_transaction.set(None)
+        try:
+            with transaction(self.directory):
+                if not self.built():
+                    self._write(self.build(load()))
+        finally:
+            jsonio.active_transaction.reset(token)
+
+    # --- updates (call inside a transaction holding self.path(movie_id), sharing self.directory) ---
+
+    def update(self, old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]]) -> None:
+        """Stage the change of one review from old to new (None = absent)."""
+        review = new or old
+        if review is None:
+            return
+        movie_id = review.get("movie_id")
+        path = self.path(movie_id)
+        tx = current()
+        if tx is None or not tx.holds(path):
+            raise TransactionError("RatingStats.update needs a transaction holding the movie's stats file")
+        if not self.built():
+            return
+        agg = jsonio.load_json(path, default=None) or empty(movie_id)
+        if old is not None:
+            _apply(agg, old, -1)
+        if new is not None:
+            _apply(agg, new, 1)
+        jsonio.save_json(path, agg)
+
+    # --- rebuild ---
+
+    def build(self, reviews: Iterable[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """{movie_id: aggregate} for the given reviews."""
+        aggs: Dict[str, Dict[str, Any]] = {}
+        for review in reviews:
+            movie_id = review.get("movie_id")
+            if movie_id is not None:
+                _apply(aggs.setdefault(movie_id, empty(movie_id)), review, 1)
+        return aggs
+
+    def _write(self, aggs: Dict[str, Dict[str, Any]]) -> None:
+        for movie_id in self._scan().keys() - aggs.keys():
+            os.remove(self.path(movie_id))
+        for movie_id, agg in aggs.items():
+            jsonio.save_json(self.path(movie_id), agg)
+        jsonio.save_json(self.meta_path, {"movies": len(aggs)})
+
+    def rebuild(self, load: Loader) -> int:
+        """Recompute every movie's stats. Returns the number of movies with reviews."""
+        with transaction(self.directory):
+            aggs = self.build(load())
+            self._write(aggs)
+        return len(aggs)
+
+    def verify(self, reviews: Iterable[Dict[str, Any]]) -> List[str]:
+        """Compare the stored stats with the reviews. Returns a list of problems (empty if consistent)."""
+        if not self.built():
+            return ["rating stats have not been built"]
+        expected = self.build(reviews)
+        problems = []
+        for movie_id in sorted(expected.keys() | self._scan().keys()):
+            want = expected.get(movie_id, empty(movie_id))
+            have = jsonio.load_json_view(self.path(movie_id), default=None) or empty(movie_id)
+            if want != have:
+                problems.append(f"movie {movie_id!r}: stored {summary(have)}, expected {summary(want)}")
+        return problems
+
+
+_stats: Dict[str, RatingStats] = {}
+_stats_lock = threading.Lock()
+
+
+def stats_for(movies) -> RatingStats:
+    """The (shared) stats of a movies collection."""
+    directory = os.path.join(movies.spec.directory, "stats")
+    with _stats_lock:
+        if directory not in _stats:
+            _stats[directory] = RatingStats(directory)
+        return _stats[directory]
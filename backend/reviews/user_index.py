@@ -0,0 +1,142 @@
+"""Persistent user_id -> [(movie_id, review_id, rating)] index over the reviews collection.
+
+Layout under <reviews directory>/index:
+    meta.json            {"reviews": n} as of the last build; marks the index as built
+    user_id/<shard>.json user_id -> [[movie_id, review_id, rating], ...]
+
+Users are split into 256 shards by an md5 of the user_id (as in core.indexes), so one user's
+reviews cost one small cached shard read instead of a scan of every review document. The
+review utilities update the index inside the transaction that writes the review, holding the
+user's shard file and sharing the index directory, so writes for users in different shards
+do not wait for each other; a build holds the whole directory. Until meta.json exists the
+index is not used or updated; the first lookup builds it from the collection. Rebuild or
+verify it with
+    python -m backend.scripts.review_index rebuild|verify
+"""
+import hashlib, os
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from backend.core import jsonio
+from backend.core.transactions import TransactionError, current, transaction
+
+SHARD_HEX_DIGITS = 2
+
+Ref = Tuple[str, str, Any]  # (movie_id, review_id, rating)
+Loader = Callable[[], Iterable[Dict[str, Any]]]  # every review; called with the index locked
+
+
+def _ref(review: Dict[str, Any]) -> List[Any]:
+    return [review.get("movie_id"), review.get("review_id"), review.get("rating")]
+
+
+def index_for(reviews) -> "ReviewUserIndex":
+    """The index of a reviews collection (kept in its directory under any engine)."""
+    return ReviewUserIndex(os.path.join(reviews.spec.directory, "index"))
+
+
+class ReviewUserIndex:
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.meta_path = os.path.join(directory, "meta.json")
+
+    def shard_path(self, user_id: Any) -> str:
+        digest = hashlib.md5(str(user_id).encode("utf-8")).hexdigest()[:SHARD_HEX_DIGITS]
+        return os.path.join(self.directory, "user_id", f"{digest}.json")
+
+    def built(self) -> bool:
+        return os.path.exists(self.meta_path)
+
+    # --- lookups ---
+
+    def refs(self, user_id: str, load: Optional[Loader] = None) -> List[Ref]:
+        """A user's (movie_id, review_id, rating) entries. With `load`, a missing index is built first."""
+        if not self.built() and load is not None:
+            self.ensure_built(load)
+        return [tuple(entry) for entry in jsonio.load_json_view(self.shard_path(user_id), default={}).get(user_id, [])]
+
+    def ensure_built(self, load: Loader) -> None:
+        # May be reached from a read inside another transaction; the build is its own unit
+        token = jsonio.active_transaction.set(None)
+        try:
+            with transaction(self.directory):
+                if not self.built():
+                    self.write(self.build(load()))
+        finally:
+            jsonio.active_transaction.reset(token)
+
+    # --- updates (call inside a transaction holding the user's shard, sharing self.directory) ---
+
+    def update(self, old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]]) -> None:
+        """Stage the change of one review from old to new (None = absent)."""
+        review = new or old
+        if review is None:
+            return
+        user_id = review.get("user_id")
+        path = self.shard_path(user_id)
+        tx = current()
+        if tx is None or not tx.holds(path):
+            raise TransactionError("ReviewUserIndex.update needs a transaction holding the user's shard")
+        if not self.built():
+            return
+        shard = jsonio.load_json(path, default={})
+        entries = [e for e in shard.get(user_id, []) if not old or e[1] != old.get("review_id")]
+        if new is not None:
+            entries.append(_ref(new))
+        if entries:
+            shard[user_id] = entries
+        else:
+            shard.pop(user_id, None)
+        jsonio.save_json(path, shard)
+
+    # --- rebuild / verify ---
+
+    def build(self, reviews: Iterable[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """Every shard ({path: map}) and meta.json for the given reviews."""
+        shards: Dict[str, Dict[str, Any]] = {}
+        count = 0
+        for review in reviews:
+            user_id = review.get("user_id")
+            if user_id is None:
+                continue
+            shards.setdefault(self.shard_path(user_id), {}).setdefault(user_id, []).append(_ref(review))
+            count += 1
+        shards[self.meta_path] = {"reviews": count}
+        return shards
+
+    def _existing_shards(self) -> List[str]:
+        folder = os.path.join(self.directory, "user_id")
+        if not os.path.isdir(folder):
+            return []
+        return [os.path.join(folder, n) for n in os.listdir(folder) if n.endswith(".json")]
+
+    def write(self, shards: Dict[str, Dict[str, Any]]) -> None:
+        """Replace the on-disk index with freshly built shards."""
+        for path in self._existing_shards():
+            if path not in shards:
+                os.remove(path)
+        for path, data in shards.items():
+            jsonio.save_json(path, data)
+
+    def rebuild(self, load: Loader) -> int:
+        """Rebuild from scratch. Returns the number of reviews indexed."""
+        with transaction(self.directory):
+            shards = self.build(load())
+            self.write(shards)
+        return shards[self.meta_path]["reviews"]
+
+    def verify(self, reviews: Iterable[Dict[str, Any]]) -> List[str]:
+        """Compare the on-disk index with the reviews. Returns a list of problems (empty if consistent)."""
+        if not self.built():
+            return ["index has not been built"]
+        expected = self.build(reviews)
+        problems = []
+        for path in sorted(set(expected) | set(self._existing_shards())):
+            if path == self.meta_path:
+                continue
+            want = expected.get(path, {})
+            have = jsonio.load_json_view(path, default={})
+            for user_id in sorted(set(want) | set(have), key=str):
+                if sorted(map(tuple, want.get(user_id, []))) != sorted(map(tuple, have.get(user_id, []))):
+                    problems.append(f"user {user_id!r}: {len(have.get(user_id, []))} indexed review(s), "
+                                    f"expected {len(want.get(user_id, []))} or different entries")
+        return problems
@@ -1,106 +1,193 @@
 """Review storage and user linkage utilities."""
-import os, glob, uuid
+import uuid
 from datetime import datetime
-from typing import List, Dict, Optional
-from backend.core.paths import REVIEWS_DIR
-from backend.core.jsonio import load_json, save_json, ensure_parent
-from backend.authentication.utils import load_active_users, save_active_users
+from typing import Any, List, Dict, Optional, Tuple
+from backend.core import storage
+from backend.core.jsonio import thaw
+from backend.core.transactions import transaction
+from backend.authentication import utils as user_utils
 from backend.reviews import schemas
+from backend.reviews.orderings import orderings_for
+from backend.reviews.stats import RatingStats, stats_for, summary
+from backend.reviews.user_index import ReviewUserIndex, index_for
+from backend.reviews.votes import ReviewVotes, all_votes, votes_for
 
 
-def _path(movie_id: str) -> str:
-    ensure_parent(os.path.join(REVIEWS_DIR, "placeholder"))
-    return os.path.join(REVIEWS_DIR, f"{movie_id}_reviews.json")
+def _reviews() -> storage.Collection:
+    return storage.collection("reviews")
+
+
+def _user_index() -> ReviewUserIndex:
+    return index_for(_reviews())
+
+
+def _stats() -> RatingStats:
+    return stats_for(storage.collection("movies"))
+
+
+def _votes() -> ReviewVotes:
+    reviews, stats = _reviews(), _stats()
+
+    def apply(movie_id: str, review_id: str, helpful: int, total: int) -> Optional[Tuple[int, int]]:
+        old = reviews.get(review_id, partition=movie_id)
+        if old is None:  # deleted since the vote
+            return None
+        r = thaw(old)
+        usefulness = r.setdefault("usefulness", {"helpful": 0, "total_votes": 0})
+        usefulness["helpful"] = usefulness.get("helpful", 0) + helpful
+        usefulness["total_votes"] = usefulness.get("total_votes", 0) + total
+        reviews.put(r)
+        stats.update(old, r)
+        return usefulness["helpful"], usefulness["total_votes"]
+
+    def settle(movie_id: str, review_id: str, helpful: int, total: int) -> bool:
+        # The stats were committed with the flushed offset; only the review can lag behind it
+        old = reviews.get(review_id, partition=movie_id)
+        usefulness = (old or {}).get("usefulness") or {}
+        if old is None or (usefulness.get("helpful", 0), usefulness.get("total_votes", 0)) == (helpful, total):
+            return False
+        r = thaw(old)
+        r["usefulness"] = {"helpful": helpful, "total_votes": total}
+        reviews.put(r)
+        return True
+
+    return votes_for(reviews, lambda movie_id: ([reviews.document_path(movie_id), stats.path(movie_id)],
+                                                [stats.directory]), apply, settle)
+
+
+def _review_locks(movie_id: str, user_id: str) -> Tuple[List[str], List[str]]:
+    """(held, shared) paths of a review write: its document, the user's index shard and the movie's stats."""
+    index, stats = _user_index(), _stats()
+    return ([_reviews().document_path(movie_id), index.shard_path(user_id), stats.path(movie_id)],
+            [index.directory, stats.directory])
 
 
 def load_reviews(movie_id: str) -> List[Dict]:
-    return load_json(_path(movie_id), default=[])
+    return _reviews().load_document(movie_id)
+
+
+def view_reviews(movie_id: str) -> List[Dict]:
+    """Read-only records of a movie's reviews."""
+    return _reviews().query(movie_id=movie_id)
 
 
 def save_reviews(movie_id: str, reviews: List[Dict]) -> None:
-    save_json(_path(movie_id), reviews, atomic=True)
+    _reviews().save_document(reviews, movie_id)
 
 
 def user_already_reviewed(movie_id: str, user_id: str) -> bool:
     """Check if the user already has a review for the movie."""
-    users = load_active_users()
-    for u in users:
-        if u.get("user_id") == user_id:
-            return movie_id in u.get("movies_reviewed", [])
-    return False
+    user = user_utils.get_active_user(user_id)
+    return user is not None and movie_id in user.get("movies_reviewed", [])
 
 
 def add_review(movie_id: str, review_data, user_id: str):
     """Add a new review for a movie; ensures unique ID and timestamp."""
-    reviews = load_reviews(movie_id)
-
-    # Prevent duplicate by same user
-    if any(r.get("user_id") == user_id for r in reviews):
-        raise ValueError("User already has a review for this movie.")
-
-    new_review = {
-        "review_id": str(uuid.uuid4()),
-        "movie_id": movie_id,
-        "user_id": user_id,
-        "title": review_data.title,
-        "rating": review_data.rating,
-        "text": review_data.text,
-        "date": datetime.utcnow().date().isoformat(),
-        "usefulness": {"helpful": 0, "total_votes": 0},
-    }
-
-    reviews.append(new_review)
-    save_reviews(movie_id, reviews)
-
-    # Optionally add the movie_id to user's movies_reviewed
-    from backend.authentication import utils as user_utils
-    users = user_utils.load_active_users()
-    for u in users:
-        if u["user_id"] == user_id:
-            u.setdefault("movies_reviewed", [])
-            if movie_id not in u["movies_reviewed"]:
-                u["movies_reviewed"].append(movie_id)
-    user_utils.save_active_users(users)
+    index, stats = _user_index(), _stats()
+    paths, shared = _review_locks(movie_id, user_id)
+    user_paths, user_shared = user_utils.user_locks(user_id)
+    with transaction(*paths, *user_paths, shared=shared + user_shared):
+        # Prevent duplicate by same user
+        if _reviews().query(movie_id=movie_id, user_id=user_id):
+            raise ValueError("User already has a review for this movie.")
+
+        new_review = {
+            "review_id": str(uuid.uuid4()),
+            "movie_id": movie_id,
+            "user_id": user_id,
+            "title": review_data.title,
+            "rating": review_data.rating,
+            "text": review_data.text,
+            "date": datetime.utcnow().date().isoformat(),
+            "usefulness": {"helpful": 0, "total_votes": 0},
+        }
+
+        _reviews().put(new_review)
+        index.update(None, new_review)
+        stats.update(None, new_review)
+
+        # Optionally add the movie_id to user's movies_reviewed
+        user = user_utils.get_active_user(user_id)
+        if user is not None and movie_id not in user.setdefault("movies_reviewed", []):
+            user["movies_reviewed"].append(movie_id)
+            user_utils.save_user(user)
 
     return new_review
 
 
 def get_review(movie_id: str, review_id: str) -> Optional[Dict]:
-    return next((r for r in load_reviews(movie_id) if r.get("review_id") == review_id), None)
+    return _reviews().get(review_id, partition=movie_id)
 
 
 def update_review(movie_id: str, review_id: str, updates: schemas.ReviewUpdate) -> Optional[Dict]:
-    reviews = load_reviews(movie_id)
-    for r in reviews:
-        if r.get("review_id") == review_id:
-            for k, v in updates.dict(exclude_unset=True).items():
-                r[k] = v
-            r["date"] = datetime.utcnow().date().isoformat()
-            save_reviews(movie_id, reviews)
-            return r
-    return None
+    found = get_review(movie_id, review_id)  # for its user_id, which a review keeps
+    if found is None:
+        return None
+    index, stats = _user_index(), _stats()
+    paths, shared = _review_locks(movie_id, found.get("user_id"))
+    with transaction(*paths, shared=shared):
+        old = get_review(movie_id, review_id)
+        if old is None:
+            return None
+        r = thaw(old)
+        for k, v in updates.dict(exclude_unset=True).items():
+            r[k] = v
+        r["date"] = datetime.utcnow().date().isoformat()
+        _reviews().put(r)
+        if r.get("rating") != old.get("rating"):
+            index.update(old, r)
+            stats.update(old, r)
+        return r
 
 
 def delete_review(movie_id: str, review_id: str) -> bool:
-    reviews = load_reviews(movie_id)
-    updated = [r for r in reviews if r.get("review_id") != review_id]
-    if len(updated) == len(reviews):
+    found = get_review(movie_id, review_id)  # for its user_id, which a review keeps
+    if found is None:
         return False
-    save_reviews(movie_id, updated)
-    return True
-
-
-def add_vote(movie_id: str, review_id: str, vote: schemas.Vote) -> Optional[Dict]:
-    reviews = load_reviews(movie_id)
-    for r in reviews:
-        if r.get("review_id") == review_id:
-            r.setdefault("usefulness", {"helpful": 0, "total_votes": 0})
-            r["usefulness"]["total_votes"] += 1
-            if vote.vote:
-                r["usefulness"]["helpful"] += 1
-            save_reviews(movie_id, reviews)
-            return r
-    return None
+    index, stats = _user_index(), _stats()
+    paths, shared = _review_locks(movie_id, found.get("user_id"))
+    with transaction(*paths, shared=shared):
+        old = get_review(movie_id, review_id)
+        if old is None or not _reviews().delete(review_id, partition=movie_id):
+            return False
+        index.update(old, None)
+        stats.update(old, None)
+        return True
+
+
+def add_vote(movie_id: str, review_id: str, vote: schemas.Vote, user_id: str) -> Optional[Dict]:
+    """
+    Record user_id's vote on a review; voting again replaces the user's earlier vote.
+    The review's usefulness is updated by the next vote flush; the returned review includes it.
+    """
+    votes = _votes()
+    with transaction(votes.log_path(movie_id)):
+        review = get_review(movie_id, review_id)
+        if review is None:
+            return None
+        votes.cast(movie_id, review_id, user_id, vote.vote)
+    r = thaw(review)
+    helpful, total = votes.pending(movie_id, review_id)
+    usefulness = r.setdefault("usefulness", {"helpful": 0, "total_votes": 0})
+    usefulness["helpful"] = usefulness.get("helpful", 0) + helpful
+    usefulness["total_votes"] = usefulness.get("total_votes", 0) + total
+    return r
+
+
+def flush_votes() -> int:
+    """Fold every pending vote into the reviews now. Returns the number of reviews changed."""
+    return _votes().flush()
+
+
+def recover_votes() -> int:
+    """Apply votes a previous run logged but did not flush (called at startup)."""
+    return _votes().recover()
+
+
+def shutdown_votes() -> None:
+    """Stop the vote flushers and flush what they hold (called on app shutdown)."""
+    for votes in all_votes():
+        votes.shutdown()
 
 
 def filter_sort_reviews(
@@ -112,24 +199,45 @@ def filter_sort_reviews(
     limit: int = 20,
 ) -> List[Dict]:
     """Filter and sort reviews for a movie."""
-    reviews = load_reviews(movie_id)
-    if rating is not None:
-        reviews = [r for r in reviews if r.get("rating") == rating]
+    return review_page(movie_id, rating, sort_by, order, skip, limit)[0]
 
-    reverse = order.lower() == "desc"
-    if sort_by in {"date", "rating"}:
-        reviews.sort(key=lambda r: r.get(sort_by), reverse=reverse)
-    elif sort_by == "helpful":
-        reviews.sort(key=lambda r: r.get("usefulness", {}).get("helpful", 0), reverse=reverse)
-    elif sort_by == "total_votes":
-        reviews.sort(key=lambda r: r.get("usefulness", {}).get("total_votes", 0), reverse=reverse)
 
-    return reviews[skip: skip + limit]
+def review_page(
+    movie_id: str,
+    rating: Optional[int] = None,
+    sort_by: str = "date",
+    order: str = "desc",
+    skip: int = 0,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+) -> Tuple[List[Dict], Optional[str]]:
+    """
+    One page of a movie's reviews from its cached sorted orderings (ties by review_id), and the
+    cursor for the next page (None on the last). cursor, when set, takes the place of skip.
+    Raises ValueError for an invalid cursor.
+    """
+    reviews = _reviews()
+    return orderings_for(reviews).page(movie_id, lambda: reviews.view_document(movie_id), rating, sort_by,
+                                       order, skip, limit, cursor, version=reviews.document_version(movie_id))
+
+
+def get_user_review_refs(user_id: str) -> List[Tuple[str, str, Any]]:
+    """(movie_id, review_id, rating) of every review by a user, from the per-user index."""
+    return _user_index().refs(user_id, load=_reviews().all)
 
 
 def get_reviews_by_user(user_id: str) -> List[Dict]:
     """Return all reviews by a specific user across all movies."""
-    out: List[Dict] = []
-    for path in glob.glob(os.path.join(REVIEWS_DIR, "*_reviews.json")):
-        out.extend([r for r in load_json(path, default=[]) if r.get("user_id") == user_id])
-    return out
+    reviews = _reviews()
+    found = (reviews.get(review_id, partition=movie_id) for movie_id, review_id, _ in get_user_review_refs(user_id))
+    return [r for r in found if r is not None]
+
+
+def get_rating_stats(movie_id: str) -> Dict[str, Any]:
+    """A movie's review count, average and stddev rating, 1-10 histogram and helpful-vote totals."""
+    return summary(_stats().get(movie_id, load=_reviews().all))
+
+
+def rating_stats_table():
+    """(version token, {movie_id: aggregate}) of every movie with reviews, for sorting."""
+    return _stats().table(load=_reviews().all)
@@ -0,0 +1,289 @@
+"""Per-user review votes: an append-only vote log per movie plus sharded in-memory counters.
+
+Layout under <reviews directory>/votes:
+    <movie_id>.log    one line per vote that changed something: [review_id, user_id, vote, d_helpful, d_total]
+    <movie_id>.json   {"flushed": n, "applied": {review_id: [helpful, total]}} - the review records
+                      reflect the first n bytes of the log, and the last flush set those counts
+
+A vote is keyed by (review_id, user_id): repeating it changes nothing and switching it moves
+one vote between helpful and not helpful, so total_votes counts voters. Casting holds the log's
+lock, checks the user's previous vote against the replayed log, appends one short line and adds
+the change to an in-memory counter; the review file is not touched. Counters are split into
+shards by movie, each with its own lock, so votes on different movies do not contend.
+
+Every FLUSH_SECONDS (and on shutdown) a background thread folds each dirty movie's log tail into
+its reviews' usefulness, in one transaction with the new flushed offset, so a burst of votes
+costs one review write per voted review per flush. The deltas are read back from the log rather
+than taken from the counters, so votes appended by another process or left unflushed by a crash
+are applied by the next flush of that movie; recover() finds those at startup. A fully flushed
+log past COMPACT_BYTES is rewritten with one line per current vote.
+
+The flushed offset is a file, while the reviews may live elsewhere (SQLite) and are committed
+after it, so a crash in between could mark votes flushed that no review received. The offset is
+therefore written with the counts the flush gave each review, and every flush (and recover(), for
+every movie with a log) first settles the reviews of the previous one to those counts.
+"""
+import json, logging, os, threading, zlib
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from backend.core import jsonio
+from backend.core.transactions import TransactionError, current, transaction
+
+logger = logging.getLogger(__name__)
+
+FLUSH_SECONDS = 2.0
+COMPACT_BYTES = 1 << 20
+SHARDS = 16
+CACHE_MAX_MOVIES = 64
+
+Deltas = Dict[str, List[int]]  # review_id -> [d_helpful, d_total]
+Locks = Callable[[str], Tuple[Iterable[str], Iterable[str]]]  # movie_id -> further (held, shared) paths of a flush
+Apply = Callable[[str, str, int, int], Optional[Tuple[int, int]]]  # (movie_id, review_id, d_helpful, d_total)
+#   -> the review's new (helpful, total), None if it is gone; called under those locks
+Settle = Callable[[str, str, int, int], bool]  # set a review's (helpful, total); True if it differed
+
+
+def _change(previous: Optional[bool], vote: bool) -> Tuple[int, int]:
+    """(d_helpful, d_total) of a user's vote going from previous (None = no vote) to vote."""
+    if previous is None:
+        return int(vote), 1
+    return int(vote) - int(previous), 0
+
+
+class _Replay:
+    def __init__(self, ino):
+        self.ino = ino
+        self.offset = 0
+        self.votes: Dict[Tuple[str, str], bool] = {}
+
+
+class _Shard:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending: Dict[str, Deltas] = {}  # movie_id -> unflushed changes cast in this process
+
+
+class ReviewVotes:
+    def __init__(self, directory: str, locks: Locks, apply: Apply, settle: Settle,
+                 flush_seconds: float = FLUSH_SECONDS, compact_bytes: int = COMPACT_BYTES):
+        self.directory = directory
+        self.locks = locks
+        self.apply = apply
+        self.settle = settle
+        self.flush_seconds = flush_seconds
+        self.compact_bytes = compact_bytes
+        self._shards = [_Shard() for _ in range(SHARDS)]
+        self._replays: "OrderedDict[str, _Replay]" = OrderedDict()
+        self._replay_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._thread_lock = threading.Lock()
+        self.flushes = self.compactions = 0
+
+    def log_path(self, movie_id: str) -> str:
+        return os.path.join(self.directory, f"{movie_id}.log")
+
+    def meta_path(self, movie_id: str) -> str:
+        return os.path.join(self.directory, f"{movie_id}.json")
+
+    def _shard(self, movie_id: str) -> _Shard:
+        return self._shards[zlib.crc32(movie_id.encode("utf-8")) % SHARDS]
+
+    # --- log replay ---
+
+    @staticmethod
+    def _lines(data: bytes) -> Iterable[list]:
+        for line in data.decode("utf-8").splitlines():
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                logger.warning("Skipping unreadable vote log entry")
+
+    def _read(self, movie_id: str, start: int = 0) -> Tuple[bytes, int]:
+        """The log's complete lines from start on, and the offset after them."""
+        try:
+            with open(self.log_path(movie_id), "rb") as f:
+                f.seek(start)
+                data = f.read()
+        except OSError:
+            return b"", start
+        end = data.rfind(b"\n") + 1  # ignore a torn final line
+        return data[:end], start + end
+
+    def votes(self, movie_id: str) -> Dict[Tuple[str, str], bool]:
+        """{(review_id, user_id): vote} as of the log on disk, replaying only what was appended since last time."""
+        try:
+            st = os.stat(self.log_path(movie_id))
+            ino, size = st.st_ino, st.st_size
+        except OSError:
+            ino, size = None, 0
+        with self._replay_lock:
+            replay = self._replays.get(movie_id)
+            if replay is None or replay.ino != ino or size < replay.offset:
+                replay = _Replay(ino)
+            if size > replay.offset:
+                data, replay.offset = self._read(movie_id, replay.offset)
+                for entry in self._lines(data):
+                    replay.votes[(entry[0], entry[1])] = bool(entry[2])
+            self._replays[movie_id] = replay
+            self._replays.move_to_end(movie_id)
+            while len(self._replays) > CACHE_MAX_MOVIES:
+                self._replays.popitem(last=False)
+            return replay.votes
+
+    # --- casting (inside a transaction holding log_path(movie_id)) ---
+
+    def cast(self, movie_id: str, review_id: str, user_id: str, vote: bool) -> Tuple[int, int]:
+        """Record user_id's vote on a review. Returns the (d_helpful, d_total) it caused ((0, 0) if a repeat)."""
+        path = self.log_path(movie_id)
+        tx = current()
+        if tx is None or not tx.holds(path):
+            raise TransactionError("ReviewVotes.cast needs a transaction holding the movie's vote log")
+        helpful, total = _change(self.votes(movie_id).get((review_id, user_id)), vote)
+        if (helpful, total) == (0, 0):
+            return 0, 0
+        tx.stage_append(path, json.dumps([review_id, user_id, int(vote), helpful, total], separators=(",", ":")))
+        shard = self._shard(movie_id)
+        with shard.lock:
+            counts = shard.pending.setdefault(movie_id, {}).setdefault(review_id, [0, 0])
+            counts[0] += helpful
+            counts[1] += total
+        self.start()
+        return helpful, total
+
+    def pending(self, movie_id: str, review_id: str) -> Tuple[int, int]:
+        """Changes to a review cast in this process and not yet flushed."""
+        shard = self._shard(movie_id)
+        with shard.lock:
+            helpful, total = shard.pending.get(movie_id, {}).get(review_id, (0, 0))
+        return helpful, total
+
+    def dirty(self) -> List[str]:
+        movies: List[str] = []
+        for shard in self._shards:
+            with shard.lock:
+                movies.extend(shard.pending)
+        return movies
+
+    # --- flushing ---
+
+    def flush(self, movie_ids: Optional[Iterable[str]] = None) -> int:
+        """Fold the unflushed votes of movie_ids (default: every dirty movie) into the reviews. Returns reviews changed."""
+        changed = 0
+        for movie_id in (self.dirty() if movie_ids is None else list(movie_ids)):
+            paths, shared = self.locks(movie_id)
+            with transaction(self.log_path(movie_id), self.meta_path(movie_id), *paths, shared=shared):
+                meta = jsonio.load_json(self.meta_path(movie_id), default={})
+                for review_id, (helpful, total) in (meta.get("applied") or {}).items():
+                    if self.settle(movie_id, review_id, helpful, total):
+                        logger.warning("Restored the votes of review %s from its last flush", review_id)
+                        changed += 1
+                deltas, end = self._take(movie_id, meta)
+                applied: Dict[str, List[int]] = {}
+                for review_id, (helpful, total) in deltas.items():
+                    if helpful or total:
+                        counts = self.apply(movie_id, review_id, helpful, total)
+                        if counts is not None:
+                            applied[review_id] = list(counts)
+                        changed += 1
+                if end != meta.get("flushed", 0) or applied:
+                    jsonio.save_json(self.meta_path(movie_id), {"flushed": end, "applied": applied})
+        self.flushes += 1
+        return changed
+
+    def _take(self, movie_id: str, meta: Dict) -> Tuple[Deltas, int]:
+        """Sum the log past the flushed offset and clear the movie's counters. Returns the sums and the new offset."""
+        data, end = self._read(movie_id, meta.get("flushed", 0))
+        deltas: Deltas = {}
+        for entry in self._lines(data):
+            counts = deltas.setdefault(entry[0], [0, 0])
+            counts[0] += entry[3]
+            counts[1] += entry[4]
+        shard = self._shard(movie_id)
+        with shard.lock:
+            shard.pending.pop(movie_id, None)
+        if end >= self.compact_bytes:
+            end = self._compact(movie_id)
+        return deltas, end
+
+    def _compact(self, movie_id: str) -> int:
+        """Stage the log rewritten as one line per current vote. Returns its length."""
+        lines = [json.dumps([review_id, user_id, int(vote), 0, 0], separators=(",", ":"))
+                 for (review_id, user_id), vote in self.votes(movie_id).items()]
+        text = "".join(line + "\n" for line in lines)
+        current().stage_text(self.log_path(movie_id), text)
+        self.compactions += 1
+        return len(text.encode("utf-8"))
+
+    def logged(self) -> List[str]:
+        """Movies with a vote log."""
+        if not os.path.isdir(self.directory):
+            return []
+        with os.scandir(self.directory) as entries:
+            return sorted(e.name[: -len(".log")] for e in entries if e.name.endswith(".log"))
+
+    def unflushed(self) -> List[str]:
+        """Movies whose log holds votes not yet folded into their reviews."""
+        movies = []
+        for movie_id in self.logged():
+            flushed = jsonio.load_json_view(self.meta_path(movie_id), default={}).get("flushed", 0)
+            try:
+                size = os.path.getsize(self.log_path(movie_id))
+            except OSError:
+                continue
+            if size > flushed:
+                movies.append(movie_id)
+        return movies
+
+    def recover(self) -> int:
+        """
+        Flush whatever a previous run left unflushed and settle every movie's last flush.
+        Returns the number of reviews changed.
+        """
+        return self.flush(self.logged())
+
+    # --- background flusher ---
+
+    def start(self) -> None:
+        with self._thread_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name="review-vote-flusher", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.flush_seconds):
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Flushing review votes failed")
+
+    def shutdown(self) -> None:
+        """Stop the flusher and flush what is pending (called on app shutdown)."""
+        with self._thread_lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stop.set()
+            thread.join()
+        self.flush()
+
+
+_votes: Dict[str, ReviewVotes] = {}
+_votes_lock = threading.Lock()
+
+
+def votes_for(reviews, locks: Locks, apply: Apply, settle: Settle) -> ReviewVotes:
+    """The (shared) votes of a reviews collection; the callbacks are used when it is first created."""
+    directory = os.path.join(reviews.spec.directory, "votes")
+    with _votes_lock:
+        if directory not in _votes:
+            _votes[directory] = ReviewVotes(directory, locks, apply, settle)
+        return _votes[directory]
+
+
+def all_votes() -> List[ReviewVotes]:
+    with _votes_lock:
+        return list(_votes.values())
@@ -1,54 +1,78 @@
-import os
+"""Import the IMDb dump (backend/data/movieData/<movie>/{metadata.json,movieReviews.csv}).
+
+Usage (from the repository root):
+    python -m backend.scripts.migrate_movies
+    python -m backend.scripts.migrate_movies --workers 8 --source /path/to/movieData
+    python -m backend.scripts.migrate_movies --workers 1 --data-dir /tmp/data
+
+Movie folders are migrated in a process pool. Each worker writes the movie record, the movie's
+review document and its votes file, and returns the usernames it saw. Review columns are
+cleaned and validated as whole pandas columns; the HTML parser only runs on cells that contain
+markup. Reviewers become inactive users: ids are derived from the username (existing inactive
+users keep theirs), and the per-folder user lists are merged in folder-name order at the end,
+so the result does not depend on which worker finished first. Movie and review ids are derived
+from the folder name and row, so migrating the same dump twice writes the same records. The
+per-user review index and the rating stats are rebuilt at the end.
+"""
+import argparse
 import json
+import os
+import time
 import uuid
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+
 import pandas as pd
 from bs4 import BeautifulSoup
 
-# Path setup
-BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
-DATA_DIR = os.path.join(BASE_DIR, "data")
+from backend.core import jsonio, storage
+from backend.core.paths import DATA_DIR
+from backend.reviews.stats import stats_for
+from backend.reviews.user_index import index_for
+
 MOVIE_DATA_DIR = os.path.join(DATA_DIR, "movieData")
 
-MOVIES_DIR = os.path.join(DATA_DIR, "movies")
-REVIEWS_DIR = os.path.join(DATA_DIR, "reviews")
-VOTES_DIR = os.path.join(DATA_DIR, "votes")
+COLUMNS = {
+    "date": ["Date of Review", "Date", "Review Date"],
+    "user": ["User", "Username"],
+    "helpful": ["Usefulness Vote", "Helpful", "Helpful Votes"],
+    "total": ["Total Votes", "Votes"],
+    "rating": ["User's Rating out of 10", "Rating", "User Rating"],
+    "title": ["Review Title", "Title"],
+    "text": ["Review", "Review Text", "Content", "Body"],
+}
+REQUIRED = ("user", "helpful", "total", "rating")
+MARKUP = r"[<&]"  # cells without a tag or an entity need no HTML parser
 
-USERS_INACTIVE_PATH = os.path.join(DATA_DIR, "users_inactive.json")
-USERS_ACTIVE_PATH = os.path.join(DATA_DIR, "users_active.json")
+# Existing inactive users (username -> user_id), set once per worker by _init_worker
+_known_users: Dict[str, str] = {}
 
-# Helper functions
-def ensure_dirs():
-    os.makedirs(MOVIES_DIR, exist_ok=True)
-    os.makedirs(REVIEWS_DIR, exist_ok=True)
-    os.makedirs(VOTES_DIR, exist_ok=True)
 
+# Helper functions
 def clean_text(val: object) -> str:
     """Strip HTML and trim whitespace."""
     if not isinstance(val, str):
         return ""
+    if "<" not in val and "&" not in val:
+        return val.strip()
     return BeautifulSoup(val, "html.parser").get_text().strip()
 
-def load_users(path):
-    if os.path.exists(path):
-        try:
-            with open(path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-                if isinstance(data, list):
-                    return data
-        except Exception:
-            pass
-    return []
 
-def save_users(path, users):
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(users, f, indent=4, ensure_ascii=False)
+def clean_column(values: pd.Series) -> pd.Series:
+    """clean_text over a column: plain cells are only stripped."""
+    text = values.fillna("").astype(str)
+    out = text.str.strip()
+    markup = text.str.contains(MARKUP, regex=True)
+    if markup.any():
+        out[markup] = text[markup].map(clean_text)
+    return out
+
+
+def int_column(values: pd.Series) -> pd.Series:
+    """Integers written as plain digits (surrounding spaces allowed); anything else is NaN."""
+    text = values.fillna("").astype(str).str.strip()
+    return pd.to_numeric(text.where(text.str.fullmatch(r"[+-]?\d+")), errors="coerce")
 
-def find_user(users, username):
-    """Return (index, user_dict) or (None, None)."""
-    for i, u in enumerate(users):
-        if u.get("username") == username:
-            return i, u
-    return None, None
 
 def try_parse_int(val):
     try:
@@ -63,12 +87,6 @@ def try_parse_int(val):
         except Exception:
             return None
 
-def safe_int(val):
-    if pd.isna(val):
-        raise ValueError("NaN")
-    if isinstance(val, str):
-        val = val.strip()
-    return int(val)
 
 def to_iso_date(date_str: str) -> str:
     """Try to parse to YYYY-MM-DD, fallback to original cleaned."""
@@ -83,167 +101,209 @@ def to_iso_date(date_str: str) -> str:
     except Exception:
         return s
 
-# Migration Logic
-def migrate_all_movies():
-    ensure_dirs()
-
-    inactive_users = load_users(USERS_INACTIVE_PATH)
-    user_index = {u["username"]: u for u in inactive_users}
 
-    for movie_folder in os.listdir(MOVIE_DATA_DIR):
-        folder_path = os.path.join(MOVIE_DATA_DIR, movie_folder)
-        metadata_path = os.path.join(folder_path, "metadata.json")
-        reviews_path = os.path.join(folder_path, "movieReviews.csv")
+def date_column(values: pd.Series) -> pd.Series:
+    """to_iso_date over a column, parsing each distinct date once."""
+    cleaned = clean_column(values)
+    return cleaned.map({s: to_iso_date(s) for s in cleaned.unique()})
+
+
+def user_id_for(username: str) -> str:
+    return _known_users.get(username) or str(uuid.uuid5(uuid.NAMESPACE_URL, f"imdb-user:{username}"))
+
+
+def inactive_user(username: str, user_id: str) -> Dict[str, Any]:
+    return {
+        "user_id": user_id,
+        "username": username,
+        "email": f"{username}@inactive.com",
+        "hashed_password": "inactive_user",
+        "role": "member",
+        "status": "inactive",
+        "movies_reviewed": [],
+    }
+
+
+def movie_doc(movie_id: str, folder: str, md: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "movie_id": movie_id,
+        "title": md.get("title"),
+        "imdb_rating": md.get("movieIMDbRating"),
+        "meta_score": try_parse_int(md.get("metaScore")),
+        "genres": md.get("movieGenres", []) or [],
+        "directors": md.get("directors", []) or [],
+        "release_date": md.get("datePublished"),
+        "duration": md.get("duration"),
+        "description": md.get("description"),
+        "main_stars": md.get("mainStars", []) or [],
+        "total_user_reviews": try_parse_int(md.get("totalUserReviews")),
+        "total_critic_reviews": try_parse_int(md.get("totalCriticReviews")),
+        "total_rating_count": try_parse_int(md.get("totalRatingCount")),
+        "source_folder": folder,
+    }
+
+
+def read_reviews(path: str) -> pd.DataFrame:
+    try:
+        return pd.read_csv(path, dtype=str, encoding_errors="ignore", on_bad_lines="skip")
+    except TypeError:
+        return pd.read_csv(path, dtype=str, encoding_errors="ignore")
+
+
+def review_rows(df: pd.DataFrame) -> Optional[pd.DataFrame]:
+    """The valid reviews of a CSV as clean columns, or None if a required column is missing."""
+    picked = {name: next((c for c in names if c in df.columns), None) for name, names in COLUMNS.items()}
+    if any(picked[name] is None for name in REQUIRED):
+        return None
+    empty = pd.Series("", index=df.index, dtype=object)
+    col = lambda name: df[picked[name]] if picked[name] else empty
+    rows = pd.DataFrame({
+        "user": clean_column(col("user")),
+        "helpful": int_column(col("helpful")),
+        "total": int_column(col("total")),
+        "rating": int_column(col("rating")),
+    })
+    valid = ((rows["user"] != "") & rows[["helpful", "total", "rating"]].notna().all(axis=1)
+             & (rows["helpful"] >= 0) & (rows["helpful"] <= rows["total"])
+             & rows["rating"].between(0, 10))
+    rows = rows[valid].astype({"helpful": "int64", "total": "int64", "rating": "int64"})
+    rows["title"] = clean_column(col("title")[valid])
+    rows["text"] = clean_column(col("text")[valid])
+    rows["date"] = date_column(col("date")[valid]) if picked["date"] else ""
+    return rows
 
-        if not os.path.isdir(folder_path):
-            continue
-        if not os.path.exists(metadata_path) or not os.path.exists(reviews_path):
-            print(f"⚠️ Skipping {movie_folder}: missing metadata or CSV.")
-            continue
 
-        # --- Movie metadata ---
-        try:
-            with open(metadata_path, "r", encoding="utf-8") as f:
-                md = json.load(f)
-        except Exception as e:
-            print(f"⚠️ Error reading {movie_folder}/metadata.json: {e}")
-            continue
-
-        movie_id = str(uuid.uuid4())
-        movie_doc = {
+# Migration Logic
+def _init_worker(known_users: Dict[str, str]) -> None:
+    global _known_users
+    _known_users = known_users
+
+
+def migrate_folder(folder_path: str, data_dir: str = DATA_DIR) -> Dict[str, Any]:
+    """Migrate one movie folder. Returns its counts and the usernames of its reviewers in order."""
+    folder = os.path.basename(folder_path)
+    result = {"folder": folder, "movie_id": None, "reviews": 0, "skipped": 0, "users": [], "error": None}
+    metadata_path = os.path.join(folder_path, "metadata.json")
+    reviews_path = os.path.join(folder_path, "movieReviews.csv")
+    if not os.path.exists(metadata_path) or not os.path.exists(reviews_path):
+        result["error"] = "missing metadata or CSV"
+        return result
+    try:
+        with open(metadata_path, "r", encoding="utf-8") as f:
+            md = json.load(f)
+    except Exception as e:
+        result["error"] = f"error reading metadata.json: {e}"
+        return result
+
+    engine = storage.JsonFileEngine(data_dir=data_dir)
+    movie_id = str(uuid.uuid5(uuid.NAMESPACE_URL, f"imdb-movie:{folder}"))
+    engine.collection("movies").put(movie_doc(movie_id, folder, md))
+    result["movie_id"] = movie_id
+
+    df = read_reviews(reviews_path)
+    rows = review_rows(df)
+    if rows is None:
+        result["error"] = "missing required columns"
+        return result
+
+    reviews, votes = [], []
+    for row, user, title, rating, date, text, helpful, total in zip(
+            rows.index.tolist(), rows["user"].tolist(), rows["title"].tolist(), rows["rating"].tolist(),
+            rows["date"].tolist(), rows["text"].tolist(), rows["helpful"].tolist(), rows["total"].tolist()):
+        review_id = str(uuid.uuid5(uuid.NAMESPACE_URL, f"imdb-review:{folder}:{row}"))
+        reviews.append({
+            "review_id": review_id,
             "movie_id": movie_id,
-            "title": md.get("title"),
-            "imdb_rating": md.get("movieIMDbRating"),
-            "meta_score": try_parse_int(md.get("metaScore")),
-            "genres": md.get("movieGenres", []) or [],
-            "directors": md.get("directors", []) or [],
-            "release_date": md.get("datePublished"),
-            "duration": md.get("duration"),
-            "description": md.get("description"),
-            "main_stars": md.get("mainStars", []) or [],
-            "total_user_reviews": try_parse_int(md.get("totalUserReviews")),
-            "total_critic_reviews": try_parse_int(md.get("totalCriticReviews")),
-            "total_rating_count": try_parse_int(md.get("totalRatingCount")),
-            "source_folder": movie_folder,
-        }
-
-        movie_out = os.path.join(MOVIES_DIR, f"{movie_id}.json")
-        with open(movie_out, "w", encoding="utf-8") as f:
-            json.dump(movie_doc, f, indent=4, ensure_ascii=False)
-
-        # --- Reviews ---
-        try:
-            df = pd.read_csv(reviews_path, dtype=str, encoding_errors="ignore", on_bad_lines="skip")
-        except TypeError:
-            df = pd.read_csv(reviews_path, dtype=str, encoding_errors="ignore")
-
-        col_map = {
-            "Date of Review": ["Date of Review", "Date", "Review Date"],
-            "User": ["User", "Username"],
-            "Usefulness Vote": ["Usefulness Vote", "Helpful", "Helpful Votes"],
-            "Total Votes": ["Total Votes", "Votes"],
-            "User's Rating out of 10": ["User's Rating out of 10", "Rating", "User Rating"],
-            "Review Title": ["Review Title", "Title"],
-            "Review": ["Review", "Review Text", "Content", "Body"],
-        }
-
-        def pick(cols):
-            for c in cols:
-                if c in df.columns:
-                    return c
-            return None
+            "user_id": user_id_for(user),
+            "title": title,
+            "rating": rating,
+            "date": date,
+            "text": text,
+            "usefulness": {"helpful": helpful, "total_votes": total},
+        })
+        votes.append({
+            "review_id": review_id,
+            "helpful_votes": helpful,
+            "total_votes": total,
+            "helpfulness_ratio": round(helpful / total, 2) if total > 0 else 0,
+        })
+    engine.collection("reviews").save_document(reviews, movie_id)
+    jsonio.save_json(os.path.join(data_dir, "votes", f"{movie_id}_votes.json"), votes)
+
+    result.update(reviews=len(reviews), skipped=len(df) - len(reviews), users=rows["user"].unique().tolist())
+    return result
+
+
+def merge_users(results: List[Dict[str, Any]], existing: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Users added or changed by the folder results, merged in folder-name order."""
+    changed: Dict[str, Dict[str, Any]] = {}
+    for result in sorted(results, key=lambda r: r["folder"]):
+        for username in result["users"]:
+            user = changed.get(username)
+            if user is None:
+                user = existing.get(username) or inactive_user(username, user_id_for(username))
+                user = changed[username] = {**user, "movies_reviewed": list(user.get("movies_reviewed") or [])}
+            if result["movie_id"] not in user["movies_reviewed"]:
+                user["movies_reviewed"].append(result["movie_id"])
+    return [u for name, u in changed.items() if u != existing.get(name)]
+
+
+def migrate_all_movies(source: str = MOVIE_DATA_DIR, data_dir: str = DATA_DIR,
+                       workers: Optional[int] = None) -> Dict[str, Any]:
+    """Migrate every folder under source into data_dir. workers=1 runs in this process."""
+    engine = storage.JsonFileEngine(data_dir=data_dir)
+    inactive = engine.collection("users_inactive")
+    existing = {u["username"]: u for u in inactive.all()}
+    known = {name: u["user_id"] for name, u in existing.items()}
+
+    folders = sorted(os.path.join(source, f) for f in os.listdir(source) if os.path.isdir(os.path.join(source, f)))
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        _init_worker(known)
+        results = [migrate_folder(folder, data_dir) for folder in folders]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(known,)) as pool:
+            results = list(pool.map(migrate_folder, folders, [data_dir] * len(folders), chunksize=4))
+
+    for result in results:
+        if result["error"]:
+            print(f"⚠️ Skipping {result['folder']}: {result['error']}.")
+        else:
+            print(f"Processed {result['folder']}: {result['reviews']} reviews ({result['skipped']} skipped)")
+
+    _init_worker(known)
+    users = merge_users(results, existing)
+    if users:
+        # Bulk path: rewrite the inactive users and rebuild the store's indexes once
+        updated = {u["username"]: u for u in users}
+        merged = [updated.pop(name, u) for name, u in existing.items()] + list(updated.values())
+        inactive.replace_all(merged)
+    reviews = engine.collection("reviews")
+    index_for(reviews).rebuild(reviews.all)
+    stats_for(engine.collection("movies")).rebuild(reviews.all)
+    return {
+        "movies": sum(1 for r in results if r["movie_id"]),
+        "reviews": sum(r["reviews"] for r in results),
+        "skipped_reviews": sum(r["skipped"] for r in results),
+        "skipped_folders": sum(1 for r in results if r["error"]),
+        "users_written": len(users),
+        "inactive_users": len(existing) + sum(1 for u in users if u["username"] not in existing),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Import the IMDb movie folders into backend/data.")
+    parser.add_argument("--source", default=MOVIE_DATA_DIR, help="folder of movie folders (default: backend/data/movieData)")
+    parser.add_argument("--data-dir", default=DATA_DIR, help="JSON data tree to write (default: backend/data)")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    counts = migrate_all_movies(args.source, args.data_dir, args.workers)
+    print(f"\n🎉 Migration complete in {time.perf_counter() - start:.2f}s: "
+          + ", ".join(f"{name}: {count}" for name, count in counts.items()))
 
-        c_date   = pick(col_map["Date of Review"])
-        c_user   = pick(col_map["User"])
-        c_help   = pick(col_map["Usefulness Vote"])
-        c_total  = pick(col_map["Total Votes"])
-        c_rating = pick(col_map["User's Rating out of 10"])
-        c_title  = pick(col_map["Review Title"])
-        c_text   = pick(col_map["Review"])
-
-        required = [c_user, c_help, c_total, c_rating]
-        if any(c is None for c in required):
-            print(f"⚠️ Skipping {movie_folder}: missing required columns.")
-            continue
-
-        reviews, votes = [], []
-        added_rows, bad_rows = 0, 0
-
-        for _, row in df.iterrows():
-            try:
-                username = clean_text(row.get(c_user, ""))
-                if not username:
-                    raise ValueError("missing username")
-
-                helpful = safe_int(row.get(c_help))
-                total = safe_int(row.get(c_total))
-                rating = safe_int(row.get(c_rating))
-
-                if helpful < 0 or total < 0 or helpful > total:
-                    raise ValueError("invalid votes")
-                if rating < 0 or rating > 10:
-                    raise ValueError("rating out of range")
-
-                # --- User handling ---
-                if username not in user_index:
-                    user_id = str(uuid.uuid4())
-                    user = {
-                        "user_id": user_id,
-                        "username": username,
-                        "email": f"{username}@inactive.com",
-                        "hashed_password": "inactive_user",
-                        "role": "member",
-                        "status": "inactive",
-                        "movies_reviewed": [movie_id],
-                    }
-                    inactive_users.append(user)
-                    user_index[username] = user
-                else:
-                    user = user_index[username]
-                    if movie_id not in user["movies_reviewed"]:
-                        user["movies_reviewed"].append(movie_id)
-                    user_id = user["user_id"]
-
-                # --- Review entry ---
-                review_id = str(uuid.uuid4())
-                review_entry = {
-                    "review_id": review_id,
-                    "movie_id": movie_id,
-                    "user_id": user_id,
-                    "title": clean_text(row.get(c_title, "")),
-                    "rating": rating,
-                    "date": to_iso_date(row.get(c_date, "")) if c_date else "",
-                    "text": clean_text(row.get(c_text, "")),
-                    "usefulness": {"helpful": helpful, "total_votes": total},
-                }
-                reviews.append(review_entry)
-
-                votes.append({
-                    "review_id": review_id,
-                    "helpful_votes": helpful,
-                    "total_votes": total,
-                    "helpfulness_ratio": round(helpful / total, 2) if total > 0 else 0
-                })
-                added_rows += 1
-
-            except Exception:
-                bad_rows += 1
-                continue
-
-        # Write per-movie review files
-        reviews_out = os.path.join(REVIEWS_DIR, f"{movie_id}_reviews.json")
-        votes_out = os.path.join(VOTES_DIR, f"{movie_id}_votes.json")
-        with open(reviews_out, "w", encoding="utf-8") as f:
-            json.dump(reviews, f, indent=4, ensure_ascii=False)
-        with open(votes_out, "w", encoding="utf-8") as f:
-            json.dump(votes, f, indent=4, ensure_ascii=False)
-
-        print(f"Processed {movie_folder}: {added_rows} reviews ({bad_rows} skipped)")
-
-    # --- Save inactive users ---
-    save_users(USERS_INACTIVE_PATH, inactive_users)
-    print(f"\n🎉 Migration complete. Total inactive users: {len(inactive_users)}")
 
 # Entrypoint
 if __name__ == "__main__":
-    migrate_all_movies()
+    main()
@@ -0,0 +1,47 @@
+"""Convert a backend/data tree between storage engines.
+
+Usage (from the repository root):
+    python -m backend.scripts.migrate_storage --to sqlite
+    python -m backend.scripts.migrate_storage --to json --db backend/data/store.sqlite3
+    python -m backend.scripts.migrate_storage --to sqlite --data-dir /path/to/data --db /tmp/store.sqlite3
+"""
+import argparse
+import time
+
+from backend.core import jsonio, storage
+from backend.core.paths import DATA_DIR
+
+
+def migrate(source, target) -> dict:
+    """Copy every collection from source to target, replacing the target's contents."""
+    counts = {}
+    for name in storage.COLLECTIONS:
+        records = source.collection(name).all()
+        counts[name] = target.collection(name).replace_all(jsonio.thaw(records))
+    return counts
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Convert backend data between the JSON and SQLite engines.")
+    parser.add_argument("--to", choices=["sqlite", "json"], required=True, help="engine to convert into")
+    parser.add_argument("--data-dir", default=DATA_DIR, help="JSON data tree (default: backend/data)")
+    parser.add_argument("--db", default=storage.SQLITE_PATH, help="SQLite database file")
+    args = parser.parse_args()
+
+    json_engine = storage.JsonFileEngine(data_dir=args.data_dir)
+    sqlite_engine = storage.SqliteEngine(path=args.db, data_dir=args.data_dir)
+    source, target = (json_engine, sqlite_engine) if args.to == "sqlite" else (sqlite_engine, json_engine)
+
+    # Write through the target engine directly, not through a jsonio backend hook
+    jsonio.set_backend(None)
+    start = time.perf_counter()
+    counts = migrate(source, target)
+    sqlite_engine.close()
+
+    for name, count in counts.items():
+        print(f"{name}: {count} records")
+    print(f"Migrated to {args.to} in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
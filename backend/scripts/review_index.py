@@ -0,0 +1,49 @@
+"""Rebuild or verify the review indexes: per-user reviews (user_id -> movie, review, rating)
+and per-movie rating aggregates (reviews.stats).
+
+Usage (from the repository root):
+    python -m backend.scripts.review_index verify
+    python -m backend.scripts.review_index rebuild
+    python -m backend.scripts.review_index verify --data-dir /path/to/data
+
+verify exits with status 1 if either disagrees with the review documents.
+"""
+import argparse
+import sys
+import time
+
+from backend.core import storage
+from backend.core.paths import DATA_DIR
+from backend.reviews.stats import stats_for
+from backend.reviews.user_index import index_for
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Rebuild or verify the per-user review index and rating stats.")
+    parser.add_argument("command", choices=["rebuild", "verify"])
+    parser.add_argument("--data-dir", default=DATA_DIR, help="JSON data tree (default: backend/data)")
+    args = parser.parse_args()
+
+    engine = storage.JsonFileEngine(data_dir=args.data_dir)
+    reviews = engine.collection("reviews")
+    index, stats = index_for(reviews), stats_for(engine.collection("movies"))
+
+    start = time.perf_counter()
+    if args.command == "rebuild":
+        count, problems = index.rebuild(reviews.all), []
+        stats.rebuild(reviews.all)
+    else:
+        records = reviews.all()
+        count, problems = len(records), index.verify(records) + stats.verify(records)
+
+    for problem in problems:
+        print(problem)
+    print(f"reviews: {count} records")
+    print(f"{'Rebuilt' if args.command == 'rebuild' else 'Verified'} in {time.perf_counter() - start:.2f}s, "
+          f"{len(problems)} problem(s)")
+    if problems and args.command == "verify":
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""Rebuild or verify the persistent user indexes (username, email, user_id).
+
+Usage (from the repository root):
+    python -m backend.scripts.user_index verify
+    python -m backend.scripts.user_index rebuild
+    python -m backend.scripts.user_index verify --data-dir /path/to/data
+
+verify exits with status 1 if the indexes disagree with the user record files.
+"""
+import argparse
+import sys
+import time
+
+from backend.core import storage
+from backend.core.paths import DATA_DIR
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Rebuild or verify the user indexes of the JSON engine.")
+    parser.add_argument("command", choices=["rebuild", "verify"])
+    parser.add_argument("--data-dir", default=DATA_DIR, help="JSON data tree (default: backend/data)")
+    args = parser.parse_args()
+
+    engine = storage.JsonFileEngine(data_dir=args.data_dir)
+    store = engine.specs["users_active"].store
+    engine.collection("users_active")  # converts legacy list files on first use
+
+    start = time.perf_counter()
+    if args.command == "rebuild":
+        problems = engine.rebuild_index(store)
+    else:
+        problems = engine.verify_index(store)
+    counts = {name: len(records) for name, records in engine.record_groups(store).items()}
+
+    for problem in problems:
+        print(problem)
+    print(", ".join(f"{name}: {count} records" for name, count in counts.items()))
+    print(f"{'Rebuilt' if args.command == 'rebuild' else 'Verified'} in {time.perf_counter() - start:.2f}s, "
+          f"{len(problems)} problem(s)")
+    if problems and args.command == "verify":
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
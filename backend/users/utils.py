@@ -6,6 +6,7 @@ from backend.authentication import utils as auth_utils
 from backend.authentication.schemas import UserCreate, UserToken
 from backend.users import schemas
 from backend.core import exceptions, validators
+from backend.core.transactions import transaction
 
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -20,10 +21,6 @@ def get_user_by_id(user_id: str) -> Optional[Dict[str, Any]]:
 
 
 def add_user(new_user: UserCreate) -> Dict[str, Any]:
-    users = load_active_users()
-    if any(u.get("email") == new_user.email for u in users):
-        raise exceptions.ConflictError("Email already registered.")
-
     user_obj = {
         "user_id": str(uuid.uuid4()),
         "username": new_user.username,
@@ -35,39 +32,42 @@ def add_user(new_user: UserCreate) -> Dict[str, Any]:
         "watch_later": [],
         "penalties": [],
     }
-    users.append(user_obj)
-    auth_utils.save_active_users(users)
-    return user_obj
+    held, shared = auth_utils.user_locks(user_obj["user_id"], changes=user_obj)
+    with transaction(*held, shared=shared):
+        if auth_utils.find_user(email=new_user.email):
+            raise exceptions.ConflictError("Email already registered.")
+        if auth_utils.find_user(username=new_user.username):
+            raise exceptions.ConflictError("Username already taken.")
+        auth_utils.save_user(user_obj)
+        return user_obj
 
 
 def update_user(user_id: str, updates: Dict[str, Any]) -> Dict[str, Any]:
-    users = load_active_users()
-    for user in users:
-        if user.get("user_id") == user_id:
-            user.update(updates)
-            auth_utils.save_active_users(users)
-            return user
-    raise exceptions.NotFoundError("User")
+    held, shared = auth_utils.user_locks(user_id, changes=updates)
+    with transaction(*held, shared=shared):
+        user = auth_utils.get_active_user(user_id)
+        if user is None:
+            raise exceptions.NotFoundError("User")
+        user.update(updates)
+        auth_utils.save_user(user)
+        return user
 
 
 def change_password(user_id: str, old_password: str, new_password: str) -> None:
     
     validators.validate_password(new_password)
     
-    users = load_active_users()
-    for user in users:
-        if user.get("user_id") == user_id:
-            if not pwd_context.verify(old_password, user.get("hashed_password", "")):
-                raise exceptions.AuthorizationError("Incorrect old password.")
-            user["hashed_password"] = pwd_context.hash(new_password)
-            auth_utils.save_active_users(users)
-            return
-    raise exceptions.NotFoundError("User")
+    held, shared = auth_utils.user_locks(user_id)
+    with transaction(*held, shared=shared):
+        user = auth_utils.get_active_user(user_id)
+        if user is None:
+            raise exceptions.NotFoundError("User")
+        if not pwd_context.verify(old_password, user.get("hashed_password", "")):
+            raise exceptions.AuthorizationError("Incorrect old password.")
+        user["hashed_password"] = pwd_context.hash(new_password)
+        auth_utils.save_user(user)
 
 
 def delete_user(user_id: str) -> None:
-    users = load_active_users()
-    updated = [u for u in users if u.get("user_id") != user_id]
-    if len(updated) == len(users):
+    if not auth_utils.users_collection().delete(user_id):
         raise exceptions.NotFoundError("User")
-    auth_utils.save_active_users(updated)
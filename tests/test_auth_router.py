@@ -89,7 +89,7 @@ def test_request_password_reset():
         }
     ]
 
-    with patch("backend.authentication.router.utils.load_all_users", return_value=users), \
+    with patch("backend.authentication.router.utils.find_user", return_value=users[0]), \
          patch("backend.authentication.security.create_reset_token", return_value="reset123"):
 
         res = client.post("/auth/password/request", params={"email": "alice@example.com"})
@@ -109,10 +109,9 @@ def test_reset_password():
     ]
 
     with patch("backend.authentication.router.security.verify_reset_token", return_value="user123"), \
-         patch("backend.authentication.router.utils.load_all_users", return_value=users), \
+         patch("backend.authentication.router.utils.find_user", return_value=users[0]), \
          patch("backend.authentication.router.security.hash_password", return_value="newhash"), \
-         patch("backend.authentication.router.utils.save_active_users") as mock_save_active, \
-         patch("backend.authentication.router.utils.save_inactive_users") as mock_save_inactive:
+         patch("backend.authentication.router.utils.save_user") as mock_save_user:
 
         res = client.post(
             "/auth/password/reset",
@@ -121,10 +120,10 @@ def test_reset_password():
         assert res.status_code == 200
         assert res.json()["message"] == "Password successfully reset"
 
-        mock_save_inactive.assert_called_once_with([])
-        mock_save_active.assert_called_once()
-        saved_active = mock_save_active.call_args[0][0]
-        assert saved_active[0]["hashed_password"] == "newhash"
+        mock_save_user.assert_called_once()
+        saved_user = mock_save_user.call_args[0][0]
+        assert saved_user["hashed_password"] == "newhash"
+        assert mock_save_user.call_args[1] == {"active": True}
 
 def test_read_current_user():
     fake_user = schemas.UserToken(
@@ -1,94 +1,119 @@
+import threading
+
 import pytest
-from unittest.mock import patch
 from backend.authentication import utils, schemas
+from backend.core import exceptions, storage, transactions
+
+
+@pytest.fixture
+def user_store(tmp_path, monkeypatch):
+    """Temporary per-user store (with its indexes) installed as the active engine."""
+    monkeypatch.setattr(transactions, "TRANSACTIONS_DIR", str(tmp_path / ".transactions"))
+    previous = storage.get_engine()
+    engine = storage.JsonFileEngine(data_dir=str(tmp_path / "data"))
+    storage.set_engine(engine)
+
+    def seed(users, name="users_active"):
+        storage.collection(name).save_document(users)
+
+    yield seed
+    storage.set_engine(previous)
+
 
-def test_user_exists():
+def test_user_exists(user_store):
     mock_users = [
         {"user_id": "1", "username": "alice", "email": "alice@example.com"},
         {"user_id": "2", "username": "john", "email": "john@example.com"},
     ]
-    with patch("backend.authentication.utils.load_all_users", return_value=mock_users):
-        exists, msg = utils.user_exists("alice", "new@example.com")
-        assert exists is True
-        assert msg == "Username already taken"
+    user_store(mock_users)
+    exists, msg = utils.user_exists("alice", "new@example.com")
+    assert exists is True
+    assert msg == "Username already taken"
 
-        exists, msg = utils.user_exists("newuser", "john@example.com")
-        assert exists is True
-        assert msg == "Email already taken"
+    exists, msg = utils.user_exists("newuser", "john@example.com")
+    assert exists is True
+    assert msg == "Email already taken"
 
-        exists, msg = utils.user_exists("newuser", "new@example.com")
-        assert exists is False
-        assert msg is None
+    exists, msg = utils.user_exists("newuser", "new@example.com")
+    assert exists is False
+    assert msg is None
 
-def test_add_user():
+def test_add_user(user_store):
     new_user = {"user_id": "3", "username": "new", "email": "new@example.com"}
 
-    with patch("backend.authentication.utils.load_active_users", return_value=[]) as mock_load_active, \
-         patch("backend.authentication.utils.save_active_users") as mock_save_active:
+    utils.add_user(new_user, active=True)
 
-        utils.add_user(new_user, active=True)
+    saved = utils.get_user_by_id("3")
+    assert saved is not None
+    assert saved["username"] == "new"
+    assert "penalties" in saved
+    assert utils.find_user(email="NEW@example.com")["user_id"] == "3"
 
-        mock_load_active.assert_called_once()
-        mock_save_active.assert_called_once()
-        saved_list = mock_save_active.call_args[0][0]
-        assert len(saved_list) == 1
-        assert saved_list[0]["user_id"] == "3"
+def test_add_user_refuses_a_taken_username_even_when_racing(user_store):
+    user_store([{"user_id": "1", "username": "alice", "email": "alice@example.com"}])
+    with pytest.raises(exceptions.ConflictError):
+        utils.add_user({"user_id": "2", "username": "alice", "email": "other@example.com"})
+    assert utils.get_user_by_username_or_email("alice")["user_id"] == "1"
 
-        assert "penalties" in saved_list[0]
+    results = []
 
-def test_get_user_by_id():
+    def register(user_id):
+        try:
+            utils.add_user({"user_id": user_id, "username": "bob", "email": f"{user_id}@example.com"})
+            results.append(user_id)
+        except exceptions.ConflictError:
+            results.append(None)
+
+    workers = [threading.Thread(target=register, args=(f"b{i}",)) for i in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    winners = [r for r in results if r is not None]
+    assert len(results) == 4 and len(winners) == 1
+    assert utils.get_user_by_username("bob")["user_id"] == winners[0]
+
+
+def test_get_user_by_id(user_store):
     mock_users = [
         {"user_id": "1", "username": "alice"},
         {"user_id": "2", "username": "john"},
     ]
+    user_store(mock_users)
+    user = utils.get_user_by_id("1")
+    assert user is not None
+    assert user["username"] == "alice"
 
-    with patch("backend.authentication.utils.load_all_users", return_value=mock_users):
-        user = utils.get_user_by_id("1")
-        assert user is not None
-        assert user["username"] == "alice"
+    user_none = utils.get_user_by_id("999")
+    assert user_none is None
 
-        user_none = utils.get_user_by_id("999")
-        assert user_none is None
 
-
-def test_get_user_by_username():
+def test_get_user_by_username(user_store):
     mock_users = [
         {"user_id": "1", "username": "alice"},
         {"user_id": "2", "username": "john"},
     ]
-
-    with patch("backend.authentication.utils.load_all_users", return_value=mock_users):
-        user = utils.get_user_by_username("john")
-        assert user is not None
-        assert user["user_id"] == "2"
-
-        user_none = utils.get_user_by_username("nobody")
-        assert user_none is None
-
-def test_update_user_status():
-    user_active = {
-        "user_id": "1",
-        "username": "alice",
-        "status": "active",
-    }
-
-    active_list = [user_active]
-    inactive_list = []
-
-    with patch("backend.authentication.utils.load_active_users", return_value=active_list), \
-         patch("backend.authentication.utils.load_inactive_users", return_value=inactive_list), \
-         patch("backend.authentication.utils.save_active_users") as mock_save_active, \
-         patch("backend.authentication.utils.save_inactive_users") as mock_save_inactive:
-
-        result = utils.update_user_status("1", schemas.UserStatus.INACTIVE)
-        assert result is True
-
-        mock_save_active.assert_called_once()
-        saved_active = mock_save_active.call_args[0][0]
-        assert saved_active == []
-
-        mock_save_inactive.assert_called_once()
-        saved_inactive = mock_save_inactive.call_args[0][0]
-        assert len(saved_inactive) == 1
-        assert saved_inactive[0]["user_id"] == "1"
-        assert saved_inactive[0]["status"] == schemas.UserStatus.INACTIVE.value
+    user_store(mock_users, name="users_inactive")
+    user = utils.get_user_by_username("john")
+    assert user is not None
+    assert user["user_id"] == "2"
+
+    user_none = utils.get_user_by_username("nobody")
+    assert user_none is None
+
+def test_update_user_status(user_store):
+    user_store([
+        {"user_id": "1", "username": "alice", "status": "active"},
+        {"user_id": "2", "username": "bob", "status": "active"},
+    ])
+
+    result = utils.update_user_status("1", schemas.UserStatus.INACTIVE)
+    assert result is True
+
+    assert storage.collection("users_active").get("1") is None
+    assert storage.collection("users_active").get("2") is not None
+    moved = storage.collection("users_inactive").get("1")
+    assert moved["status"] == schemas.UserStatus.INACTIVE.value
+    assert utils.find_user(username="alice")["status"] == schemas.UserStatus.INACTIVE.value
+
+    assert utils.update_user_status("missing", schemas.UserStatus.INACTIVE) is False
@@ -0,0 +1,119 @@
+import json
+import os
+import pytest
+
+from backend.core import journal, storage, transactions
+from backend.core.transactions import transaction
+
+
+@pytest.fixture
+def reviews(tmp_path, monkeypatch):
+    monkeypatch.setattr(transactions, "TRANSACTIONS_DIR", str(tmp_path / ".transactions"))
+    eng = storage.JsonFileEngine(data_dir=str(tmp_path / "data"))
+    col = eng.collection("reviews")
+    assert isinstance(col, storage.JsonJournaledCollection)
+    return col
+
+
+def make_review(review_id, movie_id="m1", user_id="u1", rating=7, helpful=0):
+    return {
+        "review_id": review_id,
+        "movie_id": movie_id,
+        "user_id": user_id,
+        "title": "t",
+        "rating": rating,
+        "date": "2024-01-01",
+        "text": "x",
+        "usefulness": {"helpful": helpful, "total_votes": helpful},
+    }
+
+
+def apply_ops(col):
+    col.save_document([make_review("r1"), make_review("r2", user_id="u2")], "m1")
+    col.put(make_review("r3", user_id="u3", rating=9))
+    col.put(make_review("r1", rating=2, helpful=5))
+    col.delete("r2", partition="m1")
+    col.put(make_review("r4", user_id="u4"))
+
+
+# ---------------------------------------------------------
+# Replay
+# ---------------------------------------------------------
+
+def test_mutations_append_to_log_and_match_plain_files(reviews, tmp_path):
+    apply_ops(reviews)
+    path = reviews.document_path("m1")
+    with open(path, encoding="utf-8") as f:
+        assert [r["review_id"] for r in json.load(f)] == ["r1", "r2"]
+    with open(journal.log_path(path), encoding="utf-8") as f:
+        assert len(f.read().splitlines()) == 4
+
+    plain = storage.JsonPartitionedCollection(storage.collection_specs(str(tmp_path / "plain"))["reviews"])
+    apply_ops(plain)
+    assert reviews.load_document("m1") == plain.load_document("m1")
+    assert [r["review_id"] for r in reviews.load_document("m1")] == ["r1", "r3", "r4"]
+    assert reviews.get("r1", partition="m1")["rating"] == 2
+
+
+def test_partitions_with_only_a_log_are_listed(reviews):
+    reviews.put(make_review("r1", movie_id="m9", user_id="u9"))
+    assert [r["review_id"] for r in reviews.query(user_id="u9")] == ["r1"]
+
+
+def test_appends_from_another_instance_are_picked_up(reviews, tmp_path):
+    reviews.put(make_review("r1"))
+    assert len(reviews.query(movie_id="m1")) == 1
+
+    other = storage.JsonFileEngine(data_dir=str(tmp_path / "data")).collection("reviews")
+    other.put(make_review("r2", user_id="u2"))
+    assert [r["review_id"] for r in reviews.query(movie_id="m1")] == ["r1", "r2"]
+
+
+def test_torn_final_line_is_ignored(reviews):
+    reviews.put(make_review("r1"))
+    log = journal.log_path(reviews.document_path("m1"))
+    with open(log, "a", encoding="utf-8") as f:
+        f.write('{"op": "put", "record": {"review_id": "r')
+
+    assert [r["review_id"] for r in reviews.load_document("m1")] == ["r1"]
+    reviews.put(make_review("r2", user_id="u2"))
+    assert [r["review_id"] for r in reviews.load_document("m1")] == ["r1", "r2"]
+
+
+def test_rolled_back_transaction_appends_nothing(reviews):
+    path = reviews.document_path("m1")
+    with pytest.raises(RuntimeError):
+        with transaction(path):
+            reviews.put(make_review("r1"))
+            assert reviews.get("r1", partition="m1") is not None
+            raise RuntimeError("boom")
+    assert reviews.get("r1", partition="m1") is None
+    assert not os.path.exists(journal.log_path(path))
+
+
+# ---------------------------------------------------------
+# Compaction
+# ---------------------------------------------------------
+
+def test_compaction_folds_log_into_snapshot(reviews):
+    apply_ops(reviews)
+    before = reviews.load_document("m1")
+    path = reviews.document_path("m1")
+
+    assert reviews.journal.compact(path) is True
+    assert reviews.journal.log_size(path) == 0
+    with open(path, encoding="utf-8") as f:
+        assert json.load(f) == before
+    assert reviews.load_document("m1") == before
+    assert reviews.journal.compact(path) is False
+
+
+def test_background_compaction_after_threshold(reviews):
+    reviews.journal.compact_bytes = 1
+    reviews.put(make_review("r1"))
+    reviews.journal.wait_for_compactions()
+
+    path = reviews.document_path("m1")
+    assert reviews.journal.compactions == 1
+    assert reviews.journal.log_size(path) == 0
+    assert [r["review_id"] for r in reviews.load_document("m1")] == ["r1"]
@@ -0,0 +1,180 @@
+import os, time
+import pytest
+
+from backend.core import jsonio
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    """Fresh document cache for each test."""
+    c = jsonio.DocumentCache(max_bytes=1024, max_entries=3, enabled=True)
+    monkeypatch.setattr(jsonio, "_cache", c)
+    return c
+
+
+# ---------------------------------------------------------
+# load_json / cache hits
+# ---------------------------------------------------------
+
+def test_load_json_caches_and_returns_private_copies(tmp_path, cache):
+    path = str(tmp_path / "users.json")
+    jsonio.save_json(path, [{"user_id": "u1"}])
+
+    first = jsonio.load_json(path, default=[])
+    first[0]["user_id"] = "changed"
+    second = jsonio.load_json(path, default=[])
+
+    assert second == [{"user_id": "u1"}]
+    assert cache.stats()["misses"] == 1
+    assert cache.stats()["hits"] == 1
+
+
+def test_missing_file_returns_default(tmp_path, cache):
+    assert jsonio.load_json(str(tmp_path / "nope.json"), default=[]) == []
+    assert jsonio.load_json_view(str(tmp_path / "nope.json"), default=None) is None
+
+
+def test_save_json_invalidates_entry(tmp_path, cache):
+    path = str(tmp_path / "data.json")
+    jsonio.save_json(path, [1])
+    assert jsonio.load_json_view(path, default=[]) == [1]
+
+    jsonio.save_json(path, [1, 2])
+    assert jsonio.load_json_view(path, default=[]) == [1, 2]
+    assert cache.stats()["invalidations"] >= 1
+
+
+def test_external_write_is_detected(tmp_path, cache):
+    path = str(tmp_path / "data.json")
+    jsonio.save_json(path, {"a": 1})
+    assert jsonio.load_json(path, default={}) == {"a": 1}
+
+    # Simulate another process replacing the file
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('{"a": 22}')
+    assert jsonio.load_json(path, default={}) == {"a": 22}
+
+
+# ---------------------------------------------------------
+# Read-only views
+# ---------------------------------------------------------
+
+def test_view_is_shared_and_read_only(tmp_path, cache):
+    path = str(tmp_path / "data.json")
+    jsonio.save_json(path, [{"watch_later": ["m1"]}])
+
+    view = jsonio.load_json_view(path, default=[])
+    assert view is jsonio.load_json_view(path, default=[])
+
+    with pytest.raises(TypeError):
+        view.append({})
+    with pytest.raises(TypeError):
+        view[0]["watch_later"].append("m2")
+
+    copy = jsonio.thaw(view)
+    copy[0]["watch_later"].append("m2")
+    assert jsonio.load_json(path, default=[]) == [{"watch_later": ["m1"]}]
+
+
+# ---------------------------------------------------------
+# Per-path switch and eviction
+# ---------------------------------------------------------
+
+def test_cache_can_be_disabled_per_path(tmp_path, cache):
+    path = str(tmp_path / "data.json")
+    jsonio.save_json(path, [1])
+    jsonio.set_cache_enabled(path, False)
+
+    jsonio.load_json(path, default=[])
+    jsonio.load_json(path, default=[])
+    assert cache.stats()["hits"] == 0
+    assert cache.stats()["entries"] == 0
+
+
+def test_lru_evicts_oldest_entry(tmp_path, cache):
+    paths = [str(tmp_path / f"{i}.json") for i in range(4)]
+    for p in paths:
+        jsonio.save_json(p, [os.path.basename(p)])
+        jsonio.load_json(p, default=[])
+
+    stats = cache.stats()
+    assert stats["entries"] == 3
+    assert stats["evictions"] == 1
+
+
+# ---------------------------------------------------------
+# Write-behind
+# ---------------------------------------------------------
+
+@pytest.fixture
+def write_behind(monkeypatch):
+    """Install a write-behind queue for one test; flushes and stops it afterwards."""
+    queues = []
+
+    def install(window_ms=50, durability="none"):
+        wb = jsonio.WriteBehind(window_ms, durability)
+        monkeypatch.setattr(jsonio, "_write_behind", wb)
+        queues.append(wb)
+        return wb
+
+    yield install
+    for wb in queues:
+        wb.close()
+
+
+def test_write_behind_coalesces_writes_to_one_file(tmp_path, cache, write_behind):
+    wb = write_behind(window_ms=10_000)
+    path = str(tmp_path / "votes.json")
+
+    for i in range(10):
+        jsonio.save_json(path, {"votes": i})
+
+    # Pending writes are visible to readers before they reach disk
+    assert not os.path.exists(path)
+    assert jsonio.load_json(path, default={}) == {"votes": 9}
+    assert jsonio.load_json_view(path, default={}) == {"votes": 9}
+
+    assert jsonio.flush_writes() == 1
+    with open(path, encoding="utf-8") as f:
+        assert '"votes": 9' in f.read()
+    stats = wb.stats()
+    assert stats["writes"] == 10
+    assert stats["files_written"] == 1
+    assert stats["coalescing_ratio"] == 10
+
+
+def test_write_behind_flushes_after_window(tmp_path, cache, write_behind):
+    wb = write_behind(window_ms=5, durability="group")
+    path = str(tmp_path / "data.json")
+    jsonio.save_json(path, [1, 2])
+
+    deadline = time.monotonic() + 2
+    while not os.path.exists(path) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert jsonio.load_json(path, default=[]) == [1, 2]
+    assert wb.stats()["groups"] == 1
+
+
+def test_wait_durability_waits_for_flush(tmp_path, cache, write_behind):
+    write_behind(window_ms=5, durability="wait")
+    path = str(tmp_path / "data.json")
+    jsonio.save_json(path, {"a": 1})
+    assert os.path.exists(path)
+
+
+def test_close_flushes_and_falls_back_to_direct_writes(tmp_path, cache, write_behind):
+    wb = write_behind(window_ms=10_000)
+    path = str(tmp_path / "data.json")
+    jsonio.save_json(path, [1])
+    wb.close()
+    assert jsonio.load_json(path, default=[]) == [1]
+
+    jsonio.save_json(path, [2])
+    assert wb.stats()["writes"] == 1
+    assert jsonio.load_json(path, default=[]) == [2]
+
+
+def test_unknown_durability_mode_is_rejected():
+    with pytest.raises(ValueError):
+        jsonio.WriteBehind(10, "sometimes")
+
@@ -0,0 +1,76 @@
+import json, os
+
+import pandas as pd
+
+from backend.core import storage
+from backend.scripts.migrate_movies import clean_column, int_column, migrate_all_movies
+
+CSV = """Date of Review,User,Usefulness Vote,Total Votes,User's Rating out of 10,Review Title,Review
+15 March 2010,alice, 3 ,4,9,<b>Great</b>,Loved it<br/>really &amp; truly
+1 April 2011,bob,5,4,7,Bad votes,helpful > total
+2 April 2011,carol,1,2,11,Too high,rating out of range
+3 April 2011,,1,2,5,No user,dropped
+4 April 2011,dave,x,2,5,Not a number,dropped
+not a date,bob,0,0,6,  Plain  ,  kept as is
+"""
+
+
+def make_source(root, movies):
+    for folder, (title, csv) in movies.items():
+        os.makedirs(root / folder)
+        (root / folder / "metadata.json").write_text(json.dumps({"title": title, "metaScore": "71",
+                                                                 "totalRatingCount": "1,234"}))
+        if csv is not None:
+            (root / folder / "movieReviews.csv").write_text(csv)
+
+
+def snapshot(data_dir):
+    engine = storage.JsonFileEngine(data_dir=str(data_dir))
+    return ({m["movie_id"]: m for m in engine.collection("movies").all()},
+            sorted(engine.collection("reviews").all(), key=lambda r: r["review_id"]),
+            {u["username"]: u for u in engine.collection("users_inactive").all()})
+
+
+def test_columns_are_cleaned_like_single_cells():
+    values = pd.Series([" plain ", "<i>x</i> y", "a &amp; b", None])
+    assert clean_column(values).tolist() == ["plain", "x y", "a & b", ""]
+    parsed = int_column(pd.Series([" 4 ", "4.0", "-1", None, "1,000"]))
+    assert parsed[0] == 4 and parsed[2] == -1
+    assert parsed[[1, 3, 4]].isna().all()  # int() would reject these too
+
+
+def test_migration_validates_rows_and_merges_users(tmp_path):
+    source = tmp_path / "movieData"
+    make_source(source, {"b_movie": ("B", CSV), "a_movie": ("A", CSV.replace("alice", "erin")),
+                         "no_csv": ("C", None)})
+    counts = migrate_all_movies(str(source), str(tmp_path / "data"), workers=1)
+    assert counts["movies"] == 2 and counts["reviews"] == 4 and counts["skipped_reviews"] == 8
+    assert counts["skipped_folders"] == 1
+
+    movies, reviews, users = snapshot(tmp_path / "data")
+    by_title = {m["title"]: m for m in movies.values()}
+    assert by_title["A"]["meta_score"] == 71 and by_title["A"]["total_rating_count"] == 1234
+    first = next(r for r in reviews if r["user_id"] == users["alice"]["user_id"])
+    assert (first["title"], first["text"], first["date"]) == ("Great", "Loved itreally & truly", "2010-03-15")
+    assert first["usefulness"] == {"helpful": 3, "total_votes": 4}
+    plain = next(r for r in reviews if r["title"] == "Plain")
+    assert (plain["text"], plain["date"]) == ("kept as is", "not a date")
+
+    assert sorted(users) == ["alice", "bob", "erin"]
+    # a_movie sorts before b_movie, so bob's list follows folder order
+    assert users["bob"]["movies_reviewed"] == [by_title["A"]["movie_id"], by_title["B"]["movie_id"]]
+    assert users["bob"]["status"] == "inactive"
+    votes = json.load(open(tmp_path / "data" / "votes" / f"{by_title['B']['movie_id']}_votes.json"))
+    assert sorted(v["helpfulness_ratio"] for v in votes) == [0, 0.75]
+
+
+def test_process_pool_matches_serial_run(tmp_path):
+    source = tmp_path / "movieData"
+    make_source(source, {f"movie_{i}": (f"M{i}", CSV) for i in range(4)})
+    migrate_all_movies(str(source), str(tmp_path / "serial"), workers=1)
+    migrate_all_movies(str(source), str(tmp_path / "pool"), workers=2)
+    assert snapshot(tmp_path / "serial") == snapshot(tmp_path / "pool")
+
+    # Same dump again: same ids, nothing new to write for the users
+    again = migrate_all_movies(str(source), str(tmp_path / "pool"), workers=2)
+    assert again["users_written"] == 0 and snapshot(tmp_path / "serial") == snapshot(tmp_path / "pool")
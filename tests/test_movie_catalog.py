@@ -0,0 +1,155 @@
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from backend.core import storage
+from backend.movies import catalog, utils
+from backend.movies.catalog import MovieCatalog
+from backend.movies.schemas import MovieSearchParams
+from backend.recommendations import utils as rec_utils
+from tests.test_movie_index import make_movie, random_catalog
+
+
+@pytest.mark.parametrize("query", [
+    {},
+    {"genre": "DRAMA"},
+    {"genre": "western"},
+    {"min_rating": 8},
+    {"min_rating": 0, "max_rating": 5.5},
+    {"min_year": 2000, "genre": "action"},
+    {"max_year": 1990},
+])
+def test_filter_mask_matches_filter_movies(query):
+    movies = random_catalog(300)
+    cat = MovieCatalog.from_records(movies)
+    params = MovieSearchParams(**query)
+    expected = sorted(m["movie_id"] for m in utils.filter_movies(movies, params))
+    assert cat.movie_ids[cat.filter_mask(params)].tolist() == expected
+
+
+def test_argsort_orders_like_sort_movies():
+    movies = random_catalog(300)
+    cat = MovieCatalog.from_records(movies)
+    by_id = sorted(movies, key=lambda m: m["movie_id"])
+    for order in ("asc", "desc"):
+        rows = cat.argsort("total_rating_count", order, mask=cat.genre_mask("crime"))
+        crime = [m for m in by_id if "crime" in [g.lower() for g in m["genres"]]]
+        expected = sorted(crime, key=lambda m: m["total_rating_count"] or 0, reverse=order == "desc")
+        assert cat.movie_ids[rows].tolist() == [m["movie_id"] for m in expected]
+
+
+def test_sidecar_round_trip(tmp_path):
+    cat = MovieCatalog.from_records(random_catalog(50), fingerprint="abc")
+    path = str(tmp_path / "movies_catalog.npz")
+    cat.save(path)
+    loaded = MovieCatalog.load(path)
+    assert loaded.fingerprint == "abc"
+    assert loaded.movie_ids.tolist() == cat.movie_ids.tolist()
+    np.testing.assert_array_equal(loaded["imdb_rating"], cat["imdb_rating"])
+    np.testing.assert_array_equal(loaded.genre_matrix, cat.genre_matrix)
+    assert loaded.facet_counts(np.ones(50, dtype=bool)) == cat.facet_counts(np.ones(50, dtype=bool))
+    assert MovieCatalog.load(str(tmp_path / "missing.npz")) is None
+
+
+@pytest.fixture
+def movie_store(tmp_path):
+    previous = storage.get_engine()
+    storage.set_engine(storage.JsonFileEngine(data_dir=str(tmp_path / "data")))
+    yield storage.collection("movies")
+    storage.set_engine(previous)
+
+
+def test_get_catalog_reuses_sidecar_until_movies_change(movie_store, monkeypatch):
+    movie_store.put(make_movie("m1", "Alien", rating=8.5))
+    first = catalog.get_catalog()
+    assert first.movie_ids.tolist() == ["m1"]
+
+    # A fresh process (no cached catalog) loads the sidecar instead of rebuilding
+    monkeypatch.setattr(catalog, "_catalog", None)
+    monkeypatch.setattr(MovieCatalog, "from_records", classmethod(lambda cls, *a, **k: pytest.fail("rebuilt")))
+    assert catalog.get_catalog().movie_ids.tolist() == ["m1"]
+    monkeypatch.undo()
+
+    movie_store.put(make_movie("m2", "Brazil", rating=7.9))
+    assert catalog.get_catalog().movie_ids.tolist() == ["m1", "m2"]
+
+
+def test_sqlite_catalog_ignores_writes_to_other_tables(tmp_path, monkeypatch):
+    previous = storage.get_engine()
+    engine = storage.SqliteEngine(path=str(tmp_path / "store.sqlite3"), data_dir=str(tmp_path / "data"))
+    storage.set_engine(engine)
+    try:
+        movies = storage.collection("movies")
+        movies.put(make_movie("m1", "Alien", rating=8.5))
+        fingerprint = catalog.get_catalog().fingerprint
+        monkeypatch.setattr(MovieCatalog, "save", lambda self, path: pytest.fail("re-saved"))
+        storage.collection("penalties").put({"penalty_id": "p1", "user_id": "u1", "status": "active"})
+        assert catalog.get_catalog().fingerprint == fingerprint
+
+        monkeypatch.setattr(catalog, "_catalog", None)  # a restart reuses the sidecar
+        assert catalog.get_catalog().fingerprint == fingerprint
+        monkeypatch.undo()
+        movies.put(make_movie("m2", "Brazil", rating=7.9))
+        assert catalog.get_catalog().movie_ids.tolist() == ["m1", "m2"]
+    finally:
+        storage.set_engine(previous)
+        engine.close()
+
+
+def test_popular_recommendations_use_catalog(movie_store, monkeypatch):
+    movie_store.put(make_movie("m1", "Alien", rating=8.5))
+    movie_store.put(make_movie("m2", "Brazil", rating=7.2))
+    movie_store.put(make_movie("m3", "Cars", rating=5.0))
+    monkeypatch.setattr(rec_utils, "get_user_reviewed_movies", lambda user_id: ["m1"])
+    monkeypatch.setattr(rec_utils, "get_user_watchlist", lambda user_id: [])
+
+    recs = rec_utils.popular_recommendations("u1")
+    assert [(r.movie_id, r.recommendation_reason) for r in recs] == [("m2", "Well-rated")]
+
+
+def expected_facets(movies, top=20):
+    def ranked(counter):
+        return [{"value": v, "count": c} for v, c in sorted(counter.items(), key=lambda i: (-i[1], i[0]))[:top]]
+    genres, directors, decades, ratings = Counter(), Counter(), Counter(), Counter()
+    for m in movies:
+        genres.update(m["genres"])
+        directors.update(m["directors"])
+        year = utils._parse_year(m["release_date"])
+        if year:
+            decades[year // 10 * 10] += 1
+        if m["imdb_rating"] is not None:
+            ratings[min(int(m["imdb_rating"]), 9)] += 1
+    return {
+        "genres": ranked(genres),
+        "directors": ranked(directors),
+        "decades": [{"value": f"{d}s", "count": decades[d]} for d in sorted(decades)],
+        "ratings": [{"value": f"{b}-{b + 1}", "count": ratings[b]} for b in sorted(ratings)],
+    }
+
+
+@pytest.mark.parametrize("query", [{}, {"genre": "crime", "min_year": 1990}, {"query": "dark"},
+                                   {"star": "heath ledger", "max_rating": 8}, {"director": "nobody"}])
+def test_facets_count_every_matching_movie(movie_store, query):
+    movies = random_catalog(300)
+    for m in movies:
+        movie_store.put(m)
+    params = MovieSearchParams(**query)
+    assert utils.movie_facets(params) == expected_facets(utils.filter_movies(movies, params))
+
+
+def test_list_route_returns_facets_when_asked(movie_store):
+    from fastapi.testclient import TestClient
+    from backend.main import app
+
+    movie_store.put(make_movie("m1", "Alien", genres=("Horror", "Sci-Fi"), rating=8.5, date="1979-05-25"))
+    movie_store.put(make_movie("m2", "Aliens", genres=("Sci-Fi",), rating=8.4, date="1986-07-18"))
+    movie_store.put(make_movie("m3", "Brazil", genres=("Comedy",), rating=7.9, date="1985-02-20"))
+    client = TestClient(app)
+
+    assert isinstance(client.get("/movies/").json(), list)
+    body = client.get("/movies/", params={"query": "alien", "facets": True, "limit": 1}).json()
+    assert [m["movie_id"] for m in body["movies"]] == ["m1"]
+    assert body["facets"]["genres"] == [{"value": "Sci-Fi", "count": 2}, {"value": "Horror", "count": 1}]
+    assert body["facets"]["decades"] == [{"value": "1970s", "count": 1}, {"value": "1980s", "count": 1}]
+    assert body["facets"]["ratings"] == [{"value": "8-9", "count": 2}]
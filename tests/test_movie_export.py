@@ -0,0 +1,94 @@
+import gzip
+import json
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.authentication import security
+from backend.authentication.schemas import UserToken
+from backend.core import storage
+from backend.main import app
+from backend.movies import export
+from backend.movies import index as movie_index
+from tests.test_movie_index import make_movie
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    previous = storage.get_engine()
+    storage.set_engine(storage.JsonFileEngine(data_dir=str(tmp_path / "data")))
+    movies = storage.collection("movies")
+    for i in range(40):
+        movies.put(make_movie(f"m{i:02d}", f"Movie “{i}”", rating=i / 5))
+    monkeypatch.setattr(export, "CHUNK_BYTES", 512)
+    app.dependency_overrides[security.get_current_user] = lambda: UserToken(
+        user_id="admin", username="admin", email="admin@example.com", role="administrator", status="active")
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+    storage.set_engine(previous)
+
+
+def test_json_and_ndjson_exports(client):
+    res = client.get("/movies/download")
+    assert res.status_code == 200
+    movies = json.loads(res.content)
+    assert [m["movie_id"] for m in movies] == [f"m{i:02d}" for i in range(40)]
+    assert res.headers["accept-ranges"] == "bytes"
+
+    res = client.get("/movies/download", params={"format": "ndjson", "compress": "gzip"})
+    assert res.headers["content-type"] == "application/gzip"
+    lines = gzip.decompress(res.content).decode("utf-8").splitlines()
+    assert [json.loads(line) for line in lines] == movies
+
+
+def test_range_resumes_download(client):
+    full = client.get("/movies/download")
+    body, etag = full.content, full.headers["etag"]
+
+    part = client.get("/movies/download", headers={"Range": "bytes=1000-", "If-Range": etag})
+    assert part.status_code == 206
+    assert part.headers["content-range"] == f"bytes 1000-{len(body) - 1}/{len(body)}"
+    assert part.content == body[1000:]
+
+    assert client.get("/movies/download", headers={"Range": "bytes=10-19"}).content == body[10:20]
+    assert client.get("/movies/download", headers={"Range": "bytes=-7"}).content == body[-7:]
+    assert client.get("/movies/download", headers={"Range": f"bytes={len(body)}-"}).status_code == 416
+
+    # A changed catalog no longer matches the ETag: the whole file is sent again
+    storage.collection("movies").put(make_movie("m99", "New"))
+    again = client.get("/movies/download", headers={"Range": "bytes=1000-", "If-Range": etag})
+    assert again.status_code == 200
+    assert len(json.loads(again.content)) == 41
+
+
+def test_etag_matches_in_another_worker(client, monkeypatch):
+    etag = client.get("/movies/download").headers["etag"]
+    monkeypatch.setattr(movie_index, "_index", None)  # a fresh index, as another worker or a restart has
+    part = client.get("/movies/download", headers={"Range": "bytes=100-", "If-Range": etag})
+    assert part.status_code == 206 and part.headers["etag"] == etag
+
+    storage.collection("movies").put(make_movie("m05", "Edited"))
+    assert client.get("/movies/download").headers["etag"] != etag
+
+
+def test_sqlite_etag_ignores_writes_to_other_tables(client, tmp_path, monkeypatch):
+    movies = storage.collection("movies").all()
+    storage.set_engine(storage.SqliteEngine(path=str(tmp_path / "store.sqlite3"), data_dir=str(tmp_path / "db")))
+    storage.collection("movies").replace_all(movies)
+    etag = client.get("/movies/download").headers["etag"]
+
+    storage.collection("penalties").put({"penalty_id": "p1", "user_id": "u1", "status": "active"})
+    monkeypatch.setattr(movie_index, "_index", None)
+    part = client.get("/movies/download", headers={"Range": "bytes=100-", "If-Range": etag})
+    assert part.status_code == 206 and part.headers["etag"] == etag
+
+    storage.collection("movies").put(make_movie("m05", "Edited"))
+    assert client.get("/movies/download").headers["etag"] != etag
+    storage.get_engine().close()
+
+
+def test_stats_report_throughput(client):
+    before = export.export_stats()["bytes"]
+    body = client.get("/movies/download").content
+    stats = client.get("/movies/download/stats").json()
+    assert stats["bytes"] - before == len(body)
+    assert stats["last_bytes_per_sec"] > 0
@@ -0,0 +1,110 @@
+import math
+import random
+from collections import Counter
+
+import pytest
+
+from backend.core import storage
+from backend.movies import utils
+from backend.movies.fulltext import FIELD_WEIGHTS, B, K1, TextIndex, get_text_index, stem, terms
+from tests.test_movie_index import make_movie, random_catalog
+
+
+def described(movie_id, title, description="", **kwargs):
+    movie = make_movie(movie_id, title, **kwargs)
+    movie["description"] = description
+    return movie
+
+
+def reference_scores(movies, query):
+    """BM25 computed directly from the definition, for every movie with a query term."""
+    freqs = []
+    for m in movies:
+        c = Counter()
+        for field, weight in FIELD_WEIGHTS.items():
+            value = m.get(field)
+            text = value if isinstance(value, str) else " ".join(value or ())
+            for t in terms(text):
+                c[t] += weight
+        freqs.append(c)
+    avg = sum(sum(c.values()) for c in freqs) / len(movies)
+    scores = {}
+    for m, c in zip(movies, freqs):
+        length = sum(c.values())
+        score = 0.0
+        for t in set(terms(query)):
+            df = sum(1 for other in freqs if t in other)
+            if c[t]:
+                idf = math.log(1 + (len(movies) - df + 0.5) / (df + 0.5))
+                score += idf * c[t] * (K1 + 1) / (c[t] + K1 * (1 - B + B * length / avg))
+        if score:
+            scores[m["movie_id"]] = score
+    return scores
+
+
+def test_stemming_and_stopwords():
+    assert {stem(w) for w in ("knight", "knights")} == {"knight"}
+    assert {stem(w) for w in ("hope", "hoped", "hoping")} == {"hop"}
+    assert stem("running") == "run"
+    assert terms("The Lord of the Rings") == ["lord", "ring"]
+
+
+@pytest.mark.parametrize("query", ["dark knight", "star wars hope", "Heath", "l'amour nolan", "x2"])
+def test_search_matches_reference_bm25(query):
+    movies = random_catalog(300)
+    rng = random.Random(3)
+    for m in movies:
+        m["description"] = " ".join(rng.choice(["a", "dark", "hopeful", "tale", "of", "knights", "wars"])
+                                    for _ in range(rng.randint(0, 12)))
+    index = TextIndex()
+    index.build(movies)
+    expected = reference_scores(movies, query)
+    results = index.search(query, limit=len(movies))
+    assert {m["movie_id"] for m, _ in results} == set(expected)
+    for movie, score in results:
+        assert score == pytest.approx(expected[movie["movie_id"]], abs=1e-3)
+    assert [s for _, s in results] == sorted((s for _, s in results), reverse=True)
+    assert index.search(query, limit=5, offset=5) == results[5:10]
+
+
+def test_title_outranks_description_and_updates_apply():
+    index = TextIndex()
+    index.build([
+        described("m1", "Heat", "A heist in Los Angeles"),
+        described("m2", "Ronin", "Former agents plan a heist"),
+        described("m3", "The Heist", "Thieves"),
+    ])
+    assert [m["movie_id"] for m, _ in index.search("heists")] == ["m3", "m1", "m2"]
+
+    index.upsert(described("m3", "Thieves", "Nothing to see"))
+    index.remove("m1")
+    assert [m["movie_id"] for m, _ in index.search("heist")] == ["m2"]
+    assert index.search("the of") == []
+    for i in range(200):  # enough churn to trigger compaction
+        index.upsert(described("m2", "Ronin", f"Former agents plan a heist, take {i}"))
+    assert len(index.docs) < 100
+    assert [m["description"] for m, _ in index.search("heist")] == ["Former agents plan a heist, take 199"]
+
+
+@pytest.fixture
+def movie_store(tmp_path):
+    previous = storage.get_engine()
+    storage.set_engine(storage.JsonFileEngine(data_dir=str(tmp_path / "data")))
+    yield storage.collection("movies")
+    storage.set_engine(previous)
+
+
+def test_search_route_follows_collection_changes(movie_store):
+    from fastapi.testclient import TestClient
+    from backend.main import app
+
+    movie_store.put(described("m1", "The Dark Knight", "Batman faces the Joker"))
+    movie_store.put(described("m2", "Amelie", "A shy waitress in Paris"))
+    client = TestClient(app)
+    res = client.get("/movies/search", params={"q": "joker"})
+    assert [m["movie_id"] for m in res.json()] == ["m1"] and res.json()[0]["score"] > 0
+
+    movie_store.put(described("m3", "Joker", "Arthur Fleck"))
+    assert get_text_index() is get_text_index()
+    assert [m["movie_id"] for m in utils.rank_movies("joker")] == ["m3", "m1"]
+    assert client.get("/movies/search", params={"q": ""}).status_code == 422
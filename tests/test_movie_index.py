@@ -0,0 +1,244 @@
+import random
+import pytest
+
+from backend.core import storage
+from backend.movies import utils
+from backend.movies.index import MovieIndex, get_index
+from backend.movies.schemas import MovieSearchParams
+
+
+def make_movie(movie_id, title, genres=("Drama",), directors=("Ann Lee",), rating=7.0, date="2001-05-04",
+               stars=("Kim Park",), votes=None):
+    return {
+        "movie_id": movie_id,
+        "title": title,
+        "imdb_rating": rating,
+        "genres": list(genres),
+        "directors": list(directors),
+        "release_date": date,
+        "main_stars": list(stars),
+        "meta_score": None if votes is None else votes % 100,
+        "total_rating_count": votes,
+    }
+
+
+def random_catalog(n, seed=7):
+    rng = random.Random(seed)
+    words = ["dark", "knight", "the", "return", "star", "wars", "a", "new", "hope", "l'amour", "Ünder", "x2"]
+    genres = ["Drama", "Action", "Crime", "Comedy", "Sci-Fi"]
+    directors = ["Ann Lee", "Bo Chan", "Christopher Nolan"]
+    stars = ["Kim Park", "Heath Ledger", "Zoë Kravitz"]
+    movies = []
+    for i in range(n):
+        title = " ".join(rng.choice(words) for _ in range(rng.randint(1, 4))).title()
+        date = rng.choice([None, "", "bad", f"{rng.randint(1950, 2024)}-0{rng.randint(1, 9)}-1{rng.randint(0, 9)}"])
+        rating = rng.choice([None, 0, rng.randint(10, 95) / 10])
+        votes = rng.choice([None, 0, rng.randint(1, 50), rng.randint(1, 10**6)])
+        movies.append(make_movie(f"m{i}", title, rng.sample(genres, rng.randint(0, 2)),
+                                 rng.sample(directors, rng.randint(0, 1)), rating, date,
+                                 rng.sample(stars, rng.randint(0, 2)), votes))
+    return movies
+
+
+QUERIES = [
+    {},
+    {"query": "dark"},
+    {"query": "DARK KNI"},
+    {"query": "k kn"},
+    {"query": "ar"},
+    {"query": "l'am"},
+    {"query": "ünd"},
+    {"query": "'"},
+    {"query": "zzz"},
+    {"genre": "drama"},
+    {"genre": "Sci-Fi", "director": "bo chan"},
+    {"director": "nobody"},
+    {"min_rating": 8},
+    {"min_rating": 0, "max_rating": 5.5},
+    {"min_year": 2000},
+    {"max_year": 1990},
+    {"min_year": 1980, "max_year": 1999, "genre": "action"},
+    {"query": "star", "min_rating": 3, "max_rating": 9, "max_year": 2010},
+    {"star": "heath ledger"},
+    {"star": "ZOË KRAVITZ", "genre": "drama"},
+]
+
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_search_matches_filter_movies(query):
+    movies = random_catalog(400)
+    index = MovieIndex()
+    index.build(movies)
+    params = MovieSearchParams(**query)
+    assert index.search(params) == utils.filter_movies(movies, params)
+
+
+def expected_order(movies, sort_by, order):
+    """sort_movies with ties by movie_id; descending is the exact reverse of ascending."""
+    ascending = utils.sort_movies(sorted(movies, key=lambda m: m["movie_id"]), sort_by, "asc")
+    return ascending[::-1] if order == "desc" else ascending
+
+
+SORT_KEYS = ["title", "release_date", "rating", "meta_score", "total_rating_count", "other"]
+PAGED_QUERIES = [{}, {"genre": "drama"}, {"director": "bo chan", "min_year": 1990},
+                 {"star": "heath ledger", "genre": "crime", "min_rating": 8}]
+
+
+@pytest.mark.parametrize("sort_by", SORT_KEYS)
+@pytest.mark.parametrize("order", ["asc", "desc"])
+def test_search_page_matches_sort_and_paginate(sort_by, order):
+    movies = random_catalog(400)
+    index = MovieIndex()
+    index.build(movies)
+    for query in PAGED_QUERIES:
+        for page, limit in ((1, 20), (3, 7), (50, 20)):
+            params = MovieSearchParams(sort_by=sort_by, order=order, page=page, limit=limit, **query)
+            expected = expected_order(utils.filter_movies(movies, params), sort_by, order)
+            assert index.search_page(params)[0] == utils.paginate_movies(expected, page, limit)
+
+
+@pytest.mark.parametrize("sort_by", SORT_KEYS)
+@pytest.mark.parametrize("order", ["asc", "desc"])
+def test_cursor_walks_every_result_once(sort_by, order):
+    movies = random_catalog(400)
+    index = MovieIndex()
+    index.build(movies)
+    for query in PAGED_QUERIES:
+        params = MovieSearchParams(sort_by=sort_by, order=order, limit=9, **query)
+        seen = []
+        while True:
+            page, cursor = index.search_page(params)
+            seen.extend(page)
+            if cursor is None:
+                break
+            params = params.model_copy(update={"cursor": cursor, "page": 99})
+        assert seen == expected_order(utils.filter_movies(movies, params), sort_by, order)
+
+
+def test_cursor_survives_changes_and_rejects_other_sorts():
+    movies = random_catalog(100)
+    index = MovieIndex()
+    index.build(movies)
+    params = MovieSearchParams(sort_by="rating", order="desc", limit=10)
+    page, cursor = index.search_page(params)
+
+    index.remove(page[-1]["movie_id"])  # the cursor's own movie disappears
+    rest, _ = index.search_page(params.model_copy(update={"cursor": cursor, "limit": 1000}))
+    remaining = [m for m in expected_order(movies, "rating", "desc") if m["movie_id"] != page[-1]["movie_id"]]
+    assert rest == remaining[9:]
+
+    with pytest.raises(ValueError):
+        index.search_page(params.model_copy(update={"cursor": cursor, "order": "asc"}))
+    with pytest.raises(ValueError):
+        index.search_page(params.model_copy(update={"cursor": "not-a-cursor"}))
+
+
+def test_upsert_and_remove_keep_results_in_sync():
+    movies = random_catalog(200)
+    index = MovieIndex()
+    index.build(movies)
+
+    movies[5] = make_movie("m5", "Brand New Title", genres=("Western",), rating=9.9, date="2030-01-01")
+    index.upsert(movies[5])
+    index.remove("m7")
+    del movies[7]
+    movies.append(make_movie("m999", "Dark Star", rating=8.5))
+    index.upsert(movies[-1])
+
+    for query in QUERIES + [{"genre": "western"}, {"query": "brand"}]:
+        params = MovieSearchParams(**query)
+        assert index.search(params) == utils.filter_movies(movies, params)
+    params = MovieSearchParams(sort_by="rating", order="desc", limit=50)
+    assert index.search_page(params)[0] == expected_order(movies, "rating", "desc")[:50]
+    assert len(index) == 200
+
+
+@pytest.fixture
+def movie_store(tmp_path):
+    previous = storage.get_engine()
+    storage.set_engine(storage.JsonFileEngine(data_dir=str(tmp_path / "data")))
+    yield storage.collection("movies")
+    storage.set_engine(previous)
+
+
+def test_get_index_picks_up_collection_changes(movie_store):
+    movie_store.put(make_movie("m1", "The Dark Knight", rating=9))
+    movie_store.put(make_movie("m2", "Amelie", rating=8))
+    assert [m["movie_id"] for m in utils.search_movies(MovieSearchParams(query="dark"))] == ["m1"]
+
+    movie_store.put(make_movie("m3", "Dark City", rating=7.6))
+    movie_store.put(make_movie("m1", "The Dark Knight", rating=9.1))
+    movie_store.delete("m2")
+
+    index = get_index()
+    assert len(index) == 2
+    assert {m["movie_id"] for m in index.search(MovieSearchParams(query="dark", min_rating=9.05))} == {"m1"}
+    assert index.search(MovieSearchParams(query="amelie")) == []
+
+
+def test_sqlite_index_refreshes_only_the_changed_movies(tmp_path, monkeypatch):
+    previous = storage.get_engine()
+    engine = storage.SqliteEngine(path=str(tmp_path / "store.sqlite3"), data_dir=str(tmp_path / "data"))
+    storage.set_engine(engine)
+    try:
+        movies = storage.collection("movies")
+        movies.put(make_movie("m1", "Alien", rating=8.5))
+        movies.put(make_movie("m2", "Brazil", rating=7.9))
+        index = get_index()
+        builds = []
+        monkeypatch.setattr(MovieIndex, "build", lambda self, records: builds.append(1))
+
+        storage.collection("penalties").put({"penalty_id": "p1", "user_id": "u1", "status": "active"})
+        assert get_index() is index and index.version == movies.version()
+
+        movies.put(make_movie("m3", "Aliens", rating=8.4))
+        movies.delete("m2")
+        assert get_index() is index and not builds
+        assert [m["movie_id"] for m in index.search(MovieSearchParams(query="alien"))] == ["m1", "m3"]
+        assert len(index) == 2
+    finally:
+        storage.set_engine(previous)
+        engine.close()
+
+
+def test_list_route_returns_next_cursor(movie_store):
+    from fastapi.testclient import TestClient
+    from backend.main import app
+
+    for i, title in enumerate(["Alien", "Brazil", "Casablanca"]):
+        movie_store.put(make_movie(f"m{i}", title))
+    client = TestClient(app)
+
+    res = client.get("/movies/", params={"limit": 2})
+    assert [m["title"] for m in res.json()] == ["Alien", "Brazil"]
+    res = client.get("/movies/", params={"limit": 2, "cursor": res.headers["X-Next-Cursor"]})
+    assert [m["title"] for m in res.json()] == ["Casablanca"]
+    assert "X-Next-Cursor" not in res.headers
+    assert client.get("/movies/", params={"cursor": "bogus"}).status_code == 400
+
+
+def test_get_movies_keeps_request_order(movie_store):
+    for i in range(5):
+        movie_store.put(make_movie(f"m{i}", f"Movie {i}"))
+    found = utils.get_movies(["m3", "nope", "m0", "m3", "m4"])
+    assert list(found) == ["m3", "m0", "m4"]
+    assert found["m0"]["title"] == "Movie 0"
+
+
+def test_batch_route_reports_missing_ids(movie_store):
+    from fastapi.testclient import TestClient
+    from backend.authentication import security
+    from backend.authentication.schemas import UserToken
+    from backend.main import app
+
+    movie_store.put(make_movie("m1", "Alien"))
+    movie_store.put(make_movie("m2", "Brazil"))
+    app.dependency_overrides[security.get_current_user] = lambda: UserToken(
+        user_id="u1", username="u1", email="u1@example.com", role="member", status="active")
+    try:
+        res = TestClient(app).post("/movies/batch", json={"movie_ids": ["m2", "gone", "m1"]})
+    finally:
+        app.dependency_overrides.clear()
+    assert res.status_code == 200
+    assert [m["title"] for m in res.json()["movies"]] == ["Brazil", "Alien"]
+    assert res.json()["missing"] == ["gone"]
@@ -0,0 +1,100 @@
+import random
+
+from backend.core import storage
+from backend.movies import utils
+from backend.movies.suggest import SuggestIndex, normalize
+from tests.test_movie_index import make_movie, random_catalog
+
+PREFIXES = ["d", "da", "dark", "dark kn", "kn", "the", "l amour", "under", "zoe", "heath l", "chris", "act", "x", "q"]
+
+
+def brute_force(movies, prefix, limit):
+    """Rank every title/person/genre having a word that starts with prefix."""
+    prefix = normalize(prefix)
+    found = {}
+    for m in movies:
+        votes = m.get("total_rating_count") or 0
+        name = normalize(m["title"])
+        if any(w.startswith(prefix) for w in [name[i:] for i in range(len(name)) if i == 0 or name[i - 1] == " "]):
+            found[("title", m["movie_id"])] = (m["title"], votes)
+        for kind, field in (("director", "directors"), ("star", "main_stars"), ("genre", "genres")):
+            for value in m[field]:
+                norm = normalize(value)
+                starts = [norm[i:] for i in range(len(norm)) if i == 0 or norm[i - 1] == " "]
+                if any(s.startswith(prefix) for s in starts):
+                    text, total = found.get((kind, norm), (value, 0))
+                    found[(kind, norm)] = (text, total + votes)
+    ranked = sorted(found, key=lambda e: (-found[e][1], found[e][0], e))[:limit]
+    return [(kind, found[(kind, ident)][0], found[(kind, ident)][1]) for kind, ident in ranked]
+
+
+def shown(results):
+    return [(s["type"], s["text"], s["popularity"]) for s in results]
+
+
+def test_suggestions_match_brute_force():
+    movies = random_catalog(300)
+    index = SuggestIndex()
+    index.build(movies)
+    for prefix in PREFIXES:
+        for limit in (1, 5, 20):
+            assert shown(index.suggest(prefix, limit)) == brute_force(movies, prefix, limit)
+
+
+def test_incremental_updates_match_a_rebuild():
+    movies = {m["movie_id"]: m for m in random_catalog(200)}
+    index = SuggestIndex()
+    index.build(movies.values())
+    for prefix in PREFIXES:
+        index.suggest(prefix)  # fill the short-prefix cache so changes must invalidate it
+    rng = random.Random(11)
+    for i, extra in enumerate(random_catalog(60, seed=99)):
+        target = rng.choice(sorted(movies))
+        if i % 3 == 0:
+            index.remove(target)
+            del movies[target]
+        else:
+            extra["movie_id"] = target if i % 3 == 1 else f"new{i}"
+            index.upsert(extra)
+            movies[extra["movie_id"]] = extra
+    rebuilt = SuggestIndex()
+    rebuilt.build(movies.values())
+    assert sorted(index.keys) == index.keys == rebuilt.keys
+    for prefix in PREFIXES:
+        assert index.suggest(prefix, 20) == rebuilt.suggest(prefix, 20)
+        assert shown(index.suggest(prefix, 20)) == brute_force(list(movies.values()), prefix, 20)
+
+
+def test_short_prefix_heads_follow_popularity_changes():
+    movies = {m["movie_id"]: m for m in random_catalog(300)}
+    index = SuggestIndex()
+    index.build(movies.values())
+    short = sorted({p[:n] for p in index._heads for n in (1, 2)})
+    rng = random.Random(5)
+    for _ in range(400):  # mostly demotions, so heads run short and re-rank
+        changed = dict(movies[rng.choice(sorted(movies))], total_rating_count=rng.choice([0, 1, 10**7]))
+        index.upsert(changed)
+        movies[changed["movie_id"]] = changed
+    for prefix in short:
+        assert shown(index.suggest(prefix, 20)) == brute_force(list(movies.values()), prefix, 20)
+
+
+def test_suggest_route(tmp_path):
+    from fastapi.testclient import TestClient
+    from backend.main import app
+
+    previous = storage.get_engine()
+    storage.set_engine(storage.JsonFileEngine(data_dir=str(tmp_path / "data")))
+    try:
+        movies = storage.collection("movies")
+        movies.put(make_movie("m1", "Amélie", votes=700))
+        movies.put(make_movie("m2", "American Beauty", votes=900, directors=("Sam Mendes",)))
+        client = TestClient(app)
+        res = client.get("/movies/suggest", params={"prefix": "AME", "limit": 5})
+        assert [(s["type"], s["movie_id"]) for s in res.json()] == [("title", "m2"), ("title", "m1")]
+
+        movies.put(make_movie("m1", "Amélie", votes=2000))
+        assert [s["movie_id"] for s in utils.suggest("ame")] == ["m1", "m2"]
+        assert client.get("/movies/suggest", params={"prefix": ""}).status_code == 422
+    finally:
+        storage.set_engine(previous)
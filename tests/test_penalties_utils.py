@@ -35,13 +35,13 @@ def make_penalty(**overrides):
 
 @patch("backend.penalties.utils.save_json")
 @patch("backend.penalties.utils.load_json")
-@patch("backend.penalties.utils.user_utils.save_active_users")
-@patch("backend.penalties.utils.user_utils.load_active_users")
+@patch("backend.penalties.utils.user_utils.save_user")
+@patch("backend.penalties.utils.user_utils.get_active_user")
 def test_add_penalty_updates_json_and_user(
-    mock_load_users, mock_save_users, mock_load, mock_save
+    mock_get_user, mock_save_user, mock_load, mock_save
 ):
     mock_load.return_value = []
-    mock_load_users.return_value = [{"user_id": "u1"}]
+    mock_get_user.return_value = {"user_id": "u1"}
 
     penalty = make_penalty()
 
@@ -51,9 +51,9 @@ def test_add_penalty_updates_json_and_user(
     mock_save.assert_called_once()
 
     # User updated with penalty ID
-    mock_save_users.assert_called_once()
-    updated_users = mock_save_users.call_args[0][0]
-    assert updated_users[0]["penalties"] == ["p1"]
+    mock_save_user.assert_called_once()
+    updated_user = mock_save_user.call_args[0][0]
+    assert updated_user["penalties"] == ["p1"]
 
 
 # ---------------------------------------------------------
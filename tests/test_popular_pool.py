@@ -0,0 +1,92 @@
+import time
+
+import httpx
+
+from backend.core import storage
+from backend.movies import popular
+from backend.movies.popular import LocalPopularProvider, PopularPool, TMDbPopularProvider
+from External_API.tmdb_client import TMDbClient
+from tests.test_movie_index import make_movie
+
+
+class FakeProvider:
+    def __init__(self, name, batches):
+        self.name = name
+        self.batches = list(batches)
+        self.calls = 0
+
+    def fetch(self):
+        self.calls += 1
+        batch = self.batches.pop(0) if len(self.batches) > 1 else self.batches[0]
+        if isinstance(batch, Exception):
+            raise batch
+        return batch
+
+
+def test_pool_keeps_serving_when_refresh_fails():
+    provider = FakeProvider("tmdb", [[{"id": 1}, {"id": 2}], RuntimeError("TMDB down")])
+    pool = PopularPool(provider, ttl=60)
+    assert pool.pick()["id"] in (1, 2)
+    assert provider.calls == 1
+    for _ in range(50):
+        pool.pick()
+    assert provider.calls == 1  # served from memory
+
+    assert pool.refresh() is False
+    assert pool.pick()["id"] in (1, 2) and pool.stats()["failures"] == 1
+
+
+def test_empty_pool_falls_back():
+    pool = PopularPool(FakeProvider("tmdb", [RuntimeError("offline")]), ttl=60,
+                       fallback=FakeProvider("local", [[{"id": "m1"}]]))
+    assert pool.pick() == {"id": "m1"}
+    assert pool.stats()["source"] == "local"
+    assert PopularPool(FakeProvider("tmdb", [[]]), ttl=60).pick() is None
+
+
+def test_background_thread_refreshes_after_ttl():
+    provider = FakeProvider("tmdb", [[{"id": 1}], [{"id": 2}]])
+    pool = PopularPool(provider, ttl=0.05)
+    pool.start()
+    try:
+        deadline = time.monotonic() + 5
+        while provider.calls < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert pool.pick() == {"id": 2}
+    finally:
+        pool.close()
+    assert not pool._thread.is_alive()
+
+
+def test_tmdb_provider_fetches_pages_through_one_client():
+    seen = []
+
+    def handler(request):
+        seen.append((request.headers["Authorization"], int(request.url.params["page"])))
+        page = int(request.url.params["page"])
+        return httpx.Response(200, json={"results": [{"id": page, "title": f"Page {page}", "poster_path": "/p.jpg",
+                                                      "vote_average": 7.5}]})
+
+    provider = TMDbPopularProvider("secret", pages=3, client=lambda: TMDbClient(
+        "secret", transport=httpx.MockTransport(handler)))
+    movies = provider.fetch()
+    assert len(movies) == 3 and len({page for _, page in seen}) == 3
+    assert all(auth == "Bearer secret" for auth, _ in seen)
+    assert movies[0]["poster_path"] == popular.TMDB_IMAGE_BASE + "/p.jpg" and movies[0]["rating"] == 7.5
+
+
+def test_random_route_serves_local_pool(tmp_path, monkeypatch):
+    from fastapi.testclient import TestClient
+    from backend.main import app
+
+    previous = storage.get_engine()
+    storage.set_engine(storage.JsonFileEngine(data_dir=str(tmp_path / "data")))
+    try:
+        movies = storage.collection("movies")
+        movies.put(make_movie("m1", "Alien", votes=10))
+        movies.put(make_movie("m2", "Brazil", votes=5))
+        monkeypatch.setattr(popular, "_pool", PopularPool(LocalPopularProvider(size=1), ttl=60))
+        body = TestClient(app).get("/movies/random").json()
+        assert (body["id"], body["title"], body["poster_path"]) == ("m1", "Alien", None)
+    finally:
+        storage.set_engine(previous)
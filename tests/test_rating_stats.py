@@ -0,0 +1,97 @@
+import pytest
+
+from backend.movies import utils as movie_utils
+from backend.movies.schemas import MovieSearchParams
+from backend.reviews import utils as review_utils
+from backend.reviews.schemas import ReviewCreate, ReviewUpdate, Vote
+from backend.reviews.stats import stats_for
+from tests.test_movie_index import make_movie
+from tests.test_review_index import engine  # noqa: F401  (fixture)
+from tests.test_storage import make_review
+
+
+def add(movie_id, user_id, rating):
+    return review_utils.add_review(movie_id, ReviewCreate(title="t", rating=rating, text="x"), user_id)
+
+
+def test_stats_follow_review_writes(engine):
+    reviews = engine.collection("reviews")
+    reviews.put(make_review("r0", movie_id="m1", user_id="u0", rating=10))  # before the stats exist
+    assert review_utils.get_rating_stats("m1")["count"] == 1  # first read builds them
+
+    first = add("m1", "u1", 6)
+    add("m1", "u2", 8)
+    stats = review_utils.get_rating_stats("m1")
+    assert (stats["count"], stats["average"], stats["stddev"]) == (3, 8.0, 1.63)
+    assert stats["histogram"] == [0, 0, 0, 0, 0, 1, 0, 1, 0, 1]
+
+    review_utils.update_review("m1", first["review_id"], ReviewUpdate(rating=2))
+    review_utils.add_vote("m1", first["review_id"], Vote(vote=True), "u1")
+    review_utils.add_vote("m1", first["review_id"], Vote(vote=False), "u2")
+    review_utils.flush_votes()
+    stats = review_utils.get_rating_stats("m1")
+    assert stats["histogram"][1] == 1 and stats["histogram"][5] == 0
+    assert (stats["helpful_votes"], stats["total_votes"]) == (1, 2)
+
+    assert review_utils.delete_review("m1", first["review_id"]) is True
+    stats = review_utils.get_rating_stats("m1")
+    assert (stats["count"], stats["average"], stats["total_votes"]) == (2, 9.0, 0)
+    assert review_utils.get_rating_stats("m2") == {"count": 0, "average": None, "stddev": None,
+                                                    "histogram": [0] * 10, "helpful_votes": 0, "total_votes": 0}
+    assert stats_for(engine.collection("movies")).verify(reviews.all()) == []
+
+
+def test_list_sorts_by_review_aggregates(engine):
+    movies = engine.collection("movies")
+    for movie_id, title in [("m1", "Alien"), ("m2", "Brazil"), ("m3", "Casablanca")]:
+        movies.put(make_movie(movie_id, title))
+    add("m2", "u1", 9)
+    add("m2", "u2", 7)
+    add("m3", "u1", 10)
+
+    def titles(**params):
+        return [m["title"] for m in movie_utils.list_movies(MovieSearchParams(**params))[0]]
+
+    assert titles(sort_by="user_rating", order="desc") == ["Casablanca", "Brazil", "Alien"]
+    assert titles(sort_by="review_count", order="desc") == ["Brazil", "Casablanca", "Alien"]
+    add("m1", "u3", 10)
+    add("m1", "u4", 10)
+    add("m1", "u5", 10)
+    assert titles(sort_by="review_count", order="desc") == ["Alien", "Brazil", "Casablanca"]
+
+    page, cursor = movie_utils.list_movies(MovieSearchParams(sort_by="user_rating", limit=1))
+    assert page[0]["title"] == "Brazil"
+    page, _ = movie_utils.list_movies(MovieSearchParams(sort_by="user_rating", limit=1, cursor=cursor))
+    assert page[0]["title"] in ("Alien", "Casablanca")
+
+
+def test_movie_route_includes_rating_stats(engine):
+    from fastapi.testclient import TestClient
+    from backend.authentication import security
+    from backend.authentication.schemas import UserToken
+    from backend.main import app
+
+    engine.collection("movies").put(make_movie("m1", "Alien"))
+    add("m1", "u1", 7)
+    app.dependency_overrides[security.get_current_user] = lambda: UserToken(
+        user_id="u1", username="u1", email="u1@example.com", role="member", status="active")
+    try:
+        body = TestClient(app).get("/movies/m1").json()
+    finally:
+        app.dependency_overrides.clear()
+    assert body["title"] == "Alien"
+    assert body["rating_stats"]["count"] == 1 and body["rating_stats"]["average"] == 7.0
+
+
+def test_stats_update_needs_the_movies_file(engine):
+    from backend.core import transactions
+
+    stats = stats_for(engine.collection("movies"))
+    stats.rebuild(lambda: [])
+    review = make_review("r1", movie_id="m1")
+    with transactions.transaction(stats.path("m1"), shared=[stats.directory]):
+        stats.update(None, review)
+    assert stats.get("m1")["count"] == 1
+    with transactions.transaction(stats.path("m2"), shared=[stats.directory]):
+        with pytest.raises(transactions.TransactionError):
+            stats.update(review, None)
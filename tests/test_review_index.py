@@ -0,0 +1,85 @@
+import pytest
+
+from backend.core import storage, transactions
+from backend.recommendations import utils as rec_utils
+from backend.reviews import utils as review_utils
+from backend.reviews.schemas import ReviewCreate, ReviewUpdate
+from backend.reviews.user_index import index_for
+from tests.test_storage import make_review
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    monkeypatch.setattr(transactions, "TRANSACTIONS_DIR", str(tmp_path / ".transactions"))
+    previous = storage.get_engine()
+    engine = storage.JsonFileEngine(data_dir=str(tmp_path / "data"))
+    storage.set_engine(engine)
+    yield engine
+    storage.set_engine(previous)
+
+
+def refs(user_id):
+    return sorted(review_utils.get_user_review_refs(user_id))
+
+
+def test_index_is_built_on_first_lookup(engine):
+    reviews = engine.collection("reviews")
+    reviews.put(make_review("r1", movie_id="m1", user_id="u1", rating=8))
+    reviews.put(make_review("r2", movie_id="m2", user_id="u1", rating=5))
+    reviews.put(make_review("r3", movie_id="m1", user_id="u2"))
+    index = index_for(reviews)
+    assert not index.built()
+
+    assert refs("u1") == [("m1", "r1", 8), ("m2", "r2", 5)]
+    assert index.built() and index.verify(reviews.all()) == []
+    assert [r["review_id"] for r in review_utils.get_reviews_by_user("u2")] == ["r3"]
+    assert rec_utils.get_user_ratings("u1") == {"m1": 8, "m2": 5}
+    assert sorted(rec_utils.get_user_reviewed_movies("u1")) == ["m1", "m2"]
+    assert refs("nobody") == []
+
+
+def test_review_writes_keep_the_index_current(engine):
+    assert refs("u1") == []  # builds the (empty) index
+    meta_path = index_for(engine.collection("reviews")).meta_path
+    with open(meta_path, encoding="utf-8") as f:
+        meta = f.read()
+    first = review_utils.add_review("m1", ReviewCreate(title="t", rating=6, text="x"), "u1")
+    second = review_utils.add_review("m2", ReviewCreate(title="t", rating=9, text="x"), "u1")
+    assert refs("u1") == sorted([("m1", first["review_id"], 6), ("m2", second["review_id"], 9)])
+
+    review_utils.update_review("m1", first["review_id"], ReviewUpdate(rating=2))
+    review_utils.update_review("m2", second["review_id"], ReviewUpdate(text="only text"))
+    assert refs("u1") == sorted([("m1", first["review_id"], 2), ("m2", second["review_id"], 9)])
+
+    assert review_utils.delete_review("m1", first["review_id"]) is True
+    assert review_utils.delete_review("m1", first["review_id"]) is False
+    assert refs("u1") == [("m2", second["review_id"], 9)]
+
+    reviews = engine.collection("reviews")
+    assert index_for(reviews).verify(reviews.all()) == []
+    with open(meta_path, encoding="utf-8") as f:
+        assert f.read() == meta  # updates only write the user's shard
+
+
+def test_index_update_needs_the_users_shard(engine):
+    reviews = engine.collection("reviews")
+    index = index_for(reviews)
+    index.rebuild(reviews.all)
+    review = make_review("r1", user_id="u1")
+    with transactions.transaction(index.shard_path("u1"), shared=[index.directory]):
+        index.update(None, review)
+    assert refs("u1") == [("m1", "r1", 7)]
+    other = next(u for u in map("u{}".format, range(2, 100)) if index.shard_path(u) != index.shard_path("u1"))
+    with transactions.transaction(index.shard_path(other), shared=[index.directory]):
+        with pytest.raises(transactions.TransactionError):
+            index.update(review, None)
+
+
+def test_rebuild_repairs_a_stale_index(engine):
+    reviews = engine.collection("reviews")
+    index = index_for(reviews)
+    assert index.rebuild(reviews.all) == 0
+    reviews.put(make_review("r1", user_id="u1"))  # written behind the index's back
+    assert refs("u1") == [] and len(index.verify(reviews.all())) == 1
+    assert index.rebuild(reviews.all) == 1
+    assert refs("u1") == [("m1", "r1", 7)]
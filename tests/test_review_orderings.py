@@ -0,0 +1,166 @@
+import random
+
+import pytest
+
+from backend.core import jsonio
+from backend.reviews import utils as review_utils
+from backend.reviews.orderings import ReviewOrderings, _MovieOrderings, encode_cursor, wilson_score
+from backend.reviews.schemas import ReviewCreate, ReviewUpdate, Vote
+from tests.test_review_index import engine  # noqa: F401  (fixture)
+from tests.test_storage import make_review
+
+
+def full_sort(reviews, rating, sort_by, order):
+    value = {"date": lambda r: r["date"], "rating": lambda r: r["rating"],
+             "helpful": lambda r: r["usefulness"]["helpful"],
+             "total_votes": lambda r: r["usefulness"]["total_votes"],
+             "top": lambda r: wilson_score(r["usefulness"]["helpful"], r["usefulness"]["total_votes"])}[sort_by]
+    kept = [r for r in reviews if rating is None or r["rating"] == rating]
+    return [r["review_id"] for r in sorted(kept, key=lambda r: (value(r), r["review_id"]), reverse=order == "desc")]
+
+
+def make_reviews(n, seed=7):
+    rng = random.Random(seed)
+    reviews = []
+    for i in range(n):
+        review = make_review(f"r{i:03d}", user_id=f"u{i}", rating=rng.randint(1, 10))
+        review["date"] = f"2024-01-{rng.randint(1, 28):02d}"
+        review["usefulness"] = {"helpful": rng.randint(0, 3), "total_votes": rng.randint(3, 6)}
+        reviews.append(review)
+    return reviews
+
+
+def walk(orderings, view, **params):
+    ids, cursor = [], None
+    while True:
+        page, cursor = orderings.page("m1", view, limit=7, cursor=cursor, **params)
+        ids.extend(r["review_id"] for r in page)
+        if cursor is None:
+            return ids
+
+
+@pytest.mark.parametrize("sort_by", ["date", "rating", "helpful", "total_votes", "top"])
+@pytest.mark.parametrize("order", ["asc", "desc"])
+@pytest.mark.parametrize("rating", [None, 4])
+def test_pages_and_cursors_match_a_full_sort(sort_by, order, rating):
+    reviews = make_reviews(60)
+    orderings = ReviewOrderings()
+    expected = full_sort(reviews, rating, sort_by, order)
+    assert walk(orderings, reviews, rating=rating, sort_by=sort_by, order=order) == expected
+    page, _ = orderings.page("m1", reviews, rating, sort_by, order, skip=5, limit=10)
+    assert [r["review_id"] for r in page] == expected[5:15]
+
+
+def test_orderings_follow_changed_records():
+    reviews = make_reviews(40)
+    orderings = ReviewOrderings()
+    assert walk(orderings, reviews, sort_by="rating") == full_sort(reviews, None, "rating", "desc")
+    assert walk(orderings, reviews, sort_by="helpful", rating=5) == full_sort(reviews, 5, "helpful", "desc")
+
+    changed = reviews[1:]  # r000 removed, one edited, one added; the rest are the same objects
+    changed[3] = dict(changed[3], rating=5, usefulness={"helpful": 9, "total_votes": 9})
+    changed.append(dict(make_review("r999", user_id="new", rating=5), date="2024-02-01",
+                        usefulness={"helpful": 0, "total_votes": 0}))
+    for sort_by, rating in [("rating", None), ("helpful", 5), ("date", 5)]:
+        assert walk(orderings, changed, sort_by=sort_by, rating=rating) == full_sort(changed, rating, sort_by, "desc")
+
+    edited = list(changed)  # in place, as the journal keeps an edited record's position
+    edited[10] = dict(edited[10], rating=5)
+    shrunk = edited[:20] + edited[21:]
+    for view in (edited, shrunk):
+        for sort_by, rating in [("rating", None), ("helpful", 5)]:
+            assert walk(orderings, view, sort_by=sort_by, rating=rating) == full_sort(view, rating, sort_by, "desc")
+
+
+def test_top_ranks_by_wilson_lower_bound():
+    reviews = []
+    for review_id, helpful, total in [("few", 1, 1), ("many", 50, 100), ("most", 9, 10), ("none", 0, 0)]:
+        reviews.append(dict(make_review(review_id), usefulness={"helpful": helpful, "total_votes": total}))
+    orderings = ReviewOrderings()
+    assert walk(orderings, reviews, sort_by="top") == ["most", "many", "few", "none"]
+    assert walk(orderings, reviews, sort_by="helpful")[0] == "many"
+    assert wilson_score(0, 0) == 0.0 and 0.2 < wilson_score(1, 1) < 0.21
+
+    voted = [dict(reviews[0], usefulness={"helpful": 40, "total_votes": 40})] + reviews[1:]  # a new view
+    assert walk(orderings, voted, sort_by="top") == ["few", "most", "many", "none"]
+
+
+def test_cursor_must_match_the_query():
+    orderings, reviews = ReviewOrderings(), make_reviews(5)
+    with pytest.raises(ValueError):
+        orderings.page("m1", reviews, cursor="not-a-cursor")
+    with pytest.raises(ValueError):
+        orderings.page("m1", reviews, sort_by="rating", cursor=encode_cursor("date", "desc", None, "2024-01-01", "r1"))
+
+
+def test_unknown_sort_by_and_order_keep_the_old_meaning():
+    reviews, orderings = make_reviews(12), ReviewOrderings()
+    page, cursor = orderings.page("m1", reviews, sort_by="newest", skip=2, limit=5)
+    assert [r["review_id"] for r in page] == [r["review_id"] for r in reviews[2:7]] and cursor is None
+    assert walk(orderings, reviews, sort_by="rating", order="DESC") == full_sort(reviews, None, "rating", "desc")
+    for order in ("asc", "up"):
+        assert walk(orderings, reviews, sort_by="rating", order=order) == full_sort(reviews, None, "rating", "asc")
+    with pytest.raises(ValueError):
+        orderings.page("m1", reviews, sort_by="newest", cursor=encode_cursor("date", "desc", None, "2024", "r1"))
+
+
+def test_orderings_are_keyed_on_the_document_version(monkeypatch):
+    reviews, orderings, loads = make_reviews(40), ReviewOrderings(), []
+
+    def load():  # like SQLite: new objects on every read
+        loads.append(1)
+        return jsonio.freeze([dict(r) for r in reviews])
+
+    def ids(version):
+        page, _ = orderings.page("m1", load, sort_by="rating", limit=100, version=version)
+        return [r["review_id"] for r in page]
+
+    assert ids(1) == ids(1) == full_sort(reviews, None, "rating", "desc")
+    assert len(loads) == 1
+
+    sorts = []
+    original = _MovieOrderings._sorted
+    monkeypatch.setattr(_MovieOrderings, "_sorted", lambda self, *a: sorts.append(a) or original(self, *a))
+    reviews[5] = dict(reviews[5], rating=10)
+    assert ids(2) == full_sort(reviews, None, "rating", "desc")
+    assert len(loads) == 2 and not sorts  # the edited review was moved, nothing was re-sorted
+
+
+def test_review_writes_reach_the_orderings(engine):
+    def add(user_id, rating):
+        return review_utils.add_review("m1", ReviewCreate(title="t", rating=rating, text="x"), user_id)
+
+    def ids(**params):
+        return [r["review_id"] for r in review_utils.filter_sort_reviews("m1", **params)]
+
+    first, second, third = add("u1", 4), add("u2", 9), add("u3", 6)
+    assert ids(sort_by="rating") == [second["review_id"], third["review_id"], first["review_id"]]
+    review_utils.update_review("m1", first["review_id"], ReviewUpdate(rating=10))
+    review_utils.add_vote("m1", third["review_id"], Vote(vote=True), "u1")
+    review_utils.flush_votes()
+    assert ids(sort_by="rating") == [first["review_id"], second["review_id"], third["review_id"]]
+    assert ids(sort_by="helpful", limit=1) == [third["review_id"]]
+    assert review_utils.delete_review("m1", second["review_id"])
+    assert ids(sort_by="rating", order="asc") == [third["review_id"], first["review_id"]]
+    assert ids(rating=10) == [first["review_id"]]
+    for user_id in ("u2", "u3"):
+        review_utils.add_vote("m1", first["review_id"], Vote(vote=True), user_id)
+    review_utils.flush_votes()
+    assert ids(sort_by="top") == [first["review_id"], third["review_id"]]
+
+
+def test_route_pages_with_cursor_header(engine):
+    from fastapi.testclient import TestClient
+    from backend.main import app
+
+    reviews = engine.collection("reviews")
+    for review in make_reviews(5):
+        reviews.put(review)
+    client = TestClient(app)
+    first = client.get("/reviews/m1", params={"sort_by": "rating", "limit": 3})
+    assert first.status_code == 200 and len(first.json()) == 3
+    rest = client.get("/reviews/m1", params={"sort_by": "rating", "limit": 3,
+                                             "cursor": first.headers["X-Next-Cursor"]})
+    assert len(rest.json()) == 2 and "X-Next-Cursor" not in rest.headers
+    assert [r["review_id"] for r in first.json() + rest.json()] == full_sort(make_reviews(5), None, "rating", "desc")
+    assert client.get("/reviews/m1", params={"cursor": "bogus"}).status_code == 400
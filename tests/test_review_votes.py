@@ -0,0 +1,121 @@
+import pytest
+
+from backend.core import storage, transactions
+from backend.reviews import utils as review_utils
+from backend.reviews import votes as votes_module
+from backend.reviews.schemas import ReviewCreate, Vote
+from tests.test_review_index import engine  # noqa: F401  (fixture)
+
+
+def usefulness(review_id):
+    return dict(review_utils.get_review("m1", review_id)["usefulness"])
+
+
+def vote(review_id, user_id, helpful):
+    return review_utils.add_vote("m1", review_id, Vote(vote=helpful), user_id)["usefulness"]
+
+
+def test_votes_are_per_user_and_flushed_in_batches(engine):
+    rid = review_utils.add_review("m1", ReviewCreate(title="t", rating=7, text="x"), "author")["review_id"]
+    assert vote(rid, "u1", True) == {"helpful": 1, "total_votes": 1}
+    assert vote(rid, "u1", True) == {"helpful": 1, "total_votes": 1}  # a repeat is ignored
+    assert vote(rid, "u2", True) == {"helpful": 2, "total_votes": 2}
+    assert vote(rid, "u1", False) == {"helpful": 1, "total_votes": 2}  # a change moves the vote
+    assert usefulness(rid) == {"helpful": 0, "total_votes": 0}  # the review is written on flush
+
+    assert review_utils.flush_votes() == 1
+    assert usefulness(rid) == {"helpful": 1, "total_votes": 2}
+    assert review_utils.get_rating_stats("m1")["helpful_votes"] == 1
+    assert review_utils.flush_votes() == 0
+    assert review_utils.add_vote("m1", "missing", Vote(vote=True), "u1") is None
+
+
+def test_unflushed_votes_survive_a_restart(engine, monkeypatch):
+    rid = review_utils.add_review("m1", ReviewCreate(title="t", rating=7, text="x"), "author")["review_id"]
+    vote(rid, "u1", True)
+    vote(rid, "u2", False)
+
+    monkeypatch.setattr(votes_module, "_votes", {})  # a new process: no counters, no replay cache
+    assert review_utils._votes().unflushed() == ["m1"]
+    assert review_utils.recover_votes() == 1
+    assert usefulness(rid) == {"helpful": 1, "total_votes": 2}
+    assert review_utils._votes().unflushed() == []
+
+    assert vote(rid, "u1", True) == {"helpful": 1, "total_votes": 2}  # still deduplicated from the log
+    review_utils.flush_votes()
+    assert usefulness(rid) == {"helpful": 1, "total_votes": 2}
+
+
+def test_a_crash_between_the_offset_and_the_review_loses_no_votes(engine, monkeypatch):
+    rid = review_utils.add_review("m1", ReviewCreate(title="t", rating=7, text="x"), "author")["review_id"]
+    vote(rid, "u1", True)
+    vote(rid, "u2", True)
+
+    def crash(path, text):
+        raise OSError("No space left on device")
+
+    # The offset and stats are renamed into place, then the review's append fails
+    write_append = transactions._write_append
+    monkeypatch.setattr(transactions, "_write_append", crash)
+    with pytest.raises(OSError):
+        review_utils.flush_votes()
+    monkeypatch.setattr(transactions, "_write_append", write_append)
+    assert usefulness(rid) == {"helpful": 0, "total_votes": 0} and review_utils._votes().unflushed() == []
+
+    monkeypatch.setattr(votes_module, "_votes", {})  # a new process
+    assert transactions.recover() == 1
+    assert review_utils.recover_votes() == 0
+    assert usefulness(rid) == {"helpful": 2, "total_votes": 2}
+    assert review_utils.get_rating_stats("m1")["helpful_votes"] == 2
+
+
+def test_recover_settles_a_review_whose_flush_was_lost(engine, monkeypatch):
+    rid = review_utils.add_review("m1", ReviewCreate(title="t", rating=7, text="x"), "author")["review_id"]
+    before = review_utils.get_review("m1", rid)
+    vote(rid, "u1", True)
+    vote(rid, "u2", False)
+    review_utils.flush_votes()
+    # As with SQLite rolling back after the offset file was renamed: only the review lags behind
+    storage.collection("reviews").put(dict(before))
+
+    monkeypatch.setattr(votes_module, "_votes", {})
+    assert review_utils._votes().unflushed() == []
+    assert review_utils.recover_votes() == 1
+    assert usefulness(rid) == {"helpful": 1, "total_votes": 2}
+    assert review_utils.get_rating_stats("m1")["helpful_votes"] == 1
+    assert review_utils.recover_votes() == 0
+
+
+def test_flushed_log_is_compacted(engine):
+    rid = review_utils.add_review("m1", ReviewCreate(title="t", rating=7, text="x"), "author")["review_id"]
+    votes = review_utils._votes()
+    votes.compact_bytes = 1
+    for user_id, helpful in [("u1", True), ("u1", False), ("u1", True), ("u2", False)]:
+        vote(rid, user_id, helpful)
+    review_utils.flush_votes()
+    with open(votes.log_path("m1"), encoding="utf-8") as f:
+        assert len(f.read().splitlines()) == 2
+    assert votes.unflushed() == [] and votes.compactions == 1
+    assert usefulness(rid) == {"helpful": 1, "total_votes": 2}
+
+    vote(rid, "u2", True)
+    review_utils.flush_votes()
+    assert usefulness(rid) == {"helpful": 2, "total_votes": 2}
+
+
+def test_vote_route_counts_each_user_once(engine):
+    from fastapi.testclient import TestClient
+    from backend.authentication import security
+    from backend.authentication.schemas import UserToken
+    from backend.main import app
+
+    rid = review_utils.add_review("m1", ReviewCreate(title="t", rating=7, text="x"), "author")["review_id"]
+    app.dependency_overrides[security.get_current_user] = lambda: UserToken(
+        user_id="u1", username="u1", email="u1@example.com", role="member", status="active")
+    try:
+        client = TestClient(app)
+        for helpful in (True, True, False):
+            body = client.post(f"/reviews/m1/{rid}/vote", json={"vote": helpful}).json()
+    finally:
+        app.dependency_overrides.clear()
+    assert body["usefulness"] == {"helpful": 0, "total_votes": 1}
@@ -0,0 +1,221 @@
+import os
+import threading
+import pytest
+
+from backend.core import jsonio, storage
+from backend.core.indexes import DuplicateValueError
+from backend.core.transactions import transaction
+
+
+@pytest.fixture(params=["json", "sqlite"])
+def engine(request, tmp_path):
+    data_dir = str(tmp_path / "data")
+    if request.param == "json":
+        eng = storage.JsonFileEngine(data_dir=data_dir)
+    else:
+        eng = storage.SqliteEngine(path=str(tmp_path / "store.sqlite3"), data_dir=data_dir)
+    yield eng
+    eng.close()
+
+
+def make_review(review_id, movie_id="m1", user_id="u1", rating=7):
+    return {
+        "review_id": review_id,
+        "movie_id": movie_id,
+        "user_id": user_id,
+        "title": "t",
+        "rating": rating,
+        "date": "2024-01-01",
+        "text": "x",
+        "usefulness": {"helpful": 0, "total_votes": 0},
+    }
+
+
+# ---------------------------------------------------------
+# Collection API
+# ---------------------------------------------------------
+
+def test_put_get_delete_roundtrip(engine):
+    penalties = engine.collection("penalties")
+    penalties.put({"penalty_id": "p1", "user_id": "u1", "status": "active"})
+    penalties.put({"penalty_id": "p2", "user_id": "u2", "status": "active"})
+    penalties.put({"penalty_id": "p1", "user_id": "u1", "status": "resolved"})
+
+    assert penalties.get("p1")["status"] == "resolved"
+    assert [p["penalty_id"] for p in penalties.all()] == ["p1", "p2"]
+    assert [p["penalty_id"] for p in penalties.query(user_id="u2")] == ["p2"]
+
+    assert penalties.delete("p1") is True
+    assert penalties.delete("p1") is False
+    assert penalties.get("p1") is None
+
+
+def test_partitioned_reviews(engine):
+    reviews = engine.collection("reviews")
+    reviews.put(make_review("r1", movie_id="m1", user_id="u1"))
+    reviews.put(make_review("r2", movie_id="m1", user_id="u2"))
+    reviews.put(make_review("r3", movie_id="m2", user_id="u1"))
+
+    assert [r["review_id"] for r in reviews.load_document("m1")] == ["r1", "r2"]
+    assert sorted(r["review_id"] for r in reviews.query(user_id="u1")) == ["r1", "r3"]
+    assert reviews.get("r3", partition="m1") is None
+    assert reviews.get("r3", partition="m2")["user_id"] == "u1"
+
+    reviews.save_document([make_review("r2", movie_id="m1", user_id="u2", rating=3)], "m1")
+    assert [r["rating"] for r in reviews.load_document("m1")] == [3]
+    assert len(reviews.load_document("m2")) == 1
+
+
+def test_movies_one_record_per_key(engine):
+    movies = engine.collection("movies")
+    movies.put({"movie_id": "m1", "title": "A"})
+    movies.put({"movie_id": "m2", "title": "B"})
+
+    assert movies.get("m1")["title"] == "A"
+    assert sorted(m["movie_id"] for m in movies.all()) == ["m1", "m2"]
+
+
+def test_document_version_follows_only_its_partition(engine):
+    reviews = engine.collection("reviews")
+    reviews.put(make_review("r1", movie_id="m1"))
+    reviews.put(make_review("r2", movie_id="m2"))
+    m1, m2 = reviews.document_version("m1"), reviews.document_version("m2")
+
+    engine.collection("penalties").put({"penalty_id": "p1", "user_id": "u1", "status": "active"})
+    reviews.put(make_review("r3", movie_id="m2"))
+    assert reviews.document_version("m1") == m1 and reviews.document_version("m2") != m2
+    assert reviews.delete("r1", partition="m1")
+    assert reviews.document_version("m1") != m1
+
+
+# ---------------------------------------------------------
+# Migration and jsonio routing
+# ---------------------------------------------------------
+
+def test_migrate_json_to_sqlite_and_back(tmp_path):
+    from backend.scripts.migrate_storage import migrate
+
+    src = storage.JsonFileEngine(data_dir=str(tmp_path / "src"))
+    src.collection("users_active").put({"user_id": "u1", "username": "alice", "email": "a@x.com"})
+    src.collection("reviews").put(make_review("r1"))
+    src.collection("movies").put({"movie_id": "m1", "title": "A"})
+
+    db = storage.SqliteEngine(path=str(tmp_path / "store.sqlite3"), data_dir=str(tmp_path / "src"))
+    counts = migrate(src, db)
+    assert counts["users_active"] == 1 and counts["reviews"] == 1 and counts["movies"] == 1
+
+    dst = storage.JsonFileEngine(data_dir=str(tmp_path / "dst"))
+    migrate(db, dst)
+    assert dst.collection("reviews").load_document("m1") == [make_review("r1")]
+    assert dst.collection("users_active").get("u1")["username"] == "alice"
+    db.close()
+
+
+def test_sqlite_engine_serves_jsonio_paths(tmp_path):
+    data_dir = str(tmp_path / "data")
+    eng = storage.SqliteEngine(path=str(tmp_path / "store.sqlite3"), data_dir=data_dir)
+    path = eng.specs["reports"].file
+    jsonio.set_backend(eng)
+    try:
+        jsonio.save_json(path, [{"report_id": "r1", "status": "pending"}])
+        assert not os.path.exists(path)
+        assert jsonio.load_json(path, default=[]) == [{"report_id": "r1", "status": "pending"}]
+        assert eng.collection("reports").query(status="pending")[0]["report_id"] == "r1"
+    finally:
+        jsonio.set_backend(storage.get_engine())
+        eng.close()
+
+
+# ---------------------------------------------------------
+# Per-user records and indexes (JSON engine)
+# ---------------------------------------------------------
+
+@pytest.fixture
+def users_engine(tmp_path, monkeypatch):
+    from backend.core import transactions
+    monkeypatch.setattr(transactions, "TRANSACTIONS_DIR", str(tmp_path / ".transactions"))
+    return storage.JsonFileEngine(data_dir=str(tmp_path / "data"))
+
+
+def test_user_records_move_between_groups_with_index(users_engine):
+    active = users_engine.collection("users_active")
+    inactive = users_engine.collection("users_inactive")
+    active.save_document([
+        {"user_id": "u1", "username": "alice", "email": "Alice@X.com"},
+        {"user_id": "u2", "username": "bob", "email": "bob@x.com"},
+    ])
+
+    assert active.query(email="alice@x.com")[0]["user_id"] == "u1"
+    assert active.query(username="bob")[0]["user_id"] == "u2"
+
+    inactive.put({"user_id": "u1", "username": "alice2", "email": "alice@x.com", "status": "inactive"})
+    assert active.get("u1") is None
+    assert [u["user_id"] for u in active.all()] == ["u2"]
+    assert inactive.query(username="alice2")[0]["user_id"] == "u1"
+    assert active.query(username="alice") == [] and inactive.query(username="alice") == []
+    assert not os.path.exists(active.record_path("u1"))
+
+    assert users_engine.verify_index(active.spec.store) == []
+
+
+def test_writes_to_different_users_do_not_wait_for_each_other(users_engine):
+    active = users_engine.collection("users_active")
+    active.put({"user_id": "u1", "username": "alice", "email": "a@x.com"})
+    active.put({"user_id": "u2", "username": "bob", "email": "b@x.com"})
+    alice = active.get("u1")
+
+    with transaction(*active.write_paths("u1", alice, alice), shared=[active.spec.store]):  # u1 being edited
+        done = []
+        worker = threading.Thread(target=lambda: done.append(
+            active.put({"user_id": "u2", "username": "robert", "email": "b@x.com"})))
+        worker.start()
+        worker.join(timeout=5)
+        assert done == [None]
+    assert active.query(username="robert")[0]["user_id"] == "u2"
+    assert users_engine.verify_index(active.spec.store) == []
+
+
+def test_index_refuses_a_value_owned_by_another_record(users_engine):
+    active = users_engine.collection("users_active")
+    active.put({"user_id": "u1", "username": "alice", "email": "a@x.com"})
+    with pytest.raises(DuplicateValueError):
+        active.put({"user_id": "u2", "username": "alice", "email": "b@x.com"})
+    assert active.query(username="alice")[0]["user_id"] == "u1" and active.get("u2") is None
+    assert users_engine.verify_index(active.spec.store) == []
+
+
+def test_legacy_user_list_is_imported_in_order(users_engine):
+    spec = users_engine.specs["users_active"]
+    jsonio.ensure_parent(spec.file)
+    with open(spec.file, "w", encoding="utf-8") as f:
+        f.write('[{"user_id": "b", "username": "bee", "email": "b@x.com"},'
+                ' {"user_id": "a", "username": "ay", "email": "a@x.com"}]')
+
+    active = users_engine.collection("users_active")
+    assert [u["user_id"] for u in active.all()] == ["b", "a"]
+    assert not os.path.exists(spec.file)
+
+
+def test_user_index_verify_and_rebuild(users_engine):
+    active = users_engine.collection("users_active")
+    active.save_document([{"user_id": "u1", "username": "alice", "email": "a@x.com"}])
+    jsonio.save_json(active.record_path("u1"), {"user_id": "u1", "username": "alicia", "email": "a@x.com"})
+
+    problems = users_engine.verify_index(active.spec.store)
+    assert any("alicia" in p for p in problems)
+    assert users_engine.rebuild_index(active.spec.store) == []
+    assert users_engine.verify_index(active.spec.store) == []
+    assert active.query(username="alicia")[0]["user_id"] == "u1"
+
+
+def test_legacy_user_paths_route_to_records(users_engine, monkeypatch):
+    monkeypatch.setattr(jsonio, "_backend", users_engine)
+    path = users_engine.specs["users_active"].file
+    jsonio.save_json(path, [{"user_id": "u1", "username": "alice", "email": "a@x.com"}])
+    users = jsonio.load_json(path, default=[])
+    users.append({"user_id": "u2", "username": "bob", "email": "b@x.com"})
+    jsonio.save_json(path, users)
+
+    assert not os.path.exists(path)
+    assert [u["user_id"] for u in jsonio.load_json(path, default=[])] == ["u1", "u2"]
+    assert users_engine.collection("users_active").query(username="bob")[0]["email"] == "b@x.com"
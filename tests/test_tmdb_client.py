@@ -0,0 +1,100 @@
+import asyncio
+
+import httpx
+import pytest
+
+from External_API import tmdb_client
+from External_API.tmdb_client import TMDbClient, TMDbError
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def client_for(handler, **kwargs):
+    sleeps = []
+
+    async def sleep(seconds):
+        sleeps.append(seconds)
+
+    client = TMDbClient("token", transport=httpx.MockTransport(handler), sleep=sleep, **kwargs)
+    return client, sleeps
+
+
+def test_cached_within_ttl_then_revalidated_with_etag(monkeypatch):
+    calls = []
+
+    def handler(request):
+        calls.append(request.headers.get("if-none-match"))
+        if request.headers.get("if-none-match") == '"v1"':
+            return httpx.Response(304, headers={"ETag": '"v1"'})
+        return httpx.Response(200, json={"results": [1, 2]}, headers={"ETag": '"v1"'})
+
+    async def scenario():
+        async with client_for(handler)[0] as tmdb:
+            first = await tmdb.get("/movie/popular", {"page": 1})
+            second = await tmdb.get("/movie/popular", {"page": 1})
+            monkeypatch.setitem(tmdb_client.CACHE_TTLS, "/movie/popular", 0)
+            third = await tmdb.get("/movie/popular", {"page": 1})
+            return first, second, third, tmdb.stats()
+
+    first, second, third, stats = run(scenario())
+    assert first == second == third == {"results": [1, 2]}
+    assert calls == [None, '"v1"']
+    assert (stats["requests"], stats["cache_hits"], stats["not_modified"]) == (2, 1, 1)
+
+
+def test_retries_honour_retry_after_then_give_up():
+    statuses = iter([429, 503, 200])
+
+    def handler(request):
+        status = next(statuses)
+        headers = {"Retry-After": "2"} if status == 429 else {}
+        return httpx.Response(status, json={"ok": status == 200}, headers=headers)
+
+    tmdb, sleeps = client_for(handler)
+    assert run(tmdb.get("/genre/movie/list")) == {"ok": True}
+    assert sleeps[0] == 2 and 0 <= sleeps[1] <= 1 and tmdb.retries == 2
+
+    tmdb, sleeps = client_for(lambda request: httpx.Response(500), max_retries=2)
+    with pytest.raises(TMDbError) as err:
+        run(tmdb.get("/movie/popular"))
+    assert err.value.status_code == 500 and len(sleeps) == 2
+
+    tmdb, sleeps = client_for(lambda request: httpx.Response(401, json={"status_code": 7}))
+    with pytest.raises(TMDbError):
+        run(tmdb.get("/movie/popular"))
+    assert sleeps == [] and tmdb.requests == 1
+
+
+def test_transport_errors_are_retried():
+    attempts = []
+
+    def handler(request):
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise httpx.ConnectError("refused", request=request)
+        return httpx.Response(200, json={"page": 1})
+
+    tmdb, sleeps = client_for(handler)
+    assert run(tmdb.get("/movie/popular", cache=False)) == {"page": 1}
+    assert len(attempts) == 3 and len(sleeps) == 2
+
+
+def test_concurrency_is_bounded():
+    active, peak = [0], [0]
+
+    async def handler(request):
+        active[0] += 1
+        peak[0] = max(peak[0], active[0])
+        await asyncio.sleep(0.01)
+        active[0] -= 1
+        return httpx.Response(200, json={"page": request.url.params["page"]})
+
+    async def scenario():
+        async with TMDbClient("token", transport=httpx.MockTransport(handler), concurrency=3) as tmdb:
+            return await asyncio.gather(*(tmdb.get("/movie/popular", {"page": p}) for p in range(12)))
+
+    pages = run(scenario())
+    assert [p["page"] for p in pages] == [str(p) for p in range(12)]
+    assert peak[0] == 3
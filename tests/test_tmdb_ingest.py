@@ -0,0 +1,113 @@
+import asyncio, json, os
+
+import httpx
+
+from backend.core import storage
+from External_API.ingest import MAP_FILE, MAP_LOG, IngestReport, MovieWriter, ingest, ingest_payloads
+from External_API.tmdb_client import TMDbClient
+
+GENRES = {"genres": [{"id": 18, "name": "Drama"}, {"id": 35, "name": "Comedy"}]}
+
+
+def tmdb_movie(tmdb_id, title=None, votes=100):
+    return {"id": tmdb_id, "title": title or f"Movie {tmdb_id}", "vote_average": 7.0, "vote_count": votes,
+            "genre_ids": [18, 99], "release_date": "2001-01-01", "overview": "..."}
+
+
+def page_handler(pages, calls):
+    def handler(request):
+        if request.url.path.endswith("/genre/movie/list"):
+            return httpx.Response(200, json=GENRES)
+        page = int(request.url.params["page"])
+        calls.append(page)
+        return httpx.Response(200, json={"page": page, "results": pages[page]})
+    return handler
+
+
+def run(pages, batch_size=2):
+    calls = []
+    client = TMDbClient("t", transport=httpx.MockTransport(page_handler(pages, calls)))
+    report = asyncio.run(ingest(len(pages), client=client, batch_size=batch_size))
+    return report, sorted(calls)
+
+
+def with_engine(tmp_path):
+    previous = storage.get_engine()
+    storage.set_engine(storage.JsonFileEngine(data_dir=str(tmp_path / "data")))
+    return previous
+
+
+def test_ingest_writes_pages_and_skips_unchanged(tmp_path):
+    previous = with_engine(tmp_path)
+    try:
+        pages = {1: [tmdb_movie(1), tmdb_movie(2)], 2: [tmdb_movie(3), tmdb_movie(1)], 3: [tmdb_movie(4)]}
+        report, calls = run(pages)
+        assert calls == [1, 2, 3]
+        assert (report.pages, report.movies, report.created, report.updated, report.unchanged) == (3, 4, 4, 0, 0)
+
+        movies = storage.collection("movies")
+        ids = json.load(open(os.path.join(movies.spec.directory, MAP_FILE)))
+        assert sorted(ids) == ["1", "2", "3", "4"]
+        assert not os.path.exists(os.path.join(movies.spec.directory, MAP_LOG))  # folded into the map
+        record = movies.get(ids["1"])
+        assert record["title"] == "Movie 1" and record["genres"] == ["Drama", 99]
+        assert len(movies.all()) == 4  # the map file is not a record
+
+        pages[2][0] = tmdb_movie(3, title="Renamed")
+        report, _ = run(pages)
+        assert (report.created, report.updated, report.unchanged) == (0, 1, 3)
+        assert json.load(open(os.path.join(movies.spec.directory, MAP_FILE))) == ids
+        assert movies.get(ids["3"])["title"] == "Renamed"
+    finally:
+        storage.set_engine(previous)
+
+
+def test_failed_page_raises_after_writing_the_rest(tmp_path):
+    previous = with_engine(tmp_path)
+    try:
+        def handler(request):
+            if request.url.path.endswith("/genre/movie/list"):
+                return httpx.Response(200, json=GENRES)
+            page = int(request.url.params["page"])
+            return httpx.Response(404) if page == 2 else httpx.Response(200, json={"results": [tmdb_movie(page)]})
+
+        client = TMDbClient("t", transport=httpx.MockTransport(handler))
+        try:
+            asyncio.run(ingest(3, client=client, batch_size=1))
+        except Exception as exc:
+            assert getattr(exc, "status_code", None) == 404
+        else:
+            raise AssertionError("expected the failed page to raise")
+        assert sorted(m["title"] for m in storage.collection("movies").all()) == ["Movie 1", "Movie 3"]
+    finally:
+        storage.set_engine(previous)
+
+
+def test_ingest_payloads_reuses_the_map(tmp_path):
+    previous = with_engine(tmp_path)
+    try:
+        first = ingest_payloads([{"results": [tmdb_movie(7), tmdb_movie(8)]}])
+        again = ingest_payloads([{"results": [tmdb_movie(7), tmdb_movie(8, votes=5)]}], writer=MovieWriter())
+        assert (first.created, again.created, again.updated, again.unchanged) == (2, 0, 1, 1)
+        assert len(storage.collection("movies").all()) == 2
+    finally:
+        storage.set_engine(previous)
+
+
+def test_ids_logged_by_an_unfinished_run_are_reused(tmp_path):
+    previous = with_engine(tmp_path)
+    try:
+        writer, report = MovieWriter(), IngestReport()
+        for tmdb_id in ("7", "8"):  # two batches, then the run stops before finish()
+            record = {"movie_id": writer.movie_id(tmdb_id), "title": f"Movie {tmdb_id}"}
+            writer.write([{"tmdb_id": tmdb_id, "record": record}], report)
+        directory = storage.collection("movies").spec.directory
+        assert not os.path.exists(os.path.join(directory, MAP_FILE))
+
+        again = MovieWriter()
+        assert again.ids == writer.ids and sorted(again.ids) == ["7", "8"]
+        again.finish()
+        assert json.load(open(os.path.join(directory, MAP_FILE))) == writer.ids
+        assert not os.path.exists(os.path.join(directory, MAP_LOG))
+    finally:
+        storage.set_engine(previous)
@@ -0,0 +1,196 @@
+import json
+import multiprocessing
+import os
+import threading
+import pytest
+
+from backend.core import jsonio, transactions
+from backend.core.transactions import transaction, TransactionError
+
+
+@pytest.fixture
+def files(tmp_path, monkeypatch):
+    monkeypatch.setattr(transactions, "TRANSACTIONS_DIR", str(tmp_path / ".transactions"))
+    a, b = str(tmp_path / "a.json"), str(tmp_path / "b.json")
+    jsonio.save_json(a, [1])
+    jsonio.save_json(b, [2])
+    return a, b
+
+
+# ---------------------------------------------------------
+# Commit / rollback
+# ---------------------------------------------------------
+
+def test_writes_are_staged_until_commit(files):
+    a, b = files
+    with transaction(a, b):
+        jsonio.save_json(a, [1, 10])
+        jsonio.save_json(b, [2, 20])
+        # visible inside the transaction, not yet on disk
+        assert jsonio.load_json(a, default=[]) == [1, 10]
+        with open(a, encoding="utf-8") as f:
+            assert json.load(f) == [1]
+
+    assert jsonio.load_json(a, default=[]) == [1, 10]
+    assert jsonio.load_json(b, default=[]) == [2, 20]
+
+
+def test_exception_discards_all_writes(files):
+    a, b = files
+    with pytest.raises(ValueError):
+        with transaction(a, b):
+            jsonio.save_json(a, [99])
+            jsonio.save_json(b, [99])
+            raise ValueError("boom")
+
+    assert jsonio.load_json(a, default=[]) == [1]
+    assert jsonio.load_json(b, default=[]) == [2]
+
+
+def test_commit_flushes_write_behind_group_before_unlocking(files, tmp_path, monkeypatch):
+    a, b = files
+    wb = jsonio.WriteBehind(10_000, "none")
+    monkeypatch.setattr(jsonio, "_write_behind", wb)
+    other = str(tmp_path / "other.json")
+    jsonio.save_json(other, [0])  # an unrelated pending write goes out with the same group
+    with transaction(a, b):
+        jsonio.save_json(a, [1, 10])
+        jsonio.save_json(b, [2, 20])
+
+    # Other workers read the files from disk as soon as the locks are released
+    with open(b, encoding="utf-8") as f:
+        assert json.load(f) == [2, 20]
+    assert os.path.exists(other)
+    assert wb.stats()["pending"] == 0 and wb.stats()["groups"] == 1
+    wb.close()
+
+
+def test_nested_transaction_joins_outer(files):
+    a, b = files
+    with transaction(a, b):
+        with transaction(a):
+            jsonio.save_json(a, [5])
+        assert jsonio.load_json(a, default=[]) == [5]
+    assert jsonio.load_json(a, default=[]) == [5]
+
+
+def test_nested_transaction_cannot_add_paths(files, tmp_path):
+    a, _ = files
+    with transaction(a):
+        with pytest.raises(TransactionError):
+            with transaction(str(tmp_path / "other.json")):
+                pass
+
+
+# ---------------------------------------------------------
+# Recovery and concurrency
+# ---------------------------------------------------------
+
+def test_recover_rolls_forward_interrupted_commit(files, tmp_path):
+    a, b = files
+    tmp_a, tmp_b = str(tmp_path / "a.tmp"), str(tmp_path / "b.tmp")
+    for tmp, data in ((tmp_a, [7]), (tmp_b, [8])):
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+    os.makedirs(transactions.TRANSACTIONS_DIR)
+    with open(os.path.join(transactions.TRANSACTIONS_DIR, "x.json"), "w", encoding="utf-8") as f:
+        json.dump([[tmp_a, a], [tmp_b, b]], f)
+
+    assert transactions.recover() == 1
+    assert jsonio.load_json(a, default=[]) == [7]
+    assert jsonio.load_json(b, default=[]) == [8]
+
+
+@pytest.mark.parametrize("appended", [False, True])
+def test_recover_finishes_appends_of_a_commit_interrupted_after_its_renames(files, tmp_path, monkeypatch, appended):
+    a, _ = files
+    log = str(tmp_path / "a.log")
+    with open(log, "w", encoding="utf-8") as f:
+        f.write('{"n": 1}\n{"n"')  # ends in a torn line
+    write_append = transactions._write_append
+
+    def crash(path, text):
+        if appended:
+            write_append(path, text)
+        raise OSError("No space left on device")
+
+    monkeypatch.setattr(transactions, "_write_append", crash)
+    with pytest.raises(OSError):
+        with transaction(a, log) as tx:
+            jsonio.save_json(a, [1, 2])
+            tx.stage_append(log, '{"n": 2}')
+    assert jsonio.load_json(a, default=[]) == [1, 2]  # renamed before the crash
+
+    monkeypatch.setattr(transactions, "_write_append", write_append)
+    assert transactions.recover() == 1
+    with open(log, encoding="utf-8") as f:
+        assert f.read() == '{"n": 1}\n{"n"\n{"n": 2}\n'
+    assert transactions.recover() == 0
+
+
+def test_recover_waits_for_commits_in_flight(files, tmp_path):
+    a, _ = files
+    tmp_a = str(tmp_path / "a.tmp")
+    with open(tmp_a, "w", encoding="utf-8") as f:
+        json.dump([9], f)
+    os.makedirs(transactions.TRANSACTIONS_DIR)
+    with open(os.path.join(transactions.TRANSACTIONS_DIR, "x.json"), "w", encoding="utf-8") as f:
+        json.dump({"renames": [[tmp_a, a]], "deletes": []}, f)
+
+    committing = transactions._PathLock(transactions.TRANSACTIONS_DIR, shared=True)
+    committing.acquire()
+    done = []
+    worker = threading.Thread(target=lambda: done.append(transactions.recover()))
+    worker.start()
+    worker.join(timeout=0.3)
+    assert not done and os.path.exists(tmp_a)  # the commit still owns its temp files
+    committing.release()
+    worker.join(timeout=5)
+    assert done == [1]
+    assert jsonio.load_json(a, default=[]) == [9]
+
+
+def test_shared_paths_admit_each_other_and_exclude_the_holder(tmp_path):
+    directory = str(tmp_path / "shards")
+    inside, events = threading.Barrier(3, timeout=5), []
+
+    def writer(name):
+        with transaction(os.path.join(directory, f"{name}.json"), shared=[directory]) as tx:
+            assert tx.holds(os.path.join(directory, f"{name}.json")) and not tx.holds(directory)
+            inside.wait()  # both writers are in at once
+            events.append(name)
+
+    writers = [threading.Thread(target=writer, args=(name,)) for name in ("a", "b")]
+    for t in writers:
+        t.start()
+    inside.wait()
+    with transaction(directory):  # waits for the writers
+        events.append("rebuild")
+    for t in writers:
+        t.join()
+    assert sorted(events[:2]) == ["a", "b"] and events[2] == "rebuild"
+
+    with transaction(os.path.join(directory, "a.json"), shared=[directory]):
+        with pytest.raises(TransactionError):
+            with transaction(shared=[str(tmp_path / "elsewhere")]):
+                pass
+
+
+def _increment(path, times):
+    for _ in range(times):
+        with transaction(path):
+            doc = jsonio.load_json(path, default={"n": 0})
+            doc["n"] += 1
+            jsonio.save_json(path, doc)
+
+
+def test_no_lost_updates_across_processes(tmp_path):
+    path = str(tmp_path / "counter.json")
+    jsonio.save_json(path, {"n": 0})
+    ctx = multiprocessing.get_context("fork")
+    procs = [ctx.Process(target=_increment, args=(path, 25)) for _ in range(4)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+    assert jsonio.load_json(path, default={})["n"] == 100
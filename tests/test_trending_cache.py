@@ -0,0 +1,82 @@
+import asyncio
+import json
+
+from backend.movies import trending
+from backend.movies.trending import TrendingCache
+
+
+def payload(*votes):
+    return {"page": 1, "results": [{"id": i, "vote_average": v} for i, v in enumerate(votes)]}
+
+
+class SlowFetcher:
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        response = self.responses.pop(0) if len(self.responses) > 1 else self.responses[0]
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+def test_concurrent_callers_share_one_fetch(tmp_path):
+    fetch = SlowFetcher(payload(5.0, None, 8.1))
+    cache = TrendingCache(fetch, ttl=60, path=str(tmp_path / "tmdb.json"))
+
+    async def run():
+        return await asyncio.gather(*(cache.get() for _ in range(20)))
+
+    results = asyncio.run(run())
+    assert fetch.calls == 1
+    assert all(r == results[0] for r in results)
+    assert [m["id"] for m in results[0]] == [2, 0, 1]
+    assert asyncio.run(cache.get()) is results[0]  # fresh: no fetch, no re-sort
+    assert fetch.calls == 1
+
+
+def test_stale_list_served_while_refreshing_and_kept_on_failure(tmp_path):
+    fetch = SlowFetcher(payload(7.0), RuntimeError("TMDb down"), {"status_code": 7, "success": False}, payload(9.0))
+    cache = TrendingCache(fetch, ttl=0, path=str(tmp_path / "tmdb.json"))
+
+    async def run():
+        first = await cache.get()
+        stale = await cache.get()  # starts a refresh, does not wait for it
+        await cache._task
+        await cache.refresh()  # an error payload counts as a failure too
+        kept = await cache.get()
+        await cache._task
+        return first, stale, kept, await cache.get()
+
+    first, stale, kept, last = asyncio.run(run())
+    assert first == stale == kept == [{"id": 0, "vote_average": 7.0}]
+    assert cache.stats()["failures"] == 2
+    assert last == [{"id": 0, "vote_average": 9.0}]
+
+
+def test_saves_only_changed_payloads_and_reloads_them(tmp_path):
+    path = tmp_path / "tmdb.json"
+    fetch = SlowFetcher(payload(6.0, 7.0), payload(6.0, 7.0), payload(1.0))
+    cache = TrendingCache(fetch, ttl=0, path=str(path))
+
+    async def refresh_three_times():
+        for _ in range(3):
+            await cache.refresh()
+
+    asyncio.run(refresh_three_times())
+    assert cache.saves == 2
+    assert json.loads(path.read_text()) == payload(1.0)
+
+    restarted = TrendingCache(SlowFetcher(RuntimeError("offline")), ttl=60, path=str(path))
+    assert restarted.movies == [{"id": 0, "vote_average": 1.0}]
+
+
+def test_trending_route(tmp_path, monkeypatch):
+    from fastapi.testclient import TestClient
+    from backend.main import app
+
+    monkeypatch.setattr(trending, "_cache", TrendingCache(SlowFetcher(payload(3.0, 9.5)), ttl=60, path=None))
+    assert [m["id"] for m in TestClient(app).get("/trending").json()] == [1, 0]